@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+K线存储基准
+
+在临时 SQLite 文件中按当前 Kline 模型建表，写入合成的全市场日线数据，
+测量数据库大小、写入速率和单标的区间读取延迟。用于对比表结构调整前后的效果。
+
+用法:
+    python scripts/benchmark_kline_storage.py
+    python scripts/benchmark_kline_storage.py --symbols 2000 --bars 500
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.models import Base, KlineTimeframe, SymbolType
+from src.repositories.kline_repository import KlineRepository
+
+
+def _trade_days(count: int) -> list[str]:
+    """生成 count 个工作日（ISO字符串）"""
+    days = []
+    current = date(2020, 1, 1)
+    while len(days) < count:
+        if current.weekday() < 5:
+            days.append(current.isoformat())
+        current += timedelta(days=1)
+    return days
+
+
+def _records(codes: list[str], days: list[str], rng: np.random.Generator) -> list[dict]:
+    """按交易日截面生成K线记录（与每日增量写入顺序一致）"""
+    now = datetime.now(timezone.utc)
+    close = 10 + np.cumsum(rng.normal(0, 0.2, size=(len(days), len(codes))), axis=0)
+    return [
+        {
+            "symbol_type": SymbolType.STOCK,
+            "symbol_code": code,
+            "symbol_name": None,
+            "timeframe": KlineTimeframe.DAY,
+            "trade_time": day,
+            "open": c,
+            "high": c + 0.1,
+            "low": c - 0.1,
+            "close": c,
+            "volume": 1e6,
+            "amount": 1e7,
+            "dif": None,
+            "dea": None,
+            "macd": None,
+            "updated_at": now,
+        }
+        for day, row in zip(days, close.tolist())
+        for code, c in zip(codes, row)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="K线存储基准")
+    parser.add_argument("--symbols", type=int, default=1000, help="标的数量")
+    parser.add_argument("--bars", type=int, default=500, help="每个标的的日线数量")
+    parser.add_argument("--reads", type=int, default=300, help="区间读取次数")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(0)
+    codes = [f"{600000 + i:06d}" for i in range(args.symbols)]
+    days = _trade_days(args.bars)
+    records = _records(codes, days, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(engine, tables=[Base.metadata.tables["klines"]])
+        session = sessionmaker(bind=engine)()
+        repo = KlineRepository(session)
+
+        # 写入：按交易日截面分批提交
+        start = time.perf_counter()
+        per_day = len(codes)
+        for i in range(0, len(records), per_day):
+            repo.bulk_upsert(records[i : i + per_day])
+            session.commit()
+        insert_seconds = time.perf_counter() - start
+
+        session.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        session.commit()
+        size_mb = db_path.stat().st_size / 1024 / 1024
+
+        # 区间读取：随机标的最近120根 / 一年日期范围
+        sample = rng.choice(codes, size=args.reads)
+        latest_ms, range_ms = [], []
+        for code in sample:
+            t0 = time.perf_counter()
+            repo.find_columns_by_symbol(code, SymbolType.STOCK, KlineTimeframe.DAY, limit=120)
+            t1 = time.perf_counter()
+            repo.find_columns_by_symbol(
+                code, SymbolType.STOCK, KlineTimeframe.DAY,
+                start_time=days[len(days) // 2], end_time=days[len(days) // 2 + 250 - 1],
+            )
+            t2 = time.perf_counter()
+            latest_ms.append((t1 - t0) * 1000)
+            range_ms.append((t2 - t1) * 1000)
+
+        session.close()
+        engine.dispose()
+
+    print("=" * 70)
+    print(f"K线存储基准: {args.symbols} 只 × {args.bars} 根 = {len(records):,} 行")
+    print("=" * 70)
+    print(f"数据库大小          {size_mb:>10.1f} MB  ({size_mb * 1024 * 1024 / len(records):.0f} B/行)")
+    print(f"写入速率            {len(records) / insert_seconds:>10,.0f} 行/秒  ({insert_seconds:.1f} s)")
+    print(f"最近120根 中位延迟  {statistics.median(latest_ms):>10.2f} ms")
+    print(f"一年区间 中位延迟   {statistics.median(range_ms):>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
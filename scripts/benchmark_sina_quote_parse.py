@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+新浪实时行情解析性能基准
+
+对比旧版逐行解析（每行 split 成字段列表再逐个追加）与列式 parse_hq_response
+在全市场规模（默认 5,400 只）上的耗时。目标：全市场一次解析在 1 秒内完成。
+
+用法:
+    python scripts/benchmark_sina_quote_parse.py
+    python scripts/benchmark_sina_quote_parse.py --symbols 10000
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.sina_quote_service import (
+    _HQ_LINE,
+    _QUOTE_MIN_FIELDS,
+    QUOTE_FIELDS,
+    QuoteSnapshot,
+    parse_hq_response,
+)
+
+# 全市场解析的目标耗时（秒）
+TARGET_SECONDS = 1.0
+
+
+def legacy_parse_hq_response(text: str) -> QuoteSnapshot:
+    """旧版 parse_hq_response: 逐行 split 成字段列表，按行拼成字符串二维表再整体转 float"""
+    symbols, names, numbers, dates, times = [], [], [], [], []
+    for symbol, body in _HQ_LINE.findall(text):
+        parts = body.split(",")
+        if len(parts) < _QUOTE_MIN_FIELDS:
+            continue
+        symbols.append(symbol)
+        names.append(parts[0])
+        numbers.append(parts[1:10])
+        dates.append(parts[30])
+        times.append(parts[31])
+
+    if not symbols:
+        return QuoteSnapshot.empty()
+
+    raw = np.array(numbers, dtype=str)
+    raw[raw == ""] = "0"
+    matrix = raw.astype(np.float64)
+    return QuoteSnapshot(
+        np.array(symbols, dtype=object),
+        np.array([re.sub(r"^(s_)?(sh|sz|bj)", "", s) for s in symbols], dtype=object),
+        np.array(names, dtype=object),
+        *(matrix[:, i].copy() for i in range(len(QUOTE_FIELDS))),
+        np.array(dates, dtype=object),
+        np.array(times, dtype=object),
+    )
+
+
+def _response(count: int, rng: np.random.Generator) -> str:
+    """生成 count 只股票的 hq 响应（约 2% 为字段不全的无效代码）"""
+    lines = []
+    for i in range(count):
+        market = "sh" if i % 2 else "sz"
+        symbol = f"{market}{600000 + i if market == 'sh' else i:06d}"
+        if rng.random() < 0.02:
+            lines.append(f'var hq_str_{symbol}="";\n')
+            continue
+        prev = round(float(rng.uniform(3, 200)), 2)
+        price = round(prev * float(rng.uniform(0.9, 1.1)), 2)
+        book = ",".join(f"{int(rng.integers(100, 99999))},{price:.2f}" for _ in range(10))
+        fields = [
+            f"股票{i}", f"{prev:.2f}", f"{prev:.2f}", f"{price:.2f}",
+            f"{max(prev, price):.2f}", f"{min(prev, price):.2f}", f"{price:.2f}", f"{price:.2f}",
+            str(int(rng.integers(1e4, 1e8))), f"{rng.uniform(1e6, 1e10):.3f}",
+            book, "2025-07-10", "15:00:03", "00",
+        ]
+        lines.append(f'var hq_str_{symbol}="{",".join(fields)}";\n')
+    return "".join(lines)
+
+
+def _timeit(func, repeat: int = 5) -> float:
+    """返回多次运行中的最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新浪实时行情解析性能基准")
+    parser.add_argument("--symbols", type=int, default=5400, help="标的数量")
+    args = parser.parse_args()
+
+    text = _response(args.symbols, np.random.default_rng(0))
+    legacy, columnar = legacy_parse_hq_response(text), parse_hq_response(text)
+    assert len(legacy) == len(columnar)
+    for field in QuoteSnapshot.__dataclass_fields__:
+        assert np.array_equal(getattr(legacy, field), getattr(columnar, field)), field
+
+    print("=" * 70)
+    print(f"新浪行情解析基准: {args.symbols} 只, 响应 {len(text) / 1024:.0f} KB, "
+          f"有效 {len(columnar)} 只")
+    print("=" * 70)
+
+    timings = {
+        "旧版(逐行拆分)": _timeit(lambda: legacy_parse_hq_response(text)),
+        "列式(一次拆分)": _timeit(lambda: parse_hq_response(text)),
+    }
+    for name, elapsed in timings.items():
+        print(f"{name:<16s} {elapsed * 1000:>10.1f} ms  {args.symbols / elapsed / 1e3:>8.0f} K symbols/s")
+
+    print("-" * 70)
+    elapsed = timings["列式(一次拆分)"]
+    print(
+        f"加速比: {timings['旧版(逐行拆分)'] / elapsed:.1f}x | "
+        f"目标 < {TARGET_SECONDS:.0f} s: {'达成' if elapsed < TARGET_SECONDS else '未达成'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：klines 表改为紧凑存储结构
+
+旧结构: 自增 id 主键 + 唯一约束 + ix_klines_symbol / ix_klines_lookup /
+        各列单独索引 + created_at/updated_at 两个时间戳
+新结构: (symbol_type, symbol_code, timeframe, trade_time) 聚簇主键 (WITHOUT ROWID)
+        + ix_klines_trade_time，只保留 updated_at
+
+迁移在单个事务内完成（失败自动回滚），完成后 VACUUM 回收空间。
+服务启动时 init_db 会自动执行同一迁移；本脚本用于停机时手动迁移或排查失败原因。
+迁移前请停止后端服务和定时任务，并备份数据库 (scripts/backup.sh)。
+
+用法:
+    python scripts/migrate_klines_compact.py
+    python scripts/migrate_klines_compact.py --db data/market.db
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.database import is_legacy_kline_layout, migrate_legacy_kline_layout
+
+DEFAULT_DB = Path(__file__).parent.parent / "data" / "market.db"
+
+
+def _db_size_mb(db_path: Path) -> float:
+    """数据库文件（含WAL）大小"""
+    total = 0
+    for suffix in ("", "-wal"):
+        path = Path(f"{db_path}{suffix}")
+        if path.exists():
+            total += path.stat().st_size
+    return total / 1024 / 1024
+
+
+def migrate(db_path: Path) -> bool:
+    """将 klines 表迁移为紧凑结构"""
+    if not db_path.exists():
+        print(f"❌ 未找到数据库文件: {db_path}")
+        return False
+
+    print(f"📁 数据库路径: {db_path}")
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='klines'"
+        ).fetchone():
+            print("⚠️  klines 表不存在")
+            return False
+
+        if not is_legacy_kline_layout(conn):
+            print("✅ klines 已是紧凑结构，无需迁移")
+            return True
+
+        size_before = _db_size_mb(db_path)
+        rows_before = conn.execute("SELECT COUNT(*) FROM klines").fetchone()[0]
+        print(f"📊 迁移前: {rows_before:,} 行, {size_before:.1f} MB")
+
+        start = time.perf_counter()
+        print("🔄 重建 klines 表...")
+        rows_after = migrate_legacy_kline_layout(conn)
+
+        print("🔄 VACUUM 回收空间...")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        size_after = _db_size_mb(db_path)
+        print(f"📊 迁移后: {rows_after:,} 行, {size_after:.1f} MB")
+        print(f"⏱️  耗时 {time.perf_counter() - start:.1f} s, 空间节省 {size_before - size_after:.1f} MB")
+        return True
+
+    except Exception as e:
+        print(f"❌ 迁移失败: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="klines 表紧凑结构迁移")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="SQLite数据库路径")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("数据库迁移：klines 紧凑存储结构")
+    print("=" * 60)
+
+    if migrate(args.db):
+        print("\n✅ 迁移完成！")
+    else:
+        print("\n❌ 迁移失败")
+        sys.exit(1)
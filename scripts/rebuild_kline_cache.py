@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+从SQLite全量重建K线内存映射缓存 (data/kline_cache)
+
+正常写入路径（KlineService.save_klines / save_bar_records）会在提交后增量刷新缓存；
+直接用SQL或脚本修改/删除 klines 后需要运行本脚本。
+
+用法:
+    python scripts/rebuild_kline_cache.py
+    python scripts/rebuild_kline_cache.py --type STOCK --timeframe DAY
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.models import KlineTimeframe, SymbolType
+from src.services.kline_array_cache import get_kline_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重建K线内存映射缓存")
+    parser.add_argument("--type", choices=[t.name for t in SymbolType], help="只重建该标的类型")
+    parser.add_argument(
+        "--timeframe", choices=[t.name for t in KlineTimeframe], help="只重建该时间周期"
+    )
+    args = parser.parse_args()
+
+    cache = get_kline_cache()
+    if cache is None:
+        print("❌ K线缓存未启用 (KLINE_CACHE_ENABLED=false)")
+        sys.exit(1)
+
+    symbol_types = [SymbolType[args.type]] if args.type else list(SymbolType)
+    timeframes = [KlineTimeframe[args.timeframe]] if args.timeframe else list(KlineTimeframe)
+
+    print(f"📁 缓存目录: {cache.root}")
+    for symbol_type in symbol_types:
+        for timeframe in timeframes:
+            start = time.perf_counter()
+            count = cache.rebuild(symbol_type, timeframe)
+            if count:
+                print(
+                    f"✅ {symbol_type.name}_{timeframe.name}: {count} 个标的, "
+                    f"{time.perf_counter() - start:.1f} s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ sys.path.insert(0, str(project_root))
 from sqlalchemy import func
 from src.database import SessionLocal
 from src.models import IndustryDaily, SuperCategoryDaily
+from src.services.trading_calendar import get_trading_calendar
 
 
 def load_super_category_mapping() -> Dict[str, Dict]:
@@ -45,15 +46,27 @@ def load_super_category_mapping() -> Dict[str, Dict]:
 
 
 def get_previous_trade_date(session, current_date: str) -> str | None:
-    """获取前一个交易日
+    """获取前一个有行业数据的交易日
+
+    优先取交易日历的前一个交易日；该日没有行业数据（如漏同步）时，
+    回退到之前最近一个有行业数据的日期。
 
     Args:
         session: 数据库会话
         current_date: 当前交易日 YYYYMMDD
 
     Returns:
-        前一个交易日，如果不存在返回 None
+        前一个交易日 YYYYMMDD，如果不存在返回 None
     """
+    previous = get_trading_calendar(session).prev(current_date)
+    if previous:
+        previous = previous.replace("-", "")
+        has_data = session.query(IndustryDaily.trade_date).filter(
+            IndustryDaily.trade_date == previous
+        ).first()
+        if has_data:
+            return previous
+
     result = session.query(IndustryDaily.trade_date).filter(
         IndustryDaily.trade_date < current_date
     ).order_by(IndustryDaily.trade_date.desc()).first()
@@ -267,14 +267,9 @@ def _load_board_symbols(session, board_name: str) -> list[SymbolMetadata]:
 
     if industry_daily and industry_daily.ts_code:
         try:
-            from src.services.tushare_client import TushareClient
-            from src.config import get_settings
-
-            settings = get_settings()
-            client = TushareClient(
-                token=settings.tushare_token,
-                points=settings.tushare_points
-            )
+            from src.services.tushare_client import Priority, shared_tushare_client
+
+            client = shared_tushare_client(Priority.INTERACTIVE)
 
             # 获取同花顺成分股
             members_df = client.fetch_ths_member(ts_code=industry_daily.ts_code)
@@ -1,16 +1,21 @@
 """
 股票K线API
-带懒加载功能：数据库无数据或过期时自动从API获取并保存
+带懒加载功能：数据库无数据时从API获取并保存；数据过期时先返回库中数据，
+后台刷新（stale-while-revalidate）
 """
-from datetime import datetime, time, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
 from sqlalchemy.orm import Session
-from typing import Annotated, Optional
+from typing import Annotated
 
 from src.api.dependencies import get_db
-from src.models import KlineTimeframe, SymbolType, Timeframe, TradeCalendar
+from src.models import KlineTimeframe, SymbolType, Timeframe
 from src.schemas import CandleBatchResponse, CandlePoint
+from src.services.freshness_registry import get_freshness_registry
+from src.services.kline_bootstrap import fetch_stock_klines
 from src.services.kline_service import KlineService
+from src.services.refresh_queue import get_kline_refresh_queue
 from src.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -29,206 +34,23 @@ RESPONSE_TIMEFRAME_MAP = {
     "30m": Timeframe.MINS_30,
 }
 
+# 数据库无数据时同步等待首次获取的最长时间（秒）
+BLOCKING_FETCH_TIMEOUT = 30.0
 
-# ==================== 懒加载辅助函数 ====================
-
-def _get_latest_trade_date(db: Session) -> Optional[str]:
-    """
-    获取最近一个交易日的日期 (YYYY-MM-DD)
-    从 trade_calendar 表查询
-
-    Args:
-        db: 数据库会话
-    """
-    today = datetime.now().strftime("%Y-%m-%d")
-    # 查找今天或之前最近的交易日
-    cal = db.query(TradeCalendar).filter(
-        TradeCalendar.date <= today,
-        TradeCalendar.is_trading_day == True
-    ).order_by(TradeCalendar.date.desc()).first()
-
-    if cal:
-        return cal.date
-    return None
-
-
-def _is_trading_time() -> bool:
-    """判断当前是否在交易时间内"""
-    now = datetime.now()
-    current_time = now.time()
-
-    # 上午: 09:30 - 11:30
-    morning_start = time(9, 30)
-    morning_end = time(11, 30)
-
-    # 下午: 13:00 - 15:00
-    afternoon_start = time(13, 0)
-    afternoon_end = time(15, 0)
-
-    return (morning_start <= current_time <= morning_end) or \
-           (afternoon_start <= current_time <= afternoon_end)
-
-
-def _is_data_stale(
-    db: Session,
-    latest_time: Optional[str],
-    timeframe: str,
-) -> bool:
-    """
-    判断数据是否过期需要更新
-
-    Args:
-        db: 数据库会话
-        latest_time: 数据库中最新数据的时间 (日线: YYYY-MM-DD, 30m: YYYY-MM-DD HH:MM:SS)
-        timeframe: 时间周期 (day/30m)
-
-    Returns:
-        True 表示数据过期需要更新
-    """
-    if latest_time is None:
-        return True  # 无数据，需要获取
-
-    now = datetime.now()
-
-    if timeframe == "day":
-        # 日线：检查是否是最近交易日的数据
-        latest_trade_date = _get_latest_trade_date(db)
-        if latest_trade_date is None:
-            return False  # 无法判断，不更新
-
-        # 提取日期部分
-        data_date = latest_time[:10]  # YYYY-MM-DD
-
-        # 如果数据日期 < 最近交易日，需要更新
-        # 但如果现在是交易日且收盘前，不需要更新到今天
-        if data_date < latest_trade_date:
-            return True
-
-        # 如果是今天且已收盘(15:30后)，检查是否需要更新
-        today = now.strftime("%Y-%m-%d")
-        if data_date < today and now.time() > time(15, 30):
-            # 检查今天是否是交易日
-            cal = db.query(TradeCalendar).filter(
-                TradeCalendar.date == today
-            ).first()
-            if cal and cal.is_trading_day:
-                return True
-
-        return False
-
-    else:  # 30m
-        # 30分钟线：如果在交易时间内，检查数据是否超过35分钟
-        if not _is_trading_time():
-            # 非交易时间，检查是否有最近交易日的收盘数据
-            latest_trade_date = _get_latest_trade_date(db)
-            if latest_trade_date:
-                expected_last_time = f"{latest_trade_date} 15:00:00"
-                if latest_time < expected_last_time:
-                    return True
-            return False
-
-        # 交易时间内，检查数据是否过期（超过35分钟）
-        try:
-            latest_dt = datetime.strptime(latest_time[:19], "%Y-%m-%d %H:%M:%S")
-            if now - latest_dt > timedelta(minutes=35):
-                return True
-        except ValueError:
-            return True
-
-        return False
 
+# ==================== 懒加载辅助函数 ====================
 
-def _fetch_and_save_klines(
-    db: Session,
-    ticker: str,
-    timeframe: str,
-    limit: int = 120,
-) -> int:
+def _schedule_refresh(ticker: str, timeframe: str, limit: int):
     """
-    从API获取K线数据并保存到数据库
-
-    Args:
-        db: 数据库会话
-        ticker: 6位股票代码
-        timeframe: 时间周期 (day/30m)
-        limit: 获取数量
+    提交后台刷新任务，同一 (ticker, timeframe) 同时只有一个在执行
 
     Returns:
-        保存的记录数
+        任务的 Future
     """
-    from src.services.sina_kline_provider import SinaKlineProvider
-    from src.services.tushare_client import TushareClient
-    from src.config import get_settings
-
-    logger.info(f"懒加载: 获取 {ticker} {timeframe} K线数据...")
-
-    try:
-        if timeframe == "day":
-            # 日线用TuShare
-            settings = get_settings()
-            client = TushareClient(
-                token=settings.tushare_token,
-                points=settings.tushare_points,
-                delay=settings.tushare_delay,
-                max_retries=settings.tushare_max_retries,
-            )
-            ts_code = client.normalize_ts_code(ticker)
-            df = client.fetch_daily(ts_code=ts_code)
-        else:
-            # 30分钟用新浪
-            provider = SinaKlineProvider(delay=0.1)
-            df = provider.fetch_kline(ticker, period="30m", limit=limit)
-
-        if df is None or df.empty:
-            logger.warning(f"懒加载: {ticker} {timeframe} 无数据返回")
-            return 0
-
-        # 转换为 klines 格式
-        klines = []
-        if timeframe == "day":
-            for _, row in df.head(limit).iterrows():
-                klines.append({
-                    "datetime": row["trade_date"],
-                    "open": float(row["open"]),
-                    "high": float(row["high"]),
-                    "low": float(row["low"]),
-                    "close": float(row["close"]),
-                    "volume": int(row["vol"]) if row["vol"] else 0,
-                    "amount": float(row.get("amount", 0)),
-                })
-        else:
-            for _, row in df.iterrows():
-                dt_str = row["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
-                klines.append({
-                    "datetime": dt_str,
-                    "open": float(row["open"]),
-                    "high": float(row["high"]),
-                    "low": float(row["low"]),
-                    "close": float(row["close"]),
-                    "volume": int(row["volume"]) if row["volume"] else 0,
-                    "amount": 0,
-                })
-
-        # 保存到数据库
-        kline_timeframe = KlineTimeframe.DAY if timeframe == "day" else KlineTimeframe.MINS_30
-
-        service = KlineService.create_with_session(db)
-        count = service.save_klines(
-            symbol_type=SymbolType.STOCK,
-            symbol_code=ticker,
-            symbol_name=None,
-            timeframe=kline_timeframe,
-            klines=klines,
-        )
-        db.commit()
-
-        logger.info(f"懒加载: {ticker} {timeframe} 保存 {count} 条数据")
-        return count
-
-    except Exception as e:
-        logger.error(f"懒加载失败: {ticker} {timeframe} - {e}")
-        db.rollback()
-        return 0
+    return get_kline_refresh_queue().submit(
+        ("stock", ticker, timeframe),
+        lambda session: fetch_stock_klines(session, ticker, timeframe, limit=limit),
+    )
 
 
 @router.get("/{ticker}", response_model=CandleBatchResponse)
@@ -238,6 +60,7 @@ def get_candles(
         description="Stock ticker (e.g., 000001, 600519, 002402.SZ)",
         examples=["000001", "600519", "002402.SZ"]
     )],
+    response: Response,
     timeframe: str = Query("day", description="Timeframe: day/30m"),
     limit: int = Query(120, ge=1, le=500, description="Number of candles to return"),
     db: Session = Depends(get_db),
@@ -245,13 +68,16 @@ def get_candles(
     """
     Return most recent candles for the ticker/timeframe.
 
-    带懒加载功能：
-    1. 先检查数据库是否有数据，以及数据是否过期
-    2. 如果无数据或过期，从API获取新数据并保存
-    3. 返回数据库中的数据
+    带懒加载功能（stale-while-revalidate）：
+    1. 先检查数据库是否有数据，过期判断查新鲜度登记（内存字典，不查交易日历）
+    2. 无数据：提交获取任务并等待其完成（并发请求共用同一任务）
+    3. 有数据但过期：提交后台刷新，立即返回库中数据
+    4. 响应头 X-Data-Freshness 为 fresh / stale / refreshed，
+       X-Data-Latest 为返回数据的最新K线时间
 
     Args:
         ticker: Stock code (e.g., 000001, 600519, or with suffix like 002402.SZ)
+        response: 用于设置新鲜度响应头
         timeframe: Time period (day/30m)
         limit: Number of candles to return
         db: 数据库会话（依赖注入）
@@ -278,9 +104,20 @@ def get_candles(
     )
 
     # Step 2: 判断是否需要懒加载更新
-    if _is_data_stale(db, latest_time, timeframe):
-        logger.info(f"数据过期或不存在: {ticker_code} {timeframe}, latest={latest_time}")
-        _fetch_and_save_klines(db, ticker_code, timeframe, limit=limit)
+    freshness = "fresh"
+    if latest_time is None:
+        logger.info(f"数据不存在，同步获取: {ticker_code} {timeframe}")
+        try:
+            _schedule_refresh(ticker_code, timeframe, limit).result(timeout=BLOCKING_FETCH_TIMEOUT)
+        except FutureTimeoutError:
+            logger.warning(f"懒加载超时: {ticker_code} {timeframe}，后台继续获取")
+        except Exception:
+            pass  # 失败已在后台任务中记录，下面按无数据返回 404
+        freshness = "refreshed"
+    elif get_freshness_registry().is_stale(SymbolType.STOCK, ticker_code, kline_timeframe):
+        logger.info(f"数据过期，后台刷新: {ticker_code} {timeframe}, latest={latest_time}")
+        _schedule_refresh(ticker_code, timeframe, limit)
+        freshness = "stale"
 
     # Step 3: 从数据库读取数据
     klines = service.get_klines(
@@ -320,6 +157,9 @@ def get_candles(
             ma50=None,
         ))
 
+    response.headers["X-Data-Freshness"] = freshness
+    response.headers["X-Data-Latest"] = klines[-1]["datetime"]
+
     return CandleBatchResponse(
         ticker=ticker_code,
         timeframe=response_timeframe,
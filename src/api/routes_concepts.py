@@ -13,6 +13,7 @@ from functools import lru_cache
 
 from src.api.dependencies import get_db
 from src.models import KlineTimeframe, SymbolType
+from src.repositories.kline_repository import KlineRepository
 from src.schemas.normalized import NormalizedTicker
 from src.services.kline_service import KlineService
 from src.utils.logging import get_logger
@@ -62,32 +63,18 @@ class ConceptListResponse(BaseModel):
 
 def get_concept_change_pcts(db: Session) -> dict:
     """获取所有概念板块的涨跌幅 (从 klines 表)"""
-    from sqlalchemy import and_, distinct
-    from src.models import Kline
-
     change_map = {}
     try:
-        # 获取所有概念代码
-        codes = db.query(distinct(Kline.symbol_code)).filter(
-            and_(
-                Kline.symbol_type == SymbolType.CONCEPT,
-                Kline.timeframe == KlineTimeframe.DAY,
-            )
-        ).all()
-
-        for (code,) in codes:
-            # 获取最近两条日线
-            klines = db.query(Kline).filter(
-                and_(
-                    Kline.symbol_type == SymbolType.CONCEPT,
-                    Kline.symbol_code == code,
-                    Kline.timeframe == KlineTimeframe.DAY,
-                )
-            ).order_by(Kline.trade_time.desc()).limit(2).all()
+        kline_repo = KlineRepository(db)
+        codes = kline_repo.find_symbols_with_data(SymbolType.CONCEPT, KlineTimeframe.DAY)
 
-            if len(klines) >= 2:
-                last_close = klines[0].close
-                prev_close = klines[1].close
+        # 一次查询取每个概念最近两条日线（截断在SQL中完成）
+        latest = kline_repo.latest_n_by_symbols(
+            codes, SymbolType.CONCEPT, KlineTimeframe.DAY, 2
+        )
+        for code, columns in latest.items():
+            if len(columns) >= 2:
+                prev_close, last_close = columns.close.tolist()
                 if prev_close > 0:
                     change_pct = ((last_close - prev_close) / prev_close) * 100
                     change_map[str(code)] = round(change_pct, 2)
@@ -162,11 +149,22 @@ def list_categories():
 
 @router.get("/realtime/{code}")
 async def get_concept_realtime(code: str):
-    """获取概念板块实时涨跌幅"""
+    """获取概念板块实时涨跌幅（经共享行情缓存，并发请求合并为一次上游调用）"""
+    from src.services.quote_cache import get_quote_cache
+
+    return await get_quote_cache().get(
+        "ths_concept", code, lambda: _fetch_concept_realtime(code)
+    )
+
+
+async def _fetch_concept_realtime(code: str):
+    """从同花顺获取概念板块实时涨跌幅"""
     import httpx
     import re
     import json
 
+    from src.services.http_client import get_http_manager
+
     BASE_URL = "http://d.10jqka.com.cn/v4"
     HEADERS = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
@@ -176,59 +174,58 @@ async def get_concept_realtime(code: str):
     try:
         # 获取分时数据
         url = f"{BASE_URL}/time/bk_{code}/last.js"
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url, headers=HEADERS, timeout=10.0)
-            resp.raise_for_status()
-
-            # 解析JSONP响应
-            text = resp.text
-            match = re.search(r'\((\{.*\})\)', text, re.DOTALL)
-            if not match:
-                raise HTTPException(status_code=404, detail="无法解析数据")
-
-            outer_data = json.loads(match.group(1))
-
-            # 获取内层数据 (结构: {"bk_886047": {...}})
-            inner_key = f"bk_{code}"
-            if inner_key not in outer_data:
-                raise HTTPException(status_code=404, detail=f"板块 {code} 数据不存在")
-
-            data = outer_data[inner_key]
-
-            # 获取关键数据
-            name = data.get('name', '')
-            pre_close = float(data.get('pre', 0))  # 昨收
-
-            # 从分时数据获取最新价格
-            time_data = data.get('data', '')
-            if time_data:
-                # 格式: "时间,价格,成交额,涨跌幅,成交量;..."
-                items = [item for item in time_data.split(';') if item.strip()]
-                if items:
-                    last_item = items[-1].split(',')
-                    if len(last_item) >= 2 and last_item[1]:
-                        current_price = float(last_item[1])
-                    else:
-                        current_price = pre_close
+        resp = await get_http_manager().get(url, headers=HEADERS, timeout=10.0)
+        resp.raise_for_status()
+
+        # 解析JSONP响应
+        text = resp.text
+        match = re.search(r'\((\{.*\})\)', text, re.DOTALL)
+        if not match:
+            raise HTTPException(status_code=404, detail="无法解析数据")
+
+        outer_data = json.loads(match.group(1))
+
+        # 获取内层数据 (结构: {"bk_886047": {...}})
+        inner_key = f"bk_{code}"
+        if inner_key not in outer_data:
+            raise HTTPException(status_code=404, detail=f"板块 {code} 数据不存在")
+
+        data = outer_data[inner_key]
+
+        # 获取关键数据
+        name = data.get('name', '')
+        pre_close = float(data.get('pre', 0))  # 昨收
+
+        # 从分时数据获取最新价格
+        time_data = data.get('data', '')
+        if time_data:
+            # 格式: "时间,价格,成交额,涨跌幅,成交量;..."
+            items = [item for item in time_data.split(';') if item.strip()]
+            if items:
+                last_item = items[-1].split(',')
+                if len(last_item) >= 2 and last_item[1]:
+                    current_price = float(last_item[1])
                 else:
                     current_price = pre_close
             else:
                 current_price = pre_close
+        else:
+            current_price = pre_close
 
-            # 计算涨跌幅
-            if pre_close > 0:
-                change_pct = ((current_price - pre_close) / pre_close) * 100
-            else:
-                change_pct = 0
-
-            return {
-                'code': code,
-                'name': name,
-                'price': current_price,
-                'pre_close': pre_close,
-                'change_pct': round(change_pct, 2),
-                'last_update': data.get('update', '')
-            }
+        # 计算涨跌幅
+        if pre_close > 0:
+            change_pct = ((current_price - pre_close) / pre_close) * 100
+        else:
+            change_pct = 0
+
+        return {
+            'code': code,
+            'name': name,
+            'price': current_price,
+            'pre_close': pre_close,
+            'change_pct': round(change_pct, 2),
+            'last_update': data.get('update', '')
+        }
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"请求失败: {e}")
     except Exception as e:
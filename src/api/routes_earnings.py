@@ -5,24 +5,16 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-import tushare as ts
-import os
 from datetime import datetime
-from dotenv import load_dotenv
+
+from src.services.tushare_client import Priority, TushareClient, shared_tushare_client
 
 router = APIRouter()
 
-# 延迟初始化Tushare
-_pro = None
 
-def get_pro():
-    global _pro
-    if _pro is None:
-        load_dotenv()
-        token = os.getenv("TUSHARE_TOKEN", "")
-        ts.set_token(token)
-        _pro = ts.pro_api()
-    return _pro
+def get_client() -> TushareClient:
+    """进程级共享的Tushare客户端（与其他调用方共用限流额度，接口请求优先）"""
+    return shared_tushare_client(Priority.INTERACTIVE)
 
 
 class ForecastItem(BaseModel):
@@ -62,7 +54,7 @@ class EarningsResponse(BaseModel):
 
 
 @router.get("/{ticker}", response_model=EarningsResponse)
-async def get_earnings(ticker: str):
+def get_earnings(ticker: str):
     """
     获取股票的业绩预告和业绩快报数据
     只返回2025年及以后的数据
@@ -76,7 +68,8 @@ async def get_earnings(ticker: str):
     try:
         # 获取业绩预告 - 只获取2025年以后的数据
         # end_date格式: 20250331, 20250630, 20250930, 20251231
-        df_forecast = get_pro().forecast(
+        df_forecast = get_client().query(
+            "forecast",
             ts_code=ts_code,
             fields='ann_date,end_date,type,p_change_min,p_change_max,net_profit_min,net_profit_max,last_parent_net,summary,change_reason'
         )
@@ -103,7 +96,8 @@ async def get_earnings(ticker: str):
 
     try:
         # 获取业绩快报
-        df_express = get_pro().express(
+        df_express = get_client().query(
+            "express",
             ts_code=ts_code,
             fields='ann_date,end_date,revenue,operate_profit,total_profit,n_income,total_assets,total_hldr_eqy_exc_min_int,diluted_eps,diluted_roe,yoy_net_profit,yoy_sales'
         )
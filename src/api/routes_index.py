@@ -12,10 +12,10 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from src.api.dependencies import get_db
-from src.config import get_settings
 from src.models import KlineTimeframe, SymbolType
 from src.services.kline_service import KlineService
-from src.services.tushare_client import TushareClient
+from src.services.market_breadth_service import MarketBreadthService
+from src.services.tushare_client import Priority, TushareClient, shared_tushare_client
 from src.utils.indicators import calculate_macd
 from src.utils.logging import get_logger
 
@@ -24,14 +24,8 @@ logger = get_logger(__name__)
 
 
 def get_tushare_client() -> TushareClient:
-    """获取Tushare客户端实例"""
-    settings = get_settings()
-    return TushareClient(
-        token=settings.tushare_token,
-        points=settings.tushare_points,
-        delay=settings.tushare_delay,
-        max_retries=settings.tushare_max_retries
-    )
+    """获取Tushare客户端实例（进程级共享，接口请求优先）"""
+    return shared_tushare_client(Priority.INTERACTIVE)
 
 
 @router.get("/kline/{ts_code}")
@@ -121,7 +115,10 @@ def get_index_kline(
 
 
 @router.get("/quote/{ts_code}")
-def get_index_quote(ts_code: str = "000001.SH") -> Dict[str, Any]:
+def get_index_quote(
+    ts_code: str = "000001.SH",
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
     """
     获取指数实时行情和指标数据
 
@@ -168,7 +165,7 @@ def get_index_quote(ts_code: str = "000001.SH") -> Dict[str, Any]:
             }
 
         # 获取全市场涨跌平家数
-        market_stats = get_market_stats(client, trade_date)
+        market_stats = get_market_stats(db, trade_date)
 
         change = float(latest["close"] - prev["close"])
         change_pct = (change / prev["close"]) * 100 if prev["close"] > 0 else 0
@@ -203,30 +200,27 @@ def get_index_quote(ts_code: str = "000001.SH") -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"获取指数行情失败: {str(e)}")
 
 
-def get_market_stats(client: TushareClient, trade_date: str) -> Dict[str, int]:
+def get_market_stats(db: Session, trade_date: str) -> Dict[str, int]:
     """
-    获取全市场涨跌平家数
+    获取全市场涨跌平家数（读取入库时计算的 market_breadth_daily）
 
     Args:
-        client: Tushare客户端
-        trade_date: 交易日期
+        db: 数据库会话
+        trade_date: 交易日期 (YYYYMMDD)
 
     Returns:
         包含 up_count, down_count, flat_count 的字典
     """
     try:
-        df = client.fetch_daily(trade_date=trade_date)
-        if df.empty:
+        iso_date = f"{trade_date[:4]}-{trade_date[4:6]}-{trade_date[6:8]}"
+        breadth = MarketBreadthService(db).get_daily(iso_date)
+        if breadth is None:
             return {"up_count": 0, "down_count": 0, "flat_count": 0}
 
-        up_count = len(df[df["pct_chg"] > 0])
-        down_count = len(df[df["pct_chg"] < 0])
-        flat_count = len(df[df["pct_chg"] == 0])
-
         return {
-            "up_count": up_count,
-            "down_count": down_count,
-            "flat_count": flat_count
+            "up_count": breadth.up_count,
+            "down_count": breadth.down_count,
+            "flat_count": breadth.flat_count
         }
     except Exception as e:
         logger.warning(f"获取市场统计失败: {e}")
@@ -271,47 +265,57 @@ async def get_index_realtime(ts_code: str = "000001.SH"):
     Returns:
         实时价格、涨跌幅等数据
     """
+    from src.services.quote_cache import get_quote_cache
+
+    return await get_quote_cache().get(
+        "sina_index", ts_code, lambda: _fetch_index_realtime(ts_code)
+    )
+
+
+async def _fetch_index_realtime(ts_code: str):
+    """从新浪获取指数实时行情"""
     import httpx
     import re
 
+    from src.services.http_client import get_http_manager
+
     sina_code = ts_code_to_sina(ts_code)
     url = f"http://hq.sinajs.cn/list=s_{sina_code}"
 
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url, headers={
-                "Referer": "http://finance.sina.com.cn/",
-                "User-Agent": "Mozilla/5.0"
-            }, timeout=10.0)
-            resp.raise_for_status()
-
-            # 解析响应: var hq_str_s_sh000001="上证指数,3259.22,46.14,1.44,2660394,28862016";
-            text = resp.text
-            match = re.search(r'"([^"]+)"', text)
-            if not match:
-                raise HTTPException(status_code=404, detail="无法解析指数数据")
-
-            parts = match.group(1).split(",")
-            if len(parts) < 6:
-                raise HTTPException(status_code=404, detail="指数数据格式错误")
-
-            name = parts[0]
-            price = float(parts[1]) if parts[1] else 0
-            change = float(parts[2]) if parts[2] else 0
-            change_pct = float(parts[3]) if parts[3] else 0
-            volume = int(parts[4]) if parts[4] else 0
-            amount = float(parts[5]) if parts[5] else 0
-
-            return {
-                "ts_code": ts_code,
-                "name": name,
-                "price": price,
-                "change": change,
-                "change_pct": change_pct,
-                "volume": volume,
-                "amount": amount,
-                "last_update": datetime.now().strftime("%H:%M:%S")
-            }
+        resp = await get_http_manager().get(url, headers={
+            "Referer": "http://finance.sina.com.cn/",
+            "User-Agent": "Mozilla/5.0"
+        }, timeout=10.0)
+        resp.raise_for_status()
+
+        # 解析响应: var hq_str_s_sh000001="上证指数,3259.22,46.14,1.44,2660394,28862016";
+        text = resp.text
+        match = re.search(r'"([^"]+)"', text)
+        if not match:
+            raise HTTPException(status_code=404, detail="无法解析指数数据")
+
+        parts = match.group(1).split(",")
+        if len(parts) < 6:
+            raise HTTPException(status_code=404, detail="指数数据格式错误")
+
+        name = parts[0]
+        price = float(parts[1]) if parts[1] else 0
+        change = float(parts[2]) if parts[2] else 0
+        change_pct = float(parts[3]) if parts[3] else 0
+        volume = int(parts[4]) if parts[4] else 0
+        amount = float(parts[5]) if parts[5] else 0
+
+        return {
+            "ts_code": ts_code,
+            "name": name,
+            "price": price,
+            "change": change,
+            "change_pct": change_pct,
+            "volume": volume,
+            "amount": amount,
+            "last_update": datetime.now().strftime("%H:%M:%S")
+        }
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"请求失败: {e}")
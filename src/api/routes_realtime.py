@@ -2,11 +2,24 @@
 Real-time price proxy endpoint for Sina Finance API.
 """
 
+import asyncio
+import json
+
 import httpx
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from src.services.quote_stream import get_quote_broadcaster
+from src.services.sina_quote_service import cached_hq_text, parse_hq_response, to_sina_symbol
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
+# Idle time before a keep-alive is sent on a quote stream
+STREAM_HEARTBEAT_SECONDS = 15.0
+
 
 @router.get("/prices")
 async def get_realtime_prices(tickers: str = Query(..., description="Comma-separated ticker symbols")):
@@ -22,34 +35,131 @@ async def get_realtime_prices(tickers: str = Query(..., description="Comma-separ
     if not tickers:
         raise HTTPException(status_code=400, detail="Tickers parameter is required")
 
-    # Convert tickers to Sina format
-    ticker_list = tickers.split(',')
-    sina_format = []
+    ticker_list = [t.strip() for t in tickers.split(',') if t.strip()]
+    sina_format = [to_sina_symbol(t) for t in ticker_list]
 
-    for ticker in ticker_list:
-        ticker = ticker.strip()
-        if ticker.startswith('6'):
-            sina_format.append(f'sh{ticker}')
-        elif ticker.startswith('0') or ticker.startswith('3'):
-            sina_format.append(f'sz{ticker}')
-        else:
-            sina_format.append(ticker)
+    try:
+        return {"data": await cached_hq_text(sina_format)}
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Sina API error: {e}")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Failed to connect to Sina API: {e}")
 
-    sina_tickers = ','.join(sina_format)
-    url = f'https://hq.sinajs.cn/list={sina_tickers}'
+
+@router.get("/quotes")
+async def get_realtime_quotes(
+    tickers: str = Query(..., description="Comma-separated ticker symbols"),
+    trading_only: bool = Query(False, description="Drop symbols with a zero price (suspended / pre-open)"),
+):
+    """
+    Parsed real-time quotes for any number of tickers.
+
+    Args:
+        tickers: Comma-separated ticker symbols (e.g., "000001,600000")
+        trading_only: Drop symbols whose price is 0
+
+    Returns:
+        {"count": int, "quotes": [{symbol, ticker, name, price, prev_close, change_pct, ...}]}
+    """
+    ticker_list = [t.strip() for t in tickers.split(',') if t.strip()]
+    if not ticker_list:
+        raise HTTPException(status_code=400, detail="Tickers parameter is required")
 
     try:
-        # 添加浏览器请求头来避免被新浪API拒绝
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': 'https://finance.sina.com.cn/'
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, timeout=10.0)
-            response.raise_for_status()
-            return {"data": response.text}
+        snapshot = parse_hq_response(await cached_hq_text([to_sina_symbol(t) for t in ticker_list]))
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"Sina API error: {e}")
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Failed to connect to Sina API: {e}")
+
+    if trading_only:
+        snapshot = snapshot.trading()
+    return {"count": len(snapshot), "quotes": snapshot.to_records()}
+
+
+@router.websocket("/ws")
+async def realtime_quotes_ws(websocket: WebSocket):
+    """
+    Push stream of real-time quote deltas.
+
+    Client messages (JSON):
+        {"action": "subscribe", "tickers": ["000001", "600519"]}
+        {"action": "unsubscribe", "tickers": ["000001"]}
+        {"action": "set", "tickers": [...]}   # replace the subscription set
+
+    Server messages:
+        {"type": "quotes", "data": [quote, ...]}   # only quotes that changed
+        {"type": "heartbeat"}
+    """
+    await websocket.accept()
+    subscription = get_quote_broadcaster().subscribe(
+        t for t in websocket.query_params.get("tickers", "").split(",") if t.strip()
+    )
+
+    async def receive_commands():
+        while True:
+            message = await websocket.receive_json()
+            tickers = message.get("tickers") or []
+            action = message.get("action")
+            if action == "subscribe":
+                subscription.update(tickers)
+            elif action == "set":
+                subscription.update(tickers, replace=True)
+            elif action == "unsubscribe":
+                subscription.remove(tickers)
+
+    receiver = asyncio.create_task(receive_commands())
+    try:
+        while True:
+            waiter = asyncio.create_task(subscription.next(timeout=STREAM_HEARTBEAT_SECONDS))
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                waiter.cancel()
+                break
+            quotes = waiter.result()
+            if quotes:
+                await websocket.send_json({"type": "quotes", "data": quotes})
+            else:
+                await websocket.send_json({"type": "heartbeat"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+        receiver.cancel()
+        if receiver.done() and not receiver.cancelled():
+            exc = receiver.exception()
+            if exc is not None and not isinstance(exc, WebSocketDisconnect):
+                logger.warning(f"Realtime WebSocket closed on error: {exc}")
+
+
+@router.get("/stream")
+async def realtime_quotes_sse(tickers: str = Query(..., description="Comma-separated ticker symbols")):
+    """
+    Server-Sent Events stream of real-time quote deltas.
+
+    Each `quotes` event carries a JSON list of quotes that changed since the
+    previous event; a comment line is sent as keep-alive when nothing changed.
+    """
+    ticker_list = [t.strip() for t in tickers.split(',') if t.strip()]
+    if not ticker_list:
+        raise HTTPException(status_code=400, detail="Tickers parameter is required")
+
+    subscription = get_quote_broadcaster().subscribe(ticker_list)
+
+    async def events():
+        try:
+            while True:
+                quotes = await subscription.next(timeout=STREAM_HEARTBEAT_SECONDS)
+                if quotes:
+                    payload = json.dumps(quotes, ensure_ascii=False)
+                    yield f"event: quotes\ndata: {payload}\n\n"
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -9,12 +9,16 @@ from sqlalchemy.orm import Session
 from typing import Optional
 
 from src.api.dependencies import get_db
+from src.services.market_breadth_service import MarketBreadthService
 from src.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+# 赛道成交额对比的交易日至少需要的有成交股票数
+SECTOR_TURNOVER_MIN_TRADED = 100
+
 
 class SectorResponse(BaseModel):
     ticker: str
@@ -76,93 +80,32 @@ async def get_sector_turnover(
     今日成交额按比例折算：今日实际成交额 vs 昨日全天成交额 × (已交易时间 / 4小时)
     """
     try:
-        # 1. 获取最近两个有足够成交量数据的交易日
+        # 1. 读取入库时按赛道汇总的最近两个有足够成交量数据的交易日
         # 需要有超过100只股票有成交量数据才算有效
-        trade_dates = db.execute(
-            text("""
-                SELECT trade_time, COUNT(*) as cnt
-                FROM klines
-                WHERE symbol_type = 'STOCK' AND timeframe = 'DAY' AND volume > 0
-                GROUP BY trade_time
-                HAVING cnt > 100
-                ORDER BY trade_time DESC
-                LIMIT 2
-            """)
-        ).fetchall()
+        turnover = MarketBreadthService(db).get_sector_turnover(
+            limit=2, min_traded=SECTOR_TURNOVER_MIN_TRADED
+        )
 
-        if len(trade_dates) < 2:
+        if len(turnover) < 2:
             return SectorTurnoverResponse(data=[], today_date="", yesterday_date="")
 
-        today_date = trade_dates[0][0]  # 最近有数据的日期（可能是今天）
-        yesterday_date = trade_dates[1][0]  # 前一个有数据的日期（昨天）
+        today, yesterday = turnover  # 最近有数据的日期（可能是今天）、前一个有数据的日期
 
         # 计算已交易时间比例
         traded_hours = get_traded_hours()
         time_ratio = traded_hours / 4.0 if traded_hours > 0 else 1.0
 
-        # 2. 获取所有赛道分类
-        sectors_result = db.execute(
-            text("SELECT ticker, sector FROM stock_sectors")
-        ).fetchall()
-
-        # ticker -> sector 映射
-        ticker_to_sector = {}
-        for row in sectors_result:
-            # ticker格式: 000001 (不含后缀)
-            ticker_to_sector[row[0]] = row[1]
-
-        # 3. 查询今日和昨日的成交量和收盘价数据
-        # 成交额 = volume * close * 100 (volume是手数，每手100股)
-        volume_result = db.execute(
-            text("""
-                SELECT symbol_code, trade_time, volume, close
-                FROM klines
-                WHERE symbol_type = 'STOCK'
-                AND timeframe = 'DAY'
-                AND trade_time IN (:today, :yesterday)
-            """),
-            {"today": today_date, "yesterday": yesterday_date}
-        ).fetchall()
-
-        # 4. 按赛道汇总成交额
-        # sector -> {today: amount, yesterday: amount, count: int}
-        sector_data: dict[str, dict] = {}
-
-        for row in volume_result:
-            symbol_code = row[0]  # 6位代码
-            trade_time = row[1]
-            volume = row[2] or 0
-            close = row[3] or 0
-            # 计算成交额: 手数 * 收盘价 * 100
-            amount = volume * close * 100
-
-            sector = ticker_to_sector.get(symbol_code)
-            if not sector:
-                continue
-
-            if sector not in sector_data:
-                sector_data[sector] = {
-                    "today": 0,
-                    "yesterday": 0,
-                    "today_stocks": set(),
-                    "yesterday_stocks": set(),
-                }
-
-            if trade_time == today_date:
-                sector_data[sector]["today"] += amount
-                sector_data[sector]["today_stocks"].add(symbol_code)
-            elif trade_time == yesterday_date:
-                sector_data[sector]["yesterday"] += amount
-                sector_data[sector]["yesterday_stocks"].add(symbol_code)
-
-        # 5. 计算变化比例并构建响应（按比例折算）
+        # 2. 计算变化比例并构建响应（按比例折算）
         items = []
-        for sector, data in sector_data.items():
-            today_amount = data["today"]
-            yesterday_amount = data["yesterday"]
+        empty = {"amount": 0.0, "count": 0}
+        for sector in today.sectors.keys() | yesterday.sectors.keys():
+            today_data = today.sectors.get(sector, empty)
+            yesterday_data = yesterday.sectors.get(sector, empty)
+            today_amount = today_data["amount"]
+            yesterday_amount = yesterday_data["amount"]
 
-            # 取两天都有数据的股票数量
-            stock_count = len(data["today_stocks"] & data["yesterday_stocks"])
+            # 两天都有数据的股票数量（按两日股票数的较小值计）
+            stock_count = min(today_data["count"], yesterday_data["count"])
 
             # 计算变化比例：今日实际成交额 vs 昨日按时间比例折算的成交额
             change_percent = None
@@ -185,8 +128,8 @@ async def get_sector_turnover(
 
         return SectorTurnoverResponse(
             data=items,
-            today_date=today_date,
-            yesterday_date=yesterday_date,
+            today_date=today.trade_date,
+            yesterday_date=yesterday.trade_date,
         )
     except Exception as e:
         logger.exception("获取赛道成交额失败")
@@ -302,6 +245,15 @@ async def update_sector(
                 {"ticker": ticker, "sector": request.sector, "now": now}
             )
 
+        # 赛道成交额按入库时的分类汇总，重算接口读取的最近交易日
+        breadth_service = MarketBreadthService(db)
+        breadth_service.refresh_sector_turnover(
+            t.trade_date
+            for t in breadth_service.get_sector_turnover(
+                limit=2, min_traded=SECTOR_TURNOVER_MIN_TRADED
+            )
+        )
+
         db.commit()
         return SectorResponse(ticker=ticker, sector=request.sector)
     except Exception as e:
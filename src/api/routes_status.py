@@ -3,13 +3,23 @@ from typing import Any, Dict, Optional
 from zoneinfo import ZoneInfo
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from src.api.dependencies import get_data_service, get_db
-from src.models import Kline
+from src.models import KlineTimeframe, SymbolType
+from src.repositories.kline_repository import KlineRepository
+from src.schemas import TradingStatusResponse
 from src.services.data_pipeline import MarketDataService
+from src.services.freshness_registry import get_freshness_registry
+from src.services.http_client import get_http_manager
+from src.services.ingest_pipeline import get_pipeline_stats
+from src.services.kline_gaps import scan_gaps, summarize_gaps
 from src.services.kline_scheduler import get_scheduler
+from src.services.quote_cache import get_quote_cache
+from src.services.quote_stream import get_quote_broadcaster
+from src.services.refresh_queue import get_bootstrap_queue, get_kline_refresh_queue
+from src.services.sina_kline_provider import get_async_sina_kline_provider
+from src.services.trading_calendar import get_trading_calendar
 from src.utils.logging import get_logger
 
 SHANGHAI_TZ = ZoneInfo("Asia/Shanghai")
@@ -26,6 +36,83 @@ def get_status(
     return {"last_refreshed": service.last_refresh_time()}
 
 
+@router.get("/http")
+def get_http_stats() -> Dict[str, Any]:
+    """共享 HTTP 客户端按主机的请求数、延迟和连接复用统计"""
+    manager = get_http_manager()
+    return {
+        "per_host_limit": manager.per_host_limit,
+        "http2": manager.http2,
+        "hosts": manager.stats(),
+    }
+
+
+@router.get("/quote-cache")
+def get_quote_cache_stats() -> Dict[str, Any]:
+    """实时行情缓存的命中、未命中、合并等待和上游调用统计"""
+    return get_quote_cache().stats()
+
+
+@router.get("/quote-stream")
+def get_quote_stream_stats() -> Dict[str, Any]:
+    """实时行情推送的订阅数、轮询次数和已推送增量统计"""
+    return get_quote_broadcaster().stats()
+
+
+@router.get("/refresh-queue")
+def get_refresh_queue_stats() -> Dict[str, Any]:
+    """K线后台刷新队列的排队、合并和失败统计"""
+    return get_kline_refresh_queue().stats()
+
+
+@router.get("/sina-kline")
+def get_sina_kline_stats() -> Dict[str, Any]:
+    """新浪K线并发获取：当前并发上限、实际请求速率、限流次数和熔断状态"""
+    return get_async_sina_kline_provider().stats()
+
+
+@router.get("/ingest-pipelines")
+def get_ingest_pipeline_stats() -> Dict[str, Any]:
+    """各K线入库管道最近一次运行：每阶段吞吐量、延迟、背压等待和队列峰值"""
+    return get_pipeline_stats()
+
+
+@router.get("/bootstrap-queue")
+def get_bootstrap_queue_stats() -> Dict[str, Any]:
+    """添加自选时K线初始化队列的排队、合并和失败统计"""
+    return get_bootstrap_queue().stats()
+
+
+@router.get("/trading", response_model=TradingStatusResponse)
+def get_trading_status() -> TradingStatusResponse:
+    """交易日、交易时段和最近交易日（内存交易日历）"""
+    now = datetime.now(SHANGHAI_TZ)
+    calendar = get_trading_calendar()
+    return TradingStatusResponse(
+        is_trading_day=calendar.is_trading_day(now),
+        is_trading_time=calendar.is_trading_time(now),
+        session_phase=calendar.session_phase(now),
+        current_time=now.strftime("%Y-%m-%d %H:%M:%S"),
+        latest_trade_date=calendar.latest_on_or_before(now),
+        next_trade_date=calendar.next(now),
+    )
+
+
+@router.get("/freshness")
+def get_freshness_stats() -> Dict[str, Any]:
+    """新鲜度登记：各标的类型/周期的登记数、过期数及当前应有的最新K线"""
+    return get_freshness_registry().stats()
+
+
+@router.get("/kline-gaps")
+def get_kline_gaps(db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """K线缺口：各标的类型/周期缺失K线的标的数、区间数和K线数（回溯窗口内）"""
+    return {
+        tf.value: summarize_gaps(scan_gaps(db, tf))
+        for tf in (KlineTimeframe.DAY, KlineTimeframe.MINS_30)
+    }
+
+
 @router.get("/update-times")
 def get_update_times(
     db: Session = Depends(get_db),
@@ -38,18 +125,12 @@ def get_update_times(
         scheduler = get_scheduler()
         jobs = scheduler.get_jobs() if scheduler._is_running else []
 
-        # 获取最新的K线数据时间
+        # 获取最新的K线数据时间（最新K线汇总表，每类每周期一次聚合）
+        kline_repo = KlineRepository(db)
         kline_times = {}
         for symbol_type in ["index", "concept", "stock"]:
-            for timeframe in ["day", "30m"]:
-                latest = (
-                    db.query(func.max(Kline.trade_time))
-                    .filter(
-                        Kline.symbol_type == symbol_type,
-                        Kline.timeframe == timeframe
-                    )
-                    .scalar()
-                )
+            for timeframe, kline_tf in [("day", KlineTimeframe.DAY), ("30m", KlineTimeframe.MINS_30)]:
+                latest = kline_repo.find_latest_trade_time(SymbolType(symbol_type), kline_tf)
 
                 # 将字符串时间转换为带时区的datetime
                 last_update_iso = None
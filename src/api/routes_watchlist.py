@@ -2,15 +2,19 @@
 Watchlist API routes - 自选股管理
 """
 
+import asyncio
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from src.api.dependencies import get_db
 from src.database import session_scope
 from src.models import Watchlist, SymbolMetadata
+from src.repositories.kline_repository import KlineRepository
 from src.schemas import SymbolMeta
+from src.services.kline_bootstrap import submit_stock_bootstrap
+from src.services.refresh_queue import get_bootstrap_queue
 
 router = APIRouter()
 
@@ -20,6 +24,11 @@ class WatchlistAdd(BaseModel):
     ticker: str
 
 
+class WatchlistBatchAdd(BaseModel):
+    """批量添加到自选的请求"""
+    tickers: List[str] = Field(..., min_length=1, max_length=200)
+
+
 class WatchlistResponse(BaseModel):
     """自选股列表响应"""
     ticker: str
@@ -94,79 +103,151 @@ def get_watchlist():
         return result
 
 
-@router.post("", status_code=201)
-async def add_to_watchlist(
-    request: WatchlistAdd,
-    db: Session = Depends(get_db),
-):
-    """添加股票到自选，并立即更新K线数据"""
+def _add_watchlist_item(db: Session, ticker: str) -> dict:
+    """
+    添加一只股票到自选并提交K线初始化任务（调用方负责提交事务）
+
+    Raises:
+        HTTPException 404: 股票不存在
+        HTTPException 400: 已在自选列表中
+    """
     from datetime import datetime
-    from src.models import Kline, KlineTimeframe, SymbolType
-    from sqlalchemy import desc
-    from src.services.kline_updater import KlineUpdater
+    from src.models import KlineTimeframe, SymbolType
 
-    try:
-        # 检查股票是否存在
-        symbol = db.query(SymbolMetadata).filter(
-            SymbolMetadata.ticker == request.ticker
-        ).first()
+    # 检查股票是否存在
+    symbol = db.query(SymbolMetadata).filter(
+        SymbolMetadata.ticker == ticker
+    ).first()
 
-        if not symbol:
-            raise HTTPException(status_code=404, detail="股票不存在")
+    if not symbol:
+        raise HTTPException(status_code=404, detail="股票不存在")
 
-        # 检查是否已经在自选中
-        existing = db.query(Watchlist).filter(
-            Watchlist.ticker == request.ticker
-        ).first()
+    # 检查是否已经在自选中
+    existing = db.query(Watchlist).filter(
+        Watchlist.ticker == ticker
+    ).first()
 
-        if existing:
-            raise HTTPException(status_code=400, detail="已在自选列表中")
+    if existing:
+        raise HTTPException(status_code=400, detail="已在自选列表中")
 
-        # 获取最新收盘价作为买入价格（从 klines 表查询）
-        latest_kline = db.query(Kline).filter(
-            Kline.symbol_code == request.ticker,
-            Kline.symbol_type == SymbolType.STOCK,
-            Kline.timeframe == KlineTimeframe.DAY
-        ).order_by(desc(Kline.trade_time)).first()
-
-        purchase_price = None
-        shares = None
-        purchase_date = datetime.now()
-
-        if latest_kline and latest_kline.close:
-            purchase_price = float(latest_kline.close)
-            # 每个自选股买入10000元
-            shares = 10000.0 / purchase_price if purchase_price > 0 else None
-
-        # 添加到自选
-        watchlist_item = Watchlist(
-            ticker=request.ticker,
-            purchase_price=purchase_price,
-            purchase_date=purchase_date,
-            shares=shares
-        )
-        db.add(watchlist_item)
-        db.commit()
+    # 获取最新收盘价作为买入价格（从最新K线汇总表查询）
+    latest_kline = KlineRepository(db).find_latest_bar(
+        ticker, SymbolType.STOCK, KlineTimeframe.DAY
+    )
 
-        symbol_name = symbol.name
+    purchase_price = None
+    shares = None
+    purchase_date = datetime.now()
 
-        # 立即更新该股票的K线数据 (使用同一个session)
-        updater = KlineUpdater.create_with_session(db)
-        kline_result = await updater.update_single_stock_klines(request.ticker)
+    if latest_kline and latest_kline.close:
+        purchase_price = float(latest_kline.close)
+        # 每个自选股买入10000元
+        shares = 10000.0 / purchase_price if purchase_price > 0 else None
+
+    # 添加到自选
+    db.add(Watchlist(
+        ticker=ticker,
+        purchase_price=purchase_price,
+        purchase_date=purchase_date,
+        shares=shares
+    ))
+
+    return {
+        "ticker": ticker,
+        "name": symbol.name,
+        "purchase_price": purchase_price,
+        "shares": shares,
+    }
 
-        return {
-            "message": f"成功添加 {symbol_name} 到自选",
-            "purchase_price": purchase_price,
-            "shares": shares,
-            "kline_updated": kline_result
-        }
 
+def _submit_bootstrap(item: dict) -> dict:
+    """提交K线初始化任务（后台执行，同一股票去重），附上任务 id"""
+    job = submit_stock_bootstrap(item["ticker"])
+    return {**item, "job_id": job.job_id, "job_status": job.status}
+
+
+@router.post("", status_code=201)
+def add_to_watchlist(
+    request: WatchlistAdd,
+    db: Session = Depends(get_db),
+):
+    """
+    添加股票到自选
+
+    K线数据在后台任务中获取，接口立即返回 job_id，
+    通过 GET /watchlist/jobs/{job_id} 查询（或等待）完成状态。
+    """
+    try:
+        item = _add_watchlist_item(db, request.ticker)
+        db.commit()
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+    item = _submit_bootstrap(item)
+    return {
+        "message": f"成功添加 {item['name']} 到自选",
+        "purchase_price": item["purchase_price"],
+        "shares": item["shares"],
+        "job_id": item["job_id"],
+        "job_status": item["job_status"],
+    }
+
+
+@router.post("/batch", status_code=201)
+def add_batch_to_watchlist(
+    request: WatchlistBatchAdd,
+    db: Session = Depends(get_db),
+):
+    """
+    批量添加股票到自选
+
+    一次提交全部自选记录，K线初始化任务进入后台队列（有并发上限），
+    每只股票返回各自的 job_id；不存在或已在自选中的股票放入 skipped。
+    """
+    added = []
+    skipped = []
+    try:
+        for ticker in dict.fromkeys(request.tickers):
+            try:
+                added.append(_add_watchlist_item(db, ticker))
+            except HTTPException as e:
+                skipped.append({"ticker": ticker, "reason": e.detail})
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "added": [_submit_bootstrap(item) for item in added],
+        "skipped": skipped,
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_bootstrap_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="最长等待完成的秒数（0 为立即返回）"),
+):
+    """
+    查询K线初始化任务状态
+
+    status: queued / running / done / failed；result 为 {"daily", "mins30", "errors"}。
+    wait > 0 时在任务完成或超时后返回（长轮询）。
+    """
+    job = get_bootstrap_queue().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+
+    if wait and not job.finished:
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout=wait)
+        except Exception:
+            pass  # 超时或任务失败：按当前状态返回
+    return job.to_dict()
+
 
 @router.delete("")
 def clear_watchlist():
@@ -316,8 +397,7 @@ def get_portfolio_history():
 def get_watchlist_analytics():
     """获取自选股组合分析数据"""
     from datetime import datetime
-    from src.models import Kline, KlineTimeframe, SymbolType
-    from sqlalchemy import desc, func, and_
+    from src.models import KlineTimeframe, SymbolType
     from collections import defaultdict
 
     with session_scope() as session:
@@ -353,30 +433,14 @@ def get_watchlist_analytics():
         ).all()
         ticker_to_symbol = {s.ticker: s for s in symbols}
 
-        # 获取最新价格 - 使用子查询避免N+1问题（从 klines 表）
-        # 子查询获取每个symbol_code的最新时间戳
-        subq = session.query(
-            Kline.symbol_code,
-            func.max(Kline.trade_time).label('max_ts')
-        ).filter(
-            Kline.symbol_code.in_(tickers),
-            Kline.symbol_type == SymbolType.STOCK,
-            Kline.timeframe == KlineTimeframe.DAY
-        ).group_by(Kline.symbol_code).subquery()
-
-        # 主查询获取最新K线
-        latest_klines = session.query(Kline).join(
-            subq,
-            and_(
-                Kline.symbol_code == subq.c.symbol_code,
-                Kline.trade_time == subq.c.max_ts
-            )
-        ).filter(
-            Kline.symbol_type == SymbolType.STOCK,
-            Kline.timeframe == KlineTimeframe.DAY
-        ).all()
+        # 获取最新价格 - 批量查询最新K线汇总表（避免N+1和 klines 分组扫描）
+        latest_klines = KlineRepository(session).find_latest_bars(
+            tickers, SymbolType.STOCK, KlineTimeframe.DAY
+        )
 
-        latest_prices = {k.symbol_code: float(k.close) for k in latest_klines if k.close}
+        latest_prices = {
+            code: float(k.close) for code, k in latest_klines.items() if k.close
+        }
 
         # 计算每只股票的盈亏
         stock_data = []
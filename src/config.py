@@ -49,10 +49,35 @@ class Settings(BaseSettings):
     tushare_points: int = Field(default=15000, alias="TUSHARE_POINTS")
     tushare_delay: float = Field(default=0.3, alias="TUSHARE_DELAY")
     tushare_max_retries: int = Field(default=3, alias="TUSHARE_MAX_RETRIES")
+    # SQLite file shared by processes for the Tushare call budget (empty = per process)
+    tushare_budget_path: str = Field(default="", alias="TUSHARE_BUDGET_PATH")
+
+    # Shared HTTP client for Sina / THS quote APIs
+    http_max_connections_per_host: int = Field(default=8, alias="HTTP_MAX_CONNECTIONS_PER_HOST")
+    http2_enabled: bool = Field(default=False, alias="HTTP2_ENABLED")
+
+    # Realtime quote cache TTL (seconds) during / outside trading sessions
+    quote_cache_trading_ttl: float = Field(default=3.0, alias="QUOTE_CACHE_TRADING_TTL")
+    quote_cache_idle_ttl: float = Field(default=60.0, alias="QUOTE_CACHE_IDLE_TTL")
+
+    # Realtime quote push poller interval (seconds) during / outside trading sessions
+    quote_stream_trading_interval: float = Field(default=3.0, alias="QUOTE_STREAM_TRADING_INTERVAL")
+    quote_stream_idle_interval: float = Field(default=30.0, alias="QUOTE_STREAM_IDLE_INTERVAL")
+
+    # Upper bound for the adaptive (AIMD) concurrency of Sina kline fetches
+    sina_kline_max_concurrency: int = Field(default=8, alias="SINA_KLINE_MAX_CONCURRENCY")
+
+    # Concurrent kline bootstrap jobs for newly added watchlist stocks
+    watchlist_bootstrap_workers: int = Field(default=2, alias="WATCHLIST_BOOTSTRAP_WORKERS")
+
+    # Upstream request budget of one kline gap backfill run
+    gap_backfill_max_requests: int = Field(default=100, alias="GAP_BACKFILL_MAX_REQUESTS")
 
     # Feature flags
     enable_concept_boards: bool = Field(default=True, alias="ENABLE_CONCEPT_BOARDS")
     enable_industry_levels: bool = Field(default=True, alias="ENABLE_INDUSTRY_LEVELS")
+    # K线内存映射缓存（data_dir/kline_cache，SQLite 仍为数据源）
+    kline_cache_enabled: bool = Field(default=True, alias="KLINE_CACHE_ENABLED")
 
     scheduler: SchedulerConfig = SchedulerConfig()
     scheduler_cron_override: Optional[str] = Field(
@@ -64,3 +64,221 @@ def init_db() -> None:
     from src import models  # noqa: F401  # ensure model metadata is registered
 
     Base.metadata.create_all(bind=engine)
+    _migrate_legacy_kline_layout()
+    _recreate_outdated_kline_latest()
+    _drop_market_breadth_intraday()
+    _backfill_kline_latest()
+    _backfill_market_breadth()
+    _backfill_data_freshness()
+
+
+# 旧新两种 klines 结构共有的列
+KLINE_COPY_COLUMNS = (
+    "symbol_type",
+    "symbol_code",
+    "symbol_name",
+    "timeframe",
+    "trade_time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "amount",
+    "dif",
+    "dea",
+    "macd",
+)
+
+
+def is_legacy_kline_layout(conn) -> bool:
+    """klines 表是否仍为旧结构（带自增 id 列）"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(klines)")]
+    return "id" in columns
+
+
+def migrate_legacy_kline_layout(conn) -> int:
+    """
+    将旧结构的 klines 表（自增id + 多重索引）重建为紧凑结构
+
+    在单个事务内完成，失败时回滚并抛出异常；不回收空间，调用方按需 VACUUM。
+
+    Args:
+        conn: sqlite3 连接（isolation_level=None，由本函数控制事务）
+
+    Returns:
+        迁移的行数（已是紧凑结构时为 0）
+    """
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex, CreateTable
+
+    from src.models import Kline
+
+    if not is_legacy_kline_layout(conn):
+        return 0
+
+    dialect = sqlite.dialect()
+    create_table = str(CreateTable(Kline.__table__).compile(dialect=dialect))
+    create_indexes = [
+        str(CreateIndex(index).compile(dialect=dialect)) for index in Kline.__table__.indexes
+    ]
+    columns = ", ".join(KLINE_COPY_COLUMNS)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows_before = conn.execute("SELECT COUNT(*) FROM klines").fetchone()[0]
+        conn.execute("ALTER TABLE klines RENAME TO klines_legacy")
+
+        # 旧索引随表改名保留原名，先删除以免与新索引重名
+        legacy_indexes = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type='index' AND tbl_name='klines_legacy' AND sql IS NOT NULL"
+            )
+        ]
+        for name in legacy_indexes:
+            conn.execute(f'DROP INDEX "{name}"')
+
+        conn.execute(create_table)
+        for ddl in create_indexes:
+            conn.execute(ddl)
+
+        # 按聚簇主键顺序写入，B树顺序追加
+        conn.execute(
+            f"INSERT OR IGNORE INTO klines ({columns}, updated_at) "
+            f"SELECT {columns}, COALESCE(updated_at, created_at, CURRENT_TIMESTAMP) "
+            f"FROM klines_legacy "
+            f"ORDER BY symbol_type, symbol_code, timeframe, trade_time"
+        )
+        rows_after = conn.execute("SELECT COUNT(*) FROM klines").fetchone()[0]
+        if rows_after != rows_before:
+            raise RuntimeError(f"行数不一致: 迁移前 {rows_before}, 迁移后 {rows_after}")
+
+        conn.execute("DROP TABLE klines_legacy")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return rows_after
+
+
+def _migrate_legacy_kline_layout() -> None:
+    """
+    create_all 不会改动已有表：klines 仍为旧结构时启动前自动迁移
+
+    旧结构缺少新模型的约束（created_at 非空等），任何写入都会失败，
+    因此迁移失败时拒绝启动，而不是带着不可写的表继续运行。
+    """
+    from sqlalchemy import inspect
+
+    from src.exceptions import DatabaseError
+    from src.utils.logging import get_logger
+
+    logger = get_logger(__name__)
+    columns = {column["name"] for column in inspect(engine).get_columns("klines")}
+    if "id" not in columns:
+        return
+    if engine.dialect.name != "sqlite":
+        raise DatabaseError(
+            "klines migration", "klines 表仍为旧结构，仅支持自动迁移 SQLite 数据库"
+        )
+
+    logger.warning("klines 表仍为旧结构（自增id + 多重索引），开始自动迁移为紧凑结构...")
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            rows = migrate_legacy_kline_layout(conn)
+            conn.execute("VACUUM")
+        finally:
+            conn.isolation_level = isolation_level
+    except Exception as e:
+        raise DatabaseError(
+            "klines migration",
+            f"{e}（已回滚，可运行 scripts/migrate_klines_compact.py 排查）",
+        ) from e
+    finally:
+        raw.close()
+    logger.info(f"klines 表已迁移为紧凑结构: {rows:,} 行")
+
+
+def _recreate_outdated_kline_latest() -> None:
+    """kline_latest 是 klines 的派生汇总：缺少模型中的列时删除重建，随后整表回填"""
+    from sqlalchemy import inspect
+
+    from src.models import KlineLatest
+    from src.utils.logging import get_logger
+
+    columns = {column["name"] for column in inspect(engine).get_columns("kline_latest")}
+    missing = {column.name for column in KlineLatest.__table__.columns} - columns
+    if missing:
+        get_logger(__name__).info(f"kline_latest 缺少列 {sorted(missing)}，重建汇总表")
+        KlineLatest.__table__.drop(bind=engine)
+        KlineLatest.__table__.create(bind=engine)
+
+
+def _drop_market_breadth_intraday() -> None:
+    """删除不再维护的盘中涨跌统计表（分钟K线没有全市场截面来源）"""
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS market_breadth_intraday"))
+
+
+def _backfill_kline_latest() -> None:
+    """kline_latest 为新建的空表而 klines 已有数据时，从 klines 回填一次"""
+    from sqlalchemy import select
+
+    from src.models import Kline, KlineLatest
+    from src.repositories.kline_repository import KlineRepository
+    from src.utils.logging import get_logger
+
+    with session_scope() as session:
+        if session.execute(select(KlineLatest.symbol_code).limit(1)).first():
+            return
+        if not session.execute(select(Kline.symbol_code).limit(1)).first():
+            return
+        count = KlineRepository(session).rebuild_latest()
+    get_logger(__name__).info(f"已从 klines 回填 kline_latest: {count} 个标的/周期")
+
+
+def _backfill_market_breadth() -> None:
+    """
+    market_breadth_daily 或 sector_turnover_daily 为空时回填最近的交易日统计
+
+    只尝试一次（见 MarketBreadthService.backfill_daily_once），覆盖不足回填不到数据时
+    不会每次启动都重扫 klines。
+    """
+    from sqlalchemy import select
+
+    from src.models import MarketBreadthDaily, SectorTurnoverDaily
+    from src.services.market_breadth_service import MarketBreadthService
+    from src.utils.logging import get_logger
+
+    with session_scope() as session:
+        has_breadth = session.execute(select(MarketBreadthDaily.trade_date).limit(1)).first()
+        has_turnover = session.execute(select(SectorTurnoverDaily.trade_date).limit(1)).first()
+        if has_breadth and has_turnover:
+            return
+        count = MarketBreadthService(session).backfill_daily_once()
+    if count:
+        get_logger(__name__).info(f"已回填 market_breadth_daily: {count} 个交易日")
+
+
+def _backfill_data_freshness() -> None:
+    """data_freshness 为新建的空表时，从 kline_latest 回填最新K线时间"""
+    from sqlalchemy import select
+
+    from src.models import DataFreshness
+    from src.services.freshness_registry import backfill_from_latest
+    from src.utils.logging import get_logger
+
+    with session_scope() as session:
+        if session.execute(select(DataFreshness.symbol_code).limit(1)).first():
+            return
+        count = backfill_from_latest(session)
+    if count:
+        get_logger(__name__).info(f"已从 kline_latest 回填 data_freshness: {count} 个标的/周期")
@@ -3,7 +3,11 @@ from fastapi import FastAPI
 from src.config import get_settings
 from src.database import init_db
 from src.tasks.scheduler import SchedulerManager
+from src.services.http_client import get_http_manager
 from src.services.kline_scheduler import get_scheduler, stop_scheduler
+from src.services.quote_stream import get_quote_broadcaster
+from src.services.sina_kline_provider import get_async_sina_kline_provider
+from src.services.refresh_queue import shutdown_refresh_queues
 from src.utils.logging import LOGGER
 
 _scheduler_manager: SchedulerManager | None = None
@@ -17,6 +21,9 @@ def register_startup_shutdown(app: FastAPI) -> None:
         # Tushare does not require patches like AkShare did
 
         init_db()
+        await get_http_manager().start()
+        # 后台刷新线程的新浪K线请求在应用事件循环中执行（共享并发控制与熔断）
+        get_async_sina_kline_provider().bind_loop()
         settings = get_settings()
         if settings.scheduler:
             global _scheduler_manager
@@ -36,3 +43,7 @@ def register_startup_shutdown(app: FastAPI) -> None:
 
         # 停止K线数据调度器
         stop_scheduler()
+
+        await get_quote_broadcaster().stop()
+        shutdown_refresh_queues()
+        await get_http_manager().close()
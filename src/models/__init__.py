@@ -26,7 +26,8 @@ from src.models.board import (
     IndustryDaily,
     SuperCategoryDaily,
 )
-from src.models.kline import DataUpdateLog, Kline
+from src.models.breadth import MarketBreadthDaily, SectorTurnoverDaily
+from src.models.kline import DataFreshness, DataUpdateLog, Kline, KlineIndicatorState, KlineLatest
 from src.models.simulated import SimulatedAccount, SimulatedPosition, SimulatedTrade
 from src.models.symbol import SymbolMetadata
 from src.models.trade_calendar import TradeCalendar
@@ -44,6 +45,9 @@ __all__ = [
     "TradeType",
     # K-line models
     "Kline",
+    "KlineIndicatorState",
+    "KlineLatest",
+    "DataFreshness",
     "DataUpdateLog",
     # Symbol models
     "SymbolMetadata",
@@ -52,6 +56,9 @@ __all__ = [
     "IndustryDaily",
     "ConceptDaily",
     "SuperCategoryDaily",
+    # Market breadth
+    "MarketBreadthDaily",
+    "SectorTurnoverDaily",
     # Calendar
     "TradeCalendar",
     # User models
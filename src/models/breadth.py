@@ -0,0 +1,65 @@
+"""
+Market breadth models
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, Integer, JSON, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models.base import Base, utcnow
+
+
+class MarketBreadthDaily(Base):
+    """
+    全市场日线涨跌统计表
+    每个交易日一行，由个股日线入库后增量计算（见 MarketBreadthService），
+    复盘/指数行情/赛道成交额直接读取，无需扫描 klines。
+    """
+
+    __tablename__ = "market_breadth_daily"
+
+    trade_date: Mapped[str] = mapped_column(String(32), primary_key=True)  # YYYY-MM-DD
+
+    stock_count: Mapped[int] = mapped_column(Integer, default=0)  # 有K线的股票数
+    traded_count: Mapped[int] = mapped_column(Integer, default=0)  # 有成交的股票数 (volume > 0)
+
+    up_count: Mapped[int] = mapped_column(Integer, default=0)  # 上涨家数
+    down_count: Mapped[int] = mapped_column(Integer, default=0)  # 下跌家数
+    flat_count: Mapped[int] = mapped_column(Integer, default=0)  # 平盘家数
+    limit_up_count: Mapped[int] = mapped_column(Integer, default=0)  # 涨停家数
+    limit_down_count: Mapped[int] = mapped_column(Integer, default=0)  # 跌停家数
+
+    total_amount: Mapped[float] = mapped_column(Float, default=0)  # 总成交额
+    total_volume: Mapped[float] = mapped_column(Float, default=0)  # 总成交量
+
+    # 按板块统计 {"main": {"count": n, "up": n, "down": n}, "chinext": ..., "star": ..., "bse": ...}
+    board_breadth: Mapped[dict] = mapped_column(JSON, default=dict)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow, onupdate=utcnow
+    )
+
+
+class SectorTurnoverDaily(Base):
+    """
+    赛道成交额日统计表
+    每个交易日一行，与 market_breadth_daily 在同一次重算中写入（见 MarketBreadthService），
+    赛道成交额接口直接读取。不受 MIN_COVERAGE 限制：读取方按 traded_count 筛选交易日。
+    """
+
+    __tablename__ = "sector_turnover_daily"
+
+    trade_date: Mapped[str] = mapped_column(String(32), primary_key=True)  # YYYY-MM-DD
+
+    traded_count: Mapped[int] = mapped_column(Integer, default=0)  # 全市场有成交的股票数 (volume > 0)
+
+    # 按赛道统计 {"半导体": {"amount": 成交额, "count": 有K线的股票数}, ...}
+    # 成交额 = volume * close * 100（volume 为手数）
+    sectors: Mapped[dict] = mapped_column(JSON, default=dict)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow, onupdate=utcnow
+    )
+
+
+__all__ = ["MarketBreadthDaily", "SectorTurnoverDaily"]
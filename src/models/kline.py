@@ -11,7 +11,6 @@ from sqlalchemy import (
     Integer,
     String,
     Text,
-    UniqueConstraint,
 )
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -23,32 +22,32 @@ class Kline(Base):
     """
     统一K线数据表
     存储所有类型标的(个股/指数/概念)的K线数据
+
+    以 (symbol_type, symbol_code, timeframe, trade_time) 为聚簇主键 (WITHOUT ROWID)：
+    同一标的的K线在B树中物理相邻，区间读取为一次连续扫描，写入只维护主键和
+    trade_time 二级索引（截面查询用）。
     """
 
     __tablename__ = "klines"
     __table_args__ = (
-        UniqueConstraint("symbol_type", "symbol_code", "timeframe", "trade_time"),
-        Index("ix_klines_symbol", "symbol_type", "symbol_code", "timeframe"),
         Index("ix_klines_trade_time", "trade_time"),
-        Index("ix_klines_lookup", "symbol_type", "symbol_code", "timeframe", "trade_time"),
+        {"sqlite_with_rowid": False},
     )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-
     # 标的信息
     symbol_type: Mapped[SymbolType] = mapped_column(
-        SqlEnum(SymbolType), index=True
+        SqlEnum(SymbolType), primary_key=True
     )  # 'stock', 'index', 'concept'
-    symbol_code: Mapped[str] = mapped_column(String(16), index=True)  # 代码
+    symbol_code: Mapped[str] = mapped_column(String(16), primary_key=True)  # 代码
     symbol_name: Mapped[str | None] = mapped_column(String(64), nullable=True)  # 名称
 
     # 时间周期
     timeframe: Mapped[KlineTimeframe] = mapped_column(
-        SqlEnum(KlineTimeframe), index=True
+        SqlEnum(KlineTimeframe), primary_key=True
     )
 
     # K线数据
-    trade_time: Mapped[str] = mapped_column(String(32))  # ISO格式: 'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS'
+    trade_time: Mapped[str] = mapped_column(String(32), primary_key=True)  # ISO格式: 'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS'
     open: Mapped[float] = mapped_column(Float)
     high: Mapped[float] = mapped_column(Float)
     low: Mapped[float] = mapped_column(Float)
@@ -62,14 +61,94 @@ class Kline(Base):
     macd: Mapped[float | None] = mapped_column(Float, nullable=True)  # MACD 柱
 
     # 元数据
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), default=utcnow
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow, onupdate=utcnow
     )
+
+
+class KlineIndicatorState(Base):
+    """
+    K线指标增量状态表
+    记录每个标的/周期最新K线之后的 EMA12/EMA26/DEA 状态，
+    新K线的MACD可在O(1)内从该状态继续计算，无需重算全部历史。
+    同时保存前一根K线的状态，用于盘中改写最后一根K线的情况。
+    """
+
+    __tablename__ = "kline_indicator_state"
+
+    symbol_type: Mapped[SymbolType] = mapped_column(SqlEnum(SymbolType), primary_key=True)
+    symbol_code: Mapped[str] = mapped_column(String(16), primary_key=True)
+    timeframe: Mapped[KlineTimeframe] = mapped_column(SqlEnum(KlineTimeframe), primary_key=True)
+
+    # 最新K线之后的状态
+    trade_time: Mapped[str] = mapped_column(String(32))
+    bar_count: Mapped[int] = mapped_column(Integer, default=0)  # 参与计算的K线数量
+    ema_fast: Mapped[float] = mapped_column(Float)
+    ema_slow: Mapped[float] = mapped_column(Float)
+    dea: Mapped[float] = mapped_column(Float)
+
+    # 前一根K线之后的状态 (只有一根K线时为空)
+    prev_trade_time: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    prev_ema_fast: Mapped[float | None] = mapped_column(Float, nullable=True)
+    prev_ema_slow: Mapped[float | None] = mapped_column(Float, nullable=True)
+    prev_dea: Mapped[float | None] = mapped_column(Float, nullable=True)
+
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=utcnow, onupdate=utcnow
     )
 
 
+class KlineLatest(Base):
+    """
+    K线最新一根汇总表
+    每个标的/周期一行，保存最新K线和前一根收盘价，与 klines 在同一事务内维护
+    （KlineRepository 写入/删除时刷新），"最新价/最新时间"查询无需扫描 klines。
+    """
+
+    __tablename__ = "kline_latest"
+
+    symbol_type: Mapped[SymbolType] = mapped_column(SqlEnum(SymbolType), primary_key=True)
+    symbol_code: Mapped[str] = mapped_column(String(16), primary_key=True)
+    timeframe: Mapped[KlineTimeframe] = mapped_column(SqlEnum(KlineTimeframe), primary_key=True)
+
+    # 最新K线
+    symbol_name: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    trade_time: Mapped[str] = mapped_column(String(32))
+    open: Mapped[float] = mapped_column(Float)
+    high: Mapped[float] = mapped_column(Float)
+    low: Mapped[float] = mapped_column(Float)
+    close: Mapped[float] = mapped_column(Float)
+    volume: Mapped[float] = mapped_column(Float, default=0)
+    amount: Mapped[float] = mapped_column(Float, default=0)
+
+    # 前一根K线 (只有一根K线时为空)
+    prev_trade_time: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    prev_close: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow, onupdate=utcnow
+    )
+
+
+class DataFreshness(Base):
+    """
+    数据新鲜度登记表
+    每个标的/周期一行：最新K线时间、最近一次从上游获取的时间和数据来源。
+    所有入库路径（KlineService.save_klines / save_bar_records、懒加载）在同一事务内
+    更新，FreshnessRegistry 以此判断是否需要刷新，无需每次查询交易日历。
+    """
+
+    __tablename__ = "data_freshness"
+
+    symbol_type: Mapped[SymbolType] = mapped_column(SqlEnum(SymbolType), primary_key=True)
+    symbol_code: Mapped[str] = mapped_column(String(16), primary_key=True)
+    timeframe: Mapped[KlineTimeframe] = mapped_column(SqlEnum(KlineTimeframe), primary_key=True)
+
+    last_bar_time: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    last_fetched_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    source: Mapped[str | None] = mapped_column(String(16), nullable=True)
+
+
 class DataUpdateLog(Base):
     """
     数据更新日志表
@@ -102,4 +181,4 @@ class DataUpdateLog(Base):
     )
 
 
-__all__ = ["Kline", "DataUpdateLog"]
+__all__ = ["Kline", "KlineIndicatorState", "KlineLatest", "DataFreshness", "DataUpdateLog"]
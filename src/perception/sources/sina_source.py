@@ -34,6 +34,12 @@ from src.perception.events import (
 )
 from src.perception.health import HealthStatus, SourceHealth
 from src.perception.sources.base import DataSource, SourceType
+from src.services.sina_quote_service import (
+    DEFAULT_CHUNK_SIZE,
+    chunked,
+    parse_hq_index_response,
+    parse_hq_response,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -366,22 +372,27 @@ class SinaSource(DataSource):
         if not self._stock_symbols:
             return []
 
-        symbols_str = ",".join(self._stock_symbols)
-        url = SINA_HQ_URL.format(symbols=symbols_str)
+        async def fetch_chunk(symbols: List[str]) -> str:
+            url = SINA_HQ_URL.format(symbols=",".join(symbols))
 
-        start = time.monotonic()
-        response = await self._client.get(url)  # type: ignore[union-attr]
-        latency_ms = (time.monotonic() - start) * 1000
+            start = time.monotonic()
+            response = await self._client.get(url)  # type: ignore[union-attr]
+            latency_ms = (time.monotonic() - start) * 1000
 
-        self._record_latency(latency_ms)
+            self._record_latency(latency_ms)
 
-        if response.status_code == 456:
-            raise SinaRateLimitError(
-                f"Sina returned 456 rate limit (latency={latency_ms:.0f}ms)"
-            )
-        response.raise_for_status()
+            if response.status_code == 456:
+                raise SinaRateLimitError(
+                    f"Sina returned 456 rate limit (latency={latency_ms:.0f}ms)"
+                )
+            response.raise_for_status()
+            return response.text
 
-        return self._parse_hq_response(response.text, MarketScope.CN_STOCK)
+        # Large watchlists are split into chunks fetched concurrently
+        texts = await asyncio.gather(
+            *(fetch_chunk(chunk) for chunk in chunked(self._stock_symbols, DEFAULT_CHUNK_SIZE))
+        )
+        return self._parse_hq_response("\n".join(texts), MarketScope.CN_STOCK)
 
     async def _fetch_index_quotes(self) -> List[RawMarketEvent]:
         """Fetch real-time index quotes from hq.sinajs.cn."""
@@ -485,79 +496,42 @@ class SinaSource(DataSource):
     ) -> List[RawMarketEvent]:
         """Parse hq.sinajs.cn stock-quote response.
 
-        Format per line:
-        var hq_str_sh600519="贵州茅台,1800.00,...,date,time,...";
-        Fields: name,open,prev_close,price,high,low,bid,ask,volume,amount,
-                b1_vol,b1,b2_vol,b2,b3_vol,b3,b4_vol,b4,b5_vol,b5,
-                a1_vol,a1,a2_vol,a2,a3_vol,a3,a4_vol,a4,a5_vol,a5,
-                date,time,status
+        Parsing is delegated to the shared columnar parser
+        (``parse_hq_response``); quotes with fewer than 32 fields or a
+        zero price (market closed / no data) are skipped.
         """
+        snapshot = parse_hq_response(text).trading()
+        change, change_pct = snapshot.change, snapshot.change_pct
         events: List[RawMarketEvent] = []
-        for line in text.strip().split("\n"):
-            line = line.strip()
-            if not line:
-                continue
-
-            # Extract symbol: var hq_str_sh600519="..."
-            sym_match = re.search(r"hq_str_(\w+)=", line)
-            quote_match = re.search(r'"([^"]*)"', line)
-            if not sym_match or not quote_match:
-                continue
-
-            sina_symbol = sym_match.group(1)
-            raw_ticker = re.sub(r"^(sh|sz|bj)", "", sina_symbol)
-            parts = quote_match.group(1).split(",")
-
-            if len(parts) < 32:
-                logger.debug("Skipping incomplete quote for %s (%d fields)", sina_symbol, len(parts))
-                continue
-
-            try:
-                price = float(parts[3]) if parts[3] else 0.0
-                # Skip if price is 0 (market closed / no data)
-                if price == 0:
-                    continue
-
-                event_data: Dict[str, Any] = {
-                    "name": parts[0],
-                    "open": float(parts[1]) if parts[1] else 0.0,
-                    "prev_close": float(parts[2]) if parts[2] else 0.0,
-                    "price": price,
-                    "high": float(parts[4]) if parts[4] else 0.0,
-                    "low": float(parts[5]) if parts[5] else 0.0,
-                    "bid": float(parts[6]) if parts[6] else 0.0,
-                    "ask": float(parts[7]) if parts[7] else 0.0,
-                    "volume": int(float(parts[8])) if parts[8] else 0,
-                    "amount": float(parts[9]) if parts[9] else 0.0,
-                    "date": parts[30] if len(parts) > 30 else "",
-                    "time": parts[31] if len(parts) > 31 else "",
-                }
-
-                # Calculate change
-                prev_close = event_data["prev_close"]
-                if prev_close > 0:
-                    event_data["change"] = round(price - prev_close, 4)
-                    event_data["change_pct"] = round(
-                        (price - prev_close) / prev_close * 100, 4
-                    )
-
-                # Parse timestamp from date+time fields
-                ts = _parse_quote_timestamp(event_data["date"], event_data["time"])
-
-                events.append(
-                    RawMarketEvent(
-                        source=EventSource.SINA,
-                        event_type=EventType.PRICE_UPDATE,
-                        market=market,
-                        symbol=raw_ticker,
-                        data=event_data,
-                        timestamp=ts,
-                    )
+        for i in range(len(snapshot)):
+            event_data: Dict[str, Any] = {
+                "name": snapshot.names[i],
+                "open": float(snapshot.open[i]),
+                "prev_close": float(snapshot.prev_close[i]),
+                "price": float(snapshot.price[i]),
+                "high": float(snapshot.high[i]),
+                "low": float(snapshot.low[i]),
+                "bid": float(snapshot.bid[i]),
+                "ask": float(snapshot.ask[i]),
+                "volume": int(snapshot.volume[i]),
+                "amount": float(snapshot.amount[i]),
+                "date": snapshot.date[i],
+                "time": snapshot.time[i],
+            }
+            if snapshot.prev_close[i] > 0:
+                event_data["change"] = round(float(change[i]), 4)
+                event_data["change_pct"] = round(float(change_pct[i]), 4)
+
+            events.append(
+                RawMarketEvent(
+                    source=EventSource.SINA,
+                    event_type=EventType.PRICE_UPDATE,
+                    market=market,
+                    symbol=snapshot.tickers[i],
+                    data=event_data,
+                    timestamp=_parse_quote_timestamp(snapshot.date[i], snapshot.time[i]),
                 )
-            except (ValueError, IndexError) as exc:
-                logger.debug("Failed to parse quote for %s: %s", sina_symbol, exc)
-                continue
-
+            )
         return events
 
     def _parse_index_summary_response(self, text: str) -> List[RawMarketEvent]:
@@ -566,52 +540,30 @@ class SinaSource(DataSource):
         Format: var hq_str_s_sh000001="上证指数,3259.22,46.14,1.44,2660394,28862016";
         Fields: name, price, change, change_pct, volume(手), amount(万元)
         """
+        snapshot = parse_hq_index_response(text)
+        now = datetime.now(timezone.utc)
         events: List[RawMarketEvent] = []
-        for line in text.strip().split("\n"):
-            line = line.strip()
-            if not line:
+        for i in range(len(snapshot)):
+            price = float(snapshot.price[i])
+            if not price > 0:
                 continue
-
-            sym_match = re.search(r"hq_str_s_(\w+)=", line)
-            quote_match = re.search(r'"([^"]*)"', line)
-            if not sym_match or not quote_match:
-                continue
-
-            sina_symbol = sym_match.group(1)
-            raw_ticker = re.sub(r"^(sh|sz|bj)", "", sina_symbol)
-            parts = quote_match.group(1).split(",")
-
-            if len(parts) < 6:
-                continue
-
-            try:
-                price = float(parts[1]) if parts[1] else 0.0
-                if price == 0:
-                    continue
-
-                event_data: Dict[str, Any] = {
-                    "name": parts[0],
-                    "price": price,
-                    "change": float(parts[2]) if parts[2] else 0.0,
-                    "change_pct": float(parts[3]) if parts[3] else 0.0,
-                    "volume": int(parts[4]) if parts[4] else 0,
-                    "amount": float(parts[5]) if parts[5] else 0.0,
-                }
-
-                events.append(
-                    RawMarketEvent(
-                        source=EventSource.SINA,
-                        event_type=EventType.INDEX_UPDATE,
-                        market=MarketScope.CN_INDEX,
-                        symbol=raw_ticker,
-                        data=event_data,
-                        timestamp=datetime.now(timezone.utc),
-                    )
+            events.append(
+                RawMarketEvent(
+                    source=EventSource.SINA,
+                    event_type=EventType.INDEX_UPDATE,
+                    market=MarketScope.CN_INDEX,
+                    symbol=snapshot.tickers[i],
+                    data={
+                        "name": snapshot.names[i],
+                        "price": price,
+                        "change": float(snapshot.change[i]),
+                        "change_pct": float(snapshot.change_pct[i]),
+                        "volume": int(snapshot.volume[i]),
+                        "amount": float(snapshot.amount[i]),
+                    },
+                    timestamp=now,
                 )
-            except (ValueError, IndexError) as exc:
-                logger.debug("Failed to parse index %s: %s", sina_symbol, exc)
-                continue
-
+            )
         return events
 
     # ── Retry / Circuit Breaker logic ────────────────────────────────
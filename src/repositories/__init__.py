@@ -5,17 +5,23 @@ Repository层 - 数据访问层
 """
 
 from src.repositories.base_repository import BaseRepository
+from src.repositories.kline_columns import KlineBar, KlineBatch, KlineColumns
 from src.repositories.kline_repository import KlineRepository
 from src.repositories.symbol_repository import SymbolRepository
 from src.repositories.board_mapping_repository import BoardMappingRepository
 from src.repositories.industry_daily_repository import IndustryDailyRepository
 from src.repositories.concept_daily_repository import ConceptDailyRepository
+from src.repositories.market_breadth_repository import MarketBreadthRepository
 
 __all__ = [
     "BaseRepository",
     "KlineRepository",
+    "KlineColumns",
+    "KlineBatch",
+    "KlineBar",
     "SymbolRepository",
     "BoardMappingRepository",
     "IndustryDailyRepository",
     "ConceptDailyRepository",
+    "MarketBreadthRepository",
 ]
@@ -0,0 +1,326 @@
+"""
+列式K线数据结构
+
+KlineRepository 的列式读取接口返回 KlineColumns：每个 OHLCV 字段一个 NumPy 数组
+(struct-of-arrays)，大批量读取按列分配内存，而不是为每行构造 ORM 对象。
+
+写入方向使用 KlineBatch：数据源直接从 DataFrame 或解析后的响应按列构造，
+经 KlineService.save_klines 到 KlineRepository.upsert_columns 全程保持列式。
+"""
+
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# 数值列（float64，数据库 NULL 读取为 NaN）
+PRICE_FIELDS = ("open", "high", "low", "close", "volume", "amount")
+
+# DataFrame 中可作为K线时间的列（按优先级）
+FRAME_TIME_COLUMNS = ("datetime", "trade_time", "trade_date", "timestamp")
+
+
+class KlineBar(NamedTuple):
+    """单根K线的轻量视图（属性名与 Kline 模型一致，可直接用于形态分析）"""
+
+    trade_time: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    amount: float
+
+
+@dataclass(frozen=True)
+class KlineColumns:
+    """
+    单个标的的列式K线数据（按时间正序）
+
+    Attributes:
+        symbol_code: 标的代码
+        trade_time: 交易时间数组（ISO字符串，object dtype）
+        open/high/low/close/volume/amount: float64 数组
+    """
+
+    symbol_code: str
+    trade_time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    amount: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.trade_time)
+
+    @classmethod
+    def empty(cls, symbol_code: str) -> "KlineColumns":
+        """构造空结果"""
+        return cls(
+            symbol_code,
+            np.empty(0, dtype=object),
+            *(np.empty(0, dtype=np.float64) for _ in PRICE_FIELDS),
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        symbol_code: str,
+        trade_time: Sequence,
+        columns: Sequence[Sequence],
+    ) -> "KlineColumns":
+        """
+        从按列组织的原始值构造（列顺序与 PRICE_FIELDS 一致）
+
+        Args:
+            symbol_code: 标的代码
+            trade_time: 交易时间序列
+            columns: 6 个数值列，None 转为 NaN
+
+        Returns:
+            KlineColumns实例
+        """
+        return cls(
+            symbol_code,
+            np.asarray(trade_time, dtype=object),
+            *(np.asarray(col, dtype=np.float64) for col in columns),
+        )
+
+    def slice(self, start: Optional[int] = None, stop: Optional[int] = None) -> "KlineColumns":
+        """按位置切片（返回视图，不复制数据）"""
+        window = slice(start, stop)
+        return KlineColumns(
+            self.symbol_code,
+            self.trade_time[window],
+            *(getattr(self, name)[window] for name in PRICE_FIELDS),
+        )
+
+    def reversed(self) -> "KlineColumns":
+        """倒序视图（用于倒序查询结果转正序）"""
+        return KlineColumns(
+            self.symbol_code,
+            self.trade_time[::-1],
+            *(getattr(self, name)[::-1] for name in PRICE_FIELDS),
+        )
+
+    def bar(self, index: int) -> KlineBar:
+        """取单根K线（支持负索引）"""
+        return KlineBar(
+            str(self.trade_time[index]),
+            *(float(getattr(self, name)[index]) for name in PRICE_FIELDS),
+        )
+
+    def to_records(self) -> List[dict]:
+        """
+        转换为API使用的字典列表
+
+        Returns:
+            [{"datetime", "open", "high", "low", "close", "volume", "amount"}, ...]，
+            NaN 还原为 None
+        """
+        values = [_nullable_list(getattr(self, name)) for name in PRICE_FIELDS]
+        return [
+            {
+                "datetime": trade_time,  # Return as 'datetime' for API backward compatibility
+                "open": o,
+                "high": h,
+                "low": l,
+                "close": c,
+                "volume": v,
+                "amount": a,
+            }
+            for trade_time, o, h, l, c, v, a in zip(self.trade_time.tolist(), *values)
+        ]
+
+
+def _nullable_list(values: np.ndarray) -> list:
+    """ndarray 转 list，NaN 转为 None"""
+    result = values.tolist()
+    missing = np.flatnonzero(np.isnan(values))
+    for i in missing.tolist():
+        result[i] = None
+    return result
+
+
+@dataclass(frozen=True)
+class KlineBatch:
+    """
+    单个标的待写入的列式K线（KlineService.save_klines 的输入）
+
+    Attributes:
+        trade_time: 交易时间数组（字符串，object dtype；normalized() 后为 ISO 格式）
+        open/high/low/close/volume/amount: float64 数组（成交量/成交额缺失为 0）
+    """
+
+    trade_time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    amount: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.trade_time)
+
+    @classmethod
+    def empty(cls) -> "KlineBatch":
+        """构造空批次"""
+        return cls(np.empty(0, dtype=object), *(np.empty(0, dtype=np.float64) for _ in PRICE_FIELDS))
+
+    @classmethod
+    def from_columns(cls, trade_time: Sequence, columns: Sequence[Sequence]) -> "KlineBatch":
+        """
+        从按列组织的原始值构造（列顺序与 PRICE_FIELDS 一致）
+
+        Args:
+            trade_time: 交易时间序列（字符串或 datetime64）
+            columns: 6 个数值列，成交额可为 None（全部按 0 处理）
+
+        Returns:
+            KlineBatch实例
+        """
+        size = len(trade_time)
+        *prices, volume, amount = columns
+        return cls(
+            _time_strings(trade_time),
+            *(np.asarray(col, dtype=np.float64) for col in prices),
+            np.nan_to_num(np.asarray(volume, dtype=np.float64)),
+            np.zeros(size) if amount is None else np.nan_to_num(np.asarray(amount, dtype=np.float64)),
+        )
+
+    @classmethod
+    def from_frame(cls, df: Any, time_column: Optional[str] = None) -> "KlineBatch":
+        """
+        从数据源 DataFrame 按列构造
+
+        支持 Tushare (trade_date, vol, amount)、新浪 (timestamp, volume) 以及
+        datetime/trade_time 列的通用格式；没有 amount 列时成交额为 0。
+
+        Args:
+            df: K线 DataFrame
+            time_column: 时间列名（默认按 FRAME_TIME_COLUMNS 查找）
+
+        Returns:
+            KlineBatch实例
+        """
+        if time_column is None:
+            time_column = next((c for c in FRAME_TIME_COLUMNS if c in df.columns), None)
+            if time_column is None:
+                raise ValueError(f"DataFrame 缺少时间列: {list(df.columns)}")
+        volume = "volume" if "volume" in df.columns else "vol"
+        return cls.from_columns(
+            df[time_column].to_numpy(),
+            [
+                *(df[name].to_numpy() for name in PRICE_FIELDS[:4]),
+                df[volume].to_numpy(),
+                df["amount"].to_numpy() if "amount" in df.columns else None,
+            ],
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping]) -> "KlineBatch":
+        """
+        从 {"datetime", "open", ...} 字典列表构造（兼容旧的 list[dict] 接口）
+
+        缺失或为 None 的价格保留为 NaN（与 from_columns 一致），成交量/成交额按 0 处理。
+        """
+        records = list(records)
+        return cls.from_columns(
+            [r.get("datetime", "") for r in records],
+            [[r.get(name) for r in records] for name in PRICE_FIELDS],
+        )
+
+    def take(self, index) -> "KlineBatch":
+        """按位置索引或布尔掩码选取"""
+        return KlineBatch(self.trade_time[index], *(getattr(self, name)[index] for name in PRICE_FIELDS))
+
+    def normalized(self, daily: bool) -> "KlineBatch":
+        """
+        交易时间标准化为 ISO 格式（日线 YYYY-MM-DD，分钟线 YYYY-MM-DD HH:MM:SS）
+
+        常见格式（ISO 及其前缀、YYYYMMDD、YYYYMMDDHHMM）按列转换，其他格式逐个解析，
+        无法解析时保持原值。
+        """
+        trade_time = _normalize_times(self.trade_time, daily)
+        if trade_time is self.trade_time:
+            return self
+        return KlineBatch(trade_time, *(getattr(self, name) for name in PRICE_FIELDS))
+
+    def sorted(self) -> "KlineBatch":
+        """按交易时间正序（已有序时返回自身）"""
+        if len(self) < 2 or (self.trade_time[1:] >= self.trade_time[:-1]).all():
+            return self
+        return self.take(np.argsort(self.trade_time, kind="stable"))
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None) -> "KlineBatch":
+        """保留交易时间在 [start, end] 内的K线（None 表示不限）"""
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.trade_time >= start
+        if end is not None:
+            mask &= self.trade_time <= end
+        return self if mask.all() else self.take(mask)
+
+
+def _time_strings(values: Sequence) -> np.ndarray:
+    """时间列转换为字符串数组（datetime64 转为 YYYY-MM-DD HH:MM:SS）"""
+    array = np.asarray(values)
+    if np.issubdtype(array.dtype, np.datetime64):
+        text = np.datetime_as_string(array.astype("datetime64[s]"), unit="s")
+        return np.char.replace(text, "T", " ").astype(object)
+    if array.dtype != object:
+        return array.astype(str).astype(object)
+    if len(array) and not isinstance(array[0], str):
+        return np.array([str(v) for v in array.tolist()], dtype=object)
+    return array
+
+
+def _normalize_times(trade_time: np.ndarray, daily: bool) -> np.ndarray:
+    """按列标准化交易时间，见 KlineBatch.normalized"""
+    if not len(trade_time):
+        return trade_time
+    text = np.char.strip(trade_time.astype(str))
+    length = np.char.str_len(text)
+    width = 10 if daily else 19
+
+    if (length >= width).all() and (np.char.find(text, "-") == 4).all() and (
+        daily or (np.char.find(text, ":") == 13).all()
+    ):
+        if (length == width).all() and text.dtype == np.dtype(f"U{width}"):
+            return trade_time if trade_time.dtype == object else text.astype(object)
+        return text.astype(f"U{width}").astype(object)
+
+    if np.char.isdigit(text).all() and ((length == 8) | (length == 12)).all():
+        if daily:
+            return _compact_to_iso(text.astype("U8"), daily=True)
+        if (length == 12).all():
+            return _compact_to_iso(text, daily=False)
+
+    from src.schemas.normalized import NormalizedDate, NormalizedDateTime
+
+    model = NormalizedDate if daily else NormalizedDateTime
+    result = []
+    for raw in trade_time.tolist():
+        try:
+            result.append(model(value=raw).to_iso())
+        except ValueError:
+            result.append(raw)
+    return np.array(result, dtype=object)
+
+
+def _compact_to_iso(text: np.ndarray, daily: bool) -> np.ndarray:
+    """YYYYMMDD / YYYYMMDDHHMM 数字串转 ISO 字符串（整数运算，不逐个解析）"""
+    digits = text.astype(np.int64)
+    if not daily:
+        digits, hhmm = np.divmod(digits, 10000)
+    year, month, day = digits // 10000, digits // 100 % 100, digits % 100
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    dates = months.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    if daily:
+        return np.datetime_as_string(dates, unit="D").astype(object)
+    minutes = dates.astype("datetime64[m]") + (hhmm // 100 * 60 + hhmm % 100).astype("timedelta64[m]")
+    text = np.datetime_as_string(minutes.astype("datetime64[s]"), unit="s")
+    return np.char.replace(text, "T", " ").astype(object)
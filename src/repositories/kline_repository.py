@@ -4,23 +4,256 @@ KlineRepository - K线数据访问层
 封装所有K线相关的数据库操作。
 """
 
-from datetime import datetime
-from typing import List, Optional
+from dataclasses import replace
+from datetime import datetime, timezone
+from itertools import repeat
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-from sqlalchemy import and_, delete, desc, func, select
+import numpy as np
+from sqlalchemy import and_, bindparam, delete, desc, func, or_, select, update
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
 
-from src.models import Kline, KlineTimeframe, SymbolType
+from src.models import Kline, KlineIndicatorState, KlineLatest, KlineTimeframe, SymbolType
 from src.repositories.base_repository import BaseRepository
+from src.repositories.kline_columns import PRICE_FIELDS, KlineBatch, KlineColumns, _nullable_list
 from src.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
 
+class UpsertResult(NamedTuple):
+    """批量写入统计"""
+
+    inserted: int
+    updated: int
+    unchanged: int
+
+    @property
+    def written(self) -> int:
+        """实际写入（新增或变更）的行数"""
+        return self.inserted + self.updated
+
+
+def _build_upsert_statement():
+    """
+    构建K线 upsert 语句（模块加载时构建一次，executemany 复用）
+
+    冲突时只在值确有变化时更新：
+    ON CONFLICT DO UPDATE ... WHERE excluded.close IS NOT klines.close OR ...
+    未提供的指标（NULL）保留已有值，不视为变化。
+    """
+    stmt = sqlite_insert(Kline)
+    excluded = stmt.excluded
+
+    price_columns = ("open", "high", "low", "close", "volume", "amount")
+    indicator_columns = ("dif", "dea", "macd")
+
+    set_ = {name: getattr(excluded, name) for name in price_columns}
+    for name in indicator_columns:
+        set_[name] = func.coalesce(getattr(excluded, name), getattr(Kline, name))
+    set_["updated_at"] = excluded.updated_at
+
+    changed = [
+        getattr(excluded, name).is_distinct_from(getattr(Kline, name))
+        for name in price_columns
+    ] + [
+        func.coalesce(getattr(excluded, name), getattr(Kline, name)).is_distinct_from(
+            getattr(Kline, name)
+        )
+        for name in indicator_columns
+    ]
+
+    return stmt.on_conflict_do_update(
+        index_elements=["symbol_type", "symbol_code", "timeframe", "trade_time"],
+        set_=set_,
+        where=or_(*changed),
+    )
+
+
+_UPSERT_STATEMENT = _build_upsert_statement()
+
+
+def _build_state_upsert_statement():
+    """构建指标增量状态 upsert 语句（executemany 复用）"""
+    stmt = sqlite_insert(KlineIndicatorState)
+    return stmt.on_conflict_do_update(
+        index_elements=["symbol_type", "symbol_code", "timeframe"],
+        set_={
+            col: stmt.excluded[col]
+            for col in (
+                "trade_time",
+                "bar_count",
+                "ema_fast",
+                "ema_slow",
+                "dea",
+                "prev_trade_time",
+                "prev_ema_fast",
+                "prev_ema_slow",
+                "prev_dea",
+                "updated_at",
+            )
+        },
+    )
+
+
+_STATE_UPSERT_STATEMENT = _build_state_upsert_statement()
+
+# 按单个标的键删除指标状态（executemany 复用）
+_STATE_DELETE_STATEMENT = delete(KlineIndicatorState).where(
+    KlineIndicatorState.symbol_type == bindparam("key_type"),
+    KlineIndicatorState.symbol_code == bindparam("key_code"),
+    KlineIndicatorState.timeframe == bindparam("key_timeframe"),
+)
+
+# 位置参数形式的 upsert SQL 及参数顺序，按方言缓存（列式写入使用）
+_positional_statements: Dict[str, tuple] = {}
+
+
+def _compile_positional(dialect) -> tuple:
+    """把预构建的K线 upsert 语句编译为位置参数 SQL（DBAPI executemany 直接使用元组参数）"""
+    cached = _positional_statements.get(dialect.name)
+    if cached is None:
+        column_keys = [column.name for column in Kline.__table__.columns]
+        compiled = _UPSERT_STATEMENT.compile(dialect=dialect, column_keys=column_keys)
+        cached = (compiled.string, tuple(compiled.positiontup))
+        _positional_statements[dialect.name] = cached
+    return cached
+
+
+def _bind_value(column, value, dialect):
+    """按列类型把常量转换为数据库值（枚举存名称、时间存字符串）"""
+    process = column.type.dialect_impl(dialect).bind_processor(dialect)
+    return process(value) if process else value
+
+
+# kline_latest 中与 klines 同名的K线列
+_LATEST_BAR_COLUMNS = (
+    "symbol_name", "trade_time", "open", "high", "low", "close", "volume", "amount"
+)
+
+
+def _latest_select(*criteria):
+    """
+    按条件选出每个标的的最新K线及前一根K线（供 kline_latest 刷新/重建）
+
+    前一根K线用相关子查询沿聚簇主键回退一步取得。
+    """
+    prev = aliased(Kline)
+
+    def previous(column):
+        return (
+            select(column)
+            .where(
+                prev.symbol_type == Kline.symbol_type,
+                prev.symbol_code == Kline.symbol_code,
+                prev.timeframe == Kline.timeframe,
+                prev.trade_time < Kline.trade_time,
+            )
+            .order_by(desc(prev.trade_time))
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    return select(
+        Kline.symbol_type,
+        Kline.symbol_code,
+        Kline.timeframe,
+        *(getattr(Kline, name) for name in _LATEST_BAR_COLUMNS),
+        previous(prev.trade_time),
+        previous(prev.close),
+        bindparam("updated_at", type_=KlineLatest.updated_at.type),
+    ).where(*criteria)
+
+
+def _latest_upsert(select_stmt):
+    """INSERT INTO kline_latest ... SELECT，已有行整行覆盖"""
+    columns = [
+        "symbol_type",
+        "symbol_code",
+        "timeframe",
+        *_LATEST_BAR_COLUMNS,
+        "prev_trade_time",
+        "prev_close",
+        "updated_at",
+    ]
+    stmt = sqlite_insert(KlineLatest).from_select(columns, select_stmt)
+    return stmt.on_conflict_do_update(
+        index_elements=["symbol_type", "symbol_code", "timeframe"],
+        set_={col: stmt.excluded[col] for col in columns[3:]},
+    )
+
+
+def _build_latest_refresh_statement():
+    """按单个标的键刷新 kline_latest（executemany 复用）"""
+    latest = (
+        _latest_select(
+            Kline.symbol_type == bindparam("key_type"),
+            Kline.symbol_code == bindparam("key_code"),
+            Kline.timeframe == bindparam("key_timeframe"),
+        )
+        .order_by(desc(Kline.trade_time))
+        .limit(1)
+    )
+    return _latest_upsert(latest)
+
+
+def _build_latest_rebuild_statement():
+    """从 klines 全量重建 kline_latest"""
+    newest = (
+        select(
+            Kline.symbol_type,
+            Kline.symbol_code,
+            Kline.timeframe,
+            func.max(Kline.trade_time).label("trade_time"),
+        )
+        .group_by(Kline.symbol_type, Kline.symbol_code, Kline.timeframe)
+        .subquery()
+    )
+    latest = _latest_select(
+        Kline.symbol_type == newest.c.symbol_type,
+        Kline.symbol_code == newest.c.symbol_code,
+        Kline.timeframe == newest.c.timeframe,
+        Kline.trade_time == newest.c.trade_time,
+    )
+    return _latest_upsert(latest)
+
+
+_LATEST_REFRESH_STATEMENT = _build_latest_refresh_statement()
+
+# 标的已无K线时删除汇总行
+_LATEST_PRUNE_STATEMENT = delete(KlineLatest).where(
+    KlineLatest.symbol_type == bindparam("key_type"),
+    KlineLatest.symbol_code == bindparam("key_code"),
+    KlineLatest.timeframe == bindparam("key_timeframe"),
+    ~select(Kline.trade_time)
+    .where(
+        Kline.symbol_type == KlineLatest.symbol_type,
+        Kline.symbol_code == KlineLatest.symbol_code,
+        Kline.timeframe == KlineLatest.timeframe,
+    )
+    .exists(),
+)
+
+
 class KlineRepository(BaseRepository[Kline]):
     """K线数据Repository"""
 
+    # executemany 每批的行数（每批之间 flush 一次，控制单批内存）
+    UPSERT_CHUNK_SIZE = 10000
+    # 多标的流式扫描时每条查询包含的标的数量
+    STREAM_SYMBOL_CHUNK = 200
+
+    # 列式读取的数值列（顺序与 KlineColumns 一致）
+    _COLUMN_FIELDS = (
+        Kline.open,
+        Kline.high,
+        Kline.low,
+        Kline.close,
+        Kline.volume,
+        Kline.amount,
+    )
+
     def __init__(self, session: Session):
         """初始化KlineRepository"""
         super().__init__(session, Kline)
@@ -142,7 +375,7 @@ class KlineRepository(BaseRepository[Kline]):
         limit_per_symbol: int = 100,
     ) -> List[Kline]:
         """
-        批量查询多个标的的K线数据
+        批量查询多个标的的K线数据（每个标的最近 limit_per_symbol 根）
 
         Args:
             symbol_codes: 标的代码列表
@@ -151,41 +384,95 @@ class KlineRepository(BaseRepository[Kline]):
             limit_per_symbol: 每个标的的数量限制
 
         Returns:
-            K线数据列表
+            K线数据列表（按标的代码、时间倒序）
         """
+        if not symbol_codes:
+            return []
+
+        ranked = self._ranked_subquery(symbol_codes, symbol_type, timeframe)
+        ranked_kline = aliased(Kline, ranked)
         stmt = (
-            select(Kline)
-            .filter(
-                Kline.symbol_code.in_(symbol_codes),
-                Kline.symbol_type == symbol_type,
-                Kline.timeframe == timeframe,
-            )
-            .order_by(Kline.symbol_code, desc(Kline.trade_time))
+            select(ranked_kline)
+            .filter(ranked.c.rn <= limit_per_symbol)
+            .order_by(ranked_kline.symbol_code, desc(ranked_kline.trade_time))
         )
 
         result = self.session.execute(stmt)
-        all_klines = list(result.scalars().all())
+        return list(result.scalars().all())
+
+    def latest_n_by_symbols(
+        self,
+        symbol_codes: List[str],
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        n: int,
+    ) -> Dict[str, KlineColumns]:
+        """
+        批量列式读取多个标的最近N根K线（每标的截断在SQL中完成）
 
-        # 对每个标的限制数量
-        klines_by_symbol = {}
-        for kline in all_klines:
-            if kline.symbol_code not in klines_by_symbol:
-                klines_by_symbol[kline.symbol_code] = []
-            if len(klines_by_symbol[kline.symbol_code]) < limit_per_symbol:
-                klines_by_symbol[kline.symbol_code].append(kline)
+        Args:
+            symbol_codes: 标的代码列表
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            n: 每个标的的K线数量
+
+        Returns:
+            {symbol_code: KlineColumns}（按时间正序），没有数据的标的不包含在内
+        """
+        result: Dict[str, KlineColumns] = {}
+        codes = sorted(set(symbol_codes))
+        for i in range(0, len(codes), self.STREAM_SYMBOL_CHUNK):
+            chunk = codes[i : i + self.STREAM_SYMBOL_CHUNK]
+            ranked = self._ranked_subquery(chunk, symbol_type, timeframe)
+            stmt = (
+                select(
+                    ranked.c.symbol_code,
+                    ranked.c.trade_time,
+                    *(ranked.c[column.key] for column in self._COLUMN_FIELDS),
+                )
+                .filter(ranked.c.rn <= n)
+                .order_by(ranked.c.symbol_code, ranked.c.trade_time)
+            )
+            for columns in _split_by_symbol(self.session.execute(stmt).all()):
+                result[columns.symbol_code] = columns
+        return result
 
-        # 展平结果
-        return [kline for klines in klines_by_symbol.values() for kline in klines]
+    def _ranked_subquery(
+        self,
+        symbol_codes: List[str],
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+    ):
+        """
+        按标的对K线倒序编号的子查询（rn = 1 为最新一根）
+
+        ROW_NUMBER() OVER (PARTITION BY symbol_code ORDER BY trade_time DESC)，
+        每个标的沿聚簇主键做一次连续区间扫描，外层按 rn 截断。
+        """
+        row_number = (
+            func.row_number()
+            .over(partition_by=Kline.symbol_code, order_by=desc(Kline.trade_time))
+            .label("rn")
+        )
+        return (
+            select(Kline, row_number)
+            .filter(
+                Kline.symbol_type == symbol_type,
+                Kline.symbol_code.in_(symbol_codes),
+                Kline.timeframe == timeframe,
+            )
+            .subquery()
+        )
 
     def upsert_batch(self, klines: List[Kline]) -> int:
         """
-        批量插入或更新K线数据（使用SQLite的INSERT OR REPLACE）
+        批量插入或更新K线数据（ORM对象形式，委托给 bulk_upsert）
 
         Args:
             klines: K线数据列表
 
         Returns:
-            影响的行数
+            实际写入（新增或变更）的行数
         """
         if not klines:
             return 0
@@ -204,31 +491,191 @@ class KlineRepository(BaseRepository[Kline]):
                 "close": k.close,
                 "volume": k.volume,
                 "amount": k.amount,
+                "dif": k.dif,
+                "dea": k.dea,
+                "macd": k.macd,
                 "updated_at": k.updated_at,
             }
             for k in klines
         ]
 
-        # SQLite的upsert语法
-        stmt = sqlite_insert(Kline).values(kline_dicts)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["symbol_code", "symbol_type", "timeframe", "trade_time"],
-            set_={
-                "open": stmt.excluded.open,
-                "high": stmt.excluded.high,
-                "low": stmt.excluded.low,
-                "close": stmt.excluded.close,
-                "volume": stmt.excluded.volume,
-                "amount": stmt.excluded.amount,
-                "updated_at": stmt.excluded.updated_at,
-            },
+        return self.upsert_records(kline_dicts)
+
+    def upsert_records(self, records: List[dict]) -> int:
+        """
+        批量插入或更新K线数据（字典形式，无需构造ORM对象）
+
+        Args:
+            records: K线字典列表，键与 Kline 列名一致
+
+        Returns:
+            实际写入（新增或变更）的行数
+        """
+        return self.bulk_upsert(records).written
+
+    def bulk_upsert(self, records: List[dict]) -> "UpsertResult":
+        """
+        分块 executemany 批量写入K线，值未变化的行不会被改写
+
+        所有分块复用同一个预构建的 upsert 语句（编译结果走SQLAlchemy缓存），每块只执行
+        一遍 executemany。冲突行只在 OHLCV/成交额/指标确有变化时才更新，盘中重复刷新
+        不会产生WAL写入。写入前按块查询一次已存在的主键，用于区分新增与更新。
+
+        Args:
+            records: K线字典列表，键与 Kline 列名一致（每条记录的键必须相同）
+
+        Returns:
+            UpsertResult(inserted, updated, unchanged)
+        """
+        if not records:
+            return UpsertResult(0, 0, 0)
+
+        connection = self.session.connection()
+        inserted = 0
+        updated = 0
+        touched = set()
+        for i in range(0, len(records), self.UPSERT_CHUNK_SIZE):
+            chunk = records[i : i + self.UPSERT_CHUNK_SIZE]
+
+            # rowcount = 新增行 + 值有变化的已有行
+            by_group: Dict[tuple, set] = {}
+            for r in chunk:
+                by_group.setdefault((r["symbol_type"], r["timeframe"]), set()).add(
+                    (r["symbol_code"], r["trade_time"])
+                )
+            chunk_inserted = sum(
+                len(keys) - self._count_existing(symbol_type, timeframe, keys)
+                for (symbol_type, timeframe), keys in by_group.items()
+            )
+            chunk_updated = connection.execute(_UPSERT_STATEMENT, chunk).rowcount - chunk_inserted
+            if chunk_inserted or chunk_updated:
+                touched.update(
+                    (r["symbol_type"], r["symbol_code"], r["timeframe"]) for r in chunk
+                )
+            inserted += chunk_inserted
+            updated += chunk_updated
+
+        # 同一事务内刷新最新K线汇总
+        self._refresh_latest(touched)
+        self.session.flush()
+
+        stats = UpsertResult(
+            inserted=inserted,
+            updated=updated,
+            unchanged=len(records) - inserted - updated,
+        )
+        logger.info(
+            f"Upserted {len(records)} klines "
+            f"(inserted={stats.inserted}, updated={stats.updated}, unchanged={stats.unchanged})"
         )
+        return stats
 
-        result = self.session.execute(stmt)
+    def upsert_columns(
+        self,
+        symbol_type: SymbolType,
+        symbol_code: str,
+        symbol_name: Optional[str],
+        timeframe: KlineTimeframe,
+        batch: KlineBatch,
+        indicators: Optional[np.ndarray] = None,
+    ) -> UpsertResult:
+        """
+        列式写入单个标的的K线（语义与 bulk_upsert 相同）
+
+        使用同一个 upsert 语句编译出的位置参数 SQL，列值按列转换后直接
+        executemany，不构造逐行字典或ORM对象。
+
+        Args:
+            symbol_type: 标的类型
+            symbol_code: 标的代码
+            symbol_name: 标的名称
+            timeframe: 时间周期
+            batch: 已标准化的K线
+            indicators: 形状 (n, 3) 的 dif/dea/macd，NaN 表示不提供（保留已有值）
+
+        Returns:
+            UpsertResult(inserted, updated, unchanged)
+        """
+        size = len(batch)
+        if not size:
+            return UpsertResult(0, 0, 0)
+
+        connection = self.session.connection()
+        dialect = connection.dialect
+        upsert_sql, order = _compile_positional(dialect)
+        table = Kline.__table__
+
+        values = {
+            "symbol_type": repeat(_bind_value(table.c.symbol_type, symbol_type, dialect)),
+            "symbol_code": repeat(symbol_code),
+            "symbol_name": repeat(symbol_name),
+            "timeframe": repeat(_bind_value(table.c.timeframe, timeframe, dialect)),
+            "trade_time": batch.trade_time.tolist(),
+            "updated_at": repeat(
+                _bind_value(table.c.updated_at, datetime.now(timezone.utc), dialect)
+            ),
+        }
+        for name in PRICE_FIELDS:
+            values[name] = _nullable_list(getattr(batch, name))
+        for i, name in enumerate(("dif", "dea", "macd")):
+            values[name] = repeat(None) if indicators is None else _nullable_list(indicators[:, i])
+        rows = list(zip(*(values[key] for key in order)))
+
+        inserted = 0
+        updated = 0
+        trade_times = batch.trade_time.tolist()
+        for i in range(0, size, self.UPSERT_CHUNK_SIZE):
+            chunk = rows[i : i + self.UPSERT_CHUNK_SIZE]
+            keys = {(symbol_code, t) for t in trade_times[i : i + self.UPSERT_CHUNK_SIZE]}
+            chunk_inserted = len(keys) - self._count_existing(symbol_type, timeframe, keys)
+            inserted += chunk_inserted
+            updated += connection.exec_driver_sql(upsert_sql, chunk).rowcount - chunk_inserted
+
+        if inserted or updated:
+            self._refresh_latest({(symbol_type, symbol_code, timeframe)})
         self.session.flush()
 
-        logger.info(f"Upserted {len(klines)} klines")
-        return result.rowcount
+        stats = UpsertResult(inserted=inserted, updated=updated, unchanged=size - inserted - updated)
+        logger.info(
+            f"Upserted {size} klines for {symbol_code} "
+            f"(inserted={stats.inserted}, updated={stats.updated}, unchanged={stats.unchanged})"
+        )
+        return stats
+
+    def _count_existing(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        keys: set,
+    ) -> int:
+        """
+        统计一批 (symbol_code, trade_time) 中已存在于 klines 的数量
+
+        按标的列表和时间区间做聚簇主键范围查询（截面为多标的单日，单标的写入为
+        一段连续时间），再与待写入的主键求交集。IN 列表每次最多 STREAM_SYMBOL_CHUNK
+        个标的，不超过旧版 SQLite 的 999 个绑定参数上限。
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            keys: {(symbol_code, trade_time)}
+
+        Returns:
+            已存在的主键数量
+        """
+        codes = sorted({code for code, _ in keys})
+        times = [trade_time for _, trade_time in keys]
+        existing = 0
+        for i in range(0, len(codes), self.STREAM_SYMBOL_CHUNK):
+            stmt = select(Kline.symbol_code, Kline.trade_time).filter(
+                Kline.symbol_type == symbol_type,
+                Kline.timeframe == timeframe,
+                Kline.symbol_code.in_(codes[i : i + self.STREAM_SYMBOL_CHUNK]),
+                Kline.trade_time >= min(times),
+                Kline.trade_time <= max(times),
+            )
+            existing += sum(1 for row in self.session.execute(stmt) if tuple(row) in keys)
+        return existing
 
     def delete_by_symbol(
         self,
@@ -256,7 +703,8 @@ class KlineRepository(BaseRepository[Kline]):
         )
 
         result = self.session.execute(stmt)
-        self.session.flush()
+        self.delete_indicator_state(symbol_code, symbol_type, timeframe)
+        self._refresh_latest([(symbol_type, symbol_code, timeframe)], prune=True)
 
         logger.info(
             f"Deleted {result.rowcount} klines for {symbol_code} ({symbol_type}, {timeframe})"
@@ -299,10 +747,59 @@ class KlineRepository(BaseRepository[Kline]):
         )
 
         result = self.session.execute(stmt)
-        self.session.flush()
+        if result.rowcount:
+            # 历史被改写，下次保存时全量重算指标
+            self.delete_indicator_state(symbol_code, symbol_type, timeframe)
+            self._refresh_latest([(symbol_type, symbol_code, timeframe)], prune=True)
+        else:
+            self.session.flush()
 
         return result.rowcount
 
+    def delete_before(
+        self,
+        timeframe: KlineTimeframe,
+        cutoff: str,
+    ) -> Tuple[int, List[Tuple[SymbolType, str]]]:
+        """
+        删除某个周期所有标的在指定时间之前的K线（过期数据清理）
+
+        受影响标的的指标状态一并删除（下次保存时全量重算），最新K线汇总按剩余K线刷新。
+
+        Args:
+            timeframe: 时间周期
+            cutoff: 截止时间（不包含）
+
+        Returns:
+            (删除的记录数, 受影响的 (symbol_type, symbol_code) 列表)
+        """
+        criteria = (Kline.timeframe == timeframe, Kline.trade_time < cutoff)
+        keys = [
+            (symbol_type, symbol_code)
+            for symbol_type, symbol_code in self.session.execute(
+                select(Kline.symbol_type, Kline.symbol_code).where(*criteria).distinct()
+            )
+        ]
+        if not keys:
+            return 0, []
+
+        result = self.session.execute(delete(Kline).where(*criteria))
+        self.session.connection().execute(
+            _STATE_DELETE_STATEMENT,
+            [
+                {"key_type": symbol_type, "key_code": symbol_code, "key_timeframe": timeframe}
+                for symbol_type, symbol_code in keys
+            ],
+        )
+        self._refresh_latest(
+            [(symbol_type, symbol_code, timeframe) for symbol_type, symbol_code in keys],
+            prune=True,
+        )
+        self.session.flush()
+
+        logger.info(f"Deleted {result.rowcount} {timeframe.name} klines before {cutoff}")
+        return result.rowcount, keys
+
     def count_by_symbol(
         self,
         symbol_code: str,
@@ -357,3 +854,537 @@ class KlineRepository(BaseRepository[Kline]):
 
         result = self.session.execute(stmt)
         return list(result.scalars().all())
+
+    def find_recent_trade_times(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        limit: int,
+    ) -> List[str]:
+        """
+        查询最近的若干个K线时间
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            limit: 返回数量
+
+        Returns:
+            K线时间列表（按时间倒序）
+        """
+        stmt = (
+            select(Kline.trade_time)
+            .distinct()
+            .filter(
+                Kline.symbol_type == symbol_type,
+                Kline.timeframe == timeframe,
+            )
+            .order_by(desc(Kline.trade_time))
+            .limit(limit)
+        )
+        return list(self.session.scalars(stmt).all())
+
+    def find_cross_section(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        trade_time: str,
+    ) -> list:
+        """
+        查询某一K线时间的全部标的截面，附带前一交易日收盘价
+
+        前收盘取该标的日线中早于 trade_time 所在日期的最后一根（日线即前一根K线，
+        分钟线即前一交易日收盘），每个标的一次主键回退查找。
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            trade_time: K线时间（日线 YYYY-MM-DD，分钟线 YYYY-MM-DD HH:MM:SS）
+
+        Returns:
+            [(symbol_code, name, open, close, volume, amount, prev_close), ...]，
+            name 来自 symbol_metadata（可能为 None），无前收盘时 prev_close 为 None
+        """
+        from src.models import SymbolMetadata
+
+        prev = aliased(Kline)
+        prev_close = (
+            select(prev.close)
+            .where(
+                prev.symbol_type == Kline.symbol_type,
+                prev.symbol_code == Kline.symbol_code,
+                prev.timeframe == KlineTimeframe.DAY,
+                prev.trade_time < func.substr(Kline.trade_time, 1, 10),
+            )
+            .order_by(desc(prev.trade_time))
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(
+                Kline.symbol_code,
+                SymbolMetadata.name,
+                Kline.open,
+                Kline.close,
+                Kline.volume,
+                Kline.amount,
+                prev_close,
+            )
+            .outerjoin(SymbolMetadata, SymbolMetadata.ticker == Kline.symbol_code)
+            .filter(
+                Kline.trade_time == trade_time,
+                Kline.symbol_type == symbol_type,
+                Kline.timeframe == timeframe,
+            )
+        )
+        return self.session.execute(stmt).all()
+
+    def find_columns_by_symbol(
+        self,
+        symbol_code: str,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        limit: Optional[int] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+    ) -> KlineColumns:
+        """
+        按标的列式读取K线（Core查询，不构造ORM对象）
+
+        Args:
+            symbol_code: 标的代码
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            limit: 只取最近的N根
+            start_time: 开始时间（包含，ISO字符串）
+            end_time: 结束时间（包含，ISO字符串）
+
+        Returns:
+            KlineColumns（按时间正序）
+        """
+        stmt = select(Kline.trade_time, *self._COLUMN_FIELDS).filter(
+            Kline.symbol_code == symbol_code,
+            Kline.symbol_type == symbol_type,
+            Kline.timeframe == timeframe,
+        )
+        if start_time:
+            stmt = stmt.filter(Kline.trade_time >= start_time)
+        if end_time:
+            stmt = stmt.filter(Kline.trade_time <= end_time)
+
+        if limit:
+            stmt = stmt.order_by(desc(Kline.trade_time)).limit(limit)
+        else:
+            stmt = stmt.order_by(Kline.trade_time)
+
+        rows = self.session.execute(stmt).all()
+        if not rows:
+            return KlineColumns.empty(symbol_code)
+
+        trade_time, *columns = zip(*rows)
+        result = KlineColumns.from_columns(symbol_code, trade_time, columns)
+        return result.reversed() if limit else result
+
+    def iter_columns_by_symbols(
+        self,
+        symbol_codes: List[str],
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+    ) -> Iterator[KlineColumns]:
+        """
+        流式扫描多个标的的K线（每次查询 STREAM_SYMBOL_CHUNK 个标的）
+
+        内存占用只与单个分块有关，适合全市场扫描。没有数据的标的不会产出。
+
+        Args:
+            symbol_codes: 标的代码列表
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            start_time: 开始时间（包含，ISO字符串）
+            end_time: 结束时间（包含，ISO字符串）
+
+        Yields:
+            每个标的一个 KlineColumns（按时间正序，标的按代码排序）
+        """
+        codes = sorted(set(symbol_codes))
+        for i in range(0, len(codes), self.STREAM_SYMBOL_CHUNK):
+            chunk = codes[i : i + self.STREAM_SYMBOL_CHUNK]
+            stmt = select(Kline.symbol_code, Kline.trade_time, *self._COLUMN_FIELDS).filter(
+                Kline.symbol_code.in_(chunk),
+                Kline.symbol_type == symbol_type,
+                Kline.timeframe == timeframe,
+            )
+            if start_time:
+                stmt = stmt.filter(Kline.trade_time >= start_time)
+            if end_time:
+                stmt = stmt.filter(Kline.trade_time <= end_time)
+            stmt = stmt.order_by(Kline.symbol_code, Kline.trade_time)
+
+            yield from _split_by_symbol(self.session.execute(stmt).all())
+
+    def find_closes_since(
+        self,
+        symbol_code: str,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        start_time: Optional[str] = None,
+    ) -> List[tuple[str, float]]:
+        """
+        查询标的的收盘价序列（只读取时间和收盘价两列）
+
+        Args:
+            symbol_code: 标的代码
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            start_time: 起始时间（包含），None 表示全部历史
+
+        Returns:
+            (trade_time, close) 列表（按时间正序）
+        """
+        stmt = select(Kline.trade_time, Kline.close).filter(
+            Kline.symbol_code == symbol_code,
+            Kline.symbol_type == symbol_type,
+            Kline.timeframe == timeframe,
+        )
+        if start_time:
+            stmt = stmt.filter(Kline.trade_time >= start_time)
+        stmt = stmt.order_by(Kline.trade_time)
+
+        result = self.session.execute(stmt)
+        return [(row.trade_time, row.close) for row in result]
+
+    def find_closes_by_symbols(
+        self,
+        symbol_codes: List[str],
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        start_time: str,
+        end_time: str,
+    ) -> dict[tuple[str, str], float]:
+        """
+        批量查询多个标的在时间区间内的收盘价（按标的分块的主键范围查询）
+
+        Args:
+            symbol_codes: 标的代码列表
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            start_time: 起始时间（包含）
+            end_time: 结束时间（包含）
+
+        Returns:
+            {(symbol_code, trade_time): close}
+        """
+        closes = {}
+        for i in range(0, len(symbol_codes), self.STREAM_SYMBOL_CHUNK):
+            chunk = symbol_codes[i : i + self.STREAM_SYMBOL_CHUNK]
+            stmt = select(Kline.symbol_code, Kline.trade_time, Kline.close).filter(
+                Kline.symbol_type == symbol_type,
+                Kline.timeframe == timeframe,
+                Kline.symbol_code.in_(chunk),
+                Kline.trade_time >= start_time,
+                Kline.trade_time <= end_time,
+            )
+            for code, trade_time, close in self.session.execute(stmt):
+                closes[(code, trade_time)] = close
+        return closes
+
+    def update_indicators(
+        self,
+        symbol_code: str,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        rows: List[dict],
+    ) -> int:
+        """
+        批量更新K线的MACD指标（executemany）
+
+        Args:
+            symbol_code: 标的代码
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            rows: 字典列表，包含 trade_time, dif, dea, macd
+
+        Returns:
+            更新的行数
+        """
+        if not rows:
+            return 0
+
+        table = Kline.__table__
+        stmt = (
+            update(table)
+            .where(
+                table.c.symbol_code == symbol_code,
+                table.c.symbol_type == symbol_type,
+                table.c.timeframe == timeframe,
+                table.c.trade_time == bindparam("b_trade_time"),
+            )
+            .values(
+                dif=bindparam("b_dif"),
+                dea=bindparam("b_dea"),
+                macd=bindparam("b_macd"),
+            )
+        )
+        params = [
+            {
+                "b_trade_time": r["trade_time"],
+                "b_dif": r["dif"],
+                "b_dea": r["dea"],
+                "b_macd": r["macd"],
+            }
+            for r in rows
+        ]
+
+        result = self.session.execute(stmt, params)
+        self.session.flush()
+        return result.rowcount
+
+    # ==================== 最新K线汇总 ====================
+
+    def find_latest_bar(
+        self,
+        symbol_code: str,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+    ) -> Optional[KlineLatest]:
+        """
+        查询标的的最新K线汇总（主键查找，不扫描 klines）
+
+        Args:
+            symbol_code: 标的代码
+            symbol_type: 标的类型
+            timeframe: 时间周期
+
+        Returns:
+            KlineLatest（含前一根收盘价）或None
+        """
+        stmt = (
+            select(KlineLatest)
+            .filter(
+                KlineLatest.symbol_type == symbol_type,
+                KlineLatest.symbol_code == symbol_code,
+                KlineLatest.timeframe == timeframe,
+            )
+            .execution_options(populate_existing=True)
+        )
+        return self.session.scalars(stmt).one_or_none()
+
+    def find_latest_bars(
+        self,
+        symbol_codes: List[str],
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+    ) -> Dict[str, KlineLatest]:
+        """
+        批量查询多个标的的最新K线汇总
+
+        Args:
+            symbol_codes: 标的代码列表
+            symbol_type: 标的类型
+            timeframe: 时间周期
+
+        Returns:
+            {symbol_code: KlineLatest}，无数据的标的不在结果中
+        """
+        latest = {}
+        for i in range(0, len(symbol_codes), self.STREAM_SYMBOL_CHUNK):
+            chunk = symbol_codes[i : i + self.STREAM_SYMBOL_CHUNK]
+            stmt = (
+                select(KlineLatest)
+                .filter(
+                    KlineLatest.symbol_type == symbol_type,
+                    KlineLatest.timeframe == timeframe,
+                    KlineLatest.symbol_code.in_(chunk),
+                )
+                .execution_options(populate_existing=True)
+            )
+            for bar in self.session.scalars(stmt):
+                latest[bar.symbol_code] = bar
+        return latest
+
+    def find_latest_trade_time(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+    ) -> Optional[str]:
+        """
+        查询某类标的/周期中最新的K线时间
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+
+        Returns:
+            最新交易时间或None
+        """
+        stmt = select(func.max(KlineLatest.trade_time)).filter(
+            KlineLatest.symbol_type == symbol_type,
+            KlineLatest.timeframe == timeframe,
+        )
+        return self.session.execute(stmt).scalar()
+
+    def rebuild_latest(self) -> int:
+        """
+        从 klines 全量重建最新K线汇总（建表后首次回填，或绕过Repository改写数据后使用）
+
+        Returns:
+            汇总表行数
+        """
+        self.session.execute(delete(KlineLatest))
+        self.session.connection().execute(
+            _build_latest_rebuild_statement(), {"updated_at": datetime.now(timezone.utc)}
+        )
+        self.session.flush()
+        return self.session.execute(select(func.count()).select_from(KlineLatest)).scalar()
+
+    def _refresh_latest(self, keys, prune: bool = False) -> None:
+        """
+        按 klines 当前内容刷新指定标的的最新K线汇总
+
+        Args:
+            keys: (symbol_type, symbol_code, timeframe) 集合
+            prune: 是否删除已无K线的标的的汇总行（删除K线后使用）
+        """
+        if not keys:
+            return
+
+        now = datetime.now(timezone.utc)
+        params = [
+            {
+                "key_type": symbol_type,
+                "key_code": symbol_code,
+                "key_timeframe": timeframe,
+                "updated_at": now,
+            }
+            for symbol_type, symbol_code, timeframe in keys
+        ]
+        connection = self.session.connection()
+        connection.execute(_LATEST_REFRESH_STATEMENT, params)
+        if prune:
+            connection.execute(
+                _LATEST_PRUNE_STATEMENT,
+                [{k: p[k] for k in ("key_type", "key_code", "key_timeframe")} for p in params],
+            )
+
+    # ==================== 指标增量状态 ====================
+
+    def find_indicator_state(
+        self,
+        symbol_code: str,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+    ) -> Optional[KlineIndicatorState]:
+        """
+        查询标的的指标增量状态
+
+        Args:
+            symbol_code: 标的代码
+            symbol_type: 标的类型
+            timeframe: 时间周期
+
+        Returns:
+            指标状态或None
+        """
+        return self.session.get(
+            KlineIndicatorState, (symbol_type, symbol_code, timeframe)
+        )
+
+    def find_indicator_states(
+        self,
+        symbol_codes: List[str],
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+    ) -> dict[str, KlineIndicatorState]:
+        """
+        批量查询多个标的的指标增量状态
+
+        Args:
+            symbol_codes: 标的代码列表
+            symbol_type: 标的类型
+            timeframe: 时间周期
+
+        Returns:
+            {symbol_code: 指标状态}
+        """
+        states = {}
+        for i in range(0, len(symbol_codes), self.STREAM_SYMBOL_CHUNK):
+            chunk = symbol_codes[i : i + self.STREAM_SYMBOL_CHUNK]
+            stmt = select(KlineIndicatorState).filter(
+                KlineIndicatorState.symbol_code.in_(chunk),
+                KlineIndicatorState.symbol_type == symbol_type,
+                KlineIndicatorState.timeframe == timeframe,
+            )
+            for state in self.session.scalars(stmt):
+                states[state.symbol_code] = state
+        return states
+
+    def upsert_indicator_states(self, states: List[dict]) -> int:
+        """
+        批量插入或更新指标增量状态
+
+        Args:
+            states: 字典列表，键与 KlineIndicatorState 列名一致
+
+        Returns:
+            影响的行数
+        """
+        if not states:
+            return 0
+
+        total = 0
+        for i in range(0, len(states), self.UPSERT_CHUNK_SIZE):
+            chunk = states[i : i + self.UPSERT_CHUNK_SIZE]
+            result = self.session.connection().execute(_STATE_UPSERT_STATEMENT, chunk)
+            total += result.rowcount
+
+        self.session.flush()
+        return total
+
+    def delete_indicator_state(
+        self,
+        symbol_code: str,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+    ) -> None:
+        """
+        删除标的的指标增量状态（历史被改写后调用，下次保存时全量重算）
+
+        Args:
+            symbol_code: 标的代码
+            symbol_type: 标的类型
+            timeframe: 时间周期
+        """
+        stmt = delete(KlineIndicatorState).where(
+            KlineIndicatorState.symbol_code == symbol_code,
+            KlineIndicatorState.symbol_type == symbol_type,
+            KlineIndicatorState.timeframe == timeframe,
+        )
+        self.session.execute(stmt)
+        self.session.flush()
+
+
+def _split_by_symbol(rows: list) -> Iterator[KlineColumns]:
+    """
+    将 (symbol_code, trade_time, OHLCV...) 行按标的切分为 KlineColumns
+
+    Args:
+        rows: 已按 symbol_code 排序的查询结果
+
+    Yields:
+        每个标的一个 KlineColumns
+    """
+    if not rows:
+        return
+
+    symbol_col, trade_time, *columns = zip(*rows)
+    all_columns = KlineColumns.from_columns("", trade_time, columns)
+    symbols = np.asarray(symbol_col, dtype=object)
+
+    # 结果已按代码排序，相邻相同代码为一组
+    bounds = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+    starts = [0, *bounds.tolist()]
+    stops = [*bounds.tolist(), len(symbols)]
+    for start, stop in zip(starts, stops):
+        yield replace(all_columns.slice(start, stop), symbol_code=symbols[start])
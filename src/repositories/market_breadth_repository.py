@@ -0,0 +1,155 @@
+"""
+MarketBreadthRepository - 全市场涨跌统计数据访问层
+
+封装 MarketBreadthDaily / SectorTurnoverDaily 模型的数据库操作。
+"""
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy import desc, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models import MarketBreadthDaily, SectorTurnoverDaily
+from src.repositories.base_repository import BaseRepository
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 涨跌统计字段（主键以外的列）
+BREADTH_FIELDS = (
+    "stock_count",
+    "traded_count",
+    "up_count",
+    "down_count",
+    "flat_count",
+    "limit_up_count",
+    "limit_down_count",
+    "total_amount",
+    "total_volume",
+    "board_breadth",
+    "updated_at",
+)
+
+# 赛道成交额字段（主键以外的列）
+SECTOR_TURNOVER_FIELDS = ("traded_count", "sectors", "updated_at")
+
+
+class MarketBreadthRepository(BaseRepository[MarketBreadthDaily]):
+    """全市场涨跌统计Repository"""
+
+    def __init__(self, session: Session):
+        """初始化MarketBreadthRepository"""
+        super().__init__(session, MarketBreadthDaily)
+
+    def find_daily(self, trade_date: str) -> Optional[MarketBreadthDaily]:
+        """
+        查询某个交易日的涨跌统计
+
+        Args:
+            trade_date: 交易日期（YYYY-MM-DD）
+
+        Returns:
+            统计数据或None
+        """
+        stmt = (
+            select(MarketBreadthDaily)
+            .filter(MarketBreadthDaily.trade_date == trade_date)
+            .execution_options(populate_existing=True)
+        )
+        return self.session.scalars(stmt).one_or_none()
+
+    def find_daily_before(
+        self, trade_date: str, limit: int = 5, min_stock_count: int = 0
+    ) -> List[MarketBreadthDaily]:
+        """
+        查询某个交易日之前的涨跌统计
+
+        Args:
+            trade_date: 交易日期（YYYY-MM-DD，不包含）
+            limit: 返回数量
+            min_stock_count: 只返回覆盖股票数不少于该值的交易日
+
+        Returns:
+            统计数据列表（按日期倒序）
+        """
+        stmt = (
+            select(MarketBreadthDaily)
+            .filter(
+                MarketBreadthDaily.trade_date < trade_date,
+                MarketBreadthDaily.stock_count >= min_stock_count,
+            )
+            .order_by(desc(MarketBreadthDaily.trade_date))
+            .limit(limit)
+        )
+        return list(self.session.scalars(stmt).all())
+
+    def find_recent_sector_turnover(
+        self, limit: int = 2, min_traded: int = 0
+    ) -> List[SectorTurnoverDaily]:
+        """
+        查询最近的交易日赛道成交额
+
+        Args:
+            limit: 返回数量
+            min_traded: 只返回全市场有成交股票数超过该值的交易日
+
+        Returns:
+            统计数据列表（按日期倒序）
+        """
+        stmt = (
+            select(SectorTurnoverDaily)
+            .filter(SectorTurnoverDaily.traded_count > min_traded)
+            .order_by(desc(SectorTurnoverDaily.trade_date))
+            .limit(limit)
+        )
+        return list(self.session.scalars(stmt).all())
+
+    def upsert_daily(self, records: List[dict]) -> int:
+        """
+        批量插入或更新日线涨跌统计
+
+        Args:
+            records: 字典列表，键与 MarketBreadthDaily 列名一致
+
+        Returns:
+            影响的行数
+        """
+        return self._upsert(MarketBreadthDaily, BREADTH_FIELDS, records)
+
+    def upsert_sector_turnover(self, records: List[dict]) -> int:
+        """
+        批量插入或更新赛道成交额
+
+        Args:
+            records: 字典列表，键与 SectorTurnoverDaily 列名一致
+
+        Returns:
+            影响的行数
+        """
+        return self._upsert(SectorTurnoverDaily, SECTOR_TURNOVER_FIELDS, records)
+
+    def delete_daily(self, trade_date: str) -> None:
+        """删除某个交易日的统计（该日已无个股K线时）"""
+        self.session.query(MarketBreadthDaily).filter(
+            MarketBreadthDaily.trade_date == trade_date
+        ).delete()
+
+    def delete_sector_turnover(self, trade_date: str) -> None:
+        """删除某个交易日的赛道成交额（该日已无个股K线时）"""
+        self.session.query(SectorTurnoverDaily).filter(
+            SectorTurnoverDaily.trade_date == trade_date
+        ).delete()
+
+    def _upsert(self, model, fields: Tuple[str, ...], records: List[dict]) -> int:
+        if not records:
+            return 0
+
+        stmt = sqlite_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["trade_date"],
+            set_={field: stmt.excluded[field] for field in fields},
+        )
+        result = self.session.connection().execute(stmt, records)
+        self.session.flush()
+        return result.rowcount
@@ -186,8 +186,10 @@ class TradingStatusResponse(BaseModel):
     """交易状态响应"""
     is_trading_day: bool = Field(..., description="是否交易日")
     is_trading_time: bool = Field(..., description="是否交易时间")
+    session_phase: Optional[str] = Field(None, description="交易时段 (pre_open/call_auction/morning/lunch_break/afternoon/after_close/closed)")
     current_time: str = Field(..., description="当前时间")
     latest_trade_date: Optional[str] = Field(None, description="最近交易日")
+    next_trade_date: Optional[str] = Field(None, description="下一交易日")
 
     model_config = {"from_attributes": True}
 
@@ -7,17 +7,20 @@ Orchestrates data collection from multiple sources and applies labeling algorith
 
 import asyncio
 from typing import List, Dict, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from src.models.kline import Kline
 from src.models.board import IndustryDaily, ConceptDaily, BoardMapping
 from src.models.symbol import SymbolMetadata
+from src.models.enums import KlineTimeframe, SymbolType
+from src.repositories.kline_columns import KlineColumns
 from src.repositories.kline_repository import KlineRepository
 from src.repositories.industry_daily_repository import IndustryDailyRepository
 from src.repositories.concept_daily_repository import ConceptDailyRepository
 from src.repositories.symbol_repository import SymbolRepository
+from src.services.market_breadth_service import MarketBreadthService
+from src.services.trading_calendar import get_trading_calendar
 from src.utils.kline_analyzer import KlinePatternAnalyzer
 from src.utils.market_sentiment_analyzer import MarketSentimentAnalyzer
 from src.utils.fundamental_analyzer import FundamentalAnalyzer
@@ -49,6 +52,10 @@ class DailyReviewDataService:
         "000852.SH",  # 中证1000
     ]
 
+    # History windows in trading days (index MA20 needs 20+ bars)
+    INDEX_HISTORY_DAYS = 25
+    STOCK_HISTORY_DAYS = 15
+
     def __init__(self, session: Session):
         """
         Initialize service with database session.
@@ -64,6 +71,7 @@ class DailyReviewDataService:
         self.pattern_analyzer = KlinePatternAnalyzer()
         self.sentiment_analyzer = MarketSentimentAnalyzer()
         self.fundamental_analyzer = FundamentalAnalyzer(session)
+        self.calendar = get_trading_calendar(session)
 
     async def collect_review_data(self, trade_date: str) -> DailyReviewSnapshot:
         """
@@ -131,28 +139,29 @@ class DailyReviewDataService:
 
         for symbol in self.TRACKED_INDICES:
             # Get historical data for MA calculation (need 20+ days)
-            end_date = datetime.strptime(trade_date, "%Y%m%d")
-            start_date = (end_date - timedelta(days=35)).strftime("%Y-%m-%d")
-
-            history = self.session.query(Kline).filter(
-                Kline.symbol_code == symbol,
-                Kline.symbol_type == 'index',
-                Kline.timeframe == 'DAY',
-                Kline.trade_time >= start_date,
-                Kline.trade_time <= formatted_date
-            ).order_by(Kline.trade_time).all()
+            start_date = self.calendar.n_days_back(
+                formatted_date, self.INDEX_HISTORY_DAYS - 1
+            ) or formatted_date
+
+            history = self.kline_repo.find_columns_by_symbol(
+                symbol_code=symbol,
+                symbol_type=SymbolType.INDEX,
+                timeframe=KlineTimeframe.DAY,
+                start_time=start_date,
+                end_time=formatted_date,
+            )
 
             if len(history) < 2:
                 continue
 
-            kline = history[-1]  # Current day
-            prev_close = history[-2].close if len(history) >= 2 else kline.open
+            kline = history.bar(-1)  # Current day
+            prev_close = float(history.close[-2])
 
             if len(history) < 5:
                 continue
 
             # Calculate MAs
-            closes = [k.close for k in history]
+            closes = history.close
             ma5 = calculate_ma(closes, 5)[-1] if len(closes) >= 5 else None
             ma10 = calculate_ma(closes, 10)[-1] if len(closes) >= 10 else None
             ma20 = calculate_ma(closes, 20)[-1] if len(closes) >= 20 else None
@@ -161,9 +170,9 @@ class DailyReviewDataService:
             pattern, pattern_details = self.pattern_analyzer.analyze_pattern(kline)
 
             # Calculate volume averages
-            volumes = [k.volume for k in history[-10:]]
-            avg_5d = sum(volumes[-5:]) / 5 if len(volumes) >= 5 else kline.volume
-            avg_10d = sum(volumes) / len(volumes) if volumes else kline.volume
+            volumes = history.volume[-10:]
+            avg_5d = float(volumes[-5:].mean()) if len(volumes) >= 5 else kline.volume
+            avg_10d = float(volumes.mean()) if len(volumes) else kline.volume
 
             # Get volume trend
             volume_trend, volume_ratios = self.pattern_analyzer.get_volume_trend_label(
@@ -331,78 +340,32 @@ class DailyReviewDataService:
         # Convert YYYYMMDD to YYYY-MM-DD format
         formatted_date = f"{trade_date[:4]}-{trade_date[4:6]}-{trade_date[6:8]}"
 
-        # Query all stock K-lines for the date
-        all_stocks = self.session.query(Kline).filter(
-            Kline.trade_time == formatted_date,
-            Kline.symbol_type == 'stock',
-            Kline.timeframe == 'DAY'
-        ).all()
-
-        if not all_stocks:
+        # Breadth is materialized at ingest (market_breadth_daily)
+        breadth_service = MarketBreadthService(self.session)
+        breadth = breadth_service.get_daily(formatted_date)
+        if breadth is None:
             raise ValueError(f"No stock data found for {trade_date}")
 
-        # Get previous day for comparison
-        prev_date = (datetime.strptime(trade_date, "%Y%m%d") - timedelta(days=1)).strftime("%Y-%m-%d")
-        prev_stocks = {k.symbol_code: k.close for k in self.session.query(Kline).filter(
-            Kline.trade_time == prev_date,
-            Kline.symbol_type == 'stock',
-            Kline.timeframe == 'DAY'
-        ).all()}
-
-        # Count advance/decline
-        up_count = 0
-        down_count = 0
-        flat_count = 0
-        limit_up_count = 0
-        limit_down_count = 0
-        total_amount = 0
-
-        for stock in all_stocks:
-            prev_close = prev_stocks.get(stock.symbol_code, stock.open)
-            change_pct = ((stock.close - prev_close) / prev_close * 100
-                         if prev_close > 0 else 0)
-
-            if change_pct > 0.01:
-                up_count += 1
-            elif change_pct < -0.01:
-                down_count += 1
-            else:
-                flat_count += 1
-
-            # Check for limit boards (approximately ±10% for A-shares, ±20% for ST)
-            if change_pct >= 9.9:
-                limit_up_count += 1
-            elif change_pct <= -9.9:
-                limit_down_count += 1
-
-            total_amount += stock.amount
+        up_count = breadth.up_count
+        down_count = breadth.down_count
+        flat_count = breadth.flat_count
+        limit_up_count = breadth.limit_up_count
+        limit_down_count = breadth.limit_down_count
+        total_amount = breadth.total_amount
 
         # Calculate ratios
         up_down_ratio = up_count / down_count if down_count > 0 else 5.0
 
-        # Get yesterday's total amount for comparison
-        yesterday = (datetime.strptime(trade_date, "%Y%m%d") - timedelta(days=1)).strftime("%Y-%m-%d")
-        yesterday_stocks = self.session.query(func.sum(Kline.amount)).filter(
-            Kline.trade_time == yesterday,
-            Kline.symbol_type == 'stock',
-            Kline.timeframe == 'DAY'
-        ).scalar() or total_amount
-
-        vs_yesterday = total_amount / yesterday_stocks if yesterday_stocks > 0 else 1.0
-
-        # Get 5-day average
-        recent_amounts = []
-        for i in range(1, 8):  # Last 7 days
-            check_date = (datetime.strptime(trade_date, "%Y%m%d") - timedelta(days=i)).strftime("%Y-%m-%d")
-            day_amount = self.session.query(func.sum(Kline.amount)).filter(
-                Kline.trade_time == check_date,
-                Kline.symbol_type == 'stock',
-                Kline.timeframe == 'DAY'
-            ).scalar()
-            if day_amount:
-                recent_amounts.append(day_amount)
-
-        avg_5d = sum(recent_amounts[:5]) / len(recent_amounts[:5]) if recent_amounts else total_amount
+        # Compare with the previous trading day and the 5-day average
+        recent_amounts = [
+            b.total_amount
+            for b in breadth_service.get_previous_daily(formatted_date, limit=5)
+            if b.total_amount
+        ]
+        yesterday_amount = recent_amounts[0] if recent_amounts else total_amount
+        vs_yesterday = total_amount / yesterday_amount if yesterday_amount > 0 else 1.0
+
+        avg_5d = sum(recent_amounts) / len(recent_amounts) if recent_amounts else total_amount
         vs_5d_avg = total_amount / avg_5d if avg_5d > 0 else 1.0
 
         # Calculate overall sentiment
@@ -506,10 +469,17 @@ class DailyReviewDataService:
         if not constituents:
             return []
 
-        # Get detailed stock data
+        # Get detailed stock data (one streaming scan for all constituents)
+        formatted_date, start_date = self._stock_history_window(trade_date)
         stocks_data = []
-        for ticker in constituents[:50]:  # Limit to avoid too many queries
-            stock_data = await self._get_stock_detailed_data(ticker, trade_date)
+        for history in self.kline_repo.iter_columns_by_symbols(
+            constituents[:50],  # Limit to keep the sample scan small
+            SymbolType.STOCK,
+            KlineTimeframe.DAY,
+            start_time=start_date,
+            end_time=formatted_date,
+        ):
+            stock_data = self._stock_detail_from_history(history)
             if stock_data:
                 stocks_data.append(stock_data)
 
@@ -588,7 +558,7 @@ class DailyReviewDataService:
 
         # Convert dates
         formatted_date = f"{trade_date[:4]}-{trade_date[4:6]}-{trade_date[6:8]}"
-        prev_date = (datetime.strptime(trade_date, "%Y%m%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+        prev_date = self.calendar.prev(formatted_date)
 
         up_count = 0
         down_count = 0
@@ -637,27 +607,54 @@ class DailyReviewDataService:
         Returns:
             Dict with stock details or None if not available
         """
-        # Convert dates
-        formatted_date = f"{trade_date[:4]}-{trade_date[4:6]}-{trade_date[6:8]}"
-        start_date = (datetime.strptime(trade_date, "%Y%m%d") - timedelta(days=20)).strftime("%Y-%m-%d")
+        formatted_date, start_date = self._stock_history_window(trade_date)
 
         # Get historical data for recent performance
-        history = self.session.query(Kline).filter(
-            Kline.symbol_code == ticker,
-            Kline.symbol_type == 'stock',
-            Kline.timeframe == 'DAY',
-            Kline.trade_time >= start_date,
-            Kline.trade_time <= formatted_date
-        ).order_by(Kline.trade_time).all()
+        history = self.kline_repo.find_columns_by_symbol(
+            symbol_code=ticker,
+            symbol_type=SymbolType.STOCK,
+            timeframe=KlineTimeframe.DAY,
+            start_time=start_date,
+            end_time=formatted_date,
+        )
+        return self._stock_detail_from_history(history)
+
+    def _stock_history_window(self, trade_date: str) -> Tuple[str, str]:
+        """
+        History window used for stock details.
+
+        Args:
+            trade_date: Date in YYYYMMDD format
+
+        Returns:
+            Tuple of (end_date, start_date) in YYYY-MM-DD format
+        """
+        formatted_date = f"{trade_date[:4]}-{trade_date[4:6]}-{trade_date[6:8]}"
+        start_date = self.calendar.n_days_back(
+            formatted_date, self.STOCK_HISTORY_DAYS - 1
+        ) or formatted_date
+        return formatted_date, start_date
+
+    def _stock_detail_from_history(self, history: KlineColumns) -> Optional[Dict]:
+        """
+        Build stock details from columnar daily history.
+
+        Args:
+            history: Daily K-line columns ending at the review date
+
+        Returns:
+            Dict with stock details or None if not enough data
+        """
+        ticker = history.symbol_code
 
         if len(history) < 2:
             return None
 
-        kline = history[-1]  # Current day
-        prev_close = history[-2].close if len(history) >= 2 else kline.open
+        kline = history.bar(-1)  # Current day
+        prev_close = float(history.close[-2])
 
         # Calculate recent changes
-        closes = [k.close for k in history]
+        closes = history.close.tolist()
         days_5_change = ((closes[-1] - closes[-6]) / closes[-6] * 100
                         if len(closes) >= 6 else 0)
         days_10_change = ((closes[-1] - closes[-11]) / closes[-11] * 100
@@ -671,8 +668,8 @@ class DailyReviewDataService:
         pattern, _ = self.pattern_analyzer.analyze_pattern(kline)
 
         # Volume ratio
-        volumes = [k.volume for k in history[-6:]]
-        avg_5d = sum(volumes[-5:]) / 5 if len(volumes) >= 5 else kline.volume
+        volumes = history.volume[-6:]
+        avg_5d = float(volumes[-5:].mean()) if len(volumes) >= 5 else kline.volume
         volume_ratio = kline.volume / avg_5d if avg_5d > 0 else 1.0
 
         # MA analysis
@@ -308,38 +308,54 @@ class DataConsistencyValidator:
 
         注意：收盘后可能无法获取，这是正常的
         """
-        import httpx
         import re
         import json
 
+        from src.services.http_client import get_http_manager
+        from src.services.sina_quote_service import get_quote_service
+
         if symbol_type == SymbolType.CONCEPT:
             # 概念板块
             url = f"http://d.10jqka.com.cn/v4/time/bk_{symbol_code}/last.js"
             try:
-                async with httpx.AsyncClient(timeout=5.0) as client:
-                    resp = await client.get(url, headers={
-                        "User-Agent": "Mozilla/5.0",
-                        "Referer": "http://q.10jqka.com.cn/"
-                    })
-                    text = resp.text
-                    match = re.search(r'\((\{.*\})\)', text, re.DOTALL)
-                    if match:
-                        data = json.loads(match.group(1))
-                        inner_key = f"bk_{symbol_code}"
-                        if inner_key in data:
-                            time_data = data[inner_key].get('data', '')
-                            if time_data:
-                                items = [item for item in time_data.split(';') if item.strip()]
-                                if items:
-                                    last_item = items[-1].split(',')
-                                    if len(last_item) >= 2 and last_item[1]:
-                                        return float(last_item[1])
+                resp = await get_http_manager().get(url, headers={
+                    "User-Agent": "Mozilla/5.0",
+                    "Referer": "http://q.10jqka.com.cn/"
+                }, timeout=5.0)
+                text = resp.text
+                match = re.search(r'\((\{.*\})\)', text, re.DOTALL)
+                if match:
+                    data = json.loads(match.group(1))
+                    inner_key = f"bk_{symbol_code}"
+                    if inner_key in data:
+                        time_data = data[inner_key].get('data', '')
+                        if time_data:
+                            items = [item for item in time_data.split(';') if item.strip()]
+                            if items:
+                                last_item = items[-1].split(',')
+                                if len(last_item) >= 2 and last_item[1]:
+                                    return float(last_item[1])
             except Exception:
                 pass
 
         elif symbol_type == SymbolType.INDEX:
-            # 指数（这里可以添加指数实时API，暂时跳过）
-            pass
+            # 指数代码为 Tushare 格式（000001.SH）
+            code, _, market = symbol_code.partition(".")
+            sina_code = f"{market.lower()}{code}" if market else symbol_code
+            try:
+                snapshot = await get_quote_service().fetch_index_quotes([sina_code])
+                if len(snapshot) and snapshot.price[0] > 0:
+                    return float(snapshot.price[0])
+            except Exception:
+                pass
+
+        elif symbol_type == SymbolType.STOCK:
+            try:
+                quote = (await get_quote_service().fetch_quotes([symbol_code])).quote(symbol_code)
+                if quote is not None and quote.price > 0:
+                    return quote.price
+            except Exception:
+                pass
 
         return None
 
@@ -0,0 +1,143 @@
+"""
+增量K线获取计划
+
+按新鲜度登记中每个 (标的, 周期) 已保存的最新K线，结合交易日历计算到“应有的最新K线”
+为止缺失的K线数：已是最新的标的直接跳过，其余只请求覆盖缺失区间的最小窗口；
+没有登记的标的使用更新器原有的固定窗口。
+
+已保存的最后一根K线可能是盘中未走完的K线，窗口包含它（以及正在形成的一根），
+入库前裁掉更早的K线，只重写变化的部分：
+- 新浪：datalen = 缺失K线数 + OVERLAP_BARS
+- Tushare：start_date = 已保存的最新交易日
+- 同花顺：last.js 没有区间参数，只在入库前裁剪
+"""
+
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from src.models import KlineTimeframe, SymbolType
+from src.services.freshness_registry import (
+    INTRADAY_SLOTS,
+    FreshnessRegistry,
+    get_freshness_registry,
+)
+from src.services.trading_calendar import TradingCalendar, get_trading_calendar
+
+# 重新获取已保存的最后一根K线 + 正在形成的一根
+OVERLAP_BARS = 2
+
+_SLOT_TIMES = tuple(slot.strftime("%H:%M:%S") for slot in INTRADAY_SLOTS)
+
+
+class FetchPlan(NamedTuple):
+    """单个标的的获取计划"""
+
+    code: str
+    # 已保存的最新K线时间（入库时保留不早于它的K线）；None 表示没有记录，全量获取
+    since: Optional[str]
+    # 请求的K线数量；None 表示使用数据源的固定窗口
+    window: Optional[int]
+
+    def __str__(self) -> str:
+        return self.code
+
+    @property
+    def start_date(self) -> Optional[str]:
+        """Tushare 的 start_date (YYYYMMDD)"""
+        return self.since[:10].replace("-", "") if self.since else None
+
+    def keep(self, bar_time: str) -> bool:
+        """K线（ISO 格式时间）是否需要入库"""
+        return self.since is None or bar_time >= self.since
+
+
+def count_missing_bars(
+    timeframe: KlineTimeframe,
+    last_bar: str,
+    expected: str,
+    calendar: TradingCalendar,
+    limit: int = 1000,
+) -> int:
+    """
+    last_bar 之后到 expected（含）为止应有的K线数
+
+    Args:
+        timeframe: 周期
+        last_bar: 已保存的最新K线时间
+        expected: 应有的最新K线时间
+        calendar: 交易日历
+        limit: 计数上限（超过窗口上限后不必再数）
+    """
+    if last_bar >= expected:
+        return 0
+
+    if timeframe == KlineTimeframe.DAY:
+        count, day = 0, last_bar[:10]
+        while count < limit:
+            day = calendar.next(day)
+            if day > expected[:10]:
+                break
+            count += 1
+        return count
+
+    last_day, last_time = last_bar[:10], last_bar[11:]
+    expected_day, expected_time = expected[:10], expected[11:]
+    if last_day == expected_day:
+        return sum(last_time < slot <= expected_time for slot in _SLOT_TIMES)
+
+    count = sum(slot > last_time for slot in _SLOT_TIMES)
+    day = last_day
+    while count < limit:
+        day = calendar.next(day)
+        if day >= expected_day:
+            break
+        count += len(_SLOT_TIMES)
+    return count + sum(slot <= expected_time for slot in _SLOT_TIMES)
+
+
+def plan_fetches(
+    symbol_type: SymbolType,
+    timeframe: KlineTimeframe,
+    codes: Iterable[str],
+    default_window: Optional[int] = None,
+    now: Optional[datetime] = None,
+    registry: Optional[FreshnessRegistry] = None,
+) -> List[FetchPlan]:
+    """
+    计算需要获取的标的及各自的请求窗口（已是最新的标的不在结果中）
+
+    缺失区间超过 default_window 时仍按 default_window 获取（与原有行为一致）。
+
+    Args:
+        symbol_type: 标的类型
+        timeframe: 周期
+        codes: 候选标的代码（与入库时的 symbol_code 一致）
+        default_window: 没有记录时的请求数量（数据源窗口固定时为 None）
+        now: 当前本地时间
+        registry: 新鲜度登记（默认进程级共享实例）
+
+    Returns:
+        获取计划列表，顺序与 codes 一致
+    """
+    registry = registry or get_freshness_registry()
+    now = now or datetime.now()
+    expected, _ = registry.expected_latest_bar(timeframe, now)
+    calendar = get_trading_calendar()
+
+    plans = []
+    for code in dict.fromkeys(codes):
+        if not registry.is_stale(symbol_type, code, timeframe, now):
+            continue
+        entry = registry.get(symbol_type, code, timeframe)
+        if entry is None or not entry.last_bar_time or expected is None:
+            plans.append(FetchPlan(code, None, default_window))
+            continue
+
+        window = None
+        if default_window is not None:
+            missing = count_missing_bars(
+                timeframe, entry.last_bar_time, expected, calendar, limit=default_window
+            )
+            window = min(missing + OVERLAP_BARS, default_window)
+        plans.append(FetchPlan(code, entry.last_bar_time, window))
+    return plans
@@ -0,0 +1,379 @@
+"""
+数据新鲜度登记
+
+每个 (标的类型, 代码, 周期) 记录最新K线时间、最近一次从上游获取的时间和来源
+（data_freshness 表 + 进程内映射）。所有入库路径在同一事务内登记；
+“应有的最新K线” 按周期预先计算（同一分钟内复用），判断是否过期只需一次字典查找，
+不再每个请求查询交易日历。
+
+- 日线：交易日 15:30 后应有当天K线，否则应有上一交易日K线
+- 30分钟线：每根K线结束 5 分钟后应可获取；非交易时段应有最近交易日 15:00 的K线
+- 上游已在“应有K线”可获取之后获取过但仍没有数据（如停牌），RETRY_AFTER 内不再重复获取
+"""
+
+from datetime import datetime, time, timedelta, timezone
+from threading import Lock
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import case, event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models import DataFreshness, KlineLatest, KlineTimeframe, SymbolType
+from src.services.trading_calendar import get_trading_calendar
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 日线在收盘后多久可以获取
+DAILY_AVAILABLE_AT = time(15, 30)
+# 30分钟K线结束时间
+INTRADAY_SLOTS = (
+    time(10, 0), time(10, 30), time(11, 0), time(11, 30),
+    time(13, 30), time(14, 0), time(14, 30), time(15, 0),
+)
+# 30分钟K线结束后多久可以获取
+INTRADAY_LAG = timedelta(minutes=5)
+# 上游没有新数据时的重试间隔
+RETRY_AFTER = timedelta(minutes=10)
+
+_PENDING_KEY = "freshness_pending"
+
+Key = Tuple[SymbolType, str, KlineTimeframe]
+
+
+class FreshnessEntry(NamedTuple):
+    """单个标的/周期的新鲜度"""
+
+    last_bar_time: Optional[str]
+    last_fetched_at: datetime
+    source: Optional[str]
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class FreshnessRegistry:
+    """进程内新鲜度映射（首次使用时从 data_freshness 表加载）"""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        """
+        Args:
+            session_factory: 加载 data_freshness 时创建会话（默认 SessionLocal）
+        """
+        self._session_factory = session_factory
+        self._entries: Dict[Key, FreshnessEntry] = {}
+        self._loaded = False
+        self._lock = Lock()
+        self._expected: Dict[KlineTimeframe, Tuple[datetime, Optional[str], Optional[datetime]]] = {}
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        if self._session_factory is None:
+            from src.database import SessionLocal
+
+            self._session_factory = SessionLocal
+
+        with self._lock:
+            if self._loaded:
+                return
+            session = self._session_factory()
+            try:
+                rows = session.execute(select(DataFreshness)).scalars().all()
+            finally:
+                session.close()
+            for row in rows:
+                key = (row.symbol_type, row.symbol_code, row.timeframe)
+                # 加载前已提交的登记（apply）更新，保留内存中的值
+                self._entries.setdefault(
+                    key, FreshnessEntry(row.last_bar_time, _utc(row.last_fetched_at), row.source)
+                )
+            self._loaded = True
+            logger.debug(f"新鲜度登记已加载: {len(self._entries)} 条")
+
+    def get(
+        self, symbol_type: SymbolType, symbol_code: str, timeframe: KlineTimeframe
+    ) -> Optional[FreshnessEntry]:
+        """查询登记（未登记返回 None）"""
+        self._ensure_loaded()
+        return self._entries.get((symbol_type, symbol_code, timeframe))
+
+    def apply(self, updates: Dict[Key, FreshnessEntry]) -> None:
+        """合并登记到内存映射（最新K线时间取较大者）"""
+        with self._lock:
+            for key, entry in updates.items():
+                current = self._entries.get(key)
+                if current is not None and current.last_bar_time and (
+                    entry.last_bar_time is None or entry.last_bar_time < current.last_bar_time
+                ):
+                    entry = entry._replace(last_bar_time=current.last_bar_time)
+                self._entries[key] = entry
+
+    def reset(self) -> None:
+        """清空内存映射，下次使用时从表重新加载"""
+        with self._lock:
+            self._entries.clear()
+            self._expected.clear()
+            self._loaded = False
+
+    # ==================== 应有的最新K线 ====================
+
+    def expected_latest_bar(
+        self, timeframe: KlineTimeframe, now: Optional[datetime] = None
+    ) -> Tuple[Optional[str], Optional[datetime]]:
+        """
+        当前时刻应有的最新K线时间及其可获取时间
+
+        Args:
+            timeframe: 周期
+            now: 当前本地时间（默认 datetime.now()）
+
+        Returns:
+            (K线时间字符串, 可获取时间)；无法判断时为 (None, None)
+        """
+        now = now or datetime.now()
+        minute = now.replace(second=0, microsecond=0)
+        cached = self._expected.get(timeframe)
+        if cached is not None and cached[0] == minute:
+            return cached[1], cached[2]
+
+        if timeframe == KlineTimeframe.DAY:
+            result = self._expected_daily(now)
+        else:
+            result = self._expected_intraday(now)
+        self._expected[timeframe] = (minute, *result)
+        return result
+
+    @staticmethod
+    def _expected_daily(now: datetime) -> Tuple[Optional[str], Optional[datetime]]:
+        calendar = get_trading_calendar()
+        today = now.strftime("%Y-%m-%d")
+        if calendar.is_trading_day(today) and now.time() >= DAILY_AVAILABLE_AT:
+            day = today
+        else:
+            day = calendar.latest_on_or_before(now.date() - timedelta(days=1))
+        if day is None:
+            return None, None
+        return day, datetime.strptime(day, "%Y-%m-%d").replace(
+            hour=DAILY_AVAILABLE_AT.hour, minute=DAILY_AVAILABLE_AT.minute
+        )
+
+    @staticmethod
+    def _expected_intraday(now: datetime) -> Tuple[Optional[str], Optional[datetime]]:
+        calendar = get_trading_calendar()
+        today = now.strftime("%Y-%m-%d")
+        if calendar.is_trading_day(today):
+            for slot in reversed(INTRADAY_SLOTS):
+                bar_end = datetime.combine(now.date(), slot)
+                if bar_end + INTRADAY_LAG <= now:
+                    return f"{today} {slot.strftime('%H:%M:%S')}", bar_end + INTRADAY_LAG
+        day = calendar.latest_on_or_before(now.date() - timedelta(days=1))
+        if day is None:
+            return None, None
+        last_slot = INTRADAY_SLOTS[-1]
+        bar_end = datetime.combine(datetime.strptime(day, "%Y-%m-%d").date(), last_slot)
+        return f"{day} {last_slot.strftime('%H:%M:%S')}", bar_end + INTRADAY_LAG
+
+    # ==================== 过期判断 ====================
+
+    def is_stale(
+        self,
+        symbol_type: SymbolType,
+        symbol_code: str,
+        timeframe: KlineTimeframe,
+        now: Optional[datetime] = None,
+    ) -> bool:
+        """
+        是否需要从上游刷新
+
+        未登记的标的视为过期；在应有K线可获取之后获取过、且最新K线不早于应有K线时为新鲜
+        （可获取之前保存的同一根K线可能尚未走完）；上游在应有K线可获取之后已经获取过
+        （仍无数据）时，RETRY_AFTER 内视为新鲜。
+        """
+        now = now or datetime.now()
+        entry = self.get(symbol_type, symbol_code, timeframe)
+        if entry is None:
+            return True
+        expected, available_at = self.expected_latest_bar(timeframe, now)
+        if expected is None:
+            return False
+
+        fetched_local = entry.last_fetched_at.astimezone().replace(tzinfo=None)
+        if fetched_local < available_at:
+            return True
+        if entry.last_bar_time and entry.last_bar_time >= expected:
+            return False
+        return now - fetched_local >= RETRY_AFTER
+
+    def stale_symbols(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        now: Optional[datetime] = None,
+    ) -> List[str]:
+        """已登记标的中需要刷新的代码（用于定向刷新任务）"""
+        self._ensure_loaded()
+        return sorted(
+            code
+            for (stype, code, tf) in list(self._entries)
+            if stype == symbol_type and tf == timeframe
+            and self.is_stale(stype, code, tf, now)
+        )
+
+    def stats(self, now: Optional[datetime] = None) -> dict:
+        """按标的类型/周期统计登记数和过期数"""
+        self._ensure_loaded()
+        summary: Dict[str, dict] = {}
+        for stype, code, tf in list(self._entries):
+            item = summary.setdefault(f"{stype.value}:{tf.value}", {"tracked": 0, "stale": 0})
+            item["tracked"] += 1
+            if self.is_stale(stype, code, tf, now):
+                item["stale"] += 1
+        expected = {
+            tf.value: self.expected_latest_bar(tf, now)[0]
+            for tf in (KlineTimeframe.DAY, KlineTimeframe.MINS_30)
+        }
+        return {"expected_latest_bar": expected, "groups": summary}
+
+
+_registry: Optional[FreshnessRegistry] = None
+
+
+def get_freshness_registry() -> FreshnessRegistry:
+    """获取进程级共享的新鲜度登记"""
+    global _registry
+    if _registry is None:
+        _registry = FreshnessRegistry()
+    return _registry
+
+
+# ==================== 入库登记 ====================
+
+
+def record_freshness(
+    session: Optional[Session],
+    symbol_type: SymbolType,
+    timeframe: KlineTimeframe,
+    last_bars: Dict[str, Optional[str]],
+    source: Optional[str] = None,
+) -> None:
+    """
+    登记一次上游获取，随会话事务写入 data_freshness，提交后更新内存映射
+
+    Args:
+        session: 写入K线的会话
+        symbol_type: 标的类型
+        timeframe: 周期
+        last_bars: {symbol_code: 本次获取到的最新K线时间（无数据为 None）}
+        source: 数据来源（tushare / sina / ths ...）
+    """
+    if not isinstance(session, Session) or not last_bars:
+        return
+
+    pending = session.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = session.info[_PENDING_KEY] = {}
+        if not event.contains(session, "before_commit", _write_before_commit):
+            event.listen(session, "before_commit", _write_before_commit)
+            event.listen(session, "after_commit", _apply_after_commit)
+            event.listen(session, "after_rollback", _discard_after_rollback)
+
+    now = datetime.now(timezone.utc)
+    for code, last_bar in last_bars.items():
+        key = (symbol_type, code, timeframe)
+        current = pending.get(key)
+        if current is not None and current.last_bar_time and (
+            last_bar is None or last_bar < current.last_bar_time
+        ):
+            last_bar = current.last_bar_time
+        pending[key] = FreshnessEntry(last_bar, now, source)
+
+
+def _build_upsert_statement():
+    stmt = sqlite_insert(DataFreshness)
+    table = DataFreshness.__table__.c
+    newer = case(
+        (table.last_bar_time.is_(None), stmt.excluded.last_bar_time),
+        (stmt.excluded.last_bar_time > table.last_bar_time, stmt.excluded.last_bar_time),
+        else_=table.last_bar_time,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["symbol_type", "symbol_code", "timeframe"],
+        set_={
+            "last_bar_time": newer,
+            "last_fetched_at": stmt.excluded.last_fetched_at,
+            "source": stmt.excluded.source,
+        },
+    )
+
+
+_UPSERT_STATEMENT = _build_upsert_statement()
+
+
+def _write_before_commit(session: Session) -> None:
+    pending: Dict[Key, FreshnessEntry] = session.info.get(_PENDING_KEY)
+    if not pending:
+        return
+    try:
+        session.execute(
+            _UPSERT_STATEMENT,
+            [
+                {
+                    "symbol_type": stype,
+                    "symbol_code": code,
+                    "timeframe": tf,
+                    "last_bar_time": entry.last_bar_time,
+                    "last_fetched_at": entry.last_fetched_at,
+                    "source": entry.source,
+                }
+                for (stype, code, tf), entry in pending.items()
+            ],
+        )
+    except Exception as e:
+        # 登记失败不影响K线提交；下次请求会按过期处理
+        session.info.pop(_PENDING_KEY, None)
+        logger.error(f"新鲜度登记写入失败: {e}")
+
+
+def _apply_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        get_freshness_registry().apply(pending)
+
+
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def backfill_from_latest(session: Session) -> int:
+    """
+    从 kline_latest 回填 data_freshness（表为空时使用）
+
+    Returns:
+        回填的行数
+    """
+    rows = session.execute(
+        select(
+            KlineLatest.symbol_type, KlineLatest.symbol_code, KlineLatest.timeframe,
+            KlineLatest.trade_time, KlineLatest.updated_at,
+        )
+    ).all()
+    if not rows:
+        return 0
+    session.execute(
+        _UPSERT_STATEMENT,
+        [
+            {
+                "symbol_type": stype,
+                "symbol_code": code,
+                "timeframe": tf,
+                "last_bar_time": trade_time,
+                "last_fetched_at": updated_at or datetime.now(timezone.utc),
+                "source": None,
+            }
+            for stype, code, tf, trade_time, updated_at in rows
+        ],
+    )
+    return len(rows)
@@ -0,0 +1,223 @@
+"""
+应用级共享 HTTP 客户端
+
+新浪、同花顺等行情接口统一通过 HttpClientManager 发起请求，替代每次请求
+新建 httpx.AsyncClient（每次都要重新握手）：
+- 每个事件循环一个长连接（keep-alive）客户端，连接在请求之间复用
+- 按主机限制同时进行中的请求数
+- 可选 HTTP/2（需要安装 h2）
+- 按主机统计请求数、失败数、延迟和新建连接数（其余即复用的连接）
+
+生命周期：FastAPI 启动时 start()、关闭时 close()（见 src/lifecycle.py）；
+独立运行的更新任务使用 `async with http_session():`。
+"""
+
+import asyncio
+import importlib.util
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class HostStats:
+    """单个主机的请求统计"""
+
+    requests: int = 0
+    errors: int = 0
+    new_connections: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    def to_dict(self) -> dict:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+            "avg_latency_ms": (
+                round(self.total_latency / self.requests * 1000, 1) if self.requests else None
+            ),
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+        }
+
+
+class _LoopState:
+    """某个事件循环上的客户端和主机并发信号量"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+class HttpClientManager:
+    """共享 HTTP 客户端管理器"""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        per_host_limit: int = 8,
+        timeout: float = 15.0,
+        http2: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            max_connections: 连接池总连接数上限
+            max_keepalive_connections: 保持的空闲连接数上限
+            keepalive_expiry: 空闲连接保持时间（秒）
+            per_host_limit: 单个主机同时进行中的请求数上限
+            timeout: 默认超时（秒），单次请求可覆盖
+            http2: 是否启用 HTTP/2（未安装 h2 时忽略）
+            transport: 自定义 transport（测试用）
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2:
+            logger.warning("未安装 h2，HTTP/2 未启用")
+        self._transport = transport
+        self._states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._stats: Dict[str, HostStats] = {}
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None or state.client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                follow_redirects=True,
+                transport=self._transport,
+            )
+            state = self._states[loop] = _LoopState(client)
+        return state
+
+    def is_started(self) -> bool:
+        """当前事件循环上是否已有打开的客户端"""
+        state = self._states.get(asyncio.get_running_loop())
+        return state is not None and not state.client.is_closed
+
+    async def start(self) -> None:
+        """为当前事件循环创建客户端（幂等）"""
+        self._state()
+        logger.info(
+            f"HTTP 客户端已启动 (每主机并发 {self.per_host_limit}, "
+            f"HTTP/2 {'开启' if self.http2 else '关闭'})"
+        )
+
+    async def close(self) -> None:
+        """关闭当前事件循环上的客户端"""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state.client.aclose()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        发起请求（复用连接，按主机限流并记录统计）
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            **kwargs: 传给 httpx.AsyncClient.request 的参数（headers、params、timeout 等）
+
+        Returns:
+            httpx.Response
+
+        Raises:
+            httpx.HTTPError: 请求失败
+        """
+        host = urlsplit(url).netloc
+        stats = self._stats.setdefault(host, HostStats())
+        state = self._state()
+        slots = state.host_slots.get(host)
+        if slots is None:
+            slots = state.host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+
+        async def trace(event: str, info: dict) -> None:
+            if event == "connection.connect_tcp.complete":
+                stats.new_connections += 1
+
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+
+        async with slots:
+            start = time.perf_counter()
+            try:
+                return await state.client.request(method, url, extensions=extensions, **kwargs)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                stats.requests += 1
+                stats.total_latency += elapsed
+                stats.max_latency = max(stats.max_latency, elapsed)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET 请求（参数同 request）"""
+        return await self.request("GET", url, **kwargs)
+
+    def stats(self) -> Dict[str, dict]:
+        """按主机返回请求统计"""
+        return {host: stats.to_dict() for host, stats in sorted(self._stats.items())}
+
+    def reset_stats(self) -> None:
+        """清空统计"""
+        self._stats.clear()
+
+
+_manager: Optional[HttpClientManager] = None
+
+
+def get_http_manager() -> HttpClientManager:
+    """获取进程级共享的 HTTP 客户端管理器（按配置创建）"""
+    global _manager
+    if _manager is None:
+        from src.config import get_settings
+
+        settings = get_settings()
+        _manager = HttpClientManager(
+            per_host_limit=settings.http_max_connections_per_host,
+            http2=settings.http2_enabled,
+        )
+    return _manager
+
+
+@asynccontextmanager
+async def http_session() -> AsyncIterator[HttpClientManager]:
+    """
+    在独立运行的任务中使用共享客户端
+
+    若当前事件循环上还没有客户端（不在 FastAPI 进程内），退出时关闭它；
+    在 FastAPI 进程内则沿用应用的客户端，不关闭。
+    """
+    manager = get_http_manager()
+    owned = not manager.is_started()
+    await manager.start()
+    try:
+        yield manager
+    finally:
+        if owned:
+            await manager.close()
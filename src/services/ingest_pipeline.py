@@ -0,0 +1,318 @@
+"""
+流式K线入库管道
+
+获取 → 解析/标准化 → 写入 三个阶段以有界队列串联：
+- 获取：最多 fetch_concurrency 个协程并发请求上游（可选令牌桶限流、截止时间）
+- 解析：parse_workers 个协程把原始响应交给线程池转换为待写入条目
+- 写入：队列中积压的条目合并为一个事务提交（组提交）
+
+下游队列满时上游阶段等待（背压），网络请求与 SQLite 写入互相重叠。
+组提交失败时回滚并逐条重试，只丢弃出错的条目。
+每个阶段记录处理数、错误数、耗时（平均/最大）、吞吐量、背压等待时间和输入队列峰值；
+最近一次运行的指标可通过 get_pipeline_stats() 查看。
+
+每次运行使用 session_factory 创建的独立会话，只在写线程中使用，不触碰调用方的会话；
+进程内所有管道共用一个写线程（get_ingest_writer），并发运行的管道的事务依次执行，
+SQLite 写入不会互相抢锁，一个管道的回滚也不会影响其他管道。
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from src.services.tushare_client import AsyncTokenBucket
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+K = TypeVar("K")
+R = TypeVar("R")
+W = TypeVar("W")
+
+FETCH = "fetch"
+PARSE = "parse"
+WRITE = "write"
+
+_DONE = object()
+
+
+@dataclass
+class StageMetrics:
+    """单个阶段的指标"""
+
+    items: int = 0
+    errors: int = 0
+    busy: float = 0.0
+    calls: int = 0
+    max_latency: float = 0.0
+    # 下游队列满时等待的时间（背压）
+    blocked: float = 0.0
+    # 本阶段输入队列的最大长度
+    queue_peak: int = 0
+
+    def observe(self, latency: float) -> None:
+        self.calls += 1
+        self.busy += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self, elapsed: float) -> dict:
+        return {
+            "items": self.items,
+            "errors": self.errors,
+            "per_sec": round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+            "avg_latency_ms": round(self.busy / self.calls * 1000, 1) if self.calls else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+            "blocked_sec": round(self.blocked, 3),
+            "queue_peak": self.queue_peak,
+        }
+
+
+@dataclass
+class PipelineResult:
+    """一次运行的结果与指标"""
+
+    name: str
+    written: int = 0
+    groups: int = 0
+    # 截止时间到达时未获取的条目
+    skipped: int = 0
+    elapsed: float = 0.0
+    stages: Dict[str, StageMetrics] = field(
+        default_factory=lambda: {FETCH: StageMetrics(), PARSE: StageMetrics(), WRITE: StageMetrics()}
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "written": self.written,
+            "groups": self.groups,
+            "skipped": self.skipped,
+            "elapsed_sec": round(self.elapsed, 3),
+            "stages": {name: stage.to_dict(self.elapsed) for name, stage in self.stages.items()},
+        }
+
+
+class IngestPipeline(Generic[K, R, W]):
+    """获取 → 解析 → 写入 流式管道"""
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[K], Awaitable[Optional[R]]],
+        parse: Callable[[K, R], Optional[W]],
+        write: Callable[[Session, W], int],
+        session_factory: Callable[[], Session],
+        fetch_concurrency: int = 8,
+        parse_workers: int = 2,
+        queue_size: int = 32,
+        max_group: int = 50,
+        rate_limiter: Optional[AsyncTokenBucket] = None,
+        deadline: Optional[float] = None,
+    ):
+        """
+        Args:
+            name: 管道名称（日志与指标）
+            fetch: 获取单个条目的原始数据（返回 None 表示无数据）
+            parse: 原始数据转换为待写入条目（在线程池中执行，返回 None 表示无需写入）
+            write: 用给定会话写入单个条目，返回写入记录数（在写线程中执行，不提交）
+            session_factory: 创建本次运行的写入会话，每组条目写入后提交
+            fetch_concurrency: 同时进行的获取数
+            parse_workers: 解析协程数
+            queue_size: 阶段之间队列的容量
+            max_group: 单个事务最多包含的条目数
+            rate_limiter: 获取前申请令牌（上游限流）
+            deadline: 获取阶段的最长耗时（秒），超时后剩余条目跳过
+        """
+        self.name = name
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.session_factory = session_factory
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.parse_workers = max(1, parse_workers)
+        self.queue_size = queue_size
+        self.max_group = max(1, max_group)
+        self.rate_limiter = rate_limiter
+        self.deadline = deadline
+
+    async def run(self, keys: Iterable[K]) -> PipelineResult:
+        """
+        处理全部条目
+
+        Returns:
+            写入记录数与各阶段指标
+        """
+        loop = asyncio.get_running_loop()
+        result = PipelineResult(self.name)
+        stages = result.stages
+        started = time.monotonic()
+        deadline_at = started + self.deadline if self.deadline is not None else None
+        pending = iter(list(keys))
+        parse_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        writer = get_ingest_writer()
+        session = self.session_factory()
+
+        async def put(queue: asyncio.Queue, item, producer: StageMetrics, consumer: StageMetrics):
+            if queue.full():
+                waited = time.perf_counter()
+                await queue.put(item)
+                producer.blocked += time.perf_counter() - waited
+            else:
+                queue.put_nowait(item)
+            consumer.queue_peak = max(consumer.queue_peak, queue.qsize())
+
+        async def fetcher():
+            stage = stages[FETCH]
+            for key in pending:
+                if deadline_at is not None and time.monotonic() >= deadline_at:
+                    result.skipped += 1
+                    continue
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                begin = time.perf_counter()
+                try:
+                    timeout = None if deadline_at is None else max(deadline_at - time.monotonic(), 0)
+                    raw = await asyncio.wait_for(self.fetch(key), timeout)
+                except asyncio.TimeoutError:
+                    result.skipped += 1
+                    continue
+                except Exception as e:
+                    stage.errors += 1
+                    logger.warning(f"[{self.name}] {key} 获取失败: {e}")
+                    continue
+                finally:
+                    stage.observe(time.perf_counter() - begin)
+                stage.items += 1
+                if raw is not None:
+                    await put(parse_queue, (key, raw), stage, stages[PARSE])
+
+        async def parser():
+            stage = stages[PARSE]
+            while True:
+                item = await parse_queue.get()
+                if item is _DONE:
+                    return
+                key, raw = item
+                begin = time.perf_counter()
+                try:
+                    parsed = await loop.run_in_executor(None, self.parse, key, raw)
+                except Exception as e:
+                    stage.errors += 1
+                    logger.warning(f"[{self.name}] {key} 解析失败: {e}")
+                    continue
+                finally:
+                    stage.observe(time.perf_counter() - begin)
+                stage.items += 1
+                if parsed is not None:
+                    await put(write_queue, (key, parsed), stage, stages[WRITE])
+
+        async def write_loop():
+            stage = stages[WRITE]
+            finished = False
+            while not finished:
+                item = await write_queue.get()
+                if item is _DONE:
+                    return
+                # 积压的条目合并为一个事务
+                group = [item]
+                while len(group) < self.max_group and not write_queue.empty():
+                    item = write_queue.get_nowait()
+                    if item is _DONE:
+                        finished = True
+                        break
+                    group.append(item)
+                begin = time.perf_counter()
+                written, errors = await loop.run_in_executor(
+                    writer, self._write_group, session, group
+                )
+                stage.observe(time.perf_counter() - begin)
+                stage.items += len(group) - errors
+                stage.errors += errors
+                result.written += written
+                result.groups += 1
+
+        fetchers = [asyncio.ensure_future(fetcher()) for _ in range(self.fetch_concurrency)]
+        parsers = [asyncio.ensure_future(parser()) for _ in range(self.parse_workers)]
+        write_task = asyncio.ensure_future(write_loop())
+        try:
+            await asyncio.gather(*fetchers)
+            for _ in parsers:
+                await parse_queue.put(_DONE)
+            await asyncio.gather(*parsers)
+            await write_queue.put(_DONE)
+            await write_task
+        finally:
+            for task in (*fetchers, *parsers, write_task):
+                task.cancel()
+            # 写线程按提交顺序执行：关闭会话在本次运行的所有写入之后
+            await asyncio.wrap_future(writer.submit(session.close))
+
+        result.elapsed = time.monotonic() - started
+        _record_run(result)
+        fetch, write = stages[FETCH], stages[WRITE]
+        logger.info(
+            f"[{self.name}] 获取 {fetch.items} 个（失败 {fetch.errors}，跳过 {result.skipped}），"
+            f"写入 {result.written} 条 / {result.groups} 个事务，耗时 {result.elapsed:.1f} 秒，"
+            f"背压等待 {fetch.blocked + stages[PARSE].blocked:.1f} 秒"
+        )
+        if write.errors:
+            logger.warning(f"[{self.name}] {write.errors} 个条目写入失败")
+        return result
+
+    def _write_group(self, session: Session, group: List[Tuple[K, W]]) -> Tuple[int, int]:
+        """写入一组条目并提交；失败时回滚后逐条重试（写线程中执行）"""
+        try:
+            written = sum(self.write(session, item) for _, item in group)
+            session.commit()
+            return written, 0
+        except Exception as e:
+            session.rollback()
+            if len(group) == 1:
+                logger.warning(f"[{self.name}] {group[0][0]} 写入失败: {e}")
+                return 0, 1
+
+        written = errors = 0
+        for key, item in group:
+            try:
+                count = self.write(session, item)
+                session.commit()
+                written += count
+            except Exception as e:
+                session.rollback()
+                errors += 1
+                logger.warning(f"[{self.name}] {key} 写入失败: {e}")
+        return written, errors
+
+
+_writer: Optional[ThreadPoolExecutor] = None
+_writer_lock = Lock()
+
+
+def get_ingest_writer() -> ThreadPoolExecutor:
+    """进程内共享的单线程写入执行器"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer")
+        return _writer
+
+
+_last_runs: Dict[str, dict] = {}
+_runs_lock = Lock()
+
+
+def _record_run(result: PipelineResult) -> None:
+    with _runs_lock:
+        _last_runs[result.name] = {"finished_at": time.time(), **result.to_dict()}
+
+
+def get_pipeline_stats() -> Dict[str, Any]:
+    """各管道最近一次运行的指标"""
+    with _runs_lock:
+        return dict(_last_runs)
@@ -0,0 +1,594 @@
+"""
+K线内存映射数组缓存
+
+SQLite 仍是唯一数据源。本模块在 data/kline_cache 下为每个 (symbol_type, timeframe)
+维护一个固定 dtype 的数据文件和一个按标的的偏移索引：
+
+    kline_cache/STOCK_DAY/
+        bars.<generation>.dat   # BAR_DTYPE 结构化数组，每个标的占一段连续空间
+        index.json              # {symbol_code: [offset, length, capacity]}
+
+图表/截图等读取直接对数据文件做 np.memmap 切片（零拷贝），多个 uvicorn worker
+通过操作系统页缓存共享同一份数据。
+
+一致性:
+- 写入方（KlineService.save_klines / save_bar_records）在会话中登记变更的标的，
+  事务提交后增量刷新已缓存的标的；回滚则丢弃登记。删除历史K线的一方登记为
+  None，提交后直接丢弃该标的的缓存段（下次读取时重新加载）。
+- 追加写入在段的预留空间内进行，读者只读取索引中已发布的长度，不会读到半写数据；
+  改写已有K线时写入文件末尾的新段（写时复制），最后原子替换 index.json。
+- 跨进程写入用文件锁串行化；失效空间过多时整体压缩为新的 generation 文件。
+"""
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.models import KlineTimeframe, SymbolType
+from src.repositories.kline_columns import PRICE_FIELDS, KlineColumns
+from src.repositories.kline_repository import KlineRepository
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 每根K线的存储结构：time 为 datetime64[s] 的整数值
+BAR_DTYPE = np.dtype([("time", "<i8")] + [(name, "<f8") for name in PRICE_FIELDS])
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+
+# 每段的预留追加空间（行）与扩容倍数
+MIN_SLACK_ROWS = 64
+GROWTH_FACTOR = 1.25
+# 失效空间占比超过该值时压缩
+COMPACT_RATIO = 0.5
+
+# 会话中登记待刷新标的的键
+_DIRTY_KEY = "kline_array_cache_dirty"
+
+# 交易时间字符串长度（日线 YYYY-MM-DD，分钟线 YYYY-MM-DD HH:MM:SS）
+_DAY_TIME_LEN = 10
+_INTRADAY_TIME_LEN = 19
+
+
+def encode_times(trade_time: np.ndarray, timeframe: KlineTimeframe) -> Optional[np.ndarray]:
+    """
+    ISO交易时间字符串转为 datetime64[s] 整数
+
+    Args:
+        trade_time: 交易时间字符串数组
+        timeframe: 时间周期（决定期望的字符串格式）
+
+    Returns:
+        int64 数组；格式不符合时返回 None（该标的不缓存）
+    """
+    strings = np.asarray(trade_time, dtype=str)
+    if len(strings) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    expected = _DAY_TIME_LEN if timeframe == KlineTimeframe.DAY else _INTRADAY_TIME_LEN
+    if (np.char.str_len(strings) != expected).any():
+        return None
+    try:
+        return strings.astype("datetime64[s]").astype(np.int64)
+    except ValueError:
+        return None
+
+
+def decode_times(values: np.ndarray, timeframe: KlineTimeframe) -> np.ndarray:
+    """datetime64[s] 整数转回与数据库一致的ISO字符串（object数组）"""
+    stamps = values.astype("datetime64[s]")
+    if timeframe == KlineTimeframe.DAY:
+        strings = np.datetime_as_string(stamps, unit="D")
+    else:
+        strings = np.char.replace(np.datetime_as_string(stamps, unit="s"), "T", " ")
+    return strings.astype(object)
+
+
+def _time_bound(value: str) -> int:
+    """查询边界字符串转为整数时间（与字符串比较语义一致）"""
+    return int(np.datetime64(value, "s").astype(np.int64))
+
+
+class _Partition:
+    """单个 (symbol_type, timeframe) 的缓存文件"""
+
+    def __init__(self, directory: Path, timeframe: KlineTimeframe):
+        self.directory = directory
+        self.timeframe = timeframe
+        self.generation = 0
+        self.rows = 0
+        self.entries: Dict[str, list] = {}
+        self._index_mtime: Optional[int] = None
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_generation: Optional[int] = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / INDEX_FILE
+
+    def data_path(self, generation: int) -> Path:
+        return self.directory / f"bars.{generation}.dat"
+
+    # ---------- 读取 ----------
+
+    def load_index(self, force: bool = False) -> None:
+        """索引文件有变化时重新加载"""
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self.generation, self.rows, self.entries = 0, 0, {}
+            self._index_mtime = None
+            return
+
+        if not force and mtime == self._index_mtime:
+            return
+
+        with open(self.index_path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.generation = data["generation"]
+        self.rows = data["rows"]
+        self.entries = data["symbols"]
+        self._index_mtime = mtime
+
+    def view(self, symbol_code: str) -> Optional[np.ndarray]:
+        """标的K线的只读零拷贝视图，未缓存返回 None"""
+        self.load_index()
+        entry = self.entries.get(symbol_code)
+        if entry is None:
+            return None
+
+        try:
+            mmap = self._memmap(entry[0] + entry[1])
+        except FileNotFoundError:
+            # 索引加载之后数据文件已被新的 generation 取代并删除：重新加载索引
+            self.load_index(force=True)
+            entry = self.entries.get(symbol_code)
+            if entry is None:
+                return None
+            mmap = self._memmap(entry[0] + entry[1])
+
+        offset, length, _ = entry
+        return mmap[offset : offset + length]
+
+    def _memmap(self, needed_rows: int) -> np.memmap:
+        """打开（或在文件增长后重新打开）当前 generation 的数据文件"""
+        if (
+            self._mmap is None
+            or self._mmap_generation != self.generation
+            or len(self._mmap) < needed_rows
+        ):
+            self._mmap = np.memmap(
+                self.data_path(self.generation), dtype=BAR_DTYPE, mode="r"
+            )
+            self._mmap_generation = self.generation
+        return self._mmap
+
+    # ---------- 写入（调用方持有文件锁） ----------
+
+    def write(self, updates: Dict[str, Tuple[Optional[int], np.ndarray]]) -> None:
+        """
+        写入多个标的的K线
+
+        Args:
+            updates: {symbol_code: (since, bars)}；since 为 None 表示整段替换，
+                否则保留缓存中 time < since 的部分并拼接 bars
+        """
+        self.load_index(force=True)
+        path = self.data_path(self.generation)
+        itemsize = BAR_DTYPE.itemsize
+
+        with open(path, "r+b" if path.exists() else "w+b") as f:
+            for symbol_code, (since, bars) in updates.items():
+                entry = self.entries.get(symbol_code)
+
+                if entry is not None and since is not None:
+                    offset, length, capacity = entry
+                    f.seek(offset * itemsize)
+                    cached = np.fromfile(f, dtype=BAR_DTYPE, count=length)
+                    keep = int(np.searchsorted(cached["time"], since, side="left"))
+
+                    # 纯追加且预留空间足够：原位写入已发布长度之后的区域
+                    if keep == length and length + len(bars) <= capacity:
+                        f.seek((offset + length) * itemsize)
+                        f.write(bars.tobytes())
+                        entry[1] = length + len(bars)
+                        continue
+
+                    bars = np.concatenate([cached[:keep], bars])
+
+                # 写时复制：在文件末尾分配新段
+                capacity = max(len(bars) + MIN_SLACK_ROWS, int(len(bars) * GROWTH_FACTOR))
+                f.seek(self.rows * itemsize)
+                f.write(bars.tobytes())
+                self.entries[symbol_code] = [self.rows, len(bars), capacity]
+                self.rows += capacity
+
+            f.truncate(self.rows * itemsize)
+
+        if self._live_rows() < self.rows * (1 - COMPACT_RATIO):
+            self._compact()
+        else:
+            self._publish()
+
+    def remove(self, symbol_codes) -> None:
+        """删除标的的缓存段（下次读取时重新加载）"""
+        self.load_index(force=True)
+        removed = [code for code in symbol_codes if self.entries.pop(code, None)]
+        if removed:
+            self._publish()
+
+    def _live_rows(self) -> int:
+        return sum(entry[2] for entry in self.entries.values())
+
+    def remove_superseded(self) -> None:
+        """
+        删除旧 generation 的数据文件（新索引发布之后调用）
+
+        已映射旧文件的读者不受影响（POSIX 下删除后映射仍有效），
+        尚未打开数据文件的读者会重新加载索引。
+        """
+        for path in self.directory.glob("bars.*.dat"):
+            generation = path.name.split(".")[1]
+            if generation.isdigit() and int(generation) < self.generation:
+                path.unlink(missing_ok=True)
+
+    def _compact(self) -> None:
+        """把所有存活段复制到新的 generation 文件"""
+        old_path = self.data_path(self.generation)
+        new_generation = self.generation + 1
+        itemsize = BAR_DTYPE.itemsize
+
+        rows = 0
+        entries = {}
+        with open(old_path, "rb") as src, open(self.data_path(new_generation), "wb") as dst:
+            for symbol_code, (offset, length, capacity) in self.entries.items():
+                src.seek(offset * itemsize)
+                dst.write(src.read(length * itemsize))
+                dst.seek((rows + capacity) * itemsize)
+                entries[symbol_code] = [rows, length, capacity]
+                rows += capacity
+            dst.truncate(rows * itemsize)
+
+        self.generation, self.rows, self.entries = new_generation, rows, entries
+        self._publish()
+        self.remove_superseded()
+        logger.info(f"K线缓存压缩完成: {self.directory.name} generation={new_generation}")
+
+    def _publish(self) -> None:
+        """原子替换索引文件"""
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"generation": self.generation, "rows": self.rows, "symbols": self.entries},
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = None
+
+
+class KlineArrayCache:
+    """
+    按 (symbol_type, timeframe) 分区的内存映射K线缓存
+
+    只镜像 engine 对应的数据库；其他数据库（如测试用内存库）的会话不会读写缓存。
+    """
+
+    def __init__(self, root: Path, engine: Engine):
+        """
+        初始化缓存
+
+        Args:
+            root: 缓存根目录
+            engine: 缓存所镜像的数据库引擎
+        """
+        self.root = Path(root)
+        self.engine = engine
+        self._partitions: Dict[Tuple[SymbolType, KlineTimeframe], _Partition] = {}
+        self._lock = Lock()
+
+    def serves(self, session: Optional[Session]) -> bool:
+        """会话是否连接到缓存所镜像的数据库"""
+        if session is None:
+            return False
+        try:
+            return session.get_bind() is self.engine
+        except Exception:
+            return False
+
+    def _partition(self, symbol_type: SymbolType, timeframe: KlineTimeframe) -> _Partition:
+        key = (symbol_type, timeframe)
+        partition = self._partitions.get(key)
+        if partition is None:
+            directory = self.root / f"{symbol_type.name}_{timeframe.name}"
+            directory.mkdir(parents=True, exist_ok=True)
+            partition = self._partitions.setdefault(key, _Partition(directory, timeframe))
+        return partition
+
+    @contextmanager
+    def _write_lock(self, partition: _Partition) -> Iterator[None]:
+        """进程内线程锁 + 跨进程文件锁"""
+        with self._lock, open(partition.directory / LOCK_FILE, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        symbol_code: str,
+        limit: Optional[int] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+    ) -> Optional[KlineColumns]:
+        """
+        从缓存读取标的K线（价格列为数据文件的零拷贝视图）
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            symbol_code: 标的代码
+            limit: 只取最近的N根
+            start_time: 开始时间（包含）
+            end_time: 结束时间（包含，按字符串比较语义）
+
+        Returns:
+            KlineColumns（按时间正序）；未缓存返回 None
+        """
+        partition = self._partition(symbol_type, timeframe)
+        with self._lock:
+            bars = partition.view(symbol_code)
+        if bars is None:
+            return None
+
+        times = bars["time"]
+        lo = int(np.searchsorted(times, _time_bound(start_time), "left")) if start_time else 0
+        hi = int(np.searchsorted(times, _time_bound(end_time), "right")) if end_time else len(bars)
+        if limit:
+            lo = max(lo, hi - limit)
+        bars = bars[lo:hi]
+
+        return KlineColumns(
+            symbol_code,
+            decode_times(bars["time"], timeframe),
+            *(bars[name] for name in PRICE_FIELDS),
+        )
+
+    def store(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        columns_by_code: Dict[str, KlineColumns],
+        since: Optional[Dict[str, Optional[str]]] = None,
+    ) -> int:
+        """
+        写入多个标的的K线
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            columns_by_code: {symbol_code: KlineColumns}
+            since: {symbol_code: 起始时间}，提供时只替换该时间之后的部分；
+                未提供的标的整段替换
+
+        Returns:
+            写入的标的数量
+        """
+        since = since or {}
+        updates = {}
+        skipped = []
+        for symbol_code, columns in columns_by_code.items():
+            times = encode_times(columns.trade_time, timeframe)
+            if times is None:
+                skipped.append(symbol_code)
+                continue
+
+            bars = np.empty(len(columns), dtype=BAR_DTYPE)
+            bars["time"] = times
+            for name in PRICE_FIELDS:
+                bars[name] = getattr(columns, name)
+
+            start = since.get(symbol_code)
+            updates[symbol_code] = (_time_bound(start) if start else None, bars)
+
+        partition = self._partition(symbol_type, timeframe)
+        with self._write_lock(partition):
+            if updates:
+                partition.write(updates)
+            if skipped:
+                # 时间格式不规范的标的不缓存，读取时回退到SQLite
+                partition.remove(skipped)
+        return len(updates)
+
+    def invalidate(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        symbol_codes,
+    ) -> None:
+        """删除标的的缓存段"""
+        partition = self._partition(symbol_type, timeframe)
+        with self._write_lock(partition):
+            partition.remove(list(symbol_codes))
+
+    def cached_codes(self, symbol_type: SymbolType, timeframe: KlineTimeframe) -> set:
+        """已缓存的标的代码"""
+        partition = self._partition(symbol_type, timeframe)
+        with self._lock:
+            partition.load_index()
+            return set(partition.entries)
+
+    def refresh(
+        self, dirty: Dict[Tuple[SymbolType, KlineTimeframe], Dict[str, Optional[str]]]
+    ) -> None:
+        """
+        提交后增量刷新已缓存的标的（未缓存的标的在首次读取时加载）
+
+        Args:
+            dirty: {(symbol_type, timeframe): {symbol_code: 最早变更时间}}；
+                时间为 None 的标的丢弃缓存段
+        """
+        with Session(bind=self.engine) as session:
+            repo = KlineRepository(session)
+            for (symbol_type, timeframe), changes in dirty.items():
+                cached = self.cached_codes(symbol_type, timeframe)
+                dropped = cached.intersection(c for c, since in changes.items() if since is None)
+                if dropped:
+                    self.invalidate(symbol_type, timeframe, dropped)
+                codes = sorted(
+                    cached.intersection(c for c, since in changes.items() if since is not None)
+                )
+                if not codes:
+                    continue
+                try:
+                    fresh = {
+                        columns.symbol_code: columns.slice(
+                            int(np.searchsorted(columns.trade_time, changes[columns.symbol_code]))
+                        )
+                        for columns in repo.iter_columns_by_symbols(
+                            codes,
+                            symbol_type,
+                            timeframe,
+                            start_time=min(changes[code] for code in codes),
+                        )
+                    }
+                    self.store(
+                        symbol_type,
+                        timeframe,
+                        fresh,
+                        since={code: changes[code] for code in fresh},
+                    )
+                    # 变更后已无数据的标的
+                    missing = set(codes) - set(fresh)
+                    if missing:
+                        self.invalidate(symbol_type, timeframe, missing)
+                except Exception as e:
+                    logger.error(f"K线缓存刷新失败 {symbol_type.name}_{timeframe.name}: {e}")
+                    self.invalidate(symbol_type, timeframe, codes)
+
+    def rebuild(self, symbol_type: SymbolType, timeframe: KlineTimeframe) -> int:
+        """
+        从SQLite全量重建一个分区
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+
+        Returns:
+            缓存的标的数量
+        """
+        partition = self._partition(symbol_type, timeframe)
+        with self._write_lock(partition):
+            partition.load_index(force=True)
+            partition.entries = {}
+            partition.rows = 0
+            partition.generation += 1
+            partition._publish()
+            partition.remove_superseded()
+
+        count = 0
+        with Session(bind=self.engine) as session:
+            repo = KlineRepository(session)
+            codes = repo.find_symbols_with_data(symbol_type, timeframe)
+            batch = {}
+            for columns in repo.iter_columns_by_symbols(codes, symbol_type, timeframe):
+                batch[columns.symbol_code] = columns
+                if len(batch) >= KlineRepository.STREAM_SYMBOL_CHUNK:
+                    count += self.store(symbol_type, timeframe, batch)
+                    batch = {}
+            if batch:
+                count += self.store(symbol_type, timeframe, batch)
+        return count
+
+
+# ==================== 全局实例与提交钩子 ====================
+
+_cache: Optional[KlineArrayCache] = None
+_cache_configured = False
+
+
+def get_kline_cache() -> Optional[KlineArrayCache]:
+    """
+    获取全局K线缓存（按配置懒加载，KLINE_CACHE_ENABLED=false 时返回 None）
+    """
+    global _cache, _cache_configured
+    if not _cache_configured:
+        from src.config import get_settings
+        from src.database import engine
+
+        settings = get_settings()
+        if settings.kline_cache_enabled and engine.dialect.name == "sqlite":
+            _cache = KlineArrayCache(settings.data_dir / "kline_cache", engine)
+        _cache_configured = True
+    return _cache
+
+
+def set_kline_cache(cache: Optional[KlineArrayCache]) -> None:
+    """替换全局K线缓存（None 表示禁用）"""
+    global _cache, _cache_configured
+    _cache = cache
+    _cache_configured = True
+
+
+def mark_kline_cache_dirty(
+    session: Optional[Session],
+    symbol_type: SymbolType,
+    timeframe: KlineTimeframe,
+    changes: Dict[str, Optional[str]],
+) -> None:
+    """
+    登记会话中变更的K线，事务提交后刷新缓存
+
+    Args:
+        session: 写入K线的会话
+        symbol_type: 标的类型
+        timeframe: 时间周期
+        changes: {symbol_code: 本次写入的最早时间}；删除了历史K线时为 None（提交后丢弃缓存段）
+    """
+    cache = get_kline_cache()
+    if cache is None or not cache.serves(session) or not changes:
+        return
+
+    dirty = session.info.get(_DIRTY_KEY)
+    if dirty is None:
+        dirty = session.info[_DIRTY_KEY] = {}
+        if not event.contains(session, "after_commit", _refresh_after_commit):
+            event.listen(session, "after_commit", _refresh_after_commit)
+            event.listen(session, "after_rollback", _discard_after_rollback)
+
+    partition = dirty.setdefault((symbol_type, timeframe), {})
+    for symbol_code, trade_time in changes.items():
+        if symbol_code not in partition:
+            partition[symbol_code] = trade_time
+        elif trade_time is None or partition[symbol_code] is None:
+            partition[symbol_code] = None
+        else:
+            partition[symbol_code] = min(partition[symbol_code], trade_time)
+
+
+def _refresh_after_commit(session: Session) -> None:
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    cache = get_kline_cache()
+    if not dirty or cache is None:
+        return
+    try:
+        cache.refresh(dirty)
+    except Exception as e:
+        logger.error(f"K线缓存刷新失败: {e}")
+
+
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
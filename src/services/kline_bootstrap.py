@@ -0,0 +1,135 @@
+"""
+个股K线按需获取
+
+K线懒加载（/candles）和添加自选时的首次获取共用：在后台刷新队列的线程中执行，
+不占用事件循环。日线使用同步的 Tushare 客户端；30分钟K线提交给共享的异步新浪
+提供者，与定时任务共用 AIMD 并发上限和熔断器。
+添加自选的获取按 ticker 去重，接口立即返回 job_id，客户端轮询任务状态。
+"""
+
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from src.models import KlineTimeframe, SymbolType
+from src.repositories.kline_columns import KlineBatch
+from src.services.freshness_registry import record_freshness
+from src.services.kline_service import KlineService
+from src.services.refresh_queue import RefreshJob, get_bootstrap_queue
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 添加自选时获取的30分钟K线数量
+BOOTSTRAP_MINS30_LIMIT = 80
+
+
+def fetch_stock_klines(
+    db: Session,
+    ticker: str,
+    timeframe: str,
+    limit: Optional[int] = 120,
+) -> int:
+    """
+    从API获取个股K线数据并保存到数据库
+
+    Args:
+        db: 数据库会话
+        ticker: 6位股票代码
+        timeframe: 时间周期 (day/30m)
+        limit: 获取数量（日线为 None 时保存全部返回数据）
+
+    Returns:
+        保存的记录数
+
+    Raises:
+        上游或写入失败时回滚并抛出原异常
+    """
+    from src.services.sina_kline_provider import get_async_sina_kline_provider
+    from src.services.tushare_client import Priority, shared_tushare_client
+
+    logger.info(f"按需获取: {ticker} {timeframe} K线数据...")
+
+    try:
+        if timeframe == "day":
+            # 日线用TuShare
+            client = shared_tushare_client(Priority.INTERACTIVE)
+            ts_code = client.normalize_ts_code(ticker)
+            df = client.fetch_daily(ts_code=ts_code)
+        else:
+            # 30分钟用新浪（共享的并发控制与熔断）
+            df = get_async_sina_kline_provider().fetch_kline_blocking(
+                ticker, period="30m", limit=limit or 120
+            )
+
+        kline_timeframe = KlineTimeframe.DAY if timeframe == "day" else KlineTimeframe.MINS_30
+        source = "tushare" if timeframe == "day" else "sina"
+
+        if df is None or df.empty:
+            logger.warning(f"按需获取: {ticker} {timeframe} 无数据返回")
+            # 登记本次获取，RETRY_AFTER 内不再重复请求上游
+            record_freshness(db, SymbolType.STOCK, kline_timeframe, {ticker: None}, source)
+            db.commit()
+            return 0
+
+        rows = df.head(limit) if timeframe == "day" and limit is not None else df
+        klines = KlineBatch.from_frame(rows)
+
+        # 保存到数据库
+        service = KlineService.create_with_session(db)
+        count = service.save_klines(
+            symbol_type=SymbolType.STOCK,
+            symbol_code=ticker,
+            symbol_name=None,
+            timeframe=kline_timeframe,
+            klines=klines,
+            source=source,
+        )
+        db.commit()
+
+        logger.info(f"按需获取: {ticker} {timeframe} 保存 {count} 条数据")
+        return count
+
+    except Exception as e:
+        logger.error(f"按需获取失败: {ticker} {timeframe} - {e}")
+        db.rollback()
+        raise
+
+
+def bootstrap_stock_klines(db: Session, ticker: str) -> dict:
+    """
+    获取单只股票的日线和30分钟K线（添加自选时使用）
+
+    Returns:
+        {"daily": 条数, "mins30": 条数, "errors": {周期: 错误信息}}
+
+    Raises:
+        两个周期都失败时抛出 RuntimeError
+    """
+    result = {"daily": 0, "mins30": 0, "errors": {}}
+    for key, timeframe, limit in (
+        ("daily", "day", None),
+        ("mins30", "30m", BOOTSTRAP_MINS30_LIMIT),
+    ):
+        try:
+            result[key] = fetch_stock_klines(db, ticker, timeframe, limit=limit)
+        except Exception as e:
+            result["errors"][timeframe] = str(e)
+
+    if len(result["errors"]) == 2:
+        raise RuntimeError(f"{ticker} K线获取失败: {result['errors']}")
+    logger.info(f"单股 {ticker} 初始化完成: 日线 {result['daily']} 条, 30分钟 {result['mins30']} 条")
+    return result
+
+
+def submit_stock_bootstrap(ticker: str) -> RefreshJob:
+    """
+    提交单只股票的K线初始化任务（同一 ticker 排队或执行中时返回已有任务）
+
+    Returns:
+        任务记录（job_id 用于查询状态）
+    """
+    return get_bootstrap_queue().enqueue(
+        ("bootstrap", ticker),
+        lambda session: bootstrap_stock_klines(session, ticker),
+    )
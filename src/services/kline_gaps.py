@@ -0,0 +1,285 @@
+"""
+K线缺口扫描与回补计划
+
+把 klines 表中每个标的已保存的K线与周期的 “应有K线网格” 比对：
+- 日线：trade_calendar 中的交易日
+- 30分钟线：交易日 × 8 根半小时K线 (10:00 ... 15:00)
+
+一条 SQL 找出每个标的在首根与最新K线之间缺失的网格点，并按网格序号合并为连续区间
+(gaps and islands)。首根K线之前（历史起点、清理边界）和最新K线之后（由增量更新负责）
+不算缺口；trade_calendar 未覆盖的日期不参与比对。
+
+回补计划按数据源合并请求：
+- 个股日线：同一交易日缺失的股票较多时获取该日全市场截面，其余按股票区间获取 (Tushare)
+- 个股30分钟、指数日线/30分钟：每个标的一次请求，datalen 覆盖最早缺口到最新K线 (新浪)
+- 概念：每个标的一次 last.js 请求 (同花顺)
+回补由 KlineUpdater.backfill_gaps 按请求数预算执行；回补后仍存在的缺口（如停牌）
+登记为无法回补，UNFILLABLE_TTL 内不再计划。
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.models import KlineTimeframe, SymbolType
+from src.services.fetch_planner import count_missing_bars
+from src.services.freshness_registry import INTRADAY_SLOTS, get_freshness_registry
+from src.services.trading_calendar import get_trading_calendar
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 默认扫描的交易日数（新浪单次最多 1023 根，30分钟线约 127 个交易日）
+LOOKBACK_DAYS = {
+    KlineTimeframe.DAY: 250,
+    KlineTimeframe.MINS_30: 60,
+}
+# 同一交易日缺失的股票数达到该值时改为获取全市场截面
+CROSS_SECTION_MIN = 20
+# 回补后仍缺失的区间在此期间内不再计划
+UNFILLABLE_TTL = timedelta(days=7)
+
+_SLOT_VALUES = ", ".join(f"('{slot.strftime('%H:%M:%S')}')" for slot in INTRADAY_SLOTS)
+
+_GRID = {
+    KlineTimeframe.DAY: ("c.date", ""),
+    KlineTimeframe.MINS_30: ("c.date || ' ' || s.t", "CROSS JOIN slots s"),
+}
+
+_SCAN_SQL = """
+WITH slots(t) AS (VALUES {slot_values}),
+grid AS (
+    SELECT {slot} AS slot, ROW_NUMBER() OVER (ORDER BY {slot}) AS ordinal
+    FROM trade_calendar c {slot_join}
+    WHERE c.is_trading_day = 1 AND c.date >= :since
+),
+spans AS (
+    SELECT symbol_type, symbol_code, MIN(trade_time) AS first_bar, MAX(trade_time) AS last_bar
+    FROM klines
+    WHERE timeframe = :timeframe {type_filter}
+    GROUP BY symbol_type, symbol_code
+),
+missing AS (
+    SELECT sp.symbol_type, sp.symbol_code, g.slot, g.ordinal
+    FROM spans sp
+    JOIN grid g ON g.slot > sp.first_bar AND g.slot < sp.last_bar
+    WHERE NOT EXISTS (
+        SELECT 1 FROM klines k
+        WHERE k.symbol_type = sp.symbol_type
+          AND k.symbol_code = sp.symbol_code
+          AND k.timeframe = :timeframe
+          AND k.trade_time = g.slot
+    )
+),
+islands AS (
+    SELECT symbol_type, symbol_code, slot,
+           ordinal - ROW_NUMBER() OVER (
+               PARTITION BY symbol_type, symbol_code ORDER BY ordinal
+           ) AS island
+    FROM missing
+)
+SELECT symbol_type, symbol_code, MIN(slot) AS start, MAX(slot) AS end, COUNT(*) AS missing
+FROM islands
+GROUP BY symbol_type, symbol_code, island
+ORDER BY symbol_type, symbol_code, start
+"""
+
+
+class KlineGap(NamedTuple):
+    """单个标的的一段连续缺失K线"""
+
+    symbol_type: SymbolType
+    symbol_code: str
+    timeframe: KlineTimeframe
+    start: str
+    end: str
+    missing: int
+
+
+class BackfillTask(NamedTuple):
+    """一次上游请求"""
+
+    symbol_type: SymbolType
+    timeframe: KlineTimeframe
+    # None 表示个股日线全市场截面（start == end 为交易日）
+    code: Optional[str]
+    start: str
+    end: str
+    # 新浪请求的K线数量；Tushare / 同花顺为 None
+    window: Optional[int]
+    gaps: Tuple[KlineGap, ...]
+
+    @property
+    def missing(self) -> int:
+        return sum(gap.missing for gap in self.gaps)
+
+
+_unfillable: Dict[Tuple[SymbolType, str, KlineTimeframe, str, str], datetime] = {}
+
+
+def _gap_key(gap: KlineGap) -> Tuple[SymbolType, str, KlineTimeframe, str, str]:
+    return gap.symbol_type, gap.symbol_code, gap.timeframe, gap.start, gap.end
+
+
+def mark_unfillable(gaps: Iterable[KlineGap], now: Optional[datetime] = None) -> None:
+    """登记上游没有数据的缺口（UNFILLABLE_TTL 内不再计划）"""
+    now = now or datetime.now()
+    for gap in gaps:
+        _unfillable[_gap_key(gap)] = now
+
+
+def clear_unfillable() -> None:
+    """清空无法回补登记"""
+    _unfillable.clear()
+
+
+def scan_gaps(
+    session: Session,
+    timeframe: KlineTimeframe,
+    symbol_type: Optional[SymbolType] = None,
+    since: Optional[str] = None,
+    include_unfillable: bool = False,
+    now: Optional[datetime] = None,
+) -> List[KlineGap]:
+    """
+    扫描K线缺口（一条 SQL）
+
+    Args:
+        session: 数据库会话
+        timeframe: 周期（DAY / MINS_30）
+        symbol_type: 只扫描该类型标的（默认全部）
+        since: 扫描起始日期 YYYY-MM-DD（默认回溯 LOOKBACK_DAYS 个交易日）
+        include_unfillable: 是否包含已登记为无法回补的缺口
+        now: 当前本地时间
+
+    Returns:
+        缺口列表，按标的和起始时间排序
+    """
+    now = now or datetime.now()
+    if since is None:
+        since = get_trading_calendar().n_days_back(now, LOOKBACK_DAYS[timeframe]) or "0000-00-00"
+
+    slot, slot_join = _GRID[timeframe]
+    sql = _SCAN_SQL.format(
+        slot_values=_SLOT_VALUES,
+        slot=slot,
+        slot_join=slot_join,
+        type_filter="AND symbol_type = :symbol_type" if symbol_type else "",
+    )
+    params = {"timeframe": timeframe.name, "since": since}
+    if symbol_type:
+        params["symbol_type"] = symbol_type.name
+
+    gaps = [
+        KlineGap(SymbolType[row.symbol_type], row.symbol_code, timeframe, row.start, row.end, row.missing)
+        for row in session.execute(text(sql), params)
+    ]
+    if include_unfillable:
+        return gaps
+
+    cutoff = now - UNFILLABLE_TTL
+    return [
+        gap for gap in gaps
+        if _unfillable.get(_gap_key(gap), datetime.min) < cutoff
+    ]
+
+
+def summarize_gaps(gaps: Iterable[KlineGap]) -> dict:
+    """按标的类型/周期统计缺口（状态接口使用）"""
+    summary: Dict[str, dict] = {}
+    for gap in gaps:
+        item = summary.setdefault(
+            f"{gap.symbol_type.value}:{gap.timeframe.value}",
+            {"symbols": set(), "gaps": 0, "missing_bars": 0},
+        )
+        item["symbols"].add(gap.symbol_code)
+        item["gaps"] += 1
+        item["missing_bars"] += gap.missing
+    for item in summary.values():
+        item["symbols"] = len(item["symbols"])
+    return summary
+
+
+def _trading_days(calendar, start: str, end: str) -> List[str]:
+    """[start, end] 内的交易日（日历未覆盖的日期按工作日判断）"""
+    days, day = [], datetime.strptime(start[:10], "%Y-%m-%d")
+    while day.strftime("%Y-%m-%d") <= end[:10]:
+        if calendar.is_trading_day(day):
+            days.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+    return days
+
+
+def _sina_window(gap_start: str, timeframe: KlineTimeframe, now: datetime) -> int:
+    """从缺口起点到应有最新K线（含两端）的K线数"""
+    expected, _ = get_freshness_registry().expected_latest_bar(timeframe, now)
+    if expected is None:
+        return 1023
+    missing = count_missing_bars(timeframe, gap_start, expected, get_trading_calendar(), limit=1023)
+    return min(missing + 1, 1023)
+
+
+def plan_backfill(
+    gaps: Iterable[KlineGap],
+    now: Optional[datetime] = None,
+    cross_section_min: int = CROSS_SECTION_MIN,
+) -> List[BackfillTask]:
+    """
+    把缺口合并为上游请求
+
+    全市场截面排在最前（一次请求覆盖最多缺口），其余按缺失K线数从多到少。
+
+    Args:
+        gaps: scan_gaps 的结果
+        now: 当前本地时间
+        cross_section_min: 个股日线按交易日截面获取的最少缺失股票数
+
+    Returns:
+        回补任务列表
+    """
+    now = now or datetime.now()
+    calendar = get_trading_calendar()
+    by_symbol: Dict[Tuple[SymbolType, KlineTimeframe, str], List[KlineGap]] = defaultdict(list)
+    stock_daily: List[KlineGap] = []
+    for gap in gaps:
+        if gap.symbol_type == SymbolType.STOCK and gap.timeframe == KlineTimeframe.DAY:
+            stock_daily.append(gap)
+        else:
+            by_symbol[(gap.symbol_type, gap.timeframe, gap.symbol_code)].append(gap)
+
+    # 个股日线：缺失股票多的交易日改为全市场截面
+    gaps_by_day: Dict[str, List[KlineGap]] = defaultdict(list)
+    days_of: Dict[KlineGap, List[str]] = {}
+    for gap in stock_daily:
+        days_of[gap] = _trading_days(calendar, gap.start, gap.end) or [gap.start]
+        for day in days_of[gap]:
+            gaps_by_day[day].append(gap)
+    cross_days = {day for day, items in gaps_by_day.items() if len(items) >= cross_section_min}
+
+    cross_tasks = [
+        BackfillTask(
+            SymbolType.STOCK, KlineTimeframe.DAY, None, day, day, None,
+            tuple(g._replace(start=day, end=day, missing=1) for g in gaps_by_day[day]),
+        )
+        for day in sorted(cross_days, reverse=True)
+    ]
+    for gap in stock_daily:
+        if not set(days_of[gap]) <= cross_days:
+            by_symbol[(gap.symbol_type, gap.timeframe, gap.symbol_code)].append(gap)
+
+    symbol_tasks = []
+    for (symbol_type, timeframe, code), items in by_symbol.items():
+        start = min(gap.start for gap in items)
+        end = max(gap.end for gap in items)
+        window = None
+        if symbol_type == SymbolType.INDEX or (
+            symbol_type == SymbolType.STOCK and timeframe == KlineTimeframe.MINS_30
+        ):
+            window = _sina_window(start, timeframe, now)
+        symbol_tasks.append(BackfillTask(symbol_type, timeframe, code, start, end, window, tuple(items)))
+    symbol_tasks.sort(key=lambda task: task.missing, reverse=True)
+
+    return cross_tasks + symbol_tasks
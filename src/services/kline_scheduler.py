@@ -9,16 +9,16 @@ K线数据定时调度器
 """
 
 import asyncio
-from datetime import datetime, time
+from datetime import datetime
 from typing import Optional
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.orm import Session
 
-from src.models import TradeCalendar
 from src.services.kline_updater import KlineUpdater
 from src.services.data_consistency_validator import DataConsistencyValidator
+from src.services.trading_calendar import get_trading_calendar
 from src.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -66,19 +66,8 @@ class KlineScheduler:
         if date is None:
             date = datetime.now()
 
-        trade_date = date.strftime("%Y-%m-%d")
-
-        # 使用实例的 session 而不是创建新的
-        cal = (
-            self.session.query(TradeCalendar)
-            .filter(TradeCalendar.date == trade_date)
-            .first()
-        )
-        if cal:
-            return cal.is_trading_day
-        else:
-            # 如果没有数据，按周末判断
-            return date.weekday() < 5
+        # 内存日历（日历未覆盖的日期按周末判断）
+        return get_trading_calendar(self.session).is_trading_day(date)
 
     def is_trading_time(self, dt: datetime = None) -> bool:
         """
@@ -93,22 +82,8 @@ class KlineScheduler:
         if dt is None:
             dt = datetime.now()
 
-        if not self.is_trading_day(dt):
-            return False
-
-        current_time = dt.time()
-
-        # 上午: 09:30 - 11:30
-        morning_start = time(9, 30)
-        morning_end = time(11, 30)
-
-        # 下午: 13:00 - 15:00
-        afternoon_start = time(13, 0)
-        afternoon_end = time(15, 0)
-
-        return (morning_start <= current_time <= morning_end) or (
-            afternoon_start <= current_time <= afternoon_end
-        )
+        # 上午 09:30-11:30，下午 13:00-15:00
+        return get_trading_calendar(self.session).is_trading_time(dt)
 
     # ==================== 任务函数 ====================
 
@@ -236,6 +211,18 @@ class KlineScheduler:
         except Exception as e:
             logger.exception(f"数据一致性验证失败: {e}")
 
+    async def _job_gap_backfill(self):
+        """K线缺口回补任务 (交易日 16:30 执行，全市场日线更新之后)"""
+        if not self.is_trading_day():
+            logger.info("非交易日，跳过K线缺口回补")
+            return
+
+        logger.info("开始执行K线缺口回补...")
+        try:
+            await self.updater.backfill_gaps()
+        except Exception as e:
+            logger.exception(f"K线缺口回补失败: {e}")
+
     # ==================== 调度器控制 ====================
 
     def start(self):
@@ -301,6 +288,15 @@ class KlineScheduler:
             replace_existing=True,
         )
 
+        # 7. K线缺口回补任务 (交易日 16:30)
+        self.scheduler.add_job(
+            self._job_gap_backfill,
+            CronTrigger(hour=16, minute=30),
+            id="gap_backfill",
+            name="K线缺口回补",
+            replace_existing=True,
+        )
+
         self.scheduler.start()
         self._is_running = True
 
@@ -349,6 +345,7 @@ class KlineScheduler:
             "stock_daily": self._job_stock_daily,
             "stock_30m": self._job_stock_30m,
             "all_stock_daily": self._job_all_stock_daily,
+            "gap_backfill": self._job_gap_backfill,
         }
 
         if job_id not in job_map:
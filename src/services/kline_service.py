@@ -6,19 +6,29 @@
 """
 
 from datetime import datetime, timezone
-from typing import Optional
+from typing import NamedTuple, Optional, Union
 
+import numpy as np
 from sqlalchemy.orm import Session
 
 from src.models import KlineTimeframe, SymbolType
+from src.repositories.kline_columns import KlineBatch, KlineColumns
 from src.repositories.kline_repository import KlineRepository
 from src.repositories.symbol_repository import SymbolRepository
+from src.services.kline_array_cache import get_kline_cache, mark_kline_cache_dirty
+from src.services.freshness_registry import record_freshness
+from src.services.market_breadth_service import mark_breadth_dirty
 from src.schemas.normalized import NormalizedDate, NormalizedTicker
-from src.utils.indicators import calculate_macd
+from src.utils.indicators import calculate_macd, calculate_macd_series
 from src.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# MACD 参数（存储的指标与增量状态均使用该参数）
+MACD_FAST_PERIOD = 12
+MACD_SLOW_PERIOD = 26
+MACD_SIGNAL_PERIOD = 9
+
 
 class KlineService:
     """
@@ -60,7 +70,7 @@ class KlineService:
         symbol_repo = SymbolRepository(session)
         return cls(kline_repo, symbol_repo)
 
-    def get_klines(
+    def get_kline_columns(
         self,
         symbol_type: SymbolType,
         symbol_code: str,
@@ -68,20 +78,20 @@ class KlineService:
         limit: int = 120,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-    ) -> list[dict]:
+    ) -> KlineColumns:
         """
-        获取K线数据
+        获取列式K线数据（每个字段一个NumPy数组，不构造ORM对象）
 
         Args:
             symbol_type: 标的类型 (stock/index/concept)
             symbol_code: 标的代码 (支持任意格式，会自动标准化)
-            timeframe: 时间周期 (day/30m)
-            limit: 返回数量
+            timeframe: 时间周期
+            limit: 返回数量（未指定完整日期范围时生效）
             start_date: 开始日期 (可选，支持任意格式)
             end_date: 结束日期 (可选，支持任意格式)
 
         Returns:
-            K线数据列表，日期格式为ISO标准 (YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS)
+            KlineColumns（按时间正序）
         """
         # 标准化symbol_code（个股用6位代码，指数/概念保持原样）
         if symbol_type == SymbolType.STOCK:
@@ -91,57 +101,89 @@ class KlineService:
                 pass  # 保持原值
 
         # 标准化日期参数
-        start_datetime = None
-        end_datetime = None
+        start_iso = _normalize_date(start_date)
+        end_iso = _normalize_date(end_date)
+
+        # 有完整日期范围时按范围查询，否则取最近 limit 根
+        window = (
+            {"start_time": start_iso, "end_time": end_iso}
+            if start_iso and end_iso
+            else {"limit": limit}
+        )
+        # 优先从内存映射缓存读取（未命中时从SQLite加载整段历史写入缓存）
+        cached = self._read_cached_columns(symbol_type, symbol_code, timeframe, **window)
+        if cached is not None:
+            return cached
 
-        if start_date:
-            try:
-                start_datetime = datetime.fromisoformat(
-                    NormalizedDate(value=start_date).to_iso()
-                )
-            except ValueError:
-                pass
+        return self.kline_repo.find_columns_by_symbol(
+            symbol_code=symbol_code,
+            symbol_type=symbol_type,
+            timeframe=timeframe,
+            **window,
+        )
 
-        if end_date:
-            try:
-                end_datetime = datetime.fromisoformat(
-                    NormalizedDate(value=end_date).to_iso()
-                )
-            except ValueError:
-                pass
+    def _read_cached_columns(
+        self,
+        symbol_type: SymbolType,
+        symbol_code: str,
+        timeframe: KlineTimeframe,
+        **window,
+    ) -> Optional[KlineColumns]:
+        """
+        从K线缓存读取（未缓存的标的先从SQLite加载完整历史写入缓存）
 
-        # 根据是否有日期范围选择不同的查询方法
-        if start_datetime and end_datetime:
-            klines = self.kline_repo.find_by_symbol_and_date_range(
-                symbol_code=symbol_code,
-                symbol_type=symbol_type,
-                timeframe=timeframe,
-                start_date=start_datetime,
-                end_date=end_datetime,
-            )
-        else:
-            klines = self.kline_repo.find_by_symbol(
+        Args:
+            window: 传给 KlineArrayCache.read 的 limit / start_time / end_time
+
+        Returns:
+            KlineColumns；缓存未启用、会话不属于缓存镜像的数据库或标的无数据时返回 None
+        """
+        cache = get_kline_cache()
+        if cache is None or not cache.serves(getattr(self.kline_repo, "session", None)):
+            return None
+
+        try:
+            columns = cache.read(symbol_type, timeframe, symbol_code, **window)
+            if columns is not None:
+                return columns
+
+            history = self.kline_repo.find_columns_by_symbol(
                 symbol_code=symbol_code,
                 symbol_type=symbol_type,
                 timeframe=timeframe,
-                limit=limit,
             )
-            # Repository返回的是倒序，需要反转
-            klines = list(reversed(klines))
-
-        # 转换为字典格式
-        return [
-            {
-                "datetime": k.trade_time,  # Return as 'datetime' for API backward compatibility
-                "open": k.open,
-                "high": k.high,
-                "low": k.low,
-                "close": k.close,
-                "volume": k.volume,
-                "amount": k.amount,
-            }
-            for k in klines
-        ]
+            if len(history) and cache.store(symbol_type, timeframe, {symbol_code: history}):
+                return cache.read(symbol_type, timeframe, symbol_code, **window)
+        except Exception as e:
+            logger.warning(f"K线缓存读取失败，回退到数据库: {e}")
+        return None
+
+    def get_klines(
+        self,
+        symbol_type: SymbolType,
+        symbol_code: str,
+        timeframe: KlineTimeframe = KlineTimeframe.DAY,
+        limit: int = 120,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ) -> list[dict]:
+        """
+        获取K线数据
+
+        Args:
+            symbol_type: 标的类型 (stock/index/concept)
+            symbol_code: 标的代码 (支持任意格式，会自动标准化)
+            timeframe: 时间周期 (day/30m)
+            limit: 返回数量
+            start_date: 开始日期 (可选，支持任意格式)
+            end_date: 结束日期 (可选，支持任意格式)
+
+        Returns:
+            K线数据列表，日期格式为ISO标准 (YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS)
+        """
+        return self.get_kline_columns(
+            symbol_type, symbol_code, timeframe, limit, start_date, end_date
+        ).to_records()
 
     def get_klines_with_indicators(
         self,
@@ -164,15 +206,16 @@ class KlineService:
         Returns:
             包含技术指标的K线数据列表
         """
-        klines = self.get_klines(symbol_type, symbol_code, timeframe, limit)
+        columns = self.get_kline_columns(symbol_type, symbol_code, timeframe, limit)
+        klines = columns.to_records()
 
         if not klines:
             return []
 
-        # 计算MACD指标
+        # 计算MACD指标（直接使用收盘价列）
         if include_macd:
-            close_prices = [k["close"] for k in klines if k["close"] is not None]
-            if close_prices:
+            close_prices = columns.close[~np.isnan(columns.close)]
+            if len(close_prices):
                 macd_data = calculate_macd(close_prices)
 
                 # 将指标添加到K线数据中
@@ -213,18 +256,16 @@ class KlineService:
         else:
             klines = self.get_klines(symbol_type, symbol_code, timeframe, limit)
 
-        # 获取标的名称
+        # 获取标的名称（最新K线汇总主键查找，个股缺名称时查 symbol_metadata）
         symbol_name = None
         if klines:
-            # 从第一条K线获取名称
-            first_kline = self.kline_repo.find_by_symbol(
-                symbol_code=symbol_code,
-                symbol_type=symbol_type,
-                timeframe=timeframe,
-                limit=1,
-            )
-            if first_kline:
-                symbol_name = first_kline[0].symbol_name
+            latest = self.kline_repo.find_latest_bar(symbol_code, symbol_type, timeframe)
+            if latest is not None:
+                symbol_name = latest.symbol_name
+            if symbol_name is None and symbol_type == SymbolType.STOCK and self.symbol_repo:
+                metadata = self.symbol_repo.find_by_ticker(symbol_code)
+                if metadata is not None:
+                    symbol_name = metadata.name
 
         return {
             "symbol_type": symbol_type.value,
@@ -252,7 +293,7 @@ class KlineService:
         Returns:
             最新K线数据字典或None
         """
-        kline = self.kline_repo.find_latest_by_symbol(
+        kline = self.kline_repo.find_latest_bar(
             symbol_code=symbol_code,
             symbol_type=symbol_type,
             timeframe=timeframe,
@@ -288,7 +329,7 @@ class KlineService:
         Returns:
             最新交易时间的ISO字符串或None
         """
-        kline = self.kline_repo.find_latest_by_symbol(
+        kline = self.kline_repo.find_latest_bar(
             symbol_code, symbol_type, timeframe
         )
 
@@ -339,27 +380,31 @@ class KlineService:
         symbol_code: str,
         symbol_name: Optional[str],
         timeframe: KlineTimeframe,
-        klines: list[dict],
+        klines: Union[KlineBatch, list[dict]],
         calculate_indicators: bool = True,
+        source: Optional[str] = None,
     ) -> int:
         """
         保存K线数据 (upsert)
 
+        K线按列处理：时间标准化、排序、MACD 计算和写入都在 NumPy 数组上完成。
+        MACD 从已保存的 EMA 状态增量计算，只有历史被改写时才全量重算。
+
         Args:
             symbol_type: 标的类型
             symbol_code: 标的代码 (会自动标准化)
             symbol_name: 标的名称
             timeframe: 时间周期
-            klines: K线数据列表，每个包含 datetime, open, high, low, close, volume, amount
+            klines: KlineBatch，或每个包含 datetime, open, high, low, close, volume, amount 的字典列表
             calculate_indicators: 是否计算 MACD 指标
+            source: 数据来源（记录到新鲜度登记）
 
         Returns:
             保存的记录数
         """
-        from src.models import Kline
-        from src.schemas.normalized import NormalizedDateTime
-
-        if not klines:
+        if not isinstance(klines, KlineBatch):
+            klines = KlineBatch.from_records(klines)
+        if not len(klines):
             return 0
 
         # 标准化symbol_code（个股用6位代码）
@@ -369,51 +414,468 @@ class KlineService:
             except ValueError:
                 pass
 
-        # 按时间排序
-        klines = sorted(klines, key=lambda k: k.get("datetime", ""))
+        # 标准化日期格式并按时间排序
+        batch = klines.normalized(timeframe == KlineTimeframe.DAY).sorted()
+
+        # 缺少收盘价的K线不入库（否则会作为无价K线参与 MACD 和全市场统计）
+        missing_close = np.isnan(batch.close)
+        if missing_close.any():
+            logger.warning(f"{symbol_code} 跳过 {int(missing_close.sum())} 根缺少收盘价的K线")
+            batch = batch.take(~missing_close)
+            if not len(batch):
+                return 0
 
-        # 计算 MACD
+        recompute = False
+        new_state = None
+        indicators = None
         if calculate_indicators:
-            closes = [float(k.get("close", 0)) for k in klines]
-            macd_data = calculate_macd(closes)
-        else:
-            macd_data = {"dif": [None] * len(klines), "dea": [None] * len(klines), "macd": [None] * len(klines)}
-
-        # 准备数据，标准化日期格式
-        is_daily = timeframe == KlineTimeframe.DAY
-        records = []
-        for i, k in enumerate(klines):
-            raw_time = k.get("datetime", "")
-            # 标准化日期时间
-            try:
-                if is_daily:
-                    trade_time = NormalizedDate(value=raw_time).to_iso()
+            recompute, new_state, indicators = self._apply_incremental_macd(
+                symbol_type, symbol_code, timeframe, batch
+            )
+
+        count = self.kline_repo.upsert_columns(
+            symbol_type, symbol_code, symbol_name, timeframe, batch, indicators
+        ).written
+        session = getattr(self.kline_repo, "session", None)
+        first_time, last_time = batch.trade_time[0], batch.trade_time[-1]
+        # 即使没有行变化也登记：上游已确认没有更新的数据
+        record_freshness(session, symbol_type, timeframe, {symbol_code: last_time}, source)
+        if count:
+            # 单个标的的写入不重算全市场统计（统计只由截面写入 save_bar_records 维护）
+            mark_kline_cache_dirty(session, symbol_type, timeframe, {symbol_code: first_time})
+
+        if new_state:
+            self.kline_repo.upsert_indicator_states([new_state])
+        elif recompute:
+            self.recompute_indicators(symbol_type, symbol_code, timeframe)
+
+        return count
+
+    def save_bar_records(
+        self,
+        symbol_type: SymbolType,
+        timeframe: KlineTimeframe,
+        records: list[dict],
+        calculate_indicators: bool = True,
+        source: Optional[str] = None,
+    ) -> int:
+        """
+        保存多标的K线记录（如全市场日线截面）
+
+        所有标的的指标状态和重复入库K线的已存收盘价一次性批量读取，MACD 按与
+        save_klines 相同的规则增量计算：收盘价未变化的旧K线保留已存指标，只改写了
+        最后一根时从前一根的状态继续；无状态或更早的历史被改写的标的在保存后逐个全量重算。
+
+        Args:
+            symbol_type: 标的类型
+            timeframe: 时间周期
+            records: K线字典列表（已标准化，键与 Kline 列名一致）
+            calculate_indicators: 是否计算 MACD 指标
+            source: 数据来源（记录到新鲜度登记）
+
+        Returns:
+            保存的记录数
+        """
+        if not records:
+            return 0
+
+        recompute_codes = []
+        new_states = []
+        if calculate_indicators:
+            by_symbol: dict[str, list[dict]] = {}
+            for record in records:
+                by_symbol.setdefault(record["symbol_code"], []).append(record)
+
+            states = self.kline_repo.find_indicator_states(
+                list(by_symbol), symbol_type, timeframe
+            )
+            for symbol_records in by_symbol.values():
+                symbol_records.sort(key=lambda r: r["trade_time"])
+
+            # 不晚于状态时间的K线（如同一天重复入库）：批量读取已存收盘价判断是否改写
+            rewritten = [
+                code for code, symbol_records in by_symbol.items()
+                if code in states and symbol_records[0]["trade_time"] <= states[code].trade_time
+            ]
+            stored = {}
+            if rewritten:
+                stored = self.kline_repo.find_closes_by_symbols(
+                    rewritten, symbol_type, timeframe,
+                    min(by_symbol[code][0]["trade_time"] for code in rewritten),
+                    max(states[code].trade_time for code in rewritten),
+                )
+
+            for code, symbol_records in by_symbol.items():
+                state = states.get(code)
+                resume = None
+                if state is not None:
+                    trade_time = np.array([r["trade_time"] for r in symbol_records], dtype=object)
+                    split = int(np.searchsorted(trade_time, state.trade_time, side="right"))
+                    resume = self._macd_resume_point(
+                        state,
+                        trade_time,
+                        np.array([r["close"] for r in symbol_records], dtype=np.float64),
+                        np.array(
+                            [stored.get((code, t)) for t in trade_time[:split].tolist()],
+                            dtype=np.float64,
+                        ),
+                    )
+                if resume is None:
+                    recompute_codes.append(code)
+                    continue
+
+                start, seed, seed_time, base_count = resume
+                if start == len(symbol_records):
+                    continue  # 收盘价未变化，保留已存指标和状态
+                new_state = self._continue_macd(
+                    symbol_type, code, timeframe, symbol_records[start:],
+                    seed=seed, seed_time=seed_time, base_count=base_count,
+                )
+                if new_state:
+                    new_states.append(new_state)
                 else:
-                    trade_time = NormalizedDateTime(value=raw_time).to_iso()
-            except ValueError:
-                trade_time = raw_time  # 保持原值
-
-            now = datetime.now(timezone.utc)
-            records.append(
-                Kline(
-                    symbol_type=symbol_type,
-                    symbol_code=symbol_code,
-                    symbol_name=symbol_name,
-                    timeframe=timeframe,
-                    trade_time=trade_time,
-                    open=float(k.get("open", 0)),
-                    high=float(k.get("high", 0)),
-                    low=float(k.get("low", 0)),
-                    close=float(k.get("close", 0)),
-                    volume=float(k.get("volume", 0)),
-                    amount=float(k.get("amount", 0)),
-                    dif=macd_data["dif"][i],
-                    dea=macd_data["dea"][i],
-                    macd=macd_data["macd"][i],
-                    created_at=now,
-                    updated_at=now,
+                    recompute_codes.append(code)
+
+        count = self.kline_repo.upsert_records(records)
+        self.kline_repo.upsert_indicator_states(new_states)
+        session = getattr(self.kline_repo, "session", None)
+        latest: dict[str, str] = {}
+        for record in records:
+            code, trade_time = record["symbol_code"], record["trade_time"]
+            if code not in latest or trade_time > latest[code]:
+                latest[code] = trade_time
+        record_freshness(session, symbol_type, timeframe, latest, source)
+        if count:
+            earliest: dict[str, str] = {}
+            for record in records:
+                code, trade_time = record["symbol_code"], record["trade_time"]
+                if code not in earliest or trade_time < earliest[code]:
+                    earliest[code] = trade_time
+            mark_kline_cache_dirty(session, symbol_type, timeframe, earliest)
+            if symbol_type == SymbolType.STOCK and timeframe == KlineTimeframe.DAY:
+                # 日线截面写入：提交前按 klines 中的全市场截面重算这些交易日的统计
+                mark_breadth_dirty(session, {r["trade_time"] for r in records})
+
+        if recompute_codes:
+            logger.info(f"全量重算 {len(recompute_codes)} 个标的的MACD")
+            for code in recompute_codes:
+                self.recompute_indicators(symbol_type, code, timeframe)
+
+        return count
+
+    def delete_klines_before(self, timeframe: KlineTimeframe, cutoff: str) -> int:
+        """
+        删除某个周期所有标的在截止时间之前的K线（不提交事务）
+
+        指标状态和最新K线汇总在仓储层同步维护；受影响标的的数组缓存段在提交后丢弃。
+
+        Args:
+            timeframe: 时间周期
+            cutoff: 截止时间（不包含）
+
+        Returns:
+            删除的记录数
+        """
+        deleted, keys = self.kline_repo.delete_before(timeframe, cutoff)
+        by_type: dict[SymbolType, dict[str, None]] = {}
+        for symbol_type, symbol_code in keys:
+            by_type.setdefault(symbol_type, {})[symbol_code] = None
+
+        session = getattr(self.kline_repo, "session", None)
+        for symbol_type, codes in by_type.items():
+            mark_kline_cache_dirty(session, symbol_type, timeframe, codes)
+        return deleted
+
+    def recompute_indicators(
+        self,
+        symbol_type: SymbolType,
+        symbol_code: str,
+        timeframe: KlineTimeframe,
+    ) -> int:
+        """
+        基于全部历史重新计算 MACD 并重建指标状态
+
+        Args:
+            symbol_type: 标的类型
+            symbol_code: 标的代码
+            timeframe: 时间周期
+
+        Returns:
+            更新的K线数量
+        """
+        rows = self.kline_repo.find_closes_since(symbol_code, symbol_type, timeframe)
+        if not rows:
+            self.kline_repo.delete_indicator_state(symbol_code, symbol_type, timeframe)
+            return 0
+
+        records = [{"trade_time": t, "close": close} for t, close in rows]
+        state = self._continue_macd(
+            symbol_type, symbol_code, timeframe, records,
+            seed=None, seed_time=None, base_count=0,
+        )
+
+        count = self.kline_repo.update_indicators(
+            symbol_code, symbol_type, timeframe, records
+        )
+        self.kline_repo.upsert_indicator_states([state])
+        return count
+
+    def _apply_incremental_macd(
+        self,
+        symbol_type: SymbolType,
+        symbol_code: str,
+        timeframe: KlineTimeframe,
+        batch: KlineBatch,
+    ) -> tuple[bool, Optional[dict], Optional[np.ndarray]]:
+        """
+        为待保存的单标的K线增量计算 MACD
+
+        - 全部为新K线: 从最新状态继续
+        - 只改写了最后一根K线 (盘中更新): 从前一根状态继续
+        - 与已存数据一致的旧K线: 保留已存指标
+        - 其他情况 (无状态的旧数据、改写更早的历史): 需要全量重算
+
+        Returns:
+            (是否需要全量重算, 新的指标状态字典或None,
+             形状 (n, 3) 的 dif/dea/macd 或None；NaN 表示保留已存指标)
+        """
+        state = self.kline_repo.find_indicator_state(symbol_code, symbol_type, timeframe)
+        size = len(batch)
+
+        if state is None:
+            if self.kline_repo.count_by_symbol(symbol_code, symbol_type, timeframe) > 0:
+                return True, None, None  # 已有历史但没有状态
+            result = self._continue_macd_columns(
+                symbol_type, symbol_code, timeframe, batch.trade_time, batch.close,
+                seed=None, seed_time=None, base_count=0,
+            )
+            if result is None:
+                return True, None, None
+            return False, result[1], result[0]
+
+        # [0, split) 为不晚于状态的旧K线，之后为新K线
+        split = int(np.searchsorted(batch.trade_time, state.trade_time, side="right"))
+        stored_close = np.empty(0, dtype=np.float64)
+        if split:
+            stored = dict(
+                self.kline_repo.find_closes_since(
+                    symbol_code, symbol_type, timeframe, batch.trade_time[0]
                 )
             )
+            stored_close = np.array(
+                [stored.get(t) for t in batch.trade_time[:split].tolist()], dtype=np.float64
+            )
+
+        resume = self._macd_resume_point(state, batch.trade_time, batch.close, stored_close)
+        if resume is None:
+            return True, None, None
+        start, seed, seed_time, base_count = resume
+        if start == size:
+            return False, None, None  # 数据未变化，保留已存指标和状态
+
+        result = self._continue_macd_columns(
+            symbol_type, symbol_code, timeframe,
+            batch.trade_time[start:], batch.close[start:],
+            seed=seed, seed_time=seed_time, base_count=base_count,
+        )
+        if result is None:
+            return True, None, None
+        indicators = np.full((size, 3), np.nan)
+        indicators[start:] = result[0]
+        return False, result[1], indicators
+
+    @staticmethod
+    def _macd_resume_point(
+        state,
+        trade_time: np.ndarray,
+        close: np.ndarray,
+        stored_close: np.ndarray,
+    ) -> Optional[tuple]:
+        """
+        根据已存收盘价判断增量 MACD 从哪根K线、以哪个状态继续
+
+        - 旧K线收盘价均未变化: 从最新状态继续计算之后的新K线
+        - 只改写了最后一根K线 (盘中更新/同日重复入库): 从前一根状态继续
+        - 改写了更早的历史: 需要全量重算
+
+        Args:
+            state: 标的的指标状态
+            trade_time: 待保存K线时间（正序）
+            close: 待保存K线收盘价
+            stored_close: 前 split 根（不晚于状态时间）K线的已存收盘价，缺失为 NaN
+
+        Returns:
+            (start, seed, seed_time, base_count)，start 等于K线数量表示数据未变化；
+            None 表示需要全量重算
+        """
+        split = len(stored_close)
+        changed = ~(np.abs(stored_close - close[:split]) <= 1e-9)
+        if not changed.any():
+            return split, state, state.trade_time, state.bar_count
+        if (
+            np.flatnonzero(changed).tolist() == [split - 1]
+            and trade_time[split - 1] == state.trade_time
+        ):
+            seed = None
+            if state.prev_trade_time is not None:
+                seed = _StateSeed(state.prev_ema_fast, state.prev_ema_slow, state.prev_dea)
+            return split - 1, seed, state.prev_trade_time, state.bar_count - 1
+        return None
+
+    @classmethod
+    def _continue_macd(
+        cls,
+        symbol_type: SymbolType,
+        symbol_code: str,
+        timeframe: KlineTimeframe,
+        records: list[dict],
+        seed,
+        seed_time: Optional[str],
+        base_count: int,
+    ) -> Optional[dict]:
+        """
+        从种子状态继续计算记录的 MACD，写入记录的 dif/dea/macd 字段
+
+        字典记录形式的 _continue_macd_columns（多标的截面、全量重算使用）。
+
+        Args:
+            records: 按时间正序的记录（至少包含 trade_time, close）
+
+        Returns:
+            新的指标状态字典，或None表示需要全量重算
+        """
+        result = cls._continue_macd_columns(
+            symbol_type, symbol_code, timeframe,
+            np.array([r["trade_time"] for r in records], dtype=object),
+            np.array([r["close"] for r in records], dtype=np.float64),
+            seed, seed_time, base_count,
+        )
+        if result is None:
+            return None
+
+        indicators, state = result
+        for r, (dif, dea, macd) in zip(records, indicators.tolist()):
+            r["dif"] = None if np.isnan(dif) else dif
+            r["dea"] = None if np.isnan(dea) else dea
+            r["macd"] = None if np.isnan(macd) else macd
+        return state
+
+    @staticmethod
+    def _continue_macd_columns(
+        symbol_type: SymbolType,
+        symbol_code: str,
+        timeframe: KlineTimeframe,
+        trade_time: np.ndarray,
+        close: np.ndarray,
+        seed,
+        seed_time: Optional[str],
+        base_count: int,
+    ) -> Optional[tuple[np.ndarray, dict]]:
+        """
+        从种子状态继续计算收盘价序列的 MACD
+
+        K线总数首次达到慢线周期时返回None（此前的K线也需要补上指标，需全量重算）。
+
+        Args:
+            trade_time: 按时间正序的交易时间
+            close: 对应的收盘价
+            seed: 种子状态（带 ema_fast/ema_slow/dea 属性），None 表示从头计算
+            seed_time: 种子状态对应的K线时间
+            base_count: 种子状态之前已计算的K线数量
+
+        Returns:
+            (形状 (n, 3) 的 dif/dea/macd，K线总数不足慢线周期时为 NaN, 新的指标状态字典)，
+            或None表示需要全量重算
+        """
+        if seed is None:
+            seed_time, base_count = None, 0
+        if not len(close):
+            return None
+
+        total = base_count + len(close)
+        if 0 < base_count < MACD_SLOW_PERIOD <= total:
+            return None
+
+        series = calculate_macd_series(
+            close,
+            MACD_FAST_PERIOD,
+            MACD_SLOW_PERIOD,
+            MACD_SIGNAL_PERIOD,
+            ema_fast=seed.ema_fast if seed else None,
+            ema_slow=seed.ema_slow if seed else None,
+            dea=seed.dea if seed else None,
+        )
+
+        if total >= MACD_SLOW_PERIOD:
+            indicators = np.round(
+                np.column_stack([series["dif"], series["dea"], series["macd"]]), 4
+            )
+        else:
+            indicators = np.full((len(close), 3), np.nan)
+
+        last = _StateSeed(
+            float(series["ema_fast"][-1]),
+            float(series["ema_slow"][-1]),
+            float(series["dea"][-1]),
+        )
+        if len(close) > 1:
+            prev = _StateSeed(
+                float(series["ema_fast"][-2]),
+                float(series["ema_slow"][-2]),
+                float(series["dea"][-2]),
+            )
+            prev_time = str(trade_time[-2])
+        else:
+            prev, prev_time = seed, seed_time
+
+        state = _state_record(
+            symbol_type, symbol_code, timeframe,
+            str(trade_time[-1]), total, last, prev_time, prev,
+        )
+        return indicators, state
+
+
+class _StateSeed(NamedTuple):
+    """MACD 递推所需的 EMA 状态"""
+
+    ema_fast: float
+    ema_slow: float
+    dea: float
+
+
+def _normalize_date(value: Optional[str]) -> Optional[str]:
+    """标准化任意格式的日期参数为 YYYY-MM-DD，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return NormalizedDate(value=value).to_iso()
+    except ValueError:
+        return None
+
 
-        # 使用repository保存
-        return self.kline_repo.upsert_batch(records)
+def _state_record(
+    symbol_type: SymbolType,
+    symbol_code: str,
+    timeframe: KlineTimeframe,
+    trade_time: str,
+    bar_count: int,
+    state,
+    prev_trade_time: Optional[str],
+    prev_state,
+) -> dict:
+    """构造 KlineIndicatorState 的字典记录"""
+    return {
+        "symbol_type": symbol_type,
+        "symbol_code": symbol_code,
+        "timeframe": timeframe,
+        "trade_time": trade_time,
+        "bar_count": bar_count,
+        "ema_fast": state.ema_fast,
+        "ema_slow": state.ema_slow,
+        "dea": state.dea,
+        "prev_trade_time": prev_trade_time if prev_state else None,
+        "prev_ema_fast": prev_state.ema_fast if prev_state else None,
+        "prev_ema_slow": prev_state.ema_slow if prev_state else None,
+        "prev_dea": prev_state.dea if prev_state else None,
+        "updated_at": datetime.now(timezone.utc),
+    }
@@ -8,13 +8,14 @@ K线数据更新器
 """
 
 import asyncio
+import math
 import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-import httpx
 import pandas as pd
-from sqlalchemy.orm import Session
+from sqlalchemy import desc, func
+from sqlalchemy.orm import Session, sessionmaker
 
 from src.config import get_settings
 from src.database import SessionLocal
@@ -23,14 +24,31 @@ from src.models import (
     DataUpdateStatus,
     Kline,
     KlineTimeframe,
+    SymbolMetadata,
     SymbolType,
-    TradeCalendar,
 )
+from src.repositories.kline_columns import PRICE_FIELDS, KlineBatch
 from src.repositories.kline_repository import KlineRepository
 from src.repositories.symbol_repository import SymbolRepository
-from src.schemas.normalized import NormalizedDate, NormalizedDateTime, NormalizedTicker
+from src.schemas.normalized import NormalizedDate, NormalizedTicker
+from src.services.fetch_planner import FetchPlan, plan_fetches
+from src.services.http_client import get_http_manager, http_session
+from src.services.ingest_pipeline import IngestPipeline
+from src.services.kline_gaps import BackfillTask, mark_unfillable, plan_backfill, scan_gaps
 from src.services.kline_service import KlineService, calculate_macd
-from src.services.tushare_client import TushareClient
+from src.services.trading_calendar import (
+    get_trading_calendar,
+    invalidate_trading_calendar,
+    upsert_trade_calendar,
+)
+from src.services.tushare_client import (
+    AsyncTokenBucket,
+    AsyncTushareClient,
+    Priority,
+    TushareClient,
+    shared_async_tushare_client,
+    shared_tushare_client,
+)
 from src.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -41,6 +59,20 @@ THS_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
     "Referer": "http://q.10jqka.com.cn/",
 }
+# 同花顺请求并发数与速率（约等于每批10个、批间隔0.5秒）
+THS_CONCURRENCY = 10
+THS_REQUESTS_PER_SEC = 20
+
+# 没有记录时各更新器的请求窗口（K线数）
+INDEX_WINDOW = 60
+# 某交易日已保存的个股日线数达到股票总数（SymbolMetadata）的该比例时，视为全市场截面已入库；
+# 自选股更新、按需获取只写入少数股票，不能据此跳过全市场截面
+CROSS_SECTION_COVERAGE = 0.9
+STOCK_DAILY_WINDOW = 120
+STOCK_30M_WINDOW = 500
+
+# 自选股30分钟K线获取的最长耗时（秒），留出入库时间，避免与下一轮任务重叠
+STOCK_30M_FETCH_DEADLINE = 20 * 60
 
 # Sina API 配置
 SINA_HEADERS = {
@@ -83,6 +115,7 @@ class KlineUpdater:
         """
         self.settings = get_settings()
         self._tushare_client: Optional[TushareClient] = None
+        self._async_tushare_client: Optional[AsyncTushareClient] = None
         self.kline_repo = kline_repo
         self.symbol_repo = symbol_repo
 
@@ -104,14 +137,16 @@ class KlineUpdater:
     @property
     def tushare_client(self) -> TushareClient:
         if self._tushare_client is None:
-            self._tushare_client = TushareClient(
-                token=self.settings.tushare_token,
-                points=self.settings.tushare_points,
-                delay=self.settings.tushare_delay,
-                max_retries=self.settings.tushare_max_retries,
-            )
+            self._tushare_client = shared_tushare_client(Priority.BATCH)
         return self._tushare_client
 
+    @property
+    def async_tushare_client(self) -> AsyncTushareClient:
+        """异步 Tushare 客户端（async 更新任务使用，不阻塞事件循环）"""
+        if self._async_tushare_client is None:
+            self._async_tushare_client = shared_async_tushare_client()
+        return self._async_tushare_client
+
     def _log_update(
         self,
         session,
@@ -133,160 +168,119 @@ class KlineUpdater:
         self.kline_repo.session.add(log)
         self.kline_repo.session.commit()
 
-    # ==================== 指数更新 ====================
+    # ==================== 入库管道 ====================
 
-    async def update_index_daily(self) -> int:
-        """更新指数日线数据 (新浪API - 实时数据)"""
-        logger.info("开始更新指数日线数据...")
-        total_updated = 0
+    def _pipeline(self, name: str, fetch, parse, **kwargs) -> IngestPipeline:
+        """
+        创建入库管道（写入条目见 _save_item）
 
-        try:
-            async def fetch_daily(ts_code: str, name: str) -> list[dict]:
-                """异步获取日线K线"""
-                code, market = ts_code.split(".")
-                if market == "SH":
-                    sina_code = f"sh{code}"
-                elif market == "SZ":
-                    sina_code = f"sz{code}"
-                elif market == "BJ":
-                    sina_code = f"bj{code}"
-                else:
-                    return []
-
-                # scale=240 表示日线，获取最近60条
-                url = f"https://quotes.sina.cn/cn/api/json_v2.php/CN_MarketDataService.getKLineData?symbol={sina_code}&scale=240&datalen=60"
-
-                try:
-                    async with httpx.AsyncClient() as client:
-                        resp = await client.get(url, headers=SINA_HEADERS, timeout=15.0)
-                        resp.raise_for_status()
-
-                        data = resp.json()
-                        if not data:
-                            return []
-
-                        klines = []
-                        for k in data:
-                            # 日线格式: "2026-01-12"
-                            trade_date = k["day"].split(" ")[0]
-                            klines.append({
-                                "datetime": trade_date,
-                                "open": float(k["open"]),
-                                "high": float(k["high"]),
-                                "low": float(k["low"]),
-                                "close": float(k["close"]),
-                                "volume": int(float(k["volume"])),
-                                "amount": float(k.get("amount", 0)),
-                            })
-
-                        return klines
-                except Exception as e:
-                    logger.error(f"获取 {name} 日线数据失败: {e}")
-                    return []
-
-            # 并发获取所有指数数据
-            tasks = [fetch_daily(ts_code, name) for ts_code, name in INDEX_LIST]
-            results = await asyncio.gather(*tasks)
-
-            for (ts_code, name), klines in zip(INDEX_LIST, results):
-                if klines:
-                    service = KlineService(self.kline_repo, self.symbol_repo)
-                    count = service.save_klines(
-                        symbol_type=SymbolType.INDEX,
-                        symbol_code=ts_code,
-                        symbol_name=name,
-                        timeframe=KlineTimeframe.DAY,
-                        klines=klines,
-                    )
-                    total_updated += count
-                    logger.info(f"  {name}: {count} 条")
+        写入使用绑定同一数据库的独立会话，当前会话可以继续使用（如并发运行的其他更新任务）。
+        """
+        return IngestPipeline(
+            name,
+            fetch,
+            parse,
+            self._save_item,
+            sessionmaker(bind=self.kline_repo.session.get_bind()),
+            **kwargs,
+        )
 
-            self._log_update(
-                self.kline_repo.session, "index_daily", DataUpdateStatus.COMPLETED, total_updated
+    @staticmethod
+    def _kline_item(
+        symbol_type: SymbolType,
+        symbol_code: str,
+        symbol_name: Optional[str],
+        timeframe: KlineTimeframe,
+        klines: KlineBatch,
+        source: str,
+    ) -> Optional[dict]:
+        """单个标的的写入条目（无K线时为 None）"""
+        if not len(klines):
+            return None
+        return {
+            "symbol_type": symbol_type,
+            "symbol_code": symbol_code,
+            "symbol_name": symbol_name,
+            "timeframe": timeframe,
+            "klines": klines,
+            "source": source,
+        }
+
+    @staticmethod
+    def _save_item(session: Session, item: dict) -> int:
+        """写入条目：含 records 时为多标的K线记录，否则为单个标的的K线"""
+        kline_service = KlineService.create_with_session(session)
+        if "records" in item:
+            return kline_service.save_bar_records(
+                item["symbol_type"], item["timeframe"], item["records"], source=item["source"]
             )
-            logger.info(f"指数日线更新完成，共 {total_updated} 条")
+        return kline_service.save_klines(**item)
 
-        except Exception as e:
-            logger.exception("指数日线更新失败")
-            self._log_update(
-                self.kline_repo.session, "index_daily", DataUpdateStatus.FAILED, error_message=str(e)
-            )
+    # ==================== 指数更新 ====================
 
-        return total_updated
+    async def update_index_daily(self) -> int:
+        """更新指数日线数据 (新浪API - 实时数据)"""
+        return await self._update_index(KlineTimeframe.DAY, "index_daily", "指数日线")
 
     async def update_index_30m(self) -> int:
         """更新指数30分钟数据 (Sina API)"""
-        logger.info("开始更新指数30分钟数据...")
+        return await self._update_index(KlineTimeframe.MINS_30, "index_30m", "指数30分钟")
+
+    async def _update_index(self, timeframe: KlineTimeframe, update_type: str, label: str) -> int:
+        """
+        更新指数K线（新浪 getKLineData，日线 scale=240，30分钟 scale=30）
+
+        只请求缺失的K线（没有记录时最近 INDEX_WINDOW 条）。
+        """
+        logger.info(f"开始更新{label}数据...")
         total_updated = 0
+        is_daily = timeframe == KlineTimeframe.DAY
+        names = dict(INDEX_LIST)
+
         try:
-            async def fetch_30m(ts_code: str, name: str) -> list[dict]:
-                """异步获取30分钟K线"""
-                code, market = ts_code.split(".")
-                if market == "SH":
-                    sina_code = f"sh{code}"
-                elif market == "SZ":
-                    sina_code = f"sz{code}"
-                elif market == "BJ":
-                    sina_code = f"bj{code}"
-                else:
-                    return []
-
-                # 只获取最近60条 (约2天数据)
-                url = f"https://quotes.sina.cn/cn/api/json_v2.php/CN_MarketDataService.getKLineData?symbol={sina_code}&scale=30&datalen=60"
-
-                try:
-                    async with httpx.AsyncClient() as client:
-                        resp = await client.get(url, headers=SINA_HEADERS, timeout=15.0)
-                        resp.raise_for_status()
-
-                        data = resp.json()
-                        if not data:
-                            return []
-
-                        klines = []
-                        for k in data:
-                            dt = datetime.strptime(k["day"], "%Y-%m-%d %H:%M:%S")
-                            klines.append({
-                                "datetime": dt.strftime("%Y-%m-%d %H:%M:%S"),
-                                "open": float(k["open"]),
-                                "high": float(k["high"]),
-                                "low": float(k["low"]),
-                                "close": float(k["close"]),
-                                "volume": int(float(k["volume"])),
-                                "amount": float(k["amount"]),
-                            })
-
-                        return klines
-                except Exception as e:
-                    logger.error(f"获取 {name} 30分钟数据失败: {e}")
-                    return []
-
-            # 并发获取所有指数数据
-            tasks = [fetch_30m(ts_code, name) for ts_code, name in INDEX_LIST]
-            results = await asyncio.gather(*tasks)
-
-            for (ts_code, name), klines in zip(INDEX_LIST, results):
-                if klines:
-                    service = KlineService(self.kline_repo, self.symbol_repo)
-                    count = service.save_klines(
-                        symbol_type=SymbolType.INDEX,
-                        symbol_code=ts_code,
-                        symbol_name=name,
-                        timeframe=KlineTimeframe.MINS_30,
-                        klines=klines,
-                    )
-                    total_updated += count
-                    logger.info(f"  {name}: {count} 条")
+            plans = plan_fetches(
+                SymbolType.INDEX, timeframe, list(names), default_window=INDEX_WINDOW
+            )
+            if not plans:
+                logger.info(f"{label}数据已是最新，跳过更新")
+                return 0
+
+            async def fetch(plan: FetchPlan) -> Optional[list]:
+                code, market = plan.code.split(".")
+                if market not in ("SH", "SZ", "BJ"):
+                    return None
+                url = (
+                    "https://quotes.sina.cn/cn/api/json_v2.php/CN_MarketDataService.getKLineData"
+                    f"?symbol={market.lower()}{code}&scale={240 if is_daily else 30}&datalen={plan.window}"
+                )
+                resp = await get_http_manager().get(url, headers=SINA_HEADERS, timeout=15.0)
+                resp.raise_for_status()
+                return resp.json() or None
+
+            def parse(plan: FetchPlan, data: list) -> Optional[dict]:
+                # 日线格式: "2026-01-12"，30分钟格式: "2026-01-12 10:00:00"
+                klines = KlineBatch.from_columns(
+                    [k["day"] for k in data],
+                    [[k[name] for k in data] for name in PRICE_FIELDS[:5]]
+                    + [[k.get("amount", 0) for k in data]],
+                )
+                klines = klines.normalized(is_daily).between(plan.since)
+                return self._kline_item(
+                    SymbolType.INDEX, plan.code, names[plan.code], timeframe, klines, "sina"
+                )
+
+            result = await self._pipeline(update_type, fetch, parse).run(plans)
+            total_updated = result.written
 
             self._log_update(
-                self.kline_repo.session, "index_30m", DataUpdateStatus.COMPLETED, total_updated
+                self.kline_repo.session, update_type, DataUpdateStatus.COMPLETED, total_updated
             )
-            logger.info(f"指数30分钟更新完成，共 {total_updated} 条")
+            logger.info(f"{label}更新完成，共 {total_updated} 条")
 
         except Exception as e:
-            logger.exception("指数30分钟更新失败")
+            logger.exception(f"{label}更新失败")
             self._log_update(
-                self.kline_repo.session, "index_30m", DataUpdateStatus.FAILED, error_message=str(e)
+                self.kline_repo.session, update_type, DataUpdateStatus.FAILED, error_message=str(e)
             )
 
         return total_updated
@@ -326,14 +320,20 @@ class KlineUpdater:
 
         return result
 
-    async def _fetch_ths_kline(
-        self, code: str, period: str = "01"
-    ) -> tuple[str, list[dict]]:
+    async def _fetch_ths_text(self, code: str, period: str = "01") -> str:
+        """获取同花顺K线原始响应 (JSONP)"""
+        url = f"{THS_BASE_URL}/line/bk_{code}/{period}/last.js"
+        resp = await get_http_manager().get(url, headers=THS_HEADERS, timeout=10.0)
+        resp.raise_for_status()
+        return resp.text
+
+    @staticmethod
+    def _parse_ths_kline(text: str, period: str = "01") -> tuple[str, KlineBatch]:
         """
-        获取同花顺K线数据
+        解析同花顺 JSONP K线响应（按列转换，数值无法解析的K线丢弃）
 
         Args:
-            code: 板块代码 (如 885556)
+            text: last.js 响应
             period: "01"=日线, "30"=30分钟
 
         Returns:
@@ -342,151 +342,109 @@ class KlineUpdater:
         import json
         import re
 
-        url = f"{THS_BASE_URL}/line/bk_{code}/{period}/last.js"
+        match = re.search(r"\((\{.*\})\)", text, re.DOTALL)
+        if not match:
+            return "", KlineBatch.empty()
+
+        data = json.loads(match.group(1))
+        name = data.get("name", "")
+        data_str = data.get("data", "")
+
+        # 每根K线: 时间,开,高,低,收,成交量,成交额,...
+        # 日线时间格式: YYYYMMDD, 30分钟格式: YYYYMMDDHHMM
+        rows = [
+            parts[:7]
+            for parts in (item.split(",") for item in data_str.split(";"))
+            if len(parts) >= 7 and parts[1]
+        ]
+        if not rows:
+            return name, KlineBatch.empty()
+
+        frame = pd.DataFrame(rows, columns=["datetime", *PRICE_FIELDS])
+        prices = frame[list(PRICE_FIELDS)].apply(pd.to_numeric, errors="coerce")
+        valid = prices.notna().all(axis=1).to_numpy()
+        if not valid.all():
+            logger.debug(f"解析K线数据失败: {int((~valid).sum())} 根K线数值无效")
+        klines = KlineBatch.from_columns(
+            frame["datetime"].to_numpy()[valid],
+            [prices[field].to_numpy()[valid] for field in PRICE_FIELDS],
+        )
+        return name, klines.normalized(period == "01")
 
-        try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(url, headers=THS_HEADERS, timeout=10.0)
-                resp.raise_for_status()
+    async def _fetch_ths_kline(
+        self, code: str, period: str = "01"
+    ) -> tuple[str, KlineBatch]:
+        """
+        获取同花顺K线数据
 
-                # 解析 JSONP 响应
-                text = resp.text
-                match = re.search(r"\((\{.*\})\)", text, re.DOTALL)
-                if not match:
-                    return "", []
-
-                data = json.loads(match.group(1))
-                name = data.get("name", "")
-                data_str = data.get("data", "")
-
-                if not data_str:
-                    return name, []
-
-                klines = []
-                for item in data_str.split(";"):
-                    parts = item.split(",")
-                    if len(parts) >= 7 and parts[1]:
-                        try:
-                            raw_time = parts[0]
-                            # 使用标准化模型解析时间
-                            # 日线格式: YYYYMMDD, 30分钟格式: YYYYMMDDHHMM
-                            if period == "01":
-                                trade_time = NormalizedDate(value=raw_time).to_iso()
-                            else:
-                                trade_time = NormalizedDateTime(value=raw_time).to_iso()
-
-                            klines.append({
-                                "datetime": trade_time,
-                                "open": float(parts[1]),
-                                "high": float(parts[2]),
-                                "low": float(parts[3]),
-                                "close": float(parts[4]),
-                                "volume": int(parts[5]),
-                                "amount": float(parts[6]),
-                            })
-                        except (ValueError, IndexError) as e:
-                            logger.debug(f"解析K线数据失败: {e}")
-                            continue
-
-                return name, klines
+        Args:
+            code: 板块代码 (如 885556)
+            period: "01"=日线, "30"=30分钟
 
+        Returns:
+            (name, klines)
+        """
+        try:
+            return self._parse_ths_kline(await self._fetch_ths_text(code, period), period)
         except Exception as e:
             logger.error(f"获取概念 {code} K线失败: {e}")
-            return "", []
+            return "", KlineBatch.empty()
 
     async def update_concept_daily(self) -> int:
         """更新概念日线数据 (同花顺)"""
-        logger.info("开始更新概念日线数据...")
-        total_updated = 0
-
-        concepts = self._load_hot_concepts()
-        if not concepts:
-            logger.warning("未找到热门概念列表")
-            return 0
-        try:
-            # 批量获取数据
-            async def fetch_one(code: str, expected_name: str):
-                name, klines = await self._fetch_ths_kline(code, "01")
-                return code, name or expected_name, klines
-
-            # 分批处理，避免并发过多
-            batch_size = 10
-            for i in range(0, len(concepts), batch_size):
-                batch = concepts[i : i + batch_size]
-                tasks = [fetch_one(code, name) for code, name in batch]
-                results = await asyncio.gather(*tasks)
-
-                for code, name, klines in results:
-                    if klines:
-                        service = KlineService(self.kline_repo, self.symbol_repo)
-                        count = service.save_klines(
-                            symbol_type=SymbolType.CONCEPT,
-                            symbol_code=code,
-                            symbol_name=name,
-                            timeframe=KlineTimeframe.DAY,
-                            klines=klines,
-                        )
-                        total_updated += count
-
-                # 批次间延迟
-                await asyncio.sleep(0.5)
-
-            self._log_update(
-                self.kline_repo.session, "concept_daily", DataUpdateStatus.COMPLETED, total_updated
-            )
-            logger.info(f"概念日线更新完成，共 {total_updated} 条")
-
-        except Exception as e:
-            logger.exception("概念日线更新失败")
-            self._log_update(
-                self.kline_repo.session, "concept_daily", DataUpdateStatus.FAILED, error_message=str(e)
-            )
-
-        return total_updated
+        return await self._update_concept(KlineTimeframe.DAY, "concept_daily", "概念日线")
 
     async def update_concept_30m(self) -> int:
         """更新概念30分钟数据 (同花顺)"""
-        logger.info("开始更新概念30分钟数据...")
+        return await self._update_concept(KlineTimeframe.MINS_30, "concept_30m", "概念30分钟")
+
+    async def _update_concept(self, timeframe: KlineTimeframe, update_type: str, label: str) -> int:
+        """
+        更新热门概念K线（同花顺 last.js）
+
+        last.js 窗口固定：跳过已是最新的概念，入库前裁掉已保存的K线；
+        请求并发数和速率与原先 “每批10个、批间隔0.5秒” 相当。
+        """
+        logger.info(f"开始更新{label}数据...")
         total_updated = 0
+        period = "01" if timeframe == KlineTimeframe.DAY else "30"
 
         concepts = self._load_hot_concepts()
         if not concepts:
             logger.warning("未找到热门概念列表")
             return 0
         try:
-            async def fetch_one(code: str, expected_name: str):
-                name, klines = await self._fetch_ths_kline(code, "30")
-                return code, name or expected_name, klines
-
-            batch_size = 10
-            for i in range(0, len(concepts), batch_size):
-                batch = concepts[i : i + batch_size]
-                tasks = [fetch_one(code, name) for code, name in batch]
-                results = await asyncio.gather(*tasks)
-
-                for code, name, klines in results:
-                    if klines:
-                        service = KlineService(self.kline_repo, self.symbol_repo)
-                        count = service.save_klines(
-                            symbol_type=SymbolType.CONCEPT,
-                            symbol_code=code,
-                            symbol_name=name,
-                            timeframe=KlineTimeframe.MINS_30,
-                            klines=klines,
-                        )
-                        total_updated += count
-
-                await asyncio.sleep(0.5)
+            names = dict(concepts)
+            plans = plan_fetches(SymbolType.CONCEPT, timeframe, names)
+            if not plans:
+                logger.info(f"{label}数据已是最新，跳过更新")
+                return 0
+
+            def parse(plan: FetchPlan, text: str) -> Optional[dict]:
+                name, klines = self._parse_ths_kline(text, period)
+                klines = klines.between(plan.since)
+                return self._kline_item(
+                    SymbolType.CONCEPT, plan.code, name or names[plan.code], timeframe, klines, "ths"
+                )
+
+            pipeline = self._pipeline(
+                update_type,
+                lambda plan: self._fetch_ths_text(plan.code, period),
+                parse,
+                fetch_concurrency=THS_CONCURRENCY,
+                rate_limiter=AsyncTokenBucket(rate=THS_REQUESTS_PER_SEC),
+            )
+            total_updated = (await pipeline.run(plans)).written
 
             self._log_update(
-                self.kline_repo.session, "concept_30m", DataUpdateStatus.COMPLETED, total_updated
+                self.kline_repo.session, update_type, DataUpdateStatus.COMPLETED, total_updated
             )
-            logger.info(f"概念30分钟更新完成，共 {total_updated} 条")
+            logger.info(f"{label}更新完成，共 {total_updated} 条")
 
         except Exception as e:
-            logger.exception("概念30分钟更新失败")
+            logger.exception(f"{label}更新失败")
             self._log_update(
-                self.kline_repo.session, "concept_30m", DataUpdateStatus.FAILED, error_message=str(e)
+                self.kline_repo.session, update_type, DataUpdateStatus.FAILED, error_message=str(e)
             )
 
         return total_updated
@@ -514,45 +472,37 @@ class KlineUpdater:
             logger.info("自选股列表为空，跳过更新")
             return 0
 
-        logger.info(f"共 {len(tickers)} 只自选股需要更新")
-        kline_service = KlineService(self.kline_repo, self.symbol_repo)
+        plans = plan_fetches(
+            SymbolType.STOCK, KlineTimeframe.DAY, tickers, default_window=STOCK_DAILY_WINDOW
+        )
+        logger.info(f"共 {len(tickers)} 只自选股，{len(plans)} 只需要更新")
+        if not plans:
+            return 0
+
+        client = self.async_tushare_client
+
+        async def fetch(plan: FetchPlan) -> Optional[pd.DataFrame]:
+            # 有记录时从已保存的最新交易日开始获取（并发请求由令牌桶限流）
+            kwargs = {"start_date": plan.start_date} if plan.since else {}
+            df = await client.fetch_daily(
+                ts_code=client.normalize_ts_code(plan.code),
+                priority=Priority.BATCH,
+                **kwargs,
+            )
+            if df is None or df.empty:
+                logger.debug(f"{plan.code} 无日线数据")
+                return None
+            return df
+
+        def parse(plan: FetchPlan, df: pd.DataFrame) -> Optional[dict]:
+            klines = KlineBatch.from_frame(df.head(STOCK_DAILY_WINDOW))
+            return self._kline_item(
+                SymbolType.STOCK, plan.code, None, KlineTimeframe.DAY, klines, "tushare"
+            )
 
         try:
-            for ticker in tickers:
-                try:
-                    ts_code = self.tushare_client.normalize_ts_code(ticker)
-                    df = self.tushare_client.fetch_daily(ts_code=ts_code)
-                    if df is None or df.empty:
-                        logger.debug(f"{ticker} 无日线数据")
-                        continue
-
-                    # 转换为klines格式
-                    klines = []
-                    for _, row in df.head(120).iterrows():
-                        klines.append({
-                            "datetime": row["trade_date"],
-                            "open": row["open"],
-                            "high": row["high"],
-                            "low": row["low"],
-                            "close": row["close"],
-                            "volume": row["vol"],
-                            "amount": row.get("amount", 0),
-                        })
-
-                    # 保存到数据库
-                    count = kline_service.save_klines(
-                        symbol_type=SymbolType.STOCK,
-                        symbol_code=ticker,
-                        symbol_name=None,  # 暂不保存名称
-                        timeframe=KlineTimeframe.DAY,
-                        klines=klines,
-                    )
-                    total_updated += count
-                    logger.debug(f"{ticker} 日线: {count} 条")
-
-                except Exception as e:
-                    logger.warning(f"{ticker} 日线更新失败: {e}")
-                    continue
+            result = await self._pipeline("stock_daily", fetch, parse).run(plans)
+            total_updated = result.written
 
             self._log_update(
                 self.kline_repo.session, "stock_daily", DataUpdateStatus.COMPLETED, total_updated
@@ -570,8 +520,10 @@ class KlineUpdater:
     async def update_stock_30m(self) -> int:
         """
         更新自选股30分钟K线数据 (新浪财经)
+
+        多只股票并发获取（AIMD 自适应并发），须在下一个30分钟任务前完成。
         """
-        from src.services.sina_kline_provider import SinaKlineProvider
+        from src.services.sina_kline_provider import get_async_sina_kline_provider
 
         logger.info("开始更新自选股30分钟数据...")
         total_updated = 0
@@ -581,46 +533,43 @@ class KlineUpdater:
             logger.info("自选股列表为空，跳过更新")
             return 0
 
-        logger.info(f"共 {len(tickers)} 只自选股需要更新")
-        provider = SinaKlineProvider(delay=0.5)
-        kline_service = KlineService(self.kline_repo, self.symbol_repo)
+        plans = plan_fetches(
+            SymbolType.STOCK, KlineTimeframe.MINS_30, tickers, default_window=STOCK_30M_WINDOW
+        )
+        logger.info(f"共 {len(tickers)} 只自选股，{len(plans)} 只需要更新")
+        if not plans:
+            return 0
+        provider = get_async_sina_kline_provider()
+
+        async def fetch(plan: FetchPlan) -> Optional[pd.DataFrame]:
+            df = await provider.fetch_kline(plan.code, period="30m", limit=plan.window)
+            if df is None or df.empty:
+                logger.debug(f"{plan.code} 无30分钟数据")
+                return None
+            return df
+
+        def parse(plan: FetchPlan, df: pd.DataFrame) -> Optional[dict]:
+            klines = KlineBatch.from_frame(df).normalized(daily=False).between(plan.since)
+            return self._kline_item(
+                SymbolType.STOCK, plan.code, None, KlineTimeframe.MINS_30, klines, "sina"
+            )
 
         try:
-            for ticker in tickers:
-                try:
-                    df = provider.fetch_kline(ticker, period="30m", limit=500)
-                    if df is None or df.empty:
-                        logger.debug(f"{ticker} 无30分钟数据")
-                        continue
-
-                    # 转换为klines格式
-                    klines = []
-                    for _, row in df.iterrows():
-                        klines.append({
-                            "datetime": row["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
-                            "open": row["open"],
-                            "high": row["high"],
-                            "low": row["low"],
-                            "close": row["close"],
-                            "volume": row["volume"],
-                            "amount": 0,
-                        })
-
-                    # 保存到数据库
-                    count = kline_service.save_klines(
-                        symbol_type=SymbolType.STOCK,
-                        symbol_code=ticker,
-                        symbol_name=None,
-                        timeframe=KlineTimeframe.MINS_30,
-                        klines=klines,
-                    )
-                    total_updated += count
-                    logger.debug(f"{ticker} 30分钟: {count} 条")
-
-                except Exception as e:
-                    logger.warning(f"{ticker} 30分钟更新失败: {e}")
-                    continue
+            # 实际并发由 AIMD 限流器控制，管道只保证有足够的请求在排队
+            pipeline = self._pipeline(
+                "stock_30m",
+                fetch,
+                parse,
+                fetch_concurrency=self.settings.sina_kline_max_concurrency,
+                deadline=STOCK_30M_FETCH_DEADLINE,
+            )
+            total_updated = (await pipeline.run(plans)).written
 
+            stats = provider.stats()
+            logger.info(
+                f"新浪K线: {stats['requests_per_sec']} 请求/秒, 并发上限 {stats['concurrency_limit']}, "
+                f"限流 {stats['throttled']} 次"
+            )
             self._log_update(
                 self.kline_repo.session, "stock_30m", DataUpdateStatus.COMPLETED, total_updated
             )
@@ -634,79 +583,172 @@ class KlineUpdater:
 
         return total_updated
 
-    async def update_all_stock_daily(self) -> int:
+    async def _find_missing_stock_trade_dates(self, max_days: int = 30) -> list[str]:
+        """
+        查找全市场日线缺失的交易日
+
+        按交易日统计已保存的个股日线数：覆盖率达到 CROSS_SECTION_COVERAGE 的最新交易日
+        之后（含今天）的交易日都需要获取。只统计最近 max_days 个交易日，
+        交易日历为空时退化为 Tushare 最新交易日。
+
+        Args:
+            max_days: 最多回补的交易日数量
+
+        Returns:
+            缺失交易日列表 (YYYY-MM-DD，升序)
+        """
+        session = self.kline_repo.session
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        universe = session.query(func.count(SymbolMetadata.ticker)).scalar() or 0
+        required = max(1, math.ceil(universe * CROSS_SECTION_COVERAGE))
+
+        calendar = get_trading_calendar(session)
+        window_start = calendar.n_days_back(today, max_days) or calendar.first_day or today
+        covered = (
+            session.query(Kline.trade_time)
+            .filter(
+                Kline.symbol_type == SymbolType.STOCK,
+                Kline.timeframe == KlineTimeframe.DAY,
+                Kline.trade_time >= window_start,
+            )
+            .group_by(Kline.trade_time)
+            .having(func.count() >= required)
+            .order_by(desc(Kline.trade_time))
+            .limit(1)
+            .scalar()
+        )
+
+        start = covered or window_start
+        dates = [day for day in calendar.between(start, today) if day != covered][-max_days:]
+
+        if not dates and not calendar.covers(today):
+            # 交易日历缺失，使用 Tushare 最新交易日兜底
+            trade_date = NormalizedDate(
+                value=await self.async_tushare_client.get_latest_trade_date(
+                    priority=Priority.BATCH
+                )
+            ).to_iso()
+            if not covered or trade_date > covered:
+                dates = [trade_date]
+
+        return sorted(dates)
+
+    @staticmethod
+    def _daily_frame_to_records(
+        df: pd.DataFrame, tickers: Optional[set[str]] = None
+    ) -> list[dict]:
         """
-        更新全市场股票日线数据 (TuShare)
+        将 Tushare 日线截面 DataFrame 按列转换为K线字典
 
-        每只股票只获取最近20条日线，用于每日增量更新
-        预计耗时: 5450只 × 0.1秒 ≈ 9分钟
+        Args:
+            df: fetch_daily(trade_date=...) 返回的 DataFrame
+            tickers: 仅保留这些6位代码（None 表示不过滤）
+
+        Returns:
+            可直接传给 KlineService.save_bar_records 的字典列表
+        """
+        codes = df["ts_code"].str.slice(0, 6)
+        if tickers:
+            mask = codes.isin(tickers).to_numpy()
+            df = df[mask]
+            codes = codes[mask]
+        if df.empty:
+            return []
+
+        raw_dates = df["trade_date"].astype(str)
+        trade_times = raw_dates.str.slice(0, 4) + "-" + raw_dates.str.slice(4, 6) + "-" + raw_dates.str.slice(6, 8)
+        amount = df["amount"] if "amount" in df.columns else pd.Series(0.0, index=df.index)
+
+        now = datetime.now(timezone.utc)
+        columns = zip(
+            codes.tolist(),
+            trade_times.tolist(),
+            df["open"].astype(float).tolist(),
+            df["high"].astype(float).tolist(),
+            df["low"].astype(float).tolist(),
+            df["close"].astype(float).tolist(),
+            df["vol"].fillna(0).astype(float).tolist(),
+            amount.fillna(0).astype(float).tolist(),
+        )
+        return [
+            {
+                "symbol_type": SymbolType.STOCK,
+                "symbol_code": code,
+                "symbol_name": None,
+                "timeframe": KlineTimeframe.DAY,
+                "trade_time": trade_time,
+                "open": o,
+                "high": h,
+                "low": low,
+                "close": c,
+                "volume": v,
+                "amount": a,
+                "dif": None,
+                "dea": None,
+                "macd": None,
+                "updated_at": now,
+            }
+            for code, trade_time, o, h, low, c, v, a in columns
+        ]
+
+    async def update_all_stock_daily(self, max_days: int = 30) -> int:
+        """
+        更新全市场股票日线数据 (TuShare, 按交易日截面)
+
+        对每个缺失的交易日调用一次 fetch_daily(trade_date=...) 获取全市场截面，
+        按列转换后批量 upsert（MACD 从已存状态增量计算），替代逐只股票请求。
+        预计耗时: 每个交易日数秒
+
+        Args:
+            max_days: 最多回补的交易日数量
+
+        Returns:
+            更新的记录数
         """
         logger.info("=" * 50)
         logger.info("开始更新全市场股票日线数据...")
         logger.info("=" * 50)
         total_updated = 0
-        success_count = 0
-        fail_count = 0
-        kline_service = KlineService(self.kline_repo, self.symbol_repo)
 
         try:
-            # 获取所有股票代码
-            from src.models import SymbolMetadata
-            all_tickers = self.kline_repo.session.query(SymbolMetadata.ticker).all()
-            tickers = [t[0] for t in all_tickers]
-            total = len(tickers)
+            tickers = {
+                t[0] for t in self.kline_repo.session.query(SymbolMetadata.ticker).all()
+            }
+            trade_dates = await self._find_missing_stock_trade_dates(max_days=max_days)
+            if not trade_dates:
+                logger.info("全市场日线已是最新，跳过更新")
+                return 0
 
-            logger.info(f"共 {total} 只股票需要更新")
+            logger.info(
+                f"共 {len(trade_dates)} 个交易日需要更新: "
+                f"{trade_dates[0]} ~ {trade_dates[-1]}"
+            )
             start_time = time.time()
 
-            for i, ticker in enumerate(tickers):
-                try:
-                    # 只获取最近20条日线用于增量更新
-                    ts_code = self.tushare_client.normalize_ts_code(ticker)
-                    df = self.tushare_client.fetch_daily(ts_code=ts_code)
-                    if df is None or df.empty:
-                        fail_count += 1
-                        continue
-
-                    # 转换为klines格式
-                    klines = []
-                    for _, row in df.head(20).iterrows():
-                        klines.append({
-                            "datetime": row["trade_date"],
-                            "open": row["open"],
-                            "high": row["high"],
-                            "low": row["low"],
-                            "close": row["close"],
-                            "volume": row["vol"],
-                            "amount": row.get("amount", 0),
-                        })
-
-                    # 保存到数据库
-                    count = kline_service.save_klines(
-                        symbol_type=SymbolType.STOCK,
-                        symbol_code=ticker,
-                        symbol_name=None,
-                        timeframe=KlineTimeframe.DAY,
-                        klines=klines,
-                    )
-                    total_updated += count
-                    success_count += 1
-
-                except Exception as e:
-                    fail_count += 1
-                    logger.debug(f"{ticker} 更新失败: {e}")
-                    continue
-
-                # 每500只股票打印一次进度
-                if (i + 1) % 500 == 0:
-                    elapsed = time.time() - start_time
-                    rate = (i + 1) / elapsed
-                    remaining = (total - i - 1) / rate if rate > 0 else 0
-                    logger.info(
-                        f"进度: {i + 1}/{total} ({(i+1)/total*100:.1f}%) | "
-                        f"成功: {success_count} | 失败: {fail_count} | "
-                        f"预计剩余: {remaining/60:.1f}分钟"
-                    )
+            async def fetch(trade_date: str) -> Optional[pd.DataFrame]:
+                df = await self.async_tushare_client.fetch_daily(
+                    trade_date=trade_date.replace("-", ""), priority=Priority.BATCH
+                )
+                if df is None or df.empty:
+                    logger.warning(f"{trade_date} 无日线截面数据（可能尚未发布）")
+                    return None
+                return df
+
+            def parse(trade_date: str, df: pd.DataFrame) -> dict:
+                return {
+                    "symbol_type": SymbolType.STOCK,
+                    "timeframe": KlineTimeframe.DAY,
+                    "records": self._daily_frame_to_records(df, tickers),
+                    "source": "tushare",
+                }
+
+            # 截面逐日请求（Tushare 按分钟限流），下一日的获取与上一日的写入重叠；
+            # 每个交易日单独提交
+            pipeline = self._pipeline(
+                "all_stock_daily", fetch, parse, fetch_concurrency=1, max_group=1
+            )
+            total_updated = (await pipeline.run(trade_dates)).written
 
             elapsed = time.time() - start_time
             self._log_update(
@@ -714,90 +756,164 @@ class KlineUpdater:
             )
             logger.info("=" * 50)
             logger.info(
-                f"全市场日线更新完成 | 耗时: {elapsed/60:.1f}分钟 | "
-                f"成功: {success_count} | 失败: {fail_count} | 共 {total_updated} 条"
+                f"全市场日线更新完成 | 耗时: {elapsed:.1f}秒 | "
+                f"交易日: {len(trade_dates)} | 共 {total_updated} 条"
             )
             logger.info("=" * 50)
 
         except Exception as e:
             logger.exception("全市场日线更新失败")
+            self.kline_repo.session.rollback()
             self._log_update(
                 self.kline_repo.session, "all_stock_daily", DataUpdateStatus.FAILED, error_message=str(e)
             )
 
         return total_updated
 
-    # ==================== 单股更新 (添加自选时触发) ====================
+    # ==================== 缺口回补 ====================
 
-    async def update_single_stock_klines(self, ticker: str) -> dict:
+    async def backfill_gaps(self, max_requests: Optional[int] = None) -> dict:
         """
-        更新单只股票的日线和30分钟数据
-        用于添加自选股时立即获取数据
+        扫描 klines 表中的缺口并按请求数预算回补
+
+        新浪请求并发执行（AIMD 限流），Tushare 请求经令牌桶限流；超出预算的任务留到下次。
+        回补后仍存在的缺口（如停牌）登记为无法回补。
 
         Args:
-            ticker: 股票代码 (6位)
+            max_requests: 本次最多发出的上游请求数（默认 GAP_BACKFILL_MAX_REQUESTS）
 
         Returns:
-            {"daily": 条数, "mins30": 条数}
+            {"gaps", "missing_bars", "tasks", "executed", "deferred", "saved", "unfillable"}
         """
-        from src.services.sina_kline_provider import SinaKlineProvider
-
-        result = {"daily": 0, "mins30": 0}
-        logger.info(f"开始更新单股 {ticker} 的K线数据...")
+        budget = self.settings.gap_backfill_max_requests if max_requests is None else max_requests
+        session = self.kline_repo.session
+        timeframes = (KlineTimeframe.DAY, KlineTimeframe.MINS_30)
+        result = {
+            "gaps": 0, "missing_bars": 0, "tasks": 0, "executed": 0,
+            "deferred": 0, "saved": 0, "unfillable": 0,
+        }
 
-        # 1. 更新日线 (TuShare)
         try:
-            ts_code = self.tushare_client.normalize_ts_code(ticker)
-            daily_df = self.tushare_client.fetch_daily(ts_code=ts_code)
-
-            if daily_df is not None and not daily_df.empty:
-                # 转换DataFrame为KlineService期望的格式 (timestamp -> datetime)
-                if 'timestamp' in daily_df.columns:
-                    daily_df = daily_df.rename(columns={'timestamp': 'datetime'})
-                daily_klines = daily_df.to_dict('records')
-                service = KlineService(self.kline_repo, self.symbol_repo)
-                count = service.save_klines(
-                    symbol_type=SymbolType.STOCK,
-                    symbol_code=ticker,
-                    symbol_name=None,
-                    timeframe=KlineTimeframe.DAY,
-                    klines=daily_klines,
-                )
-                self.kline_repo.session.commit()
-                result["daily"] = count
-                logger.info(f"{ticker} 日线更新: {count} 条")
-
-        except Exception as e:
-            logger.warning(f"{ticker} 日线更新失败: {e}")
+            gaps = [gap for tf in timeframes for gap in scan_gaps(session, tf)]
+            tasks = plan_backfill(gaps)
+            run = tasks[:budget]
+            result.update(
+                gaps=len(gaps),
+                missing_bars=sum(gap.missing for gap in gaps),
+                tasks=len(tasks),
+                executed=len(run),
+                deferred=len(tasks) - len(run),
+            )
+            if not run:
+                logger.info(f"K线缺口扫描: {len(gaps)} 个缺口，无需回补")
+                return result
 
-        # 2. 更新30分钟 (新浪财经)
-        try:
-            sina = SinaKlineProvider()
-            mins30_df = sina.fetch_kline(ticker, period="30m", limit=80)
-
-            if mins30_df is not None and not mins30_df.empty:
-                # 转换DataFrame为KlineService期望的格式 (timestamp -> datetime)
-                if 'timestamp' in mins30_df.columns:
-                    mins30_df = mins30_df.rename(columns={'timestamp': 'datetime'})
-                mins30_klines = mins30_df.to_dict('records')
-                service = KlineService(self.kline_repo, self.symbol_repo)
-                count = service.save_klines(
-                    symbol_type=SymbolType.STOCK,
-                    symbol_code=ticker,
-                    symbol_name=None,
-                    timeframe=KlineTimeframe.MINS_30,
-                    klines=mins30_klines,
+            logger.info(
+                f"K线缺口扫描: {len(gaps)} 个缺口 / {result['missing_bars']} 根K线，"
+                f"本次回补 {len(run)} 个请求，{result['deferred']} 个留到下次"
+            )
+            pipeline = self._pipeline(
+                "kline_gap_backfill",
+                self._fetch_backfill,
+                self._parse_backfill,
+                fetch_concurrency=self.settings.sina_kline_max_concurrency,
+            )
+            result["saved"] = (await pipeline.run(run)).written
+
+            # 已请求过仍缺失的区间登记为无法回补
+            attempted = {}
+            for task in run:
+                for gap in task.gaps:
+                    attempted.setdefault(
+                        (gap.symbol_type, gap.symbol_code, gap.timeframe), []
+                    ).append((gap.start, gap.end))
+            unfillable = [
+                gap
+                for tf in timeframes
+                for gap in scan_gaps(session, tf)
+                if any(
+                    start <= gap.end and gap.start <= end
+                    for start, end in attempted.get((gap.symbol_type, gap.symbol_code, gap.timeframe), ())
                 )
-                self.kline_repo.session.commit()
-                result["mins30"] = count
-                logger.info(f"{ticker} 30分钟更新: {count} 条")
+            ]
+            mark_unfillable(unfillable)
+            result["unfillable"] = len(unfillable)
+
+            self._log_update(session, "kline_gap_backfill", DataUpdateStatus.COMPLETED, result["saved"])
+            logger.info(
+                f"K线缺口回补完成: 保存 {result['saved']} 条，{len(unfillable)} 个缺口上游无数据"
+            )
 
         except Exception as e:
-            logger.warning(f"{ticker} 30分钟更新失败: {e}")
+            logger.exception("K线缺口回补失败")
+            session.rollback()
+            self._log_update(session, "kline_gap_backfill", DataUpdateStatus.FAILED, error_message=str(e))
 
-        logger.info(f"单股 {ticker} 更新完成: 日线 {result['daily']} 条, 30分钟 {result['mins30']} 条")
         return result
 
+    @staticmethod
+    def _sina_symbol(task: BackfillTask) -> str:
+        """回补任务的新浪代码（个股为6位代码，指数如 sh000001）"""
+        if task.symbol_type == SymbolType.INDEX:
+            code, market = task.code.split(".")
+            return f"{market.lower()}{code}"
+        return task.code
+
+    async def _fetch_backfill(self, task: BackfillTask):
+        """回补任务的上游请求（Tushare / 新浪返回 DataFrame，同花顺返回原始响应）"""
+        from src.services.sina_kline_provider import get_async_sina_kline_provider
+
+        is_daily = task.timeframe == KlineTimeframe.DAY
+        client = self.async_tushare_client
+        if task.code is None:
+            # 全市场截面
+            df = await client.fetch_daily(
+                trade_date=task.start.replace("-", ""), priority=Priority.BATCH
+            )
+        elif task.symbol_type == SymbolType.STOCK and is_daily:
+            df = await client.fetch_daily(
+                ts_code=client.normalize_ts_code(task.code),
+                start_date=task.start.replace("-", ""),
+                end_date=task.end.replace("-", ""),
+                priority=Priority.BATCH,
+            )
+        elif task.window is not None:
+            df = await get_async_sina_kline_provider().fetch_kline(
+                self._sina_symbol(task), period="day" if is_daily else "30m", limit=task.window
+            )
+        else:
+            return await self._fetch_ths_text(task.code, "01" if is_daily else "30")
+        return None if df is None or df.empty else df
+
+    def _parse_backfill(self, task: BackfillTask, raw) -> Optional[dict]:
+        """回补任务的写入条目，只保留缺口区间内的K线"""
+        is_daily = task.timeframe == KlineTimeframe.DAY
+        if task.code is None:
+            # 截面只保留缺失该日K线的股票（按截面写入，提交前重算该日全市场统计）
+            records = self._daily_frame_to_records(raw, {gap.symbol_code for gap in task.gaps})
+            if not records:
+                return None
+            return {
+                "symbol_type": SymbolType.STOCK,
+                "timeframe": KlineTimeframe.DAY,
+                "records": records,
+                "source": "tushare",
+            }
+
+        if task.symbol_type == SymbolType.STOCK and is_daily:
+            klines = KlineBatch.from_frame(raw).normalized(True)
+            source = "tushare"
+        elif task.window is not None:
+            klines = KlineBatch.from_frame(raw).normalized(is_daily)
+            source = "sina"
+        else:
+            _, klines = self._parse_ths_kline(raw, "01" if is_daily else "30")
+            source = "ths"
+
+        klines = klines.between(task.start, task.end)
+        name = dict(INDEX_LIST).get(task.code) if task.symbol_type == SymbolType.INDEX else None
+        return self._kline_item(task.symbol_type, task.code, name, task.timeframe, klines, source)
+
     # ==================== 交易日历更新 ====================
 
     def update_trade_calendar(self) -> int:
@@ -817,27 +933,10 @@ class KlineUpdater:
                 logger.warning("未获取到交易日历数据")
                 return 0
 
-            count = 0
-            for _, row in df.iterrows():
-                # 使用标准化模型转换日期
-                trade_date = NormalizedDate(value=str(row["cal_date"])).to_iso()
-                is_open = row["is_open"] == 1
-
-                # Upsert
-                existing = (
-                    self.kline_repo.session.query(TradeCalendar)
-                    .filter(TradeCalendar.date == trade_date)
-                    .first()
-                )
-                if existing:
-                    existing.is_trading_day = is_open
-                else:
-                    self.kline_repo.session.add(
-                        TradeCalendar(date=trade_date, is_trading_day=is_open)
-                    )
-                count += 1
-
+            days = dict(zip(df["cal_date"].astype(str), df["is_open"].astype(int) == 1))
+            count = upsert_trade_calendar(self.kline_repo.session, days)
             self.kline_repo.session.commit()
+            invalidate_trading_calendar()
             self._log_update(
                 self.kline_repo.session, "trade_calendar", DataUpdateStatus.COMPLETED, count
             )
@@ -871,28 +970,17 @@ class KlineUpdater:
 
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
         try:
+            # 经 KlineService 删除：同步维护指标状态、最新K线汇总和数组缓存
+            kline_service = KlineService(self.kline_repo, self.symbol_repo)
+
             # 清理30分钟线 (只保留90天)
             mins_cutoff = (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d")
-            deleted = (
-                self.kline_repo.session.query(Kline)
-                .filter(
-                    Kline.timeframe == KlineTimeframe.MINS_30,
-                    Kline.trade_time < mins_cutoff,
-                )
-                .delete()
-            )
+            deleted = kline_service.delete_klines_before(KlineTimeframe.MINS_30, mins_cutoff)
             total_deleted += deleted
             logger.info(f"  30分钟线: 删除 {deleted} 条")
 
             # 清理日线 (保留1年)
-            deleted = (
-                self.kline_repo.session.query(Kline)
-                .filter(
-                    Kline.timeframe == KlineTimeframe.DAY,
-                    Kline.trade_time < cutoff_date,
-                )
-                .delete()
-            )
+            deleted = kline_service.delete_klines_before(KlineTimeframe.DAY, cutoff_date)
             total_deleted += deleted
             logger.info(f"  日线: 删除 {deleted} 条")
 
@@ -918,10 +1006,11 @@ async def run_daily_update():
         updater = KlineUpdater.create_with_session(session)
 
         # 并发更新指数日线和概念日线
-        await asyncio.gather(
-            updater.update_index_daily(),
-            updater.update_concept_daily(),
-        )
+        async with http_session():
+            await asyncio.gather(
+                updater.update_index_daily(),
+                updater.update_concept_daily(),
+            )
 
         logger.info("每日更新任务完成")
     finally:
@@ -936,10 +1025,11 @@ async def run_30m_update():
         updater = KlineUpdater.create_with_session(session)
 
         # 并发更新指数和概念30分钟线
-        await asyncio.gather(
-            updater.update_index_30m(),
-            updater.update_concept_30m(),
-        )
+        async with http_session():
+            await asyncio.gather(
+                updater.update_index_30m(),
+                updater.update_concept_30m(),
+            )
 
         logger.info("30分钟更新任务完成")
     finally:
@@ -0,0 +1,414 @@
+"""
+全市场涨跌统计服务
+
+全市场个股日线截面入库后（KlineService.save_bar_records），在同一事务提交前
+重新计算受影响交易日的涨跌家数、涨跌停家数、成交额和分板块统计，
+写入 market_breadth_daily；同一次重算按 stock_sectors 汇总赛道成交额，
+写入 sector_turnover_daily。读取方直接查统计表。
+
+单个标的的写入（save_klines，如单股回补）不触发重算；截面覆盖的股票数不足
+MIN_COVERAGE 时涨跌统计既不写入也不返回，避免残缺截面覆盖或冒充全市场统计。
+赛道成交额沿用"有成交股票数"口径，残缺截面也会写入，由读取方按 traded_count 筛选。
+分钟K线只按自选股逐个入库，凑不成全市场截面，因此不做盘中统计。
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from src.models import (
+    DataUpdateLog,
+    DataUpdateStatus,
+    KlineTimeframe,
+    MarketBreadthDaily,
+    SectorTurnoverDaily,
+    SymbolMetadata,
+    SymbolType,
+)
+from src.repositories.kline_repository import KlineRepository
+from src.repositories.market_breadth_repository import MarketBreadthRepository
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 板块及涨跌停幅度
+BOARD_LIMITS = {
+    "main": 0.10,  # 沪深主板
+    "chinext": 0.20,  # 创业板
+    "star": 0.20,  # 科创板
+    "bse": 0.30,  # 北交所
+}
+# 主板 ST 股票涨跌停幅度
+ST_LIMIT = 0.05
+
+# 价格比较容差（价格精确到分）
+PRICE_EPSILON = 1e-6
+
+# 统计的最低覆盖率：截面股票数不足股票池（symbol_metadata）的该比例时视为残缺截面
+MIN_COVERAGE = 0.8
+
+# 启动回填在 data_update_log 中的类型（记录已尝试过回填）
+BACKFILL_UPDATE_TYPE = "market_breadth_backfill"
+
+# 会话中登记待重算交易日的键
+_DIRTY_KEY = "market_breadth_dirty"
+
+
+def classify_boards(codes: np.ndarray) -> np.ndarray:
+    """
+    按6位代码划分板块
+
+    Args:
+        codes: 股票代码数组
+
+    Returns:
+        板块名数组（main / chinext / star / bse）
+    """
+    codes = np.asarray(codes, dtype=str)
+    boards = np.full(len(codes), "main", dtype=object)
+    boards[np.char.startswith(codes, "30")] = "chinext"
+    boards[np.char.startswith(codes, "68")] = "star"
+    bse = (
+        np.char.startswith(codes, "8")
+        | np.char.startswith(codes, "4")
+        | np.char.startswith(codes, "92")
+    )
+    boards[bse] = "bse"
+    return boards
+
+
+def _limit_price(prev_close: np.ndarray, pct: np.ndarray) -> np.ndarray:
+    """涨跌停价（四舍五入到分）"""
+    return np.floor(prev_close * (1 + pct) * 100 + 0.5) / 100
+
+
+def compute_breadth(rows: list) -> Optional[dict]:
+    """
+    由截面数据计算涨跌统计
+
+    Args:
+        rows: KlineRepository.find_cross_section 的结果
+            [(symbol_code, name, open, close, volume, amount, prev_close), ...]
+
+    Returns:
+        与 MarketBreadthMixin 字段一致的字典；截面为空时返回 None
+    """
+    if not rows:
+        return None
+
+    codes, names, opens, closes, volumes, amounts, prevs = zip(*rows)
+    opens = np.asarray(opens, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    volumes = np.nan_to_num(np.asarray(volumes, dtype=np.float64))
+    amounts = np.nan_to_num(np.asarray(amounts, dtype=np.float64))
+    prevs = np.asarray(prevs, dtype=np.float64)
+
+    # 无前收盘（新股首日）时以开盘价为基准
+    prevs = np.where(np.isnan(prevs) | (prevs <= 0), opens, prevs)
+    diff = closes - prevs
+    up = diff > PRICE_EPSILON
+    down = diff < -PRICE_EPSILON
+
+    boards = classify_boards(codes)
+    pct = np.array([BOARD_LIMITS[b] for b in boards])
+    is_st = np.array(["ST" in (name or "").upper() for name in names])
+    pct = np.where(is_st & (boards == "main"), ST_LIMIT, pct)
+
+    valid = prevs > 0
+    limit_up = valid & (closes >= _limit_price(prevs, pct) - PRICE_EPSILON)
+    limit_down = valid & (closes <= _limit_price(prevs, -pct) + PRICE_EPSILON)
+
+    board_breadth = {}
+    for board in BOARD_LIMITS:
+        mask = boards == board
+        if mask.any():
+            board_breadth[board] = {
+                "count": int(mask.sum()),
+                "up": int((up & mask).sum()),
+                "down": int((down & mask).sum()),
+            }
+
+    return {
+        "stock_count": len(rows),
+        "traded_count": int((volumes > 0).sum()),
+        "up_count": int(up.sum()),
+        "down_count": int(down.sum()),
+        "flat_count": int(len(rows) - up.sum() - down.sum()),
+        "limit_up_count": int(limit_up.sum()),
+        "limit_down_count": int(limit_down.sum()),
+        "total_amount": float(amounts.sum()),
+        "total_volume": float(volumes.sum()),
+        "board_breadth": board_breadth,
+    }
+
+
+def compute_sector_turnover(rows: list, ticker_to_sector: Dict[str, str]) -> dict:
+    """
+    由截面数据按赛道汇总成交额
+
+    Args:
+        rows: KlineRepository.find_cross_section 的结果
+        ticker_to_sector: {股票代码: 赛道}
+
+    Returns:
+        与 SectorTurnoverDaily 字段一致的字典（traded_count, sectors）
+    """
+    sectors: Dict[str, dict] = {}
+    traded = 0
+    for code, _name, _open, close, volume, _amount, _prev in rows:
+        volume = volume or 0
+        if volume > 0:
+            traded += 1
+        sector = ticker_to_sector.get(code)
+        if not sector:
+            continue
+        # 成交额 = 手数 * 收盘价 * 100
+        item = sectors.setdefault(sector, {"amount": 0.0, "count": 0})
+        item["amount"] += volume * (close or 0) * 100
+        item["count"] += 1
+    return {"traded_count": traded, "sectors": sectors}
+
+
+class MarketBreadthService:
+    """全市场涨跌统计的计算与读取"""
+
+    def __init__(self, session: Session):
+        """
+        初始化MarketBreadthService
+
+        Args:
+            session: SQLAlchemy Session
+        """
+        self.session = session
+        self.kline_repo = KlineRepository(session)
+        self.breadth_repo = MarketBreadthRepository(session)
+        self._required: Optional[int] = None
+
+    def required_stock_count(self) -> int:
+        """
+        一条统计至少需要覆盖的股票数
+
+        Returns:
+            股票池数量 × MIN_COVERAGE（股票池为空时为 1）
+        """
+        if self._required is None:
+            universe = self.session.query(func.count(SymbolMetadata.ticker)).scalar() or 0
+            self._required = max(1, math.ceil(universe * MIN_COVERAGE))
+        return self._required
+
+    def refresh(self, trade_dates: Iterable[str]) -> int:
+        """
+        重新计算并保存指定交易日的涨跌统计和赛道成交额（不提交事务）
+
+        Args:
+            trade_dates: 交易日期（YYYY-MM-DD）
+
+        覆盖不足的交易日不写入涨跌统计，也不改动已有的统计；赛道成交额照常写入。
+
+        Returns:
+            写入的涨跌统计行数
+        """
+        now = datetime.now(timezone.utc)
+        required = self.required_stock_count()
+        ticker_to_sector = self._sector_map()
+        records, turnover = [], []
+        for trade_date in sorted(set(trade_dates)):
+            rows = self.kline_repo.find_cross_section(
+                SymbolType.STOCK, KlineTimeframe.DAY, trade_date
+            )
+            if not rows:
+                self.breadth_repo.delete_daily(trade_date)
+                self.breadth_repo.delete_sector_turnover(trade_date)
+                continue
+
+            turnover.append(
+                {"trade_date": trade_date, "updated_at": now,
+                 **compute_sector_turnover(rows, ticker_to_sector)}
+            )
+
+            stats = compute_breadth(rows)
+            if stats["stock_count"] < required:
+                logger.debug(
+                    f"{trade_date} 截面仅 {stats['stock_count']} 只股票（需 {required}），跳过统计"
+                )
+                continue
+
+            stats["trade_date"] = trade_date
+            stats["updated_at"] = now
+            records.append(stats)
+
+        self.breadth_repo.upsert_sector_turnover(turnover)
+        return self.breadth_repo.upsert_daily(records)
+
+    def refresh_sector_turnover(self, trade_dates: Iterable[str]) -> int:
+        """
+        按当前 stock_sectors 重算指定交易日的赛道成交额（赛道分类修改后调用，不提交事务）
+
+        Args:
+            trade_dates: 交易日期（YYYY-MM-DD）
+
+        Returns:
+            写入的行数
+        """
+        now = datetime.now(timezone.utc)
+        ticker_to_sector = self._sector_map()
+        turnover = []
+        for trade_date in sorted(set(trade_dates)):
+            rows = self.kline_repo.find_cross_section(
+                SymbolType.STOCK, KlineTimeframe.DAY, trade_date
+            )
+            if rows:
+                turnover.append(
+                    {"trade_date": trade_date, "updated_at": now,
+                     **compute_sector_turnover(rows, ticker_to_sector)}
+                )
+        return self.breadth_repo.upsert_sector_turnover(turnover)
+
+    def _sector_map(self) -> Dict[str, str]:
+        """stock_sectors 中的 {股票代码: 赛道}（表由赛道脚本/接口创建，可能不存在）"""
+        if not inspect(self.session.connection()).has_table("stock_sectors"):
+            return {}
+        return dict(
+            self.session.execute(text("SELECT ticker, sector FROM stock_sectors")).all()
+        )
+
+    def get_daily(self, trade_date: str) -> Optional[MarketBreadthDaily]:
+        """
+        获取某个交易日的统计（统计表中没有时从 klines 现算，不落库）
+
+        Args:
+            trade_date: 交易日期（YYYY-MM-DD）
+
+        Returns:
+            统计数据；该日个股日线覆盖不足时返回 None
+        """
+        required = self.required_stock_count()
+        breadth = self.breadth_repo.find_daily(trade_date)
+        if breadth is not None and breadth.stock_count >= required:
+            return breadth
+
+        stats = compute_breadth(
+            self.kline_repo.find_cross_section(SymbolType.STOCK, KlineTimeframe.DAY, trade_date)
+        )
+        if stats is None or stats["stock_count"] < required:
+            return None
+        return MarketBreadthDaily(trade_date=trade_date, **stats)
+
+    def get_previous_daily(self, trade_date: str, limit: int = 5) -> List[MarketBreadthDaily]:
+        """
+        获取某个交易日之前最近几个交易日的统计（跳过覆盖不足的行）
+
+        Args:
+            trade_date: 交易日期（YYYY-MM-DD，不包含）
+            limit: 返回数量
+
+        Returns:
+            统计数据列表（按日期倒序）
+        """
+        return self.breadth_repo.find_daily_before(
+            trade_date, limit, min_stock_count=self.required_stock_count()
+        )
+
+    def get_sector_turnover(
+        self, limit: int = 2, min_traded: int = 0
+    ) -> List[SectorTurnoverDaily]:
+        """
+        获取最近交易日的赛道成交额（不要求 MIN_COVERAGE）
+
+        Args:
+            limit: 返回数量
+            min_traded: 全市场有成交股票数需超过该值
+
+        Returns:
+            统计数据列表（按日期倒序）
+        """
+        return self.breadth_repo.find_recent_sector_turnover(limit=limit, min_traded=min_traded)
+
+    def backfill_daily(self, limit: int = 60) -> int:
+        """
+        回填最近若干个交易日的日线统计和赛道成交额（建表后首次使用）
+
+        Args:
+            limit: 回填的交易日数量
+
+        Returns:
+            写入的统计行数
+        """
+        dates = self.kline_repo.find_recent_trade_times(
+            SymbolType.STOCK, KlineTimeframe.DAY, limit
+        )
+        return self.refresh(dates)
+
+    def backfill_daily_once(self, limit: int = 60) -> Optional[int]:
+        """
+        启动时回填一次最近的交易日统计（不提交事务）
+
+        回填记录在 data_update_log 中：覆盖不足等原因没有写入任何统计时，
+        之后的启动也不会重复扫描 klines，统计由后续的截面入库维护。
+
+        Args:
+            limit: 回填的交易日数量
+
+        Returns:
+            写入的统计行数；已回填过时返回 None
+        """
+        attempted = self.session.execute(
+            select(DataUpdateLog.id)
+            .filter(DataUpdateLog.update_type == BACKFILL_UPDATE_TYPE)
+            .limit(1)
+        ).first()
+        if attempted:
+            return None
+
+        started_at = datetime.now(timezone.utc)
+        count = self.backfill_daily(limit)
+        self.session.add(
+            DataUpdateLog(
+                update_type=BACKFILL_UPDATE_TYPE,
+                status=DataUpdateStatus.COMPLETED,
+                records_updated=count,
+                started_at=started_at,
+                completed_at=datetime.now(timezone.utc),
+            )
+        )
+        return count
+
+
+def mark_breadth_dirty(session: Optional[Session], trade_dates: Iterable[str]) -> None:
+    """
+    登记会话中写入了个股日线截面的交易日，事务提交前重算这些交易日的统计
+
+    Args:
+        session: 写入K线的会话
+        trade_dates: 写入的交易日期
+    """
+    if not isinstance(session, Session):
+        return
+
+    dirty = session.info.get(_DIRTY_KEY)
+    if dirty is None:
+        dirty = session.info[_DIRTY_KEY] = set()
+        if not event.contains(session, "before_commit", _refresh_before_commit):
+            event.listen(session, "before_commit", _refresh_before_commit)
+            event.listen(session, "after_rollback", _discard_after_rollback)
+    dirty.update(trade_dates)
+
+
+def _refresh_before_commit(session: Session) -> None:
+    dirty: set = session.info.pop(_DIRTY_KEY, None)
+    if not dirty:
+        return
+
+    try:
+        MarketBreadthService(session).refresh(dirty)
+    except Exception as e:
+        # 统计失败不影响K线提交；读取方对缺失的日期会现算
+        logger.error(f"全市场涨跌统计计算失败: {e}")
+
+
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
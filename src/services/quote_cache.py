@@ -0,0 +1,231 @@
+"""
+实时行情上游缓存
+
+/realtime/prices、/concepts/realtime、/index/realtime 等代理接口共用的进程内缓存：
+- 按 (namespace, key) 缓存，每个标的一条
+- TTL 随交易时段变化：盘中短（行情在变），盘后/午休长
+- 同一 key 的并发未命中合并为一次上游请求（single-flight）
+- 批量请求只为未命中的 key 调用一次加载函数，结果按 key 拼装
+- 统计命中、未命中、合并等待和上游调用次数
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from src.services.trading_calendar import get_trading_calendar
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+TZ_SHANGHAI = ZoneInfo("Asia/Shanghai")
+
+BatchLoader = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+
+def in_trading_session(now: Optional[datetime] = None) -> bool:
+    """是否处于A股行情变动时段（交易日 9:25-11:30、13:00-15:00，节假日按交易日历）"""
+    now = now or datetime.now(TZ_SHANGHAI)
+    return get_trading_calendar().in_quote_session(now)
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+
+
+@dataclass
+class CacheStats:
+    """单个 namespace 的缓存统计"""
+
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    upstream_calls: int = 0
+    upstream_errors: int = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class QuoteCache:
+    """带 TTL 和 single-flight 的行情缓存"""
+
+    def __init__(
+        self,
+        trading_ttl: float = 3.0,
+        idle_ttl: float = 60.0,
+        max_entries: int = 20000,
+        clock: Callable[[], float] = time.monotonic,
+        session_check: Callable[[], bool] = in_trading_session,
+    ):
+        """
+        Args:
+            trading_ttl: 交易时段内的缓存时间（秒）
+            idle_ttl: 非交易时段的缓存时间（秒）
+            max_entries: 条目数超过该值时清理过期条目
+            clock: 单调时钟（测试用）
+            session_check: 判断是否处于交易时段（测试用）
+        """
+        self.trading_ttl = trading_ttl
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._session_check = session_check
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._stats: Dict[str, CacheStats] = {}
+
+    def ttl(self) -> float:
+        """当前时段的 TTL"""
+        return self.trading_ttl if self._session_check() else self.idle_ttl
+
+    async def get(self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        获取单个 key
+
+        Args:
+            namespace: 缓存分区（如 sina_hq、ths_concept）
+            key: 标的代码
+            loader: 未命中时调用的上游请求函数
+
+        Raises:
+            loader 抛出的异常（不缓存，同时传给合并等待的请求）
+        """
+
+        async def load(keys: List[str]) -> Dict[str, Any]:
+            return {key: await loader()}
+
+        return (await self.get_many(namespace, [key], load))[key]
+
+    async def get_many(
+        self, namespace: str, keys: Sequence[str], loader: BatchLoader
+    ) -> Dict[str, Any]:
+        """
+        批量获取，未命中的 key 合并为一次 loader 调用
+
+        Args:
+            namespace: 缓存分区
+            keys: 标的代码列表（可重复）
+            loader: 接收未命中 key 列表、返回 {key: value} 的上游请求函数；
+                    结果中缺失的 key 缓存为 None
+
+        Returns:
+            {key: value}，顺序与 keys 一致
+        """
+        stats = self._stats.setdefault(namespace, CacheStats())
+        keys = list(dict.fromkeys(keys))
+        now = self._clock()
+        result: Dict[str, Any] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing: List[str] = []
+
+        for key in keys:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry.expires_at > now:
+                stats.hits += 1
+                result[key] = entry.value
+            elif (namespace, key) in self._inflight:
+                stats.coalesced += 1
+                waiting[key] = self._inflight[(namespace, key)]
+            else:
+                stats.misses += 1
+                missing.append(key)
+
+        if missing:
+            result.update(await self._load(namespace, missing, loader, stats))
+
+        for key, future in waiting.items():
+            # shield: 某个等待方被取消不影响共享的上游请求
+            result[key] = await asyncio.shield(future)
+
+        return {key: result[key] for key in keys}
+
+    async def _load(
+        self, namespace: str, keys: List[str], loader: BatchLoader, stats: CacheStats
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        for key, future in futures.items():
+            self._inflight[(namespace, key)] = future
+
+        stats.upstream_calls += 1
+        try:
+            loaded = await loader(keys)
+        except BaseException as exc:
+            if isinstance(exc, Exception):
+                stats.upstream_errors += 1
+            for key, future in futures.items():
+                self._inflight.pop((namespace, key), None)
+                if isinstance(exc, Exception):
+                    future.set_exception(exc)
+                    # 没有合并等待方时避免 "exception was never retrieved"
+                    future.exception()
+                else:
+                    future.cancel()
+            raise
+
+        expires_at = self._clock() + self.ttl()
+        values = {}
+        for key, future in futures.items():
+            value = loaded.get(key)
+            self._entries[(namespace, key)] = _Entry(value, expires_at)
+            self._inflight.pop((namespace, key), None)
+            future.set_result(value)
+            values[key] = value
+
+        if len(self._entries) > self.max_entries:
+            self._evict_expired()
+        return values
+
+    def _evict_expired(self) -> None:
+        now = self._clock()
+        expired = [k for k, entry in self._entries.items() if entry.expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+        logger.debug(f"行情缓存清理过期条目 {len(expired)} 个，剩余 {len(self._entries)} 个")
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """清空缓存（指定 namespace 时只清空该分区）"""
+        if namespace is None:
+            self._entries.clear()
+        else:
+            self._entries = {k: v for k, v in self._entries.items() if k[0] != namespace}
+
+    def stats(self) -> Dict[str, Any]:
+        """按 namespace 返回统计"""
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "ttl_seconds": self.ttl(),
+            "namespaces": {ns: s.to_dict() for ns, s in sorted(self._stats.items())},
+        }
+
+
+_cache: Optional[QuoteCache] = None
+
+
+def get_quote_cache() -> QuoteCache:
+    """获取进程级共享的行情缓存（按配置创建）"""
+    global _cache
+    if _cache is None:
+        from src.config import get_settings
+
+        settings = get_settings()
+        _cache = QuoteCache(
+            trading_ttl=settings.quote_cache_trading_ttl,
+            idle_ttl=settings.quote_cache_idle_ttl,
+        )
+    return _cache
@@ -0,0 +1,266 @@
+"""
+实时行情推送
+
+客户端通过 WebSocket / SSE 订阅一组标的，服务端只有一个轮询任务：
+- 按交易时段调整轮询间隔，拉取所有订阅标的的并集（经共享行情缓存）
+- 与上次推送的行情比较，只把发生变化的标的作为增量推给订阅了它的客户端
+- 每个订阅按标的合并未取走的增量，慢客户端只会拿到最新值，不会堆积队列
+- 没有订阅者时轮询任务自动退出
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.services.quote_cache import in_trading_session
+from src.services.sina_quote_service import (
+    QUOTE_FIELDS,
+    QuoteSnapshot,
+    cached_hq_text,
+    parse_hq_response,
+    to_sina_symbol,
+)
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+Fetcher = Callable[[List[str]], Awaitable[QuoteSnapshot]]
+
+
+async def _fetch_snapshot(symbols: List[str]) -> QuoteSnapshot:
+    return parse_hq_response(await cached_hq_text(symbols))
+
+
+class QuoteSubscription:
+    """单个客户端的订阅"""
+
+    def __init__(self, broadcaster: "QuoteBroadcaster", symbols: Set[str]):
+        self._broadcaster = broadcaster
+        self.symbols = symbols
+        self._pending: Dict[str, dict] = {}
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def _push(self, quotes: Dict[str, dict]) -> None:
+        wanted = {s: q for s, q in quotes.items() if s in self.symbols}
+        if wanted:
+            self._pending.update(wanted)
+            self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> List[dict]:
+        """
+        等待下一批增量
+
+        Args:
+            timeout: 超时秒数，超时返回空列表（用于发送心跳）
+
+        Returns:
+            发生变化的行情列表（同一标的只保留最新一条）
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        quotes = list(self._pending.values())
+        self._pending.clear()
+        return quotes
+
+    def update(self, tickers: Iterable[str], replace: bool = False) -> None:
+        """
+        增加（或替换为）一组标的；已有行情的新标的会立即推送一次
+
+        Args:
+            tickers: 6位代码或新浪代码
+            replace: True 时替换整个订阅集合
+        """
+        symbols = {to_sina_symbol(t) for t in tickers if t.strip()}
+        added = symbols - self.symbols
+        self.symbols = symbols if replace else self.symbols | symbols
+        self._broadcaster._on_subscription_change(added)
+        self._push(self._broadcaster.latest(added))
+
+    def remove(self, tickers: Iterable[str]) -> None:
+        """退订一组标的"""
+        self.symbols -= {to_sina_symbol(t) for t in tickers}
+        for symbol in list(self._pending):
+            if symbol not in self.symbols:
+                del self._pending[symbol]
+
+    def close(self) -> None:
+        """结束订阅"""
+        if not self.closed:
+            self.closed = True
+            self._broadcaster._unsubscribe(self)
+
+    def __enter__(self) -> "QuoteSubscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class QuoteBroadcaster:
+    """单一上游轮询 + 增量广播"""
+
+    def __init__(
+        self,
+        fetcher: Fetcher = _fetch_snapshot,
+        trading_interval: float = 3.0,
+        idle_interval: float = 30.0,
+        session_check: Callable[[], bool] = in_trading_session,
+    ):
+        """
+        Args:
+            fetcher: 按新浪代码列表获取行情快照
+            trading_interval: 交易时段的轮询间隔（秒）
+            idle_interval: 非交易时段的轮询间隔（秒）
+            session_check: 判断是否处于交易时段
+        """
+        self._fetcher = fetcher
+        self.trading_interval = trading_interval
+        self.idle_interval = idle_interval
+        self._session_check = session_check
+        self._subscriptions: List[QuoteSubscription] = []
+        self._latest: Dict[str, dict] = {}
+        self._signatures: Dict[str, Tuple[Optional[float], ...]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._polls = 0
+        self._errors = 0
+        self._deltas = 0
+
+    def interval(self) -> float:
+        """当前时段的轮询间隔"""
+        return self.trading_interval if self._session_check() else self.idle_interval
+
+    def subscribe(self, tickers: Iterable[str] = ()) -> QuoteSubscription:
+        """
+        新建订阅（需在事件循环中调用）
+
+        Args:
+            tickers: 6位代码或新浪代码
+        """
+        subscription = QuoteSubscription(self, set())
+        self._subscriptions.append(subscription)
+        subscription.update(tickers)
+        return subscription
+
+    def latest(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        """最近一次轮询得到的行情"""
+        return {s: self._latest[s] for s in symbols if s in self._latest}
+
+    def symbols(self) -> List[str]:
+        """所有订阅标的的并集"""
+        union: Set[str] = set()
+        for subscription in self._subscriptions:
+            union |= subscription.symbols
+        return sorted(union)
+
+    def _on_subscription_change(self, added: Set[str]) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif added - self._latest.keys():
+            # 有从未拉取过的标的，立即轮询一次
+            self._wake.set()
+
+    def _unsubscribe(self, subscription: QuoteSubscription) -> None:
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+        if not self._subscriptions and self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        logger.info("实时行情推送轮询已启动")
+        try:
+            while self._subscriptions:
+                symbols = self.symbols()
+                if symbols:
+                    try:
+                        await self.poll_once(symbols)
+                    except Exception as e:
+                        self._errors += 1
+                        logger.warning(f"实时行情轮询失败: {e}")
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            logger.info("实时行情推送轮询已停止")
+
+    async def poll_once(self, symbols: List[str]) -> int:
+        """
+        拉取一次并广播变化的行情
+
+        Returns:
+            发生变化的标的数
+        """
+        snapshot = await self._fetcher(symbols)
+        self._polls += 1
+
+        # 丢弃已无人订阅的标的，重新订阅时会再推送一次完整行情
+        wanted = set(symbols)
+        for symbol in [s for s in self._latest if s not in wanted]:
+            self._latest.pop(symbol, None)
+            self._signatures.pop(symbol, None)
+
+        changed: Dict[str, dict] = {}
+        columns = [getattr(snapshot, field) for field in QUOTE_FIELDS]
+        records = None
+        for i, symbol in enumerate(snapshot.symbols):
+            # NaN（坏值）按 None 比较，避免每次都判定为变化
+            signature = tuple(v if v == v else None for v in (float(col[i]) for col in columns))
+            if self._signatures.get(symbol) == signature:
+                continue
+            if records is None:
+                records = snapshot.to_records()
+            self._signatures[symbol] = signature
+            self._latest[symbol] = changed[symbol] = records[i]
+
+        if changed:
+            self._deltas += len(changed)
+            for subscription in list(self._subscriptions):
+                subscription._push(changed)
+        return len(changed)
+
+    async def stop(self) -> None:
+        """关闭所有订阅并停止轮询"""
+        for subscription in list(self._subscriptions):
+            subscription.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """订阅和轮询统计"""
+        return {
+            "subscribers": len(self._subscriptions),
+            "symbols": len(self.symbols()),
+            "interval_seconds": self.interval(),
+            "polls": self._polls,
+            "poll_errors": self._errors,
+            "deltas_sent": self._deltas,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+_broadcaster: Optional[QuoteBroadcaster] = None
+
+
+def get_quote_broadcaster() -> QuoteBroadcaster:
+    """获取进程级共享的行情推送器"""
+    global _broadcaster
+    if _broadcaster is None:
+        from src.config import get_settings
+
+        settings = get_settings()
+        _broadcaster = QuoteBroadcaster(
+            trading_interval=settings.quote_stream_trading_interval,
+            idle_interval=settings.quote_stream_idle_interval,
+        )
+    return _broadcaster
@@ -0,0 +1,228 @@
+"""
+后台数据刷新队列
+
+请求路径上不再同步等待上游（Tushare/新浪）：刷新任务提交到后台线程池，
+按 key（如 (ticker, timeframe)）去重，同一 key 正在排队或执行时，后续提交
+直接复用同一个任务，N 个并发请求只触发一次上游获取。
+每个任务在独立的数据库会话中执行，结束后关闭会话。
+任务有 job_id，最近完成的任务保留状态和结果供客户端轮询。
+"""
+
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy.orm import Session
+
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+Job = Callable[[Session], Any]
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class RefreshJob:
+    """一个后台任务的状态"""
+
+    job_id: str
+    key: Hashable
+    future: Future = field(repr=False)
+    status: str = QUEUED
+    submitted_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "key": list(self.key) if isinstance(self.key, tuple) else self.key,
+            "status": self.status,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class RefreshQueue:
+    """按 key 去重的后台刷新队列"""
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        session_factory: Optional[Callable[[], Session]] = None,
+        name: str = "refresh",
+        max_history: int = 500,
+    ):
+        """
+        Args:
+            max_workers: 后台线程数（上游有速率限制，不宜过大）
+            session_factory: 创建数据库会话（默认 SessionLocal）
+            name: 线程名前缀
+            max_history: 保留的任务记录数（超出后淘汰最早的已完成任务）
+        """
+        if session_factory is None:
+            from src.database import SessionLocal
+
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = Lock()
+        self._pending: Dict[Hashable, RefreshJob] = {}
+        self._jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+        self._max_history = max_history
+        self._submitted = 0
+        self._coalesced = 0
+        self._failed = 0
+
+    def submit(self, key: Hashable, job: Job) -> Future:
+        """
+        提交刷新任务
+
+        Args:
+            key: 去重键，相同 key 的任务在完成前只执行一次
+            job: 接收数据库会话、返回结果（如写入条数）的函数
+
+        Returns:
+            任务的 Future（重复提交时返回已有的 Future）
+        """
+        return self.enqueue(key, job).future
+
+    def enqueue(self, key: Hashable, job: Job) -> RefreshJob:
+        """
+        提交任务并返回任务记录（可按 job_id 查询状态）
+
+        相同 key 的任务在排队或执行中时返回已有记录。
+        """
+        with self._lock:
+            existing = self._pending.get(key)
+            if existing is not None:
+                self._coalesced += 1
+                return existing
+            record = RefreshJob(job_id=uuid.uuid4().hex, key=key, future=Future())
+            self._pending[key] = record
+            self._remember(record)
+            self._submitted += 1
+        # 线程池的 Future 只用于执行；对外的 Future 在任务记录更新后才完成
+        self._executor.submit(self._run, record, job)
+        return record
+
+    def get_job(self, job_id: str) -> Optional[RefreshJob]:
+        """按 job_id 查询任务（已被淘汰或不存在时返回 None）"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def is_pending(self, key: Hashable) -> bool:
+        """该 key 是否正在排队或执行"""
+        with self._lock:
+            return key in self._pending
+
+    def _remember(self, record: RefreshJob) -> None:
+        self._jobs[record.job_id] = record
+        if len(self._jobs) > self._max_history:
+            for job_id, old in list(self._jobs.items()):
+                if len(self._jobs) <= self._max_history:
+                    break
+                if old.finished:
+                    del self._jobs[job_id]
+
+    def _run(self, record: RefreshJob, job: Job) -> None:
+        if record.future.cancelled():
+            return  # 关闭队列时已取消
+        record.status = RUNNING
+        record.started_at = datetime.now(timezone.utc)
+        session = self._session_factory()
+        try:
+            result = job(session)
+        except BaseException as e:
+            with self._lock:
+                self._failed += 1
+            logger.exception(f"后台刷新失败: {record.key}")
+            session.rollback()
+            self._finish(record, FAILED, error=str(e) or type(e).__name__)
+            if not record.future.cancelled():
+                record.future.set_exception(e)
+        else:
+            self._finish(record, DONE, result=result)
+            if not record.future.cancelled():
+                record.future.set_result(result)
+        finally:
+            session.close()
+
+    def _finish(self, record: RefreshJob, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        record.result = result
+        record.error = error
+        record.finished_at = datetime.now(timezone.utc)
+        record.status = status
+        with self._lock:
+            self._pending.pop(record.key, None)
+
+    def stats(self) -> dict:
+        """提交、合并、失败次数和当前排队数"""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "failed": self._failed,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """停止接收新任务（wait=False 时取消排队中的任务）"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        with self._lock:
+            cancelled = [r for r in self._pending.values() if r.status == QUEUED]
+        for record in cancelled:
+            self._finish(record, FAILED, error="cancelled")
+            record.future.cancel()
+
+
+_kline_queue: Optional[RefreshQueue] = None
+_bootstrap_queue: Optional[RefreshQueue] = None
+
+
+def get_kline_refresh_queue() -> RefreshQueue:
+    """获取进程级共享的K线刷新队列"""
+    global _kline_queue
+    if _kline_queue is None:
+        _kline_queue = RefreshQueue(name="kline-refresh")
+    return _kline_queue
+
+
+def get_bootstrap_queue() -> RefreshQueue:
+    """获取添加自选时K线初始化的任务队列（与懒加载队列分开，批量添加不阻塞K线请求）"""
+    global _bootstrap_queue
+    if _bootstrap_queue is None:
+        from src.config import get_settings
+
+        _bootstrap_queue = RefreshQueue(
+            max_workers=get_settings().watchlist_bootstrap_workers, name="kline-bootstrap"
+        )
+    return _bootstrap_queue
+
+
+def shutdown_refresh_queues() -> None:
+    """关闭所有共享队列（应用关闭时调用）"""
+    global _kline_queue, _bootstrap_queue
+    for queue in (_kline_queue, _bootstrap_queue):
+        if queue is not None:
+            queue.shutdown()
+    _kline_queue = None
+    _bootstrap_queue = None
@@ -14,6 +14,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
+import numpy as np
 import pandas as pd
 import mplfinance as mpf
 import matplotlib.pyplot as plt
@@ -22,6 +23,7 @@ from sqlalchemy.orm import Session
 
 from src.repositories.kline_repository import KlineRepository
 from src.repositories.symbol_repository import SymbolRepository
+from src.services.kline_service import KlineService
 
 # 设置中文字体
 matplotlib.rcParams['font.sans-serif'] = ['PingFang SC', 'Heiti SC', 'STHeiti', 'SimHei', 'Arial Unicode MS']
@@ -150,35 +152,26 @@ class ScreenshotService:
         kline_tf = tf_map.get(timeframe, KlineTimeframe.DAY)
 
         try:
-            # 使用 repository 查询K线数据
-            klines = self.kline_repo.find_by_symbol_and_timeframe(
-                symbol_code=ticker,
-                symbol_type=SymbolType.STOCK,
-                timeframe=kline_tf,
-                limit=limit,
-                order_desc=True
+            # 列式读取K线数据（按时间正序，优先走K线缓存）
+            columns = KlineService(self.kline_repo).get_kline_columns(
+                SymbolType.STOCK, ticker, kline_tf, limit=limit
             )
 
-            if not klines:
+            if len(columns) == 0:
                 logger.warning(f"{ticker} 没有K线数据")
                 return None
 
-            # 转换为DataFrame
-            data = []
-            for k in klines:
-                data.append({
-                    "Date": k.trade_time,
-                    "Open": float(k.open) if k.open else 0,
-                    "High": float(k.high) if k.high else 0,
-                    "Low": float(k.low) if k.low else 0,
-                    "Close": float(k.close) if k.close else 0,
-                    "Volume": float(k.volume) if k.volume else 0,
-                })
-
-            df = pd.DataFrame(data)
-            df["Date"] = pd.to_datetime(df["Date"])
-            df = df.set_index("Date")
-            df = df.sort_index()  # 按时间正序排列
+            # 转换为DataFrame（直接使用列数组，缺失值补0）
+            df = pd.DataFrame(
+                {
+                    "Open": np.nan_to_num(columns.open),
+                    "High": np.nan_to_num(columns.high),
+                    "Low": np.nan_to_num(columns.low),
+                    "Close": np.nan_to_num(columns.close),
+                    "Volume": np.nan_to_num(columns.volume),
+                },
+                index=pd.DatetimeIndex(pd.to_datetime(columns.trade_time), name="Date"),
+            )
 
             # 计算均线
             df["MA5"] = df["Close"].rolling(window=5).mean()
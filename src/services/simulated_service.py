@@ -94,10 +94,11 @@ class SimulatedService:
         positions = self.session.query(SimulatedPosition).all()
         total_cost = sum(p.cost_amount for p in positions)
 
-        # 计算当前持仓市值
+        # 计算当前持仓市值（一次批量查询所有持仓的最新价）
+        prices = self._get_current_prices([p.ticker for p in positions])
         position_value = 0
         for pos in positions:
-            current_price = self._get_current_price(pos.ticker)
+            current_price = prices.get(pos.ticker)
             if current_price:
                 position_value += pos.shares * current_price
             else:
@@ -134,9 +135,15 @@ class SimulatedService:
         """
         positions = self.session.query(SimulatedPosition).all()
         result = []
+        if not positions:
+            return result
+
+        prices = self._get_current_prices([p.ticker for p in positions])
+        account = self.get_account()
+        total_value = account.get("total_value", DEFAULT_INITIAL_CAPITAL)
 
         for pos in positions:
-            current_price = self._get_current_price(pos.ticker)
+            current_price = prices.get(pos.ticker)
             current_value = pos.shares * current_price if current_price else pos.cost_amount
             pnl = current_value - pos.cost_amount
             pnl_pct = (pnl / pos.cost_amount) * 100 if pos.cost_amount > 0 else 0
@@ -146,8 +153,6 @@ class SimulatedService:
             holding_days = (date.today() - first_buy).days
 
             # 计算仓位百分比
-            account = self.get_account()
-            total_value = account.get("total_value", DEFAULT_INITIAL_CAPITAL)
             position_pct = (current_value / total_value) * 100 if total_value > 0 else 0
 
             result.append({
@@ -471,14 +476,19 @@ class SimulatedService:
 
     def _get_current_price(self, ticker: str) -> Optional[float]:
         """获取股票当前价格（最近收盘价）"""
-        # 使用 KlineRepository 查询最新日线
-        klines = self.kline_repo.find_by_symbol(
+        latest = self.kline_repo.find_latest_bar(
             symbol_code=ticker,
             symbol_type=SymbolType.STOCK,
             timeframe=KlineTimeframe.DAY,
-            limit=1
         )
-        return klines[0].close if klines else None
+        return latest.close if latest else None
+
+    def _get_current_prices(self, tickers: List[str]) -> Dict[str, float]:
+        """批量获取股票当前价格（最近收盘价），无数据的股票不在结果中"""
+        latest = self.kline_repo.find_latest_bars(
+            tickers, SymbolType.STOCK, KlineTimeframe.DAY
+        )
+        return {code: bar.close for code, bar in latest.items() if bar.close is not None}
 
     def _get_stock_name(self, ticker: str) -> str:
         """获取股票名称"""
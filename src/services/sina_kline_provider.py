@@ -1,29 +1,86 @@
 """
 新浪财经K线数据提供者
 用于获取分钟级K线数据
+
+- SinaKlineProvider: 同步 requests，固定请求间隔（单只股票按需获取）
+- AsyncSinaKlineProvider: 共享异步 HTTP 客户端，多个请求并发进行；
+  并发上限按 AIMD 自适应（成功加性增长，456/5xx 乘性回退），
+  连续失败由 SinaSource 的 CircuitBreaker 熔断
 """
+import asyncio
+import json
+import random
 import time
 import logging
 import requests
-from typing import List, Optional
+from collections import deque
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Union
 from datetime import datetime
 import pandas as pd
 
+from src.perception.config import CircuitBreakerConfig
+from src.perception.sources.sina_source import SINA_HEADERS, CircuitBreaker
+
 LOGGER = logging.getLogger(__name__)
 
+BASE_URL = "https://money.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_MarketData.getKLineData"
+
+# 周期映射
+PERIOD_MAP = {
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "60m": 60,
+    "day": 240,
+}
+
+
+def convert_ticker(ticker: str) -> str:
+    """
+    转换股票代码为新浪格式
+
+    Args:
+        ticker: 6位股票代码 (如 000001)
+
+    Returns:
+        新浪格式代码 (如 sz000001)
+    """
+    if ticker.startswith('6'):
+        return f'sh{ticker}'
+    elif ticker.startswith('0') or ticker.startswith('3'):
+        return f'sz{ticker}'
+    else:
+        return ticker
+
+
+def kline_frame(data: list, ticker: str) -> pd.DataFrame:
+    """
+    新浪K线 JSON 转 DataFrame
+
+    Returns:
+        DataFrame with columns: timestamp, open, high, low, close, volume, ticker
+    """
+    df = pd.DataFrame(data)
+
+    # 重命名列
+    df = df.rename(columns={'day': 'timestamp'})
+
+    # 转换数据类型
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    for col in ['open', 'high', 'low', 'close']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).astype(int)
+
+    # 添加ticker列
+    df['ticker'] = ticker
+    return df
+
 
 class SinaKlineProvider:
     """新浪财经K线数据提供者"""
 
-    BASE_URL = "https://money.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_MarketData.getKLineData"
-
-    # 周期映射
-    PERIOD_MAP = {
-        "5m": 5,
-        "15m": 15,
-        "30m": 30,
-        "60m": 60,
-    }
+    BASE_URL = BASE_URL
+    PERIOD_MAP = PERIOD_MAP
 
     def __init__(self, delay: float = 3.0):
         """
@@ -50,21 +107,8 @@ class SinaKlineProvider:
         self._last_request_time = time.time()
 
     def _convert_ticker(self, ticker: str) -> str:
-        """
-        转换股票代码为新浪格式
-
-        Args:
-            ticker: 6位股票代码 (如 000001)
-
-        Returns:
-            新浪格式代码 (如 sz000001)
-        """
-        if ticker.startswith('6'):
-            return f'sh{ticker}'
-        elif ticker.startswith('0') or ticker.startswith('3'):
-            return f'sz{ticker}'
-        else:
-            return ticker
+        """转换股票代码为新浪格式"""
+        return convert_ticker(ticker)
 
     def fetch_kline(
         self,
@@ -77,7 +121,7 @@ class SinaKlineProvider:
 
         Args:
             ticker: 6位股票代码
-            period: 周期 (5m, 15m, 30m, 60m)
+            period: 周期 (5m, 15m, 30m, 60m, day)
             limit: 获取数量，最大1023
 
         Returns:
@@ -110,28 +154,7 @@ class SinaKlineProvider:
                 LOGGER.debug(f"{ticker} 无数据返回")
                 return None
 
-            # 转换为DataFrame
-            df = pd.DataFrame(data)
-
-            # 重命名列
-            df = df.rename(columns={
-                'day': 'timestamp',
-                'open': 'open',
-                'high': 'high',
-                'low': 'low',
-                'close': 'close',
-                'volume': 'volume'
-            })
-
-            # 转换数据类型
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            for col in ['open', 'high', 'low', 'close']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).astype(int)
-
-            # 添加ticker列
-            df['ticker'] = ticker
-
+            df = kline_frame(data, ticker)
             LOGGER.debug(f"{ticker} 获取 {len(df)} 条K线")
             return df
 
@@ -183,3 +206,338 @@ class SinaKlineProvider:
             return result
         else:
             return pd.DataFrame()
+
+
+# ==================== 异步并发获取 ====================
+
+# 新浪限流返回 456；5xx 同样视为过载
+THROTTLE_STATUS = 456
+
+
+def _is_throttled(status_code: int) -> bool:
+    return status_code == THROTTLE_STATUS or status_code >= 500
+
+
+class AimdLimiter:
+    """
+    加性增、乘性减（AIMD）的并发上限
+
+    每次成功上限增加 increase / limit（约每轮 +increase），
+    被限流时上限乘以 decrease；cooldown 内的多次限流只回退一次
+    （同一轮并发中的请求会同时失败）。
+    """
+
+    def __init__(
+        self,
+        initial: float = 2,
+        minimum: float = 1,
+        maximum: float = 8,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(min(max(initial, minimum), maximum))
+        self._clock = clock
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self.throttles = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            # asyncio 原语绑定事件循环：换了循环（如测试、脚本）时重建
+            self._loop, self._cond, self._in_flight = loop, asyncio.Condition(), 0
+        return self._cond
+
+    async def acquire(self) -> None:
+        """等待空闲并发位"""
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    async def release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            cond.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def on_throttle(self) -> bool:
+        """
+        被限流时回退
+
+        Returns:
+            本次是否实际回退（cooldown 内返回 False）
+        """
+        now = self._clock()
+        if now - self._last_decrease < self.cooldown:
+            return False
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self.throttles += 1
+        LOGGER.info(f"新浪K线被限流，并发上限降至 {self.limit:.2f}")
+        return True
+
+
+class AsyncSinaKlineProvider:
+    """并发获取新浪K线（AIMD 并发控制 + 熔断）"""
+
+    def __init__(
+        self,
+        limiter: Optional[AimdLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: int = 3,
+        timeout: float = 10.0,
+        http=None,
+        rate_window: float = 30.0,
+    ):
+        """
+        Args:
+            limiter: 并发控制（默认初始 2，上限为 SINA_KLINE_MAX_CONCURRENCY）
+            breaker: 熔断器（默认连续 5 次失败熔断 60 秒）
+            max_retries: 被限流/网络错误时的重试次数
+            timeout: 单次请求超时（秒）
+            http: HttpClientManager（默认共享实例）
+            rate_window: 计算请求速率的滑动窗口（秒）
+        """
+        if limiter is None:
+            from src.config import get_settings
+
+            limiter = AimdLimiter(initial=2, maximum=get_settings().sina_kline_max_concurrency)
+        self.limiter = limiter
+        self.breaker = breaker or CircuitBreaker(
+            CircuitBreakerConfig(failure_threshold=5, recovery_timeout_seconds=60.0)
+        )
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._http = http
+        self._rate_window = rate_window
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._completed: deque = deque()
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.rejected = 0
+
+    @property
+    def http(self):
+        if self._http is None:
+            from src.services.http_client import get_http_manager
+
+            self._http = get_http_manager()
+        return self._http
+
+    def _record_request(self) -> None:
+        now = time.monotonic()
+        self.requests += 1
+        self._completed.append(now)
+        while self._completed and now - self._completed[0] > self._rate_window:
+            self._completed.popleft()
+
+    def requests_per_sec(self) -> float:
+        """滑动窗口内实际达到的请求速率"""
+        now = time.monotonic()
+        while self._completed and now - self._completed[0] > self._rate_window:
+            self._completed.popleft()
+        if len(self._completed) < 2:
+            return float(len(self._completed))
+        span = max(now - self._completed[0], 1e-6)
+        return len(self._completed) / span
+
+    async def fetch_kline(
+        self,
+        ticker: str,
+        period: str = "30m",
+        limit: int = 500,
+    ) -> Optional[pd.DataFrame]:
+        """
+        获取单只股票的K线数据（失败返回 None）
+
+        Args:
+            ticker: 6位股票代码
+            period: 周期 (5m, 15m, 30m, 60m, day)
+            limit: 获取数量，最大1023
+        """
+        if period not in PERIOD_MAP:
+            LOGGER.error(f"不支持的周期: {period}")
+            return None
+        params = {
+            'symbol': convert_ticker(ticker),
+            'scale': PERIOD_MAP[period],
+            'ma': 'no',
+            'datalen': min(limit, 1023),
+        }
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow_request():
+                self.rejected += 1
+                LOGGER.warning(f"{ticker} 新浪K线熔断中，跳过")
+                return None
+
+            await self.limiter.acquire()
+            try:
+                response = await self.http.get(
+                    BASE_URL, params=params, headers=SINA_HEADERS, timeout=self.timeout
+                )
+            except Exception as e:
+                response = None
+                error = e
+            finally:
+                await self.limiter.release()
+            self._record_request()
+
+            if response is not None and not _is_throttled(response.status_code):
+                if response.status_code >= 400:
+                    self.errors += 1
+                    LOGGER.warning(f"{ticker} 请求失败: HTTP {response.status_code}")
+                    return None
+                self.limiter.on_success()
+                self.breaker.record_success()
+                try:
+                    data = json.loads(response.text or "null")
+                    if not data:
+                        LOGGER.debug(f"{ticker} 无数据返回")
+                        return None
+                    return kline_frame(data, ticker)
+                except Exception as e:
+                    self.errors += 1
+                    LOGGER.warning(f"{ticker} 解析失败: {e}")
+                    return None
+
+            # 被限流或网络错误：回退并发，稍后重试
+            self.throttled += 1
+            self.limiter.on_throttle()
+            self.breaker.record_failure()
+            reason = f"HTTP {response.status_code}" if response is not None else error
+            if attempt < self.max_retries:
+                delay = random.uniform(0, min(2.0 ** attempt, 10.0))
+                LOGGER.debug(f"{ticker} 请求失败 ({reason})，{delay:.1f}秒后重试")
+                await asyncio.sleep(delay)
+            else:
+                self.errors += 1
+                LOGGER.warning(f"{ticker} 请求失败: {reason}")
+        return None
+
+    def bind_loop(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        绑定应用的事件循环（应用启动时调用），后台线程的同步获取提交到该循环执行
+
+        Args:
+            loop: 事件循环（默认当前运行中的循环）
+        """
+        self._loop = loop or asyncio.get_running_loop()
+
+    def fetch_kline_blocking(
+        self,
+        ticker: str,
+        period: str = "30m",
+        limit: int = 500,
+    ) -> Optional[pd.DataFrame]:
+        """
+        在后台线程（如刷新队列）中同步获取单只股票的K线（失败返回 None）
+
+        请求提交到 bind_loop 绑定的事件循环执行，与定时任务共用 AIMD 并发上限和熔断器；
+        未绑定或循环已停止时（脚本、测试）在当前线程新建事件循环执行。
+
+        Raises:
+            RuntimeError: 在事件循环中调用（应使用 await fetch_kline）
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("fetch_kline_blocking 不能在事件循环中调用，请使用 await fetch_kline")
+
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            return asyncio.run_coroutine_threadsafe(
+                self.fetch_kline(ticker, period, limit), loop
+            ).result()
+        return asyncio.run(self.fetch_kline(ticker, period, limit))
+
+    async def fetch_many(
+        self,
+        tickers: Sequence[str],
+        period: str = "30m",
+        limit: Union[int, Mapping[str, int]] = 500,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        并发获取多只股票的K线（并发数由 AIMD 控制）
+
+        Args:
+            tickers: 股票代码列表
+            period: 周期
+            limit: 每只股票获取数量，或 {ticker: 数量}（增量获取时按股票指定）
+            deadline: 最长耗时（秒）；超时后尚未完成的股票结果为 None
+
+        Returns:
+            {ticker: DataFrame 或 None}，顺序与 tickers 一致
+        """
+        if not tickers:
+            return {}
+        started = time.monotonic()
+        tasks = {
+            ticker: asyncio.ensure_future(self.fetch_kline(
+                ticker, period, limit[ticker] if isinstance(limit, Mapping) else limit
+            ))
+            for ticker in dict.fromkeys(tickers)
+        }
+        done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            LOGGER.warning(f"新浪K线获取超过 {deadline} 秒，{len(pending)} 只未完成")
+
+        results = {
+            ticker: (task.result() if task in done and not task.exception() else None)
+            for ticker, task in tasks.items()
+        }
+        elapsed = time.monotonic() - started
+        LOGGER.info(
+            f"新浪K线并发获取 {len(tasks)} 只，耗时 {elapsed:.1f} 秒，"
+            f"{len(tasks) / max(elapsed, 1e-6):.1f} 只/秒，并发上限 {self.limiter.limit:.2f}"
+        )
+        return results
+
+    def stats(self) -> dict:
+        """并发上限、实际请求速率、限流与熔断状态"""
+        return {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "requests": self.requests,
+            "requests_per_sec": round(self.requests_per_sec(), 2),
+            "throttled": self.throttled,
+            "backoffs": self.limiter.throttles,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "breaker": self.breaker.state.value,
+        }
+
+
+_async_provider: Optional[AsyncSinaKlineProvider] = None
+
+
+def get_async_sina_kline_provider() -> AsyncSinaKlineProvider:
+    """获取进程级共享的异步新浪K线提供者（并发上限在多次任务间延续）"""
+    global _async_provider
+    if _async_provider is None:
+        _async_provider = AsyncSinaKlineProvider()
+    return _async_provider
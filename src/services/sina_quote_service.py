@@ -0,0 +1,410 @@
+"""
+新浪实时行情批量获取
+
+hq.sinajs.cn/list= 一次请求可带多个标的。SinaQuoteService 把任意数量的标的
+按块拆分、经共享 HTTP 客户端并发请求，再把 `var hq_str_...="..."` 响应一次性
+解析为列式快照（每个字段一个 NumPy 数组）。API、数据一致性校验和感知层
+SinaSource 共用本模块的解析结果。
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.services.http_client import get_http_manager
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+SINA_HQ_URL = "https://hq.sinajs.cn/list={symbols}"
+SINA_HQ_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Referer": "https://finance.sina.com.cn/",
+}
+
+# 单次请求的标的数（约 8KB URL，全市场 ~5,400 只分 7 块并发）
+DEFAULT_CHUNK_SIZE = 800
+
+# 一行: var hq_str_sh600519="贵州茅台,1800.00,...";
+_HQ_LINE = re.compile(r'hq_str_(\w+)="([^"]*)"')
+
+# 完整行情的字段位置（name 在 0，date/time 在 30/31）
+QUOTE_FIELDS = ("open", "prev_close", "price", "high", "low", "bid", "ask", "volume", "amount")
+_QUOTE_MIN_FIELDS = 32
+# 指数简要行情（s_ 前缀）: name,price,change,change_pct,volume(手),amount(万元)
+INDEX_FIELDS = ("price", "change", "change_pct", "volume", "amount")
+_INDEX_MIN_FIELDS = 6
+
+
+def to_sina_symbol(ticker: str) -> str:
+    """6位代码转新浪代码（6 开头为沪市，0/3 开头为深市，其余原样返回）"""
+    ticker = ticker.strip()
+    if ticker.startswith("6"):
+        return f"sh{ticker}"
+    if ticker.startswith(("0", "3")):
+        return f"sz{ticker}"
+    return ticker
+
+
+def chunked(items: Sequence[str], size: int) -> List[Sequence[str]]:
+    """按 size 拆分"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+_MARKET_PREFIXES = ("sh", "sz", "bj")
+
+
+def _strip_market(symbols: Iterable[str]) -> np.ndarray:
+    """新浪代码去掉 s_ 和市场前缀（sh600519 -> 600519）"""
+    stripped = (s.removeprefix("s_") for s in symbols)
+    return np.array(
+        [s[2:] if s[:2] in _MARKET_PREFIXES else s for s in stripped], dtype=object
+    )
+
+
+def _to_float_matrix(rows: np.ndarray) -> np.ndarray:
+    """字符串二维表（object 数组）转 float64（空串为 0，无法解析的值为 NaN）"""
+    rows = np.asarray(rows, dtype=object)
+    try:
+        return rows.astype(np.float64)
+    except ValueError:
+        pass
+    rows = np.where(rows == "", "0", rows)
+    try:
+        return rows.astype(np.float64)
+    except ValueError:
+        # 极少数脏数据：宽松解析，坏值记为 NaN
+        import pandas as pd
+
+        return pd.to_numeric(rows.ravel(), errors="coerce").astype(np.float64).reshape(rows.shape)
+
+
+def _split_fields(text: str, min_fields: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    把响应切分为列式字段表
+
+    所有行的内容用逗号拼接后只 split 一次，得到全部字段的一维数组；
+    由每行的字段数算出行首偏移，第 j 个字段的整列即 fields[starts + j]，不逐行拆分。
+
+    Args:
+        text: 新浪 hq 响应
+        min_fields: 字段数不足该值的行被丢弃
+
+    Returns:
+        (新浪代码数组, 字段数组, 有效行的行首偏移)
+    """
+    pairs = _HQ_LINE.findall(text)
+    if not pairs:
+        empty = np.empty(0, dtype=object)
+        return empty, empty, np.empty(0, dtype=np.intp)
+
+    symbols, bodies = zip(*pairs)
+    counts = np.fromiter(map(str.count, bodies, repeat(",")), np.intp, len(bodies)) + 1
+    fields = np.array(",".join(bodies).split(","), dtype=object)
+    starts = np.cumsum(counts) - counts
+    keep = counts >= min_fields
+    return np.array(symbols, dtype=object)[keep], fields, starts[keep]
+
+
+class Quote(NamedTuple):
+    """单个标的的实时行情"""
+
+    symbol: str
+    ticker: str
+    name: str
+    open: float
+    prev_close: float
+    price: float
+    high: float
+    low: float
+    bid: float
+    ask: float
+    volume: float
+    amount: float
+    change: float
+    change_pct: float
+    date: str
+    time: str
+
+
+@dataclass(frozen=True)
+class QuoteSnapshot:
+    """
+    一批标的的列式实时行情
+
+    Attributes:
+        symbols: 新浪代码（如 sh600519，object dtype）
+        tickers: 6位代码
+        names: 名称
+        open/prev_close/price/high/low/bid/ask/volume/amount: float64 数组
+        date/time: 行情日期和时间字符串
+    """
+
+    symbols: np.ndarray
+    tickers: np.ndarray
+    names: np.ndarray
+    open: np.ndarray
+    prev_close: np.ndarray
+    price: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+    volume: np.ndarray
+    amount: np.ndarray
+    date: np.ndarray
+    time: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @classmethod
+    def empty(cls) -> "QuoteSnapshot":
+        """构造空快照"""
+        text = [np.empty(0, dtype=object) for _ in range(3)]
+        numbers = [np.empty(0, dtype=np.float64) for _ in QUOTE_FIELDS]
+        return cls(*text, *numbers, np.empty(0, dtype=object), np.empty(0, dtype=object))
+
+    @classmethod
+    def concat(cls, snapshots: Sequence["QuoteSnapshot"]) -> "QuoteSnapshot":
+        """合并多个分块的快照"""
+        snapshots = [s for s in snapshots if len(s)]
+        if not snapshots:
+            return cls.empty()
+        if len(snapshots) == 1:
+            return snapshots[0]
+        return cls(*(
+            np.concatenate([getattr(s, field) for s in snapshots])
+            for field in cls.__dataclass_fields__
+        ))
+
+    @property
+    def change(self) -> np.ndarray:
+        """涨跌额（昨收为 0 时为 NaN）"""
+        return np.where(self.prev_close > 0, self.price - self.prev_close, np.nan)
+
+    @property
+    def change_pct(self) -> np.ndarray:
+        """涨跌幅（%，昨收为 0 时为 NaN）"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = (self.price - self.prev_close) / self.prev_close * 100
+        return np.where(self.prev_close > 0, pct, np.nan)
+
+    def trading(self) -> "QuoteSnapshot":
+        """去掉现价为 0 的标的（停牌或尚未开盘）"""
+        mask = self.price > 0
+        if mask.all():
+            return self
+        return QuoteSnapshot(*(getattr(self, field)[mask] for field in self.__dataclass_fields__))
+
+    def quote(self, key: str) -> Optional[Quote]:
+        """按新浪代码或6位代码取单个标的"""
+        hits = np.flatnonzero((self.symbols == key) | (self.tickers == key))
+        if not len(hits):
+            return None
+        return next(self._rows(hits[:1]))
+
+    def to_records(self) -> List[dict]:
+        """转为字典列表（API 输出；NaN 输出为 None）"""
+        return [
+            {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in q._asdict().items()}
+            for q in self._rows(range(len(self)))
+        ]
+
+    def _rows(self, indices: Iterable[int]):
+        change, change_pct = self.change, self.change_pct
+        for i in indices:
+            yield Quote(
+                self.symbols[i], self.tickers[i], self.names[i],
+                *(float(getattr(self, field)[i]) for field in QUOTE_FIELDS),
+                float(change[i]), float(change_pct[i]),
+                self.date[i], self.time[i],
+            )
+
+
+@dataclass(frozen=True)
+class IndexQuoteSnapshot:
+    """一批指数的列式简要行情（price/change/change_pct/volume/amount 为 float64）"""
+
+    symbols: np.ndarray
+    tickers: np.ndarray
+    names: np.ndarray
+    price: np.ndarray
+    change: np.ndarray
+    change_pct: np.ndarray
+    volume: np.ndarray
+    amount: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @classmethod
+    def empty(cls) -> "IndexQuoteSnapshot":
+        """构造空快照"""
+        text = [np.empty(0, dtype=object) for _ in range(3)]
+        return cls(*text, *(np.empty(0, dtype=np.float64) for _ in INDEX_FIELDS))
+
+    def to_records(self) -> List[dict]:
+        """转为字典列表"""
+        return [
+            {
+                "symbol": self.symbols[i],
+                "ticker": self.tickers[i],
+                "name": self.names[i],
+                **{field: float(getattr(self, field)[i]) for field in INDEX_FIELDS},
+            }
+            for i in range(len(self))
+        ]
+
+
+def parse_hq_response(text: str) -> QuoteSnapshot:
+    """
+    一次性解析完整行情响应
+
+    字段: name,open,prev_close,price,high,low,bid,ask,volume,amount,
+          b1_vol,b1,...,a5_vol,a5,date,time,status
+    字段不足 32 个的行（无效代码、退市等）被跳过。
+    """
+    symbols, fields, starts = _split_fields(text, _QUOTE_MIN_FIELDS)
+    if not len(symbols):
+        return QuoteSnapshot.empty()
+
+    # 每行一列：(字段, 标的) 形状，取出的每个字段都是连续数组
+    matrix = _to_float_matrix(fields[np.arange(1, 1 + len(QUOTE_FIELDS))[:, None] + starts])
+    return QuoteSnapshot(
+        symbols,
+        _strip_market(symbols),
+        fields[starts],
+        *matrix,
+        fields[starts + 30],
+        fields[starts + 31],
+    )
+
+
+def parse_hq_index_response(text: str) -> IndexQuoteSnapshot:
+    """
+    解析指数简要行情响应
+
+    格式: var hq_str_s_sh000001="上证指数,3259.22,46.14,1.44,2660394,28862016";
+    """
+    symbols, fields, starts = _split_fields(text, _INDEX_MIN_FIELDS)
+    if not len(symbols):
+        return IndexQuoteSnapshot.empty()
+
+    symbols = np.array([s[2:] if s.startswith("s_") else s for s in symbols], dtype=object)
+    matrix = _to_float_matrix(fields[np.arange(1, 1 + len(INDEX_FIELDS))[:, None] + starts])
+    return IndexQuoteSnapshot(
+        symbols,
+        _strip_market(symbols),
+        fields[starts],
+        *matrix,
+    )
+
+
+class SinaQuoteService:
+    """新浪实时行情批量获取服务"""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, timeout: float = 10.0):
+        """
+        Args:
+            chunk_size: 单次请求的标的数
+            timeout: 单次请求超时（秒）
+        """
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+    async def fetch_raw(self, symbols: Sequence[str]) -> List[str]:
+        """
+        按块并发请求，返回各块的原始响应文本（顺序与分块一致）
+
+        Args:
+            symbols: 新浪代码列表（如 sh600519、s_sh000001）
+
+        Raises:
+            httpx.HTTPError: 任一分块请求失败
+        """
+        if not symbols:
+            return []
+        manager = get_http_manager()
+
+        async def fetch_chunk(chunk: Sequence[str]) -> str:
+            url = SINA_HQ_URL.format(symbols=",".join(chunk))
+            resp = await manager.get(url, headers=SINA_HQ_HEADERS, timeout=self.timeout)
+            resp.raise_for_status()
+            return resp.text
+
+        return await asyncio.gather(
+            *(fetch_chunk(chunk) for chunk in chunked(list(symbols), self.chunk_size))
+        )
+
+    async def fetch_lines(self, symbols: Sequence[str]) -> Dict[str, str]:
+        """
+        按块请求并按标的拆分原始响应
+
+        Returns:
+            {新浪代码: 该标的的原始响应行}（用于按标的缓存后重新拼装）
+        """
+        texts = await self.fetch_raw(symbols)
+        return {
+            match.group(1): f"var {match.group(0)};\n"
+            for text in texts
+            for match in _HQ_LINE.finditer(text)
+        }
+
+    async def fetch_quotes(self, tickers: Sequence[str]) -> QuoteSnapshot:
+        """
+        获取个股实时行情
+
+        Args:
+            tickers: 6位代码或新浪代码
+
+        Returns:
+            QuoteSnapshot（包含现价为 0 的停牌标的，需要时用 trading() 过滤）
+        """
+        symbols = list(dict.fromkeys(to_sina_symbol(t) for t in tickers))
+        texts = await self.fetch_raw(symbols)
+        snapshot = QuoteSnapshot.concat([parse_hq_response(text) for text in texts])
+        logger.debug(f"新浪实时行情: 请求 {len(symbols)} 个, 解析 {len(snapshot)} 个")
+        return snapshot
+
+    async def fetch_index_quotes(self, symbols: Sequence[str]) -> IndexQuoteSnapshot:
+        """
+        获取指数简要行情
+
+        Args:
+            symbols: 新浪指数代码（如 sh000001）
+        """
+        summary = [s if s.startswith("s_") else f"s_{s}" for s in dict.fromkeys(symbols)]
+        texts = await self.fetch_raw(summary)
+        return parse_hq_index_response("\n".join(texts))
+
+
+async def cached_hq_text(symbols: Sequence[str]) -> str:
+    """
+    从共享行情缓存按标的拼装新浪原始响应
+
+    只有缓存未命中的标的才会请求上游（按块并发）；并发请求同一标的时
+    共用进行中的上游请求。
+    """
+    from src.services.quote_cache import get_quote_cache
+
+    lines = await get_quote_cache().get_many("sina_hq", symbols, get_quote_service().fetch_lines)
+    return "".join(lines[s] or "" for s in dict.fromkeys(symbols))
+
+
+_service: Optional[SinaQuoteService] = None
+
+
+def get_quote_service() -> SinaQuoteService:
+    """获取进程级共享的行情服务"""
+    global _service
+    if _service is None:
+        _service = SinaQuoteService()
+    return _service
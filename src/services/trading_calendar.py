@@ -0,0 +1,264 @@
+"""
+内存交易日历
+
+trade_calendar 表一次性读入内存（有序日期数组），交易日判断、前后交易日、
+回溯 N 个交易日等查询均为二分查找，不再每次请求都查询数据库。
+日历按天自动重新加载；update_trade_calendar 批量写入后调用
+invalidate_trading_calendar() 立即生效。表中没有覆盖的日期按工作日判断。
+
+交易时段（本地时间，交易日）：
+- pre_open: 9:15 前
+- call_auction: 9:15-9:30 集合竞价（9:25 撮合后行情开始变动）
+- morning: 9:30-11:30
+- lunch_break: 11:30-13:00
+- afternoon: 13:00-15:00
+- after_close: 15:00 后
+非交易日全天为 closed。
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Union
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models import TradeCalendar
+from src.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+DateLike = Union[str, date, datetime]
+
+PRE_OPEN = "pre_open"
+CALL_AUCTION = "call_auction"
+MORNING = "morning"
+LUNCH_BREAK = "lunch_break"
+AFTERNOON = "afternoon"
+AFTER_CLOSE = "after_close"
+CLOSED = "closed"
+
+AUCTION_START = time(9, 15)
+QUOTE_START = time(9, 25)
+MORNING_START = time(9, 30)
+MORNING_END = time(11, 30)
+AFTERNOON_START = time(13, 0)
+AFTERNOON_END = time(15, 0)
+
+
+def _to_iso(value: DateLike) -> str:
+    if isinstance(value, str):
+        value = value.strip()
+        if len(value) >= 8 and value[:8].isdigit():
+            # YYYYMMDD
+            return f"{value[:4]}-{value[4:6]}-{value[6:8]}"
+        return value[:10]
+    return value.strftime("%Y-%m-%d")
+
+
+def _is_weekday(iso: str) -> bool:
+    return datetime.strptime(iso, "%Y-%m-%d").weekday() < 5
+
+
+def _shift(iso: str, days: int) -> str:
+    return (datetime.strptime(iso, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+class TradingCalendar:
+    """有序交易日数组上的交易日查询"""
+
+    def __init__(self, trading_days: Sequence[str], known_days: Sequence[str] = ()):
+        """
+        Args:
+            trading_days: 交易日 (YYYY-MM-DD)
+            known_days: 日历覆盖的全部日期（含非交易日），用于判断是否需要按工作日推断
+        """
+        self._days = sorted(set(trading_days))
+        self._trading = set(self._days)
+        known = sorted(set(known_days) | self._trading)
+        self.first_day: Optional[str] = known[0] if known else None
+        self.last_day: Optional[str] = known[-1] if known else None
+
+    @classmethod
+    def load(cls, session: Session) -> "TradingCalendar":
+        """从 trade_calendar 表加载"""
+        rows = session.execute(select(TradeCalendar.date, TradeCalendar.is_trading_day)).all()
+        return cls([d for d, is_open in rows if is_open], [d for d, _ in rows])
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def covers(self, day: DateLike) -> bool:
+        """日期是否在日历覆盖范围内"""
+        iso = _to_iso(day)
+        return self.first_day is not None and self.first_day <= iso <= self.last_day
+
+    def is_trading_day(self, day: DateLike) -> bool:
+        """是否为交易日（日历未覆盖的日期按工作日判断）"""
+        iso = _to_iso(day)
+        if self.covers(iso):
+            return iso in self._trading
+        return _is_weekday(iso)
+
+    # ==================== 前后交易日 ====================
+
+    def latest_on_or_before(self, day: DateLike) -> Optional[str]:
+        """不晚于 day 的最近交易日"""
+        iso = _to_iso(day)
+        if self.last_day is None or iso > self.last_day:
+            # 日历尚未覆盖到 day：按工作日向前找，找到已覆盖范围内为止
+            while self.last_day is None or iso > self.last_day:
+                if _is_weekday(iso):
+                    return iso
+                iso = _shift(iso, -1)
+        index = bisect_right(self._days, iso)
+        return self._days[index - 1] if index else None
+
+    def prev(self, day: DateLike, n: int = 1) -> Optional[str]:
+        """day 之前的第 n 个交易日（不含 day 本身）"""
+        return self.n_days_back(_shift(_to_iso(day), -1), n - 1)
+
+    def next(self, day: DateLike) -> Optional[str]:
+        """day 之后的第一个交易日（不含 day 本身）"""
+        iso = _to_iso(day)
+        if self.last_day is not None and iso < self.last_day:
+            index = bisect_right(self._days, iso)
+            if index < len(self._days):
+                return self._days[index]
+        # 超出日历覆盖范围：按工作日推断
+        iso = _shift(max(iso, self.last_day or iso), 1)
+        while not _is_weekday(iso):
+            iso = _shift(iso, 1)
+        return iso
+
+    def n_days_back(self, day: DateLike, n: int) -> Optional[str]:
+        """
+        以不晚于 day 的最近交易日为第 0 个，向前第 n 个交易日
+
+        用于确定 “截至 day 的 n+1 根日线” 的起始日期；日历不足时返回 None。
+        """
+        iso = _to_iso(day)
+        # 日历未覆盖的尾部按工作日逐日回溯
+        while n >= 0 and (self.last_day is None or iso > self.last_day):
+            if _is_weekday(iso):
+                if n == 0:
+                    return iso
+                n -= 1
+            iso = _shift(iso, -1)
+        index = bisect_right(self._days, iso) - 1 - n
+        return self._days[index] if index >= 0 else None
+
+    def between(self, start: DateLike, end: DateLike) -> List[str]:
+        """[start, end] 内日历中的交易日（不做工作日推断）"""
+        lo = bisect_left(self._days, _to_iso(start))
+        hi = bisect_right(self._days, _to_iso(end))
+        return self._days[lo:hi]
+
+    # ==================== 交易时段 ====================
+
+    def session_phase(self, moment: Optional[datetime] = None) -> str:
+        """当前所处交易时段（见模块说明）"""
+        moment = moment or datetime.now()
+        if not self.is_trading_day(moment):
+            return CLOSED
+        current = moment.time()
+        if current < AUCTION_START:
+            return PRE_OPEN
+        if current < MORNING_START:
+            return CALL_AUCTION
+        if current <= MORNING_END:
+            return MORNING
+        if current < AFTERNOON_START:
+            return LUNCH_BREAK
+        if current <= AFTERNOON_END:
+            return AFTERNOON
+        return AFTER_CLOSE
+
+    def is_trading_time(self, moment: Optional[datetime] = None) -> bool:
+        """是否处于连续竞价时段（9:30-11:30、13:00-15:00）"""
+        return self.session_phase(moment) in (MORNING, AFTERNOON)
+
+    def in_quote_session(self, moment: Optional[datetime] = None) -> bool:
+        """行情是否在变动（含 9:25 集合竞价撮合后）"""
+        moment = moment or datetime.now()
+        phase = self.session_phase(moment)
+        return phase in (MORNING, AFTERNOON) or (
+            phase == CALL_AUCTION and moment.time() >= QUOTE_START
+        )
+
+
+_calendar: Optional[TradingCalendar] = None
+_loaded_on: Optional[date] = None
+_lock = Lock()
+
+
+def get_trading_calendar(session: Optional[Session] = None) -> TradingCalendar:
+    """
+    获取进程级共享的交易日历（每天首次调用时重新加载）
+
+    加载失败时本次返回空日历（全部按工作日判断），下次调用重试。
+
+    Args:
+        session: 加载时使用的会话，默认新建
+    """
+    global _calendar, _loaded_on
+    today = date.today()
+    if _calendar is not None and _loaded_on == today:
+        return _calendar
+    with _lock:
+        if _calendar is None or _loaded_on != today:
+            try:
+                if session is not None:
+                    calendar = TradingCalendar.load(session)
+                else:
+                    from src.database import session_scope
+
+                    with session_scope() as own:
+                        calendar = TradingCalendar.load(own)
+            except Exception as e:
+                logger.warning(f"交易日历加载失败，按工作日判断: {e}")
+                return TradingCalendar([])
+            _calendar, _loaded_on = calendar, today
+            logger.debug(f"交易日历已加载: {len(_calendar)} 个交易日")
+    return _calendar
+
+
+def invalidate_trading_calendar() -> None:
+    """日历数据更新后调用，下次获取时重新加载"""
+    global _calendar, _loaded_on
+    with _lock:
+        _calendar = None
+        _loaded_on = None
+
+
+def upsert_trade_calendar(session: Session, days: Dict[str, bool], exchange: str = "SSE") -> int:
+    """
+    批量写入交易日历（一条 INSERT ... ON CONFLICT 语句，不逐日查询）
+
+    调用方提交后需调用 invalidate_trading_calendar()。
+
+    Args:
+        session: 数据库会话
+        days: {日期: 是否交易日}，日期可为 YYYYMMDD 或 YYYY-MM-DD
+        exchange: 交易所
+
+    Returns:
+        写入的日期数
+    """
+    if not days:
+        return 0
+    stmt = sqlite_insert(TradeCalendar)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["date"],
+        set_={"is_trading_day": stmt.excluded.is_trading_day},
+    )
+    session.execute(
+        stmt,
+        [
+            {"date": _to_iso(day), "is_trading_day": bool(is_open), "exchange": exchange}
+            for day, is_open in days.items()
+        ],
+    )
+    return len(days)
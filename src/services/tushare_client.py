@@ -1,12 +1,26 @@
 """
 Tushare Pro API Client
 提供对 Tushare Pro 数据接口的封装，包含智能限流和重试机制
+
+- TushareClient: 同步客户端（脚本、同步接口使用）
+- AsyncTushareClient: 异步客户端（事件循环内使用），请求在有界线程池中执行，
+  限流与重试等待均为 await，不阻塞事件循环
 """
 
+import asyncio
+import heapq
+import itertools
 import logging
+import sqlite3
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Optional
+from enum import IntEnum
+from functools import partial
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
 
 import pandas as pd
 import tushare as ts
@@ -14,6 +28,73 @@ import tushare as ts
 logger = logging.getLogger(__name__)
 
 
+class Priority(IntEnum):
+    """请求优先级（数值越小越先获得调用额度）"""
+
+    INTERACTIVE = 0  # 接口请求（用户等待中）
+    NORMAL = 1
+    BATCH = 2  # 定时任务、脚本批量拉取
+
+
+class _LocalWindow:
+    """进程内滑动窗口计数"""
+
+    def __init__(self, max_calls: int, time_window: float):
+        self.max_calls = max_calls
+        self.time_window = time_window
+        self.calls: Deque[float] = deque()
+
+    def try_acquire(self) -> float:
+        """尝试占用一次调用额度，成功返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        cutoff = now - self.time_window
+        while self.calls and self.calls[0] <= cutoff:
+            self.calls.popleft()
+        if len(self.calls) < self.max_calls:
+            self.calls.append(now)
+            return 0.0
+        return self.calls[0] + self.time_window - now
+
+
+class _FileWindow:
+    """
+    跨进程滑动窗口计数（SQLite 文件）
+
+    多个进程（API 服务、定时任务、脚本）指向同一个文件时共享额度。
+    """
+
+    def __init__(self, path: str, max_calls: int, time_window: float):
+        self.max_calls = max_calls
+        self.time_window = time_window
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # 调用方持有 RateLimiter 的锁，连接可以跨线程使用
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS calls (ts REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_calls_ts ON calls (ts)")
+
+    def try_acquire(self) -> float:
+        """尝试占用一次调用额度，成功返回0，否则返回需要等待的秒数"""
+        now = time.time()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM calls WHERE ts <= ?", (now - self.time_window,))
+            count, oldest = conn.execute("SELECT COUNT(*), MIN(ts) FROM calls").fetchone()
+            if count < self.max_calls:
+                conn.execute("INSERT INTO calls (ts) VALUES (?)", (now,))
+                wait = 0.0
+            else:
+                wait = oldest + self.time_window - now
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
 class RateLimiter:
     """
     智能限流器，根据积分等级控制 API 调用频率
@@ -23,39 +104,141 @@ class RateLimiter:
     - 2000-5000积分：约 120次/分钟
     - 5000+积分：约 200次/分钟
     - 15000+积分：约 200-300次/分钟
+
+    滑动窗口额度由锁保护，可被多个线程/客户端共享；等待中的调用按
+    优先级（其次按到达顺序）获得额度。指定 state_path 时额度记录在
+    SQLite 文件中，由多个进程共享。
     """
 
-    def __init__(self, max_calls: int = 200, time_window: int = 60):
+    def __init__(
+        self,
+        max_calls: int = 200,
+        time_window: int = 60,
+        state_path: Optional[str] = None,
+    ):
         """
         Args:
             max_calls: 时间窗口内的最大调用次数
             time_window: 时间窗口（秒）
+            state_path: 跨进程共享额度的 SQLite 文件路径（None 表示仅进程内）
         """
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls: List[datetime] = []
+        self.state_path = state_path
+        if state_path:
+            self._window = _FileWindow(state_path, max_calls, time_window)
+        else:
+            self._window = _LocalWindow(max_calls, time_window)
+        self._cond = threading.Condition()
+        self._waiting: List[tuple] = []  # 堆: (priority, seq)
+        self._seq = itertools.count()
 
-    def wait_if_needed(self):
-        """如果需要，等待直到可以发起新请求"""
-        now = datetime.now()
+    def wait_if_needed(self, priority: Priority = Priority.NORMAL):
+        """
+        如果需要，等待直到可以发起新请求
 
-        # 清理超出时间窗口的调用记录
-        cutoff = now - timedelta(seconds=self.time_window)
-        self.calls = [t for t in self.calls if t > cutoff]
+        Args:
+            priority: 请求优先级
+        """
+        ticket = (int(priority), next(self._seq))
+        warned = False
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._cond.notify_all()  # 让当前队首重新比较优先级
+            try:
+                while True:
+                    if self._waiting[0] != ticket:
+                        self._cond.wait()
+                        continue
+
+                    wait_time = self._window.try_acquire()
+                    if wait_time <= 0:
+                        heapq.heappop(self._waiting)
+                        self._cond.notify_all()
+                        return
+
+                    if not warned:
+                        logger.warning(
+                            f"达到调用限制 ({self.max_calls}次/{self.time_window}秒)，"
+                            f"等待 {wait_time:.1f} 秒"
+                        )
+                        warned = True
+                    self._cond.wait(timeout=wait_time + 0.01)
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                raise
+
+
+def max_calls_for_points(points: int) -> int:
+    """根据积分等级返回每分钟最大调用次数"""
+    if points >= 15000:
+        return 180  # 保守值，避免触发限流
+    elif points >= 5000:
+        return 150
+    elif points >= 2000:
+        return 100
+    else:
+        return 50
+
+
+class AsyncTokenBucket:
+    """
+    异步令牌桶限流器
 
-        # 如果已达到限制，等待
-        if len(self.calls) >= self.max_calls:
-            oldest = self.calls[0]
-            wait_time = (oldest + timedelta(seconds=self.time_window) - now).total_seconds()
-            if wait_time > 0:
-                logger.warning(
-                    f"达到调用限制 ({self.max_calls}次/{self.time_window}秒)，"
-                    f"等待 {wait_time:.1f} 秒"
-                )
-                time.sleep(wait_time + 0.1)  # 额外0.1秒缓冲
+    令牌以 rate 个/秒 匀速补充，最多积累 capacity 个。acquire() 先预约令牌
+    再 await 等待，多个协程并发调用时各自排队等待，不阻塞事件循环。
+    预约计算在线程锁内完成，同一个令牌桶可以被多个事件循环/线程共享。
+    """
 
-        # 记录本次调用
-        self.calls.append(datetime.now())
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 令牌桶容量（默认等于 rate，即允许1秒的突发）
+        """
+        if rate <= 0:
+            raise ValueError("令牌补充速率必须大于0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, max_calls: int, burst: Optional[float] = None) -> "AsyncTokenBucket":
+        """按每分钟调用次数创建令牌桶"""
+        return cls(rate=max_calls / 60.0, capacity=burst)
+
+    def _reserve(self, tokens: float) -> float:
+        """预约令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """
+        获取令牌，不足时异步等待
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            实际等待的秒数
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
 
 
 class TushareClient:
@@ -74,7 +257,10 @@ class TushareClient:
         token: str,
         points: int = 15000,
         delay: float = 0.3,
-        max_retries: int = 3
+        max_retries: int = 3,
+        rate_limited: bool = True,
+        priority: Priority = Priority.NORMAL,
+        rate_limiter: Optional[RateLimiter] = None
     ):
         """
         Args:
@@ -82,6 +268,10 @@ class TushareClient:
             points: 积分等级（决定调用频率限制）
             delay: 每次请求后的基础延迟（秒）
             max_retries: 最大重试次数
+            rate_limited: 是否由本客户端限流和重试（由 AsyncTushareClient
+                包装时为 False，限流与重试交给异步客户端）
+            priority: 本客户端请求的优先级
+            rate_limiter: 限流器（默认使用同一 token 的进程级共享限流器）
         """
         if not token:
             raise ValueError("Tushare token 不能为空，请在 .env 文件中配置 TUSHARE_TOKEN")
@@ -90,6 +280,8 @@ class TushareClient:
         self.points = points
         self.delay = delay
         self.max_retries = max_retries
+        self.rate_limited = rate_limited
+        self.priority = priority
 
         # 初始化 Tushare Pro API
         try:
@@ -99,22 +291,19 @@ class TushareClient:
             logger.error(f"Tushare 初始化失败: {e}")
             raise
 
-        # 根据积分等级设置 Rate Limiter
-        max_calls_per_minute = self._get_max_calls(points)
-        self.rate_limiter = RateLimiter(max_calls=max_calls_per_minute, time_window=60)
+        # 同一 token 的所有客户端共享一个限流器（账号额度是按 token 计算的）
+        if rate_limiter is None:
+            rate_limiter = shared_rate_limiter(token, self._get_max_calls(points))
+        self.rate_limiter = rate_limiter
 
-        logger.info(f"限流设置：{max_calls_per_minute} 次/分钟，基础延迟 {delay} 秒")
+        logger.info(
+            f"限流设置：{rate_limiter.max_calls} 次/{rate_limiter.time_window}秒，"
+            f"基础延迟 {delay} 秒"
+        )
 
     def _get_max_calls(self, points: int) -> int:
         """根据积分等级返回每分钟最大调用次数"""
-        if points >= 15000:
-            return 180  # 保守值，避免触发限流
-        elif points >= 5000:
-            return 150
-        elif points >= 2000:
-            return 100
-        else:
-            return 50
+        return max_calls_for_points(points)
 
     def _request_with_retry(self, func, *args, **kwargs) -> pd.DataFrame:
         """
@@ -130,10 +319,14 @@ class TushareClient:
         Raises:
             Exception: 重试max_retries次后仍失败
         """
+        if not self.rate_limited:
+            df = func(*args, **kwargs)
+            return df if df is not None else pd.DataFrame()
+
         for attempt in range(1, self.max_retries + 1):
             try:
                 # 限流等待
-                self.rate_limiter.wait_if_needed()
+                self.rate_limiter.wait_if_needed(self.priority)
 
                 # 调用 API
                 df = func(*args, **kwargs)
@@ -155,6 +348,19 @@ class TushareClient:
 
         return pd.DataFrame()
 
+    def query(self, api_name: str, **kwargs) -> pd.DataFrame:
+        """
+        调用任意 Tushare Pro 接口（经过限流和重试）
+
+        Args:
+            api_name: 接口名（如 forecast、express）
+            **kwargs: 接口参数
+
+        Returns:
+            DataFrame: API 返回的数据
+        """
+        return self._request_with_retry(getattr(self.pro, api_name), **kwargs)
+
     # ====================
     # 基础数据接口
     # ====================
@@ -583,3 +789,259 @@ class TushareClient:
             trade_date=trade_date,
             fields='ts_code,trade_date,total_mv,float_mv,total_share,float_share,free_share,turnover_rate,turnover_rate_f,pe,pe_ttm,pb'
         )
+
+
+class AsyncTushareClient:
+    """
+    异步 Tushare 客户端
+
+    包装一个不限流的 TushareClient（rate_limited=False）：
+    - 同步 API 调用在有界线程池中执行，不阻塞事件循环
+    - 默认在线程池中占用同步客户端的共享额度（与同步调用方共用全局预算，
+      按优先级排队）；也可以传入令牌桶，在事件循环中 await 等待
+    - 失败后按指数退避 await 重试
+
+    用法：
+        client = AsyncTushareClient.create(token, points=15000)
+        df = await client.fetch_daily(trade_date="20240102")
+    """
+
+    def __init__(
+        self,
+        client: TushareClient,
+        rate_limiter: Optional[AsyncTokenBucket] = None,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        max_workers: int = 4,
+        priority: Priority = Priority.NORMAL,
+    ):
+        """
+        Args:
+            client: 同步客户端（应以 rate_limited=False 创建，避免重复限流）
+            rate_limiter: 令牌桶（不传时使用 client 的共享限流器；两者都没有时
+                按 client.points 创建令牌桶）
+            max_retries: 最大尝试次数
+            retry_delay: 首次重试前的等待秒数（之后每次翻倍）
+            max_workers: 线程池大小，即同时进行中的请求上限
+            priority: 默认请求优先级（每次调用可用 priority 参数覆盖）
+        """
+        self.client = client
+        self.budget: Optional[RateLimiter] = None
+        if rate_limiter is None:
+            self.budget = getattr(client, "rate_limiter", None)
+            if self.budget is None:
+                points = getattr(client, "points", 0) or 0
+                rate_limiter = AsyncTokenBucket.per_minute(max_calls_for_points(points))
+        self.rate_limiter = rate_limiter
+        self.priority = priority
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tushare"
+        )
+
+    @classmethod
+    def create(
+        cls,
+        token: str,
+        points: int = 15000,
+        max_retries: int = 3,
+        max_workers: int = 4,
+    ) -> "AsyncTushareClient":
+        """
+        按 token/积分创建异步客户端
+
+        Args:
+            token: Tushare Pro Token
+            points: 积分等级（决定令牌桶速率）
+            max_retries: 最大尝试次数
+            max_workers: 线程池大小
+
+        Returns:
+            AsyncTushareClient
+        """
+        client = TushareClient(token=token, points=points, rate_limited=False)
+        return cls(client, max_retries=max_retries, max_workers=max_workers)
+
+    async def call(
+        self, method: str, *args, priority: Optional[Priority] = None, **kwargs
+    ) -> pd.DataFrame:
+        """
+        异步调用同步客户端的方法（限流 + 线程池 + 重试）
+
+        Args:
+            method: TushareClient 方法名（如 fetch_daily）
+            *args, **kwargs: 方法参数
+            priority: 本次请求优先级（默认使用客户端的优先级）
+
+        Returns:
+            方法返回值
+
+        Raises:
+            Exception: 重试max_retries次后仍失败
+        """
+        func = partial(getattr(self.client, method), *args, **kwargs)
+        if self.budget is not None:
+            func = partial(
+                _run_with_budget, self.budget,
+                self.priority if priority is None else priority, func,
+            )
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(1, self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            try:
+                return await loop.run_in_executor(self._executor, func)
+            except Exception as e:
+                logger.warning(
+                    f"API 调用失败 {method} (尝试 {attempt}/{self.max_retries}): {e}"
+                )
+                if attempt == self.max_retries:
+                    logger.error(f"API 调用失败 {method}，已达最大重试次数: {e}")
+                    raise
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        return pd.DataFrame()
+
+    async def fetch_stock_list(self, **kwargs) -> pd.DataFrame:
+        """获取股票列表（参数同 TushareClient.fetch_stock_list）"""
+        return await self.call("fetch_stock_list", **kwargs)
+
+    async def fetch_daily(self, **kwargs) -> pd.DataFrame:
+        """获取日线行情（参数同 TushareClient.fetch_daily）"""
+        return await self.call("fetch_daily", **kwargs)
+
+    async def fetch_mins(self, ts_code: str, **kwargs) -> pd.DataFrame:
+        """获取分钟行情（参数同 TushareClient.fetch_mins）"""
+        return await self.call("fetch_mins", ts_code, **kwargs)
+
+    async def fetch_daily_basic(self, **kwargs) -> pd.DataFrame:
+        """获取每日指标（参数同 TushareClient.fetch_daily_basic）"""
+        return await self.call("fetch_daily_basic", **kwargs)
+
+    async def fetch_index_daily(self, **kwargs) -> pd.DataFrame:
+        """获取指数日线（参数同 TushareClient.fetch_index_daily）"""
+        return await self.call("fetch_index_daily", **kwargs)
+
+    async def get_latest_trade_date(self, **kwargs) -> str:
+        """获取最新交易日期 YYYYMMDD"""
+        return await self.call("get_latest_trade_date", **kwargs)
+
+    def normalize_ts_code(self, ticker: str) -> str:
+        """标准化股票代码为 Tushare 格式（纯计算，无需 await）"""
+        return self.client.normalize_ts_code(ticker)
+
+    def close(self) -> None:
+        """关闭线程池"""
+        self._executor.shutdown(wait=False)
+
+
+def _run_with_budget(budget: RateLimiter, priority: Priority, func):
+    """在线程池中占用额度后执行请求"""
+    budget.wait_if_needed(priority)
+    return func()
+
+
+# ====================
+# 进程级共享客户端
+# ====================
+
+_registry_lock = threading.Lock()
+_shared_limiters: Dict[str, RateLimiter] = {}
+_shared_clients: Dict[Priority, TushareClient] = {}
+_shared_async_client: Optional[AsyncTushareClient] = None
+
+
+def shared_rate_limiter(token: str, max_calls: int) -> RateLimiter:
+    """
+    获取 token 对应的进程级共享限流器
+
+    配置了 TUSHARE_BUDGET_PATH 时额度记录在该 SQLite 文件中，由所有进程共享。
+
+    Args:
+        token: Tushare Pro Token
+        max_calls: 每分钟最大调用次数（仅首次创建时生效）
+
+    Returns:
+        RateLimiter
+    """
+    with _registry_lock:
+        limiter = _shared_limiters.get(token)
+        if limiter is None:
+            from src.config import get_settings
+
+            state_path = get_settings().tushare_budget_path or None
+            limiter = RateLimiter(max_calls=max_calls, time_window=60, state_path=state_path)
+            _shared_limiters[token] = limiter
+        return limiter
+
+
+def shared_tushare_client(priority: Priority = Priority.NORMAL) -> TushareClient:
+    """
+    获取进程级共享的同步客户端（按配置创建，每个优先级一个实例）
+
+    Args:
+        priority: 请求优先级（接口请求用 INTERACTIVE，定时任务用 BATCH）
+
+    Returns:
+        TushareClient
+    """
+    with _registry_lock:
+        client = _shared_clients.get(priority)
+    if client is not None:
+        return client
+
+    from src.config import get_settings
+
+    settings = get_settings()
+    client = TushareClient(
+        token=settings.tushare_token,
+        points=settings.tushare_points,
+        delay=settings.tushare_delay,
+        max_retries=settings.tushare_max_retries,
+        priority=priority,
+    )
+    with _registry_lock:
+        return _shared_clients.setdefault(priority, client)
+
+
+def shared_async_tushare_client() -> AsyncTushareClient:
+    """
+    获取进程级共享的异步客户端（与同步客户端共用限流额度）
+
+    Returns:
+        AsyncTushareClient
+    """
+    global _shared_async_client
+    if _shared_async_client is not None:
+        return _shared_async_client
+
+    from src.config import get_settings
+
+    settings = get_settings()
+    client = AsyncTushareClient(
+        TushareClient(
+            token=settings.tushare_token,
+            points=settings.tushare_points,
+            rate_limited=False,
+        ),
+        max_retries=settings.tushare_max_retries,
+    )
+    with _registry_lock:
+        if _shared_async_client is None:
+            _shared_async_client = client
+        else:
+            client.close()
+        return _shared_async_client
+
+
+def reset_shared_tushare_clients() -> None:
+    """清空共享客户端和限流器（配置变更或测试时使用）"""
+    global _shared_async_client
+    with _registry_lock:
+        if _shared_async_client is not None:
+            _shared_async_client.close()
+        _shared_async_client = None
+        _shared_clients.clear()
+        _shared_limiters.clear()
@@ -11,13 +11,10 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, desc
-import tushare as ts
-from dotenv import load_dotenv
-import os
-
 from src.models.kline import Kline
 from src.models.symbol import SymbolMetadata
 from src.models.board import IndustryDaily
+from src.services.tushare_client import TushareClient, shared_tushare_client
 
 
 class FundamentalAnalyzer:
@@ -25,17 +22,11 @@ class FundamentalAnalyzer:
 
     def __init__(self, session: Session):
         self.session = session
-        self._pro = None
 
     @property
-    def pro(self):
-        """延迟初始化Tushare Pro API"""
-        if self._pro is None:
-            load_dotenv()
-            token = os.getenv("TUSHARE_TOKEN", "")
-            ts.set_token(token)
-            self._pro = ts.pro_api()
-        return self._pro
+    def client(self) -> TushareClient:
+        """进程级共享的Tushare客户端（共用限流额度）"""
+        return shared_tushare_client()
 
     def get_52w_high_low(self, ticker: str, trade_date: str) -> Tuple[float, float]:
         """
@@ -86,7 +77,8 @@ class FundamentalAnalyzer:
         ts_code = f"{ticker}.SZ" if ticker.startswith(("0", "3")) else f"{ticker}.SH"
 
         try:
-            df = self.pro.fina_indicator(
+            df = self.client.query(
+                "fina_indicator",
                 ts_code=ts_code,
                 fields='ts_code,ann_date,end_date,eps,dt_eps,roe,roe_dt,roa,grossprofit_margin,netprofit_margin,netprofit_yoy,or_yoy,q_netprofit_yoy,q_sales_yoy,debt_to_assets,current_ratio,quick_ratio'
             )
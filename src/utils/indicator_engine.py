@@ -0,0 +1,361 @@
+"""
+向量化技术指标引擎
+
+所有指标都基于 NumPy 数组计算，同时支持:
+- 1-D 数组: 单个标的的时间序列
+- 2-D 面板: (标的数 × 时间) 的全市场数据，一次调用完成全部标的计算
+
+实现要点:
+- EMA/SMA(N,1) 等递推指标按 IIR 滤波器分块求闭式解（每块内用累积和），
+  避免逐元素的 Python 循环，分块长度保证衰减因子的幂不放大数值误差
+- MA 使用累积和，O(n) 完成任意周期的滑动平均
+- 面板中缺失值 (NaN): 前导 NaN 视为尚未上市，对应输出为 NaN；
+  中间的 NaN 视为停牌，沿用前一个有效值
+"""
+import math
+
+import numpy as np
+
+# 分块闭式解中衰减因子幂的上限（控制累积和的相对误差在 1e-12 左右）
+_MAX_DECAY_GAIN = 1e4
+
+
+def _as_panel(values) -> tuple[np.ndarray, bool]:
+    """转换为 float64 的 2-D 面板，返回 (面板, 输入是否为1-D)"""
+    arr = np.asarray(values, dtype=float)
+    if arr.ndim == 1:
+        return arr[np.newaxis, :], True
+    if arr.ndim != 2:
+        raise ValueError(f"指标输入必须是1-D或2-D数组，实际维度: {arr.ndim}")
+    return arr, False
+
+
+def _restore(arr: np.ndarray, is_1d: bool) -> np.ndarray:
+    """还原为输入的维度"""
+    return arr[0] if is_1d else arr
+
+
+def _fill_missing(panel: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    填充面板中的缺失值
+
+    前导 NaN 用第一个有效值填充，中间 NaN 用前一个有效值填充。
+
+    Returns:
+        (填充后的面板, 每行第一个有效值的下标；整行无效时为列数)
+    """
+    valid = ~np.isnan(panel)
+    n_cols = panel.shape[1]
+    first_valid = np.where(valid.any(axis=1), valid.argmax(axis=1), n_cols)
+
+    if valid.all():
+        return panel, first_valid
+
+    # 前向填充: 每个位置取最近一个有效值的下标
+    idx = np.where(valid, np.arange(n_cols), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    rows = np.arange(panel.shape[0])[:, np.newaxis]
+    filled = panel[rows, idx]
+
+    # 前导部分用第一个有效值填充
+    safe_first = np.minimum(first_valid, n_cols - 1)
+    leading = np.arange(n_cols) < first_valid[:, np.newaxis]
+    filled = np.where(leading, panel[np.arange(panel.shape[0]), safe_first][:, np.newaxis], filled)
+    return filled, first_valid
+
+
+def _mask_leading(result: np.ndarray, first_valid: np.ndarray, offset: int = 0) -> np.ndarray:
+    """将每行第一个有效值（加 offset）之前的输出置为 NaN"""
+    leading = np.arange(result.shape[1]) < (first_valid + offset)[:, np.newaxis]
+    if leading.any():
+        result = np.where(leading, np.nan, result)
+    return result
+
+
+def _iir(panel: np.ndarray, alpha: float, init=None) -> np.ndarray:
+    """
+    一阶 IIR 滤波: y[t] = y[t-1] + alpha * (x[t] - y[t-1])
+
+    按块求闭式解:
+        y[t] = d^(t+1) * y[-1] + alpha * d^t * Σ_{j<=t} x[j] * d^(-j),  d = 1 - alpha
+
+    Args:
+        panel: 无缺失值的 2-D 面板
+        alpha: 平滑系数 (0, 1]
+        init: 初始状态 y[-1]（标量或每行一个值），None 表示以第一个值为初值
+
+    Returns:
+        与输入同形状的滤波结果
+    """
+    n_rows, n_cols = panel.shape
+    out = np.empty_like(panel)
+    if n_cols == 0:
+        return out
+    if alpha >= 1.0:
+        out[:] = panel
+        return out
+
+    decay = 1.0 - alpha
+    block = max(1, int(math.log(_MAX_DECAY_GAIN) / -math.log(decay)))
+
+    if init is None:
+        prev = panel[:, 0].copy()  # y[-1] = x[0] 等价于 y[0] = x[0]
+    else:
+        prev = np.broadcast_to(np.asarray(init, dtype=float), (n_rows,)).copy()
+
+    steps = np.arange(block)
+    grow_all = decay ** (-steps)
+    shrink_all = decay ** steps
+
+    for start in range(0, n_cols, block):
+        chunk = panel[:, start : start + block]
+        length = chunk.shape[1]
+        grow = grow_all[:length]
+        shrink = shrink_all[:length]
+
+        acc = np.cumsum(chunk * grow, axis=1)
+        result = (shrink * decay) * prev[:, np.newaxis] + alpha * shrink * acc
+        out[:, start : start + length] = result
+        prev = result[:, -1]
+
+    return out
+
+
+def _rolling_sum(panel: np.ndarray, period: int) -> np.ndarray:
+    """基于累积和的滑动窗口求和（窗口不足时为已有数据之和）"""
+    cumsum = np.cumsum(panel, axis=1)
+    result = cumsum.copy()
+    if period < panel.shape[1]:
+        result[:, period:] -= cumsum[:, :-period]
+    return result
+
+
+def _rolling_extreme(panel: np.ndarray, period: int, func) -> np.ndarray:
+    """滑动窗口最大/最小值（窗口不足时使用已有数据）"""
+    n_cols = panel.shape[1]
+    if n_cols == 0:
+        return panel.copy()
+    width = min(period, n_cols)
+    padded = np.concatenate(
+        [np.repeat(panel[:, :1], width - 1, axis=1), panel], axis=1
+    )
+    windows = np.lib.stride_tricks.sliding_window_view(padded, width, axis=1)
+    return func(windows, axis=2)
+
+
+# ==================== 基础指标 ====================
+
+
+def ema(values, period: int, init=None) -> np.ndarray:
+    """
+    指数移动平均 EMA(N)，alpha = 2 / (N + 1)
+
+    Args:
+        values: 1-D 序列或 (标的 × 时间) 面板
+        period: 周期
+        init: 上一根K线的EMA（用于增量计算），None 表示以第一个值为初值
+
+    Returns:
+        与输入同形状的数组
+    """
+    panel, is_1d = _as_panel(values)
+    filled, first_valid = _fill_missing(panel)
+    result = _iir(filled, 2.0 / (period + 1), init)
+    return _restore(_mask_leading(result, first_valid), is_1d)
+
+
+def sma(values, period: int) -> np.ndarray:
+    """
+    简单移动平均 MA(N)
+
+    数据不足N个时使用已有数据的累积平均（与 calculate_ma 一致）。
+
+    Args:
+        values: 1-D 序列或 (标的 × 时间) 面板
+        period: 周期
+
+    Returns:
+        与输入同形状的数组
+    """
+    panel, is_1d = _as_panel(values)
+    filled, first_valid = _fill_missing(panel)
+
+    leading = np.arange(panel.shape[1]) < first_valid[:, np.newaxis]
+    sums = _rolling_sum(np.where(leading, 0.0, filled), period)
+    counts = np.clip(np.arange(1, panel.shape[1] + 1) - first_valid[:, np.newaxis], 0, period)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = sums / counts
+    return _restore(_mask_leading(result, first_valid), is_1d)
+
+
+# ==================== 组合指标 ====================
+
+
+def macd(
+    close,
+    fast_period: int = 12,
+    slow_period: int = 26,
+    signal_period: int = 9,
+) -> dict[str, np.ndarray]:
+    """
+    MACD 指标
+
+    Args:
+        close: 收盘价，1-D 序列或 (标的 × 时间) 面板
+        fast_period: 快线周期
+        slow_period: 慢线周期
+        signal_period: 信号线周期
+
+    Returns:
+        包含 dif, dea, macd(柱状图) 的字典
+    """
+    panel, is_1d = _as_panel(close)
+    filled, first_valid = _fill_missing(panel)
+
+    dif = _iir(filled, 2.0 / (fast_period + 1)) - _iir(filled, 2.0 / (slow_period + 1))
+    dea = _iir(dif, 2.0 / (signal_period + 1))
+    bar = (dif - dea) * 2
+
+    return {
+        key: _restore(_mask_leading(arr, first_valid), is_1d)
+        for key, arr in (("dif", dif), ("dea", dea), ("macd", bar))
+    }
+
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    """
+    相对强弱指标 RSI(N)
+
+    RSI = SMA(MAX(C - LC, 0), N, 1) / SMA(ABS(C - LC), N, 1) * 100（与通达信一致）
+
+    Args:
+        close: 收盘价，1-D 序列或 (标的 × 时间) 面板
+        period: 周期
+
+    Returns:
+        与输入同形状的数组，第一根K线为 NaN
+    """
+    panel, is_1d = _as_panel(close)
+    filled, first_valid = _fill_missing(panel)
+
+    change = np.diff(filled, axis=1)
+    gain = _iir(np.maximum(change, 0.0), 1.0 / period)
+    total = _iir(np.abs(change), 1.0 / period)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = np.where(total > 0, gain / total * 100, 50.0)
+
+    result = np.concatenate([np.full((panel.shape[0], 1), np.nan), values], axis=1)
+    return _restore(_mask_leading(result, first_valid, offset=1), is_1d)
+
+
+def boll(close, period: int = 20, width: float = 2.0) -> dict[str, np.ndarray]:
+    """
+    布林带 BOLL(N, K)
+
+    MID = MA(C, N)，UPPER/LOWER = MID ± K * STD(C, N)（总体标准差）；
+    数据不足N个时为 NaN。
+
+    Args:
+        close: 收盘价，1-D 序列或 (标的 × 时间) 面板
+        period: 周期
+        width: 标准差倍数
+
+    Returns:
+        包含 mid, upper, lower 的字典
+    """
+    panel, is_1d = _as_panel(close)
+    filled, first_valid = _fill_missing(panel)
+
+    # 以每行首个值为基准平移，降低平方和的数值误差
+    shifted = filled - filled[:, :1]
+    mean = _rolling_sum(shifted, period) / period
+    mean_sq = _rolling_sum(shifted * shifted, period) / period
+    std = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+    mid = mean + filled[:, :1]
+    result = {"mid": mid, "upper": mid + width * std, "lower": mid - width * std}
+    return {
+        key: _restore(_mask_leading(arr, first_valid, offset=period - 1), is_1d)
+        for key, arr in result.items()
+    }
+
+
+def kdj(high, low, close, n: int = 9, m1: int = 3, m2: int = 3) -> dict[str, np.ndarray]:
+    """
+    随机指标 KDJ(N, M1, M2)
+
+    RSV = (C - LLV(L, N)) / (HHV(H, N) - LLV(L, N)) * 100
+    K = SMA(RSV, M1, 1)，D = SMA(K, M2, 1)，J = 3K - 2D，K/D 初值为 50
+
+    Args:
+        high: 最高价，1-D 序列或 (标的 × 时间) 面板
+        low: 最低价
+        close: 收盘价
+        n: RSV 周期
+        m1: K 平滑周期
+        m2: D 平滑周期
+
+    Returns:
+        包含 k, d, j 的字典
+    """
+    high_panel, is_1d = _as_panel(high)
+    low_panel, _ = _as_panel(low)
+    close_panel, _ = _as_panel(close)
+    high_filled, _ = _fill_missing(high_panel)
+    low_filled, _ = _fill_missing(low_panel)
+    close_filled, first_valid = _fill_missing(close_panel)
+
+    highest = _rolling_extreme(high_filled, n, np.max)
+    lowest = _rolling_extreme(low_filled, n, np.min)
+    spread = highest - lowest
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsv = np.where(spread > 0, (close_filled - lowest) / spread * 100, 50.0)
+
+    k = _iir(rsv, 1.0 / m1, init=50.0)
+    d = _iir(k, 1.0 / m2, init=50.0)
+    j = 3 * k - 2 * d
+
+    return {
+        key: _restore(_mask_leading(arr, first_valid), is_1d)
+        for key, arr in (("k", k), ("d", d), ("j", j))
+    }
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """
+    平均真实波幅 ATR(N) = MA(TR, N)
+
+    TR = MAX(H - L, |H - LC|, |L - LC|)，第一根K线 TR = H - L
+
+    Args:
+        high: 最高价，1-D 序列或 (标的 × 时间) 面板
+        low: 最低价
+        close: 收盘价
+        period: 周期
+
+    Returns:
+        与输入同形状的数组
+    """
+    high_panel, is_1d = _as_panel(high)
+    low_panel, _ = _as_panel(low)
+    close_panel, _ = _as_panel(close)
+    high_filled, _ = _fill_missing(high_panel)
+    low_filled, _ = _fill_missing(low_panel)
+    close_filled, first_valid = _fill_missing(close_panel)
+
+    prev_close = np.concatenate([close_filled[:, :1], close_filled[:, :-1]], axis=1)
+    true_range = np.maximum.reduce([
+        high_filled - low_filled,
+        np.abs(high_filled - prev_close),
+        np.abs(low_filled - prev_close),
+    ])
+    # 让首个有效K线之前的部分不参与平均
+    leading = np.arange(close_panel.shape[1]) < first_valid[:, np.newaxis]
+    true_range = np.where(leading, np.nan, true_range)
+
+    return _restore(sma(true_range, period), is_1d)
+
+
+__all__ = ["ema", "sma", "macd", "rsi", "boll", "kdj", "atr"]
@@ -2,16 +2,19 @@
 技术指标计算工具
 
 提供常用的技术指标计算函数，如MACD、MA等
+列表接口，底层由向量化的 indicator_engine 计算（面板批量计算请直接使用 indicator_engine）
 """
 import numpy as np
 
+from src.utils.indicator_engine import ema, macd, sma
+
 
 def calculate_ma(prices: list[float], period: int) -> list[float]:
     """
     计算简单移动平均线 (Simple Moving Average)
 
     Args:
-        prices: 价格列表
+        prices: 价格列表（list 或 ndarray）
         period: MA周期
 
     Returns:
@@ -22,20 +25,9 @@ def calculate_ma(prices: list[float], period: int) -> list[float]:
         >>> calculate_ma(prices, 3)
         [10.0, 10.5, 11.0, 12.0, 13.0]
     """
-    if len(prices) < period:
-        # 数据不足时使用累积平均
-        return [sum(prices[:i+1]) / (i+1) for i in range(len(prices))]
-
-    result = []
-    for i in range(len(prices)):
-        if i < period - 1:
-            # 前期数据不足,使用累积平均
-            result.append(sum(prices[:i+1]) / (i+1))
-        else:
-            # 计算period周期的MA
-            result.append(sum(prices[i-period+1:i+1]) / period)
-
-    return result
+    if len(prices) == 0:
+        return []
+    return sma(prices, period).tolist()
 
 
 def calculate_macd(
@@ -75,37 +67,61 @@ def calculate_macd(
             "macd": [None] * len(close_prices),
         }
 
-    closes = np.array(close_prices, dtype=float)
+    result = macd(close_prices, fast_period, slow_period, signal_period)
 
-    def ema(data: np.ndarray, period: int) -> np.ndarray:
-        """
-        计算指数移动平均 (Exponential Moving Average)
+    return {key: np.round(values, 4).tolist() for key, values in result.items()}
 
-        EMA[i] = (Price[i] - EMA[i-1]) * multiplier + EMA[i-1]
-        其中 multiplier = 2 / (period + 1)
-        """
-        result = np.zeros(len(data))
-        multiplier = 2 / (period + 1)
-        result[0] = data[0]
-        for i in range(1, len(data)):
-            result[i] = (data[i] - result[i - 1]) * multiplier + result[i - 1]
-        return result
 
-    # 计算快线和慢线EMA
-    ema_fast = ema(closes, fast_period)
-    ema_slow = ema(closes, slow_period)
+def calculate_macd_series(
+    close_prices: list[float],
+    fast_period: int = 12,
+    slow_period: int = 26,
+    signal_period: int = 9,
+    ema_fast: float | None = None,
+    ema_slow: float | None = None,
+    dea: float | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    从给定的EMA状态继续计算MACD序列（增量计算）
 
-    # DIF = 快线EMA - 慢线EMA
-    dif = ema_fast - ema_slow
+    与 calculate_macd 使用相同的递推公式，但:
+    - 可以从上一根K线的 EMA12/EMA26/DEA 状态继续计算，无需重算全部历史
+    - 不做数据量检查，也不四舍五入，返回值可直接作为下一次计算的状态
 
-    # DEA = DIF的EMA (信号线)
-    dea = ema(dif, signal_period)
+    状态为 None 时以第一个收盘价作为EMA初值，结果与 calculate_macd 完全一致。
 
-    # MACD柱状图 = (DIF - DEA) * 2
-    macd_bar = (dif - dea) * 2
+    Args:
+        close_prices: 收盘价列表（状态之后的新K线）
+        fast_period: 快线周期，默认12
+        slow_period: 慢线周期，默认26
+        signal_period: 信号线周期，默认9
+        ema_fast: 上一根K线的快线EMA
+        ema_slow: 上一根K线的慢线EMA
+        dea: 上一根K线的DEA
+
+    Returns:
+        包含 ema_fast, ema_slow, dif, dea, macd 的字典，每个元素为对应K线之后的状态
+    """
+    closes = np.asarray(close_prices, dtype=float)
+    if len(closes) == 0:
+        return {key: np.zeros(0) for key in ("ema_fast", "ema_slow", "dif", "dea", "macd")}
+
+    if ema_fast is None or ema_slow is None or dea is None:
+        # 无历史状态：以第一个收盘价作为初值
+        fast = ema(closes, fast_period)
+        slow = ema(closes, slow_period)
+        dif = fast - slow
+        signal = ema(dif, signal_period)
+    else:
+        fast = ema(closes, fast_period, init=ema_fast)
+        slow = ema(closes, slow_period, init=ema_slow)
+        dif = fast - slow
+        signal = ema(dif, signal_period, init=dea)
 
     return {
-        "dif": [round(v, 4) for v in dif.tolist()],
-        "dea": [round(v, 4) for v in dea.tolist()],
-        "macd": [round(v, 4) for v in macd_bar.tolist()],
+        "ema_fast": fast,
+        "ema_slow": slow,
+        "dif": dif,
+        "dea": signal,
+        "macd": (dif - signal) * 2,
     }
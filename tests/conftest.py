@@ -0,0 +1,37 @@
+"""
+测试公共配置
+
+src.config / src.database / src.utils.logging 在导入时就读取配置、创建引擎和日志文件，
+所以数据库、数据目录和日志目录必须在导入任何 src 模块之前指向临时目录；
+K线数组缓存则在每个测试中指向该测试自己的 tmp_path。运行测试不会写入工作区。
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TEST_ROOT = Path(tempfile.mkdtemp(prefix="ashare-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TEST_ROOT / 'market.db'}"
+os.environ["DATA_DIR"] = str(_TEST_ROOT / "data")
+os.environ["LOGS_DIR"] = str(_TEST_ROOT / "logs")
+
+
+@pytest.fixture(autouse=True)
+def kline_cache_in_tmp_path(tmp_path):
+    """全局K线缓存写入 tmp_path，测试结束后恢复为按配置懒加载"""
+    from src.database import engine
+    from src.services import kline_array_cache
+
+    kline_array_cache.set_kline_cache(
+        kline_array_cache.KlineArrayCache(tmp_path / "kline_cache", engine)
+    )
+    yield
+    kline_array_cache._cache = None
+    kline_array_cache._cache_configured = False
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TEST_ROOT, ignore_errors=True)
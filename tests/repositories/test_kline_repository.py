@@ -4,6 +4,8 @@ Unit tests for KlineRepository
 Tests all data access methods using an in-memory SQLite database.
 """
 
+import numpy as np
+import pandas as pd
 import pytest
 from datetime import datetime
 from sqlalchemy import create_engine
@@ -11,6 +13,7 @@ from sqlalchemy.orm import Session, sessionmaker
 
 from src.database import Base
 from src.models import Kline, KlineTimeframe, SymbolType
+from src.repositories.kline_columns import KlineBatch
 from src.repositories.kline_repository import KlineRepository
 
 
@@ -44,7 +47,6 @@ def sample_klines():
             close=3050.0,
             volume=1000000.0,
             amount=5000000.0,
-            created_at=now,
             updated_at=now,
         ),
         Kline(
@@ -59,7 +61,6 @@ def sample_klines():
             close=3100.0,
             volume=1200000.0,
             amount=6000000.0,
-            created_at=now,
             updated_at=now,
         ),
         Kline(
@@ -74,7 +75,6 @@ def sample_klines():
             close=3150.0,
             volume=1500000.0,
             amount=7500000.0,
-            created_at=now,
             updated_at=now,
         ),
     ]
@@ -104,7 +104,6 @@ class TestKlineRepositoryBasicOperations:
         saved = repo.save(kline)
         repo.commit()
 
-        assert saved.id is not None
         assert saved.symbol_code == "000001"
         assert saved.close == 10.3
 
@@ -116,8 +115,10 @@ class TestKlineRepositoryBasicOperations:
         saved = repo.save(sample_klines[0])
         repo.commit()
 
-        # Find by ID
-        found = repo.find_by_id(saved.id)
+        # Find by composite primary key
+        found = repo.find_by_id(
+            (saved.symbol_type, saved.symbol_code, saved.timeframe, saved.trade_time)
+        )
 
         assert found is not None
         assert found.symbol_code == "000001.SH"
@@ -351,6 +352,82 @@ class TestKlineRepositoryBatchOperations:
         assert latest.close == 3250.0  # 3150 + 100
 
 
+    def test_bulk_upsert_reports_counts_and_skips_unchanged(self, db_session):
+        """Test unchanged rows are not rewritten and counts are reported"""
+        repo = KlineRepository(db_session)
+
+        def record(day, close, dif=None):
+            return {
+                "symbol_type": SymbolType.STOCK,
+                "symbol_code": "000001",
+                "symbol_name": None,
+                "timeframe": KlineTimeframe.DAY,
+                "trade_time": f"2024-01-0{day}",
+                "open": 10.0,
+                "high": 11.0,
+                "low": 9.0,
+                "close": close,
+                "volume": 1000.0,
+                "amount": 5000.0,
+                "dif": dif,
+                "dea": None,
+                "macd": None,
+                "updated_at": datetime(2024, 1, day),
+            }
+
+        first = repo.bulk_upsert([record(1, 10.0, dif=0.5), record(2, 10.5)])
+        assert (first.inserted, first.updated, first.unchanged) == (2, 0, 0)
+
+        # 相同值（指标未提供视为不变）+ 一根改价 + 一根新K线
+        batch = [record(1, 10.0), record(2, 10.8), record(3, 11.0)]
+        for r in batch:
+            r["updated_at"] = datetime(2024, 2, 1)
+        second = repo.bulk_upsert(batch)
+        repo.commit()
+
+        assert (second.inserted, second.updated, second.unchanged) == (1, 1, 1)
+        assert second.written == 2
+
+        rows = {
+            k.trade_time: k
+            for k in repo.find_by_symbol("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        }
+        assert rows["2024-01-01"].dif == 0.5
+        assert rows["2024-01-01"].updated_at.replace(tzinfo=None) == datetime(2024, 1, 1)
+        assert rows["2024-01-02"].close == 10.8
+        assert rows["2024-01-02"].updated_at.replace(tzinfo=None) == datetime(2024, 2, 1)
+
+    def test_bulk_upsert_counts_cross_section_across_code_chunks(self, db_session, monkeypatch):
+        """Test the existing-key lookup bounds its IN list and still counts every code"""
+        monkeypatch.setattr(KlineRepository, "STREAM_SYMBOL_CHUNK", 2)
+        repo = KlineRepository(db_session)
+
+        def record(code):
+            return {
+                "symbol_type": SymbolType.STOCK,
+                "symbol_code": code,
+                "symbol_name": None,
+                "timeframe": KlineTimeframe.DAY,
+                "trade_time": "2024-01-02",
+                "open": 10.0,
+                "high": 11.0,
+                "low": 9.0,
+                "close": 10.5,
+                "volume": 1000.0,
+                "amount": 5000.0,
+                "dif": None,
+                "dea": None,
+                "macd": None,
+                "updated_at": datetime(2024, 1, 2),
+            }
+
+        codes = [f"00000{i}" for i in range(5)]
+        repo.bulk_upsert([record(code) for code in codes[:3]])
+        stats = repo.bulk_upsert([record(code) for code in codes])
+
+        assert (stats.inserted, stats.updated, stats.unchanged) == (2, 0, 3)
+
+
 class TestKlineRepositoryDelete:
     """Test delete operations"""
 
@@ -448,3 +525,410 @@ class TestKlineRepositoryEdgeCases:
         )
 
         assert count == 0
+
+    def test_upsert_records_chunks_large_batches(self, db_session):
+        """Test dict upsert beyond SQLite's bound-variable limit"""
+        repo = KlineRepository(db_session)
+
+        records = [
+            {
+                "symbol_type": SymbolType.STOCK,
+                "symbol_code": f"{i:06d}",
+                "symbol_name": None,
+                "timeframe": KlineTimeframe.DAY,
+                "trade_time": "2024-01-02",
+                "open": 10.0,
+                "high": 11.0,
+                "low": 9.0,
+                "close": 10.5,
+                "volume": 1000.0,
+                "amount": 5000.0,
+                "updated_at": datetime.now(),
+            }
+            for i in range(3000)
+        ]
+
+        count = repo.upsert_records(records)
+        repo.commit()
+
+        assert count == 3000
+        assert repo.count() == 3000
+
+
+class TestKlineRepositoryColumns:
+    """Test columnar Core read path"""
+
+    def test_find_columns_by_symbol(self, db_session, sample_klines):
+        """Test columns come back oldest first as float arrays"""
+        repo = KlineRepository(db_session)
+        repo.save_all(sample_klines)
+        repo.commit()
+
+        columns = repo.find_columns_by_symbol(
+            "000001.SH", SymbolType.INDEX, KlineTimeframe.DAY
+        )
+
+        assert len(columns) == 3
+        assert columns.trade_time.tolist() == ["2024-01-01", "2024-01-02", "2024-01-03"]
+        assert columns.close.dtype == np.float64
+        assert columns.close.tolist() == [3050.0, 3100.0, 3150.0]
+        assert columns.bar(-1).high == 3200.0
+
+    def test_find_columns_with_limit_and_range(self, db_session, sample_klines):
+        """Test limit keeps the latest bars and ranges are inclusive"""
+        repo = KlineRepository(db_session)
+        repo.save_all(sample_klines)
+        repo.commit()
+
+        latest = repo.find_columns_by_symbol(
+            "000001.SH", SymbolType.INDEX, KlineTimeframe.DAY, limit=2
+        )
+        ranged = repo.find_columns_by_symbol(
+            "000001.SH", SymbolType.INDEX, KlineTimeframe.DAY,
+            start_time="2024-01-02", end_time="2024-01-03",
+        )
+        empty = repo.find_columns_by_symbol(
+            "999999.SH", SymbolType.INDEX, KlineTimeframe.DAY
+        )
+
+        assert latest.trade_time.tolist() == ["2024-01-02", "2024-01-03"]
+        assert ranged.trade_time.tolist() == ["2024-01-02", "2024-01-03"]
+        assert len(empty) == 0
+        assert empty.to_records() == []
+
+    def test_iter_columns_by_symbols_streams_per_symbol(self, db_session, monkeypatch):
+        """Test multi-symbol scan splits rows per symbol across query chunks"""
+        repo = KlineRepository(db_session)
+        monkeypatch.setattr(KlineRepository, "STREAM_SYMBOL_CHUNK", 2)
+
+        codes = ["000001", "000002", "000003", "000004", "000005"]
+        records = [
+            {
+                "symbol_type": SymbolType.STOCK,
+                "symbol_code": code,
+                "symbol_name": None,
+                "timeframe": KlineTimeframe.DAY,
+                "trade_time": f"2024-01-0{day}",
+                "open": 10.0,
+                "high": 11.0,
+                "low": 9.0,
+                "close": float(i * 10 + day),
+                "volume": 1000.0,
+                "amount": 5000.0,
+                "updated_at": datetime.now(),
+            }
+            for i, code in enumerate(codes)
+            if code != "000004"
+            for day in (3, 1, 2)
+        ]
+        repo.upsert_records(records)
+        repo.commit()
+
+        result = list(repo.iter_columns_by_symbols(
+            codes, SymbolType.STOCK, KlineTimeframe.DAY, start_time="2024-01-02"
+        ))
+
+        assert [c.symbol_code for c in result] == ["000001", "000002", "000003", "000005"]
+        assert result[1].trade_time.tolist() == ["2024-01-02", "2024-01-03"]
+        assert result[1].close.tolist() == [12.0, 13.0]
+        assert result[3].close.tolist() == [42.0, 43.0]
+
+
+class TestKlineBatch:
+    """Test the columnar write batch built from provider payloads"""
+
+    @staticmethod
+    def _tushare_frame():
+        return pd.DataFrame({
+            "ts_code": ["600519.SH"] * 3,
+            "trade_date": ["20240103", "20240102", "20240101"],
+            "open": [10.0, 11.0, 12.0],
+            "high": [10.5, 11.5, 12.5],
+            "low": [9.5, 10.5, 11.5],
+            "close": [10.2, 11.2, 12.2],
+            "vol": [100.0, None, 300.0],
+            "amount": [1000.0, 2000.0, 3000.0],
+        })
+
+    def test_from_frame_normalizes_and_sorts(self):
+        """Test Tushare and Sina frames convert column-wise to ISO times"""
+        batch = KlineBatch.from_frame(self._tushare_frame()).normalized(daily=True).sorted()
+        assert batch.trade_time.tolist() == ["2024-01-01", "2024-01-02", "2024-01-03"]
+        assert batch.close.tolist() == [12.2, 11.2, 10.2]
+        assert batch.volume.tolist() == [300.0, 0.0, 100.0]
+
+        sina = pd.DataFrame({
+            "timestamp": pd.to_datetime(["2024-01-02 14:30:00", "2024-01-02 15:00:00"]),
+            "open": [1.0, 2.0], "high": [1.0, 2.0], "low": [1.0, 2.0], "close": [1.0, 2.0],
+            "volume": [10, 20],
+        })
+        batch = KlineBatch.from_frame(sina)
+        assert batch.normalized(daily=False) is batch
+        assert batch.trade_time.tolist() == ["2024-01-02 14:30:00", "2024-01-02 15:00:00"]
+        assert batch.amount.tolist() == [0.0, 0.0]
+        assert batch.between("2024-01-02 15:00:00").trade_time.tolist() == ["2024-01-02 15:00:00"]
+
+    def test_from_records_keeps_missing_prices_as_nan(self):
+        """Test missing prices stay NaN while volume/amount default to 0"""
+        batch = KlineBatch.from_records([
+            {"datetime": "2024-01-02", "open": 10.0, "high": 10.5, "low": 9.5, "close": 10.2,
+             "volume": 100.0, "amount": 1000.0},
+            {"datetime": "2024-01-03", "open": None, "high": 10.5, "low": 9.5, "volume": None},
+        ])
+        assert batch.close[0] == 10.2
+        assert np.isnan(batch.open[1]) and np.isnan(batch.close[1])
+        assert batch.volume.tolist() == [100.0, 0.0]
+        assert batch.amount.tolist() == [1000.0, 0.0]
+
+    def test_normalized_handles_compact_and_irregular_times(self):
+        """Test compact THS times and the per-value fallback"""
+        columns = [[1.0, 2.0]] * 6
+        intraday = KlineBatch.from_columns(["202401021000", "202401021500"], columns)
+        assert intraday.normalized(daily=False).trade_time.tolist() == [
+            "2024-01-02 10:00:00",
+            "2024-01-02 15:00:00",
+        ]
+        assert intraday.normalized(daily=True).trade_time.tolist() == ["2024-01-02"] * 2
+
+        mixed = KlineBatch.from_columns(["2024-01-02", "bad"], columns).normalized(daily=False)
+        assert mixed.trade_time.tolist() == ["2024-01-02 00:00:00", "bad"]
+
+    def test_upsert_columns(self, db_session):
+        """Test the columnar upsert counts rows and keeps indicators it is not given"""
+        repo = KlineRepository(db_session)
+        batch = KlineBatch.from_frame(self._tushare_frame()).normalized(daily=True).sorted()
+        indicators = np.array([[0.1, 0.2, -0.2], [0.3, 0.4, -0.2], [0.5, 0.6, -0.2]])
+
+        result = repo.upsert_columns(
+            SymbolType.STOCK, "600519", "贵州茅台", KlineTimeframe.DAY, batch, indicators
+        )
+        assert (result.inserted, result.updated, result.unchanged) == (3, 0, 0)
+
+        # 重复写入不改写行；未提供的指标保留已有值
+        result = repo.upsert_columns(
+            SymbolType.STOCK, "600519", "贵州茅台", KlineTimeframe.DAY, batch
+        )
+        assert (result.inserted, result.updated, result.unchanged) == (0, 0, 3)
+        repo.commit()
+
+        stored = repo.find_by_symbol("600519", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert [k.trade_time for k in stored] == ["2024-01-03", "2024-01-02", "2024-01-01"]
+        assert stored[0].symbol_type == SymbolType.STOCK
+        assert (stored[0].close, stored[0].volume, stored[0].dif) == (10.2, 100.0, 0.5)
+        assert stored[0].updated_at is not None
+        latest = repo.find_latest_bar("600519", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert (latest.trade_time, latest.prev_close) == ("2024-01-03", 11.2)
+
+
+class TestKlineRepositoryLatestN:
+    """Test per-symbol row limiting done in SQL"""
+
+    def _seed(self, repo):
+        records = [
+            {
+                "symbol_type": SymbolType.STOCK,
+                "symbol_code": code,
+                "symbol_name": None,
+                "timeframe": timeframe,
+                "trade_time": f"2024-01-{day:02d}",
+                "open": 10.0,
+                "high": 11.0,
+                "low": 9.0,
+                "close": float(day),
+                "volume": 1000.0,
+                "amount": 5000.0,
+                "updated_at": datetime.now(),
+            }
+            for code in ("000001", "000002", "000003")
+            for timeframe in (KlineTimeframe.DAY, KlineTimeframe.MINS_30)
+            for day in range(1, 21)
+        ]
+        repo.upsert_records(records)
+        repo.commit()
+
+    def test_find_by_symbols_limits_each_symbol(self, db_session):
+        """Test limit_per_symbol keeps the newest bars of each symbol"""
+        repo = KlineRepository(db_session)
+        self._seed(repo)
+
+        klines = repo.find_by_symbols(
+            ["000001", "000002"], SymbolType.STOCK, KlineTimeframe.DAY, limit_per_symbol=3
+        )
+
+        assert [(k.symbol_code, k.trade_time) for k in klines] == [
+            ("000001", "2024-01-20"),
+            ("000001", "2024-01-19"),
+            ("000001", "2024-01-18"),
+            ("000002", "2024-01-20"),
+            ("000002", "2024-01-19"),
+            ("000002", "2024-01-18"),
+        ]
+
+    def test_latest_n_by_symbols_returns_columns(self, db_session):
+        """Test latest_n_by_symbols returns oldest-first columns per symbol"""
+        repo = KlineRepository(db_session)
+        self._seed(repo)
+
+        result = repo.latest_n_by_symbols(
+            ["000003", "000001", "999999"], SymbolType.STOCK, KlineTimeframe.DAY, 4
+        )
+
+        assert sorted(result) == ["000001", "000003"]
+        assert result["000003"].close.tolist() == [17.0, 18.0, 19.0, 20.0]
+        assert result["000001"].trade_time[0] == "2024-01-17"
+
+    def test_ranking_uses_clustered_key(self, db_session):
+        """Test the ROW_NUMBER ranking is a range search on the clustered key"""
+        from sqlalchemy import select
+        from sqlalchemy.dialects import sqlite
+
+        repo = KlineRepository(db_session)
+        ranked = repo._ranked_subquery(
+            ["000001", "000002"], SymbolType.STOCK, KlineTimeframe.DAY
+        )
+        stmt = select(ranked.c.close).filter(ranked.c.rn <= 5)
+        sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+        plan = [
+            row[3]
+            for row in db_session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql)
+        ]
+
+        assert any(
+            "SEARCH klines USING PRIMARY KEY (symbol_type=? AND symbol_code=? AND timeframe=?)"
+            in detail
+            for detail in plan
+        ), plan
+        assert not any(detail.startswith("SCAN klines") for detail in plan), plan
+
+
+class TestKlineRepositoryLatestBar:
+    """Test the kline_latest summary maintained by writes"""
+
+    @staticmethod
+    def _record(code, day, close):
+        return {
+            "symbol_type": SymbolType.STOCK,
+            "symbol_code": code,
+            "symbol_name": None,
+            "timeframe": KlineTimeframe.DAY,
+            "trade_time": f"2024-01-{day:02d}",
+            "open": 10.0,
+            "high": 11.0,
+            "low": 9.0,
+            "close": close,
+            "volume": 1000.0,
+            "amount": 5000.0,
+            "updated_at": datetime.now(),
+        }
+
+    def test_upsert_maintains_latest_and_prev_close(self, db_session):
+        """Test the summary tracks the newest bar and the close before it"""
+        repo = KlineRepository(db_session)
+        repo.upsert_records([self._record("000001", day, float(day)) for day in (3, 1, 2)])
+
+        latest = repo.find_latest_bar("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert (latest.trade_time, latest.close) == ("2024-01-03", 3.0)
+        assert (latest.prev_trade_time, latest.prev_close) == ("2024-01-02", 2.0)
+
+        # Rewriting the previous bar updates prev_close; a new bar shifts the window
+        repo.upsert_records([self._record("000001", 2, 2.5)])
+        latest = repo.find_latest_bar("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert latest.prev_close == 2.5
+
+        repo.upsert_records([self._record("000001", 4, 4.0)])
+        repo.commit()
+        latest = repo.find_latest_bar("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert (latest.trade_time, latest.close, latest.prev_close) == ("2024-01-04", 4.0, 3.0)
+
+    def test_rollback_discards_summary_changes(self, db_session):
+        """Test the summary is written in the same transaction as the klines"""
+        repo = KlineRepository(db_session)
+        repo.upsert_records([self._record("000001", 1, 1.0)])
+        repo.commit()
+
+        repo.upsert_records([self._record("000001", 2, 2.0)])
+        db_session.rollback()
+
+        latest = repo.find_latest_bar("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert latest.trade_time == "2024-01-01"
+
+    def test_deletes_refresh_or_remove_summary(self, db_session):
+        """Test deleting bars rolls the summary back and removes empty symbols"""
+        repo = KlineRepository(db_session)
+        repo.upsert_records([self._record("000001", day, float(day)) for day in range(1, 6)])
+
+        repo.delete_by_date_range(
+            "000001", SymbolType.STOCK, KlineTimeframe.DAY,
+            datetime(2024, 1, 4), datetime(2024, 1, 5),
+        )
+        latest = repo.find_latest_bar("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert (latest.trade_time, latest.prev_close) == ("2024-01-03", 2.0)
+
+        repo.delete_by_symbol("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert repo.find_latest_bar("000001", SymbolType.STOCK, KlineTimeframe.DAY) is None
+
+    def test_batch_lookup_and_latest_trade_time(self, db_session):
+        """Test batch lookup, per-type latest time and a full rebuild"""
+        repo = KlineRepository(db_session)
+        repo.upsert_records(
+            [self._record("000001", day, float(day)) for day in (1, 2)]
+            + [self._record("000002", 5, 5.0)]
+        )
+
+        latest = repo.find_latest_bars(
+            ["000001", "000002", "999999"], SymbolType.STOCK, KlineTimeframe.DAY
+        )
+        assert {code: bar.close for code, bar in latest.items()} == {
+            "000001": 2.0,
+            "000002": 5.0,
+        }
+        assert latest["000002"].prev_close is None
+        assert repo.find_latest_trade_time(SymbolType.STOCK, KlineTimeframe.DAY) == "2024-01-05"
+        assert repo.find_latest_trade_time(SymbolType.INDEX, KlineTimeframe.DAY) is None
+
+        assert repo.rebuild_latest() == 2
+        rebuilt = repo.find_latest_bar("000001", SymbolType.STOCK, KlineTimeframe.DAY)
+        assert (rebuilt.trade_time, rebuilt.prev_close) == ("2024-01-02", 1.0)
+
+
+class TestLegacyKlineLayoutMigration:
+    """Rebuilding the pre-compaction klines table"""
+
+    def test_migrates_legacy_table_in_place(self):
+        import sqlite3
+
+        from src.database import is_legacy_kline_layout, migrate_legacy_kline_layout
+
+        conn = sqlite3.connect(":memory:", isolation_level=None)
+        conn.execute(
+            "CREATE TABLE klines (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "symbol_type VARCHAR(6) NOT NULL, symbol_code VARCHAR(16) NOT NULL, "
+            "symbol_name VARCHAR(64), timeframe VARCHAR(7) NOT NULL, "
+            "trade_time VARCHAR(19) NOT NULL, open FLOAT NOT NULL, high FLOAT NOT NULL, "
+            "low FLOAT NOT NULL, close FLOAT NOT NULL, volume FLOAT, amount FLOAT, "
+            "dif FLOAT, dea FLOAT, macd FLOAT, created_at DATETIME NOT NULL, "
+            "updated_at DATETIME)"
+        )
+        conn.execute("CREATE INDEX ix_klines_trade_time ON klines (trade_time)")
+        conn.executemany(
+            "INSERT INTO klines (symbol_type, symbol_code, timeframe, trade_time, open, high, "
+            "low, close, volume, amount, created_at) "
+            "VALUES ('STOCK', ?, 'DAY', ?, 1, 1, 1, 1, 0, 0, '2024-01-01 00:00:00')",
+            [("600001", "2024-01-03"), ("600000", "2024-01-02")],
+        )
+
+        assert is_legacy_kline_layout(conn)
+        assert migrate_legacy_kline_layout(conn) == 2
+        assert not is_legacy_kline_layout(conn)
+        assert migrate_legacy_kline_layout(conn) == 0
+
+        # 新结构可直接写入（不再要求 created_at）
+        conn.execute(
+            "INSERT INTO klines (symbol_type, symbol_code, timeframe, trade_time, open, high, "
+            "low, close, volume, amount, updated_at) VALUES ('STOCK', '600002', 'DAY', "
+            "'2024-01-02', 1, 1, 1, 1, 0, 0, CURRENT_TIMESTAMP)"
+        )
+        assert conn.execute(
+            "SELECT symbol_code, updated_at FROM klines ORDER BY symbol_code LIMIT 1"
+        ).fetchone() == ("600000", "2024-01-01 00:00:00")
@@ -0,0 +1,88 @@
+"""
+Tests for incremental "since last bar" fetch planning
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from src.models import KlineTimeframe, SymbolType
+from src.services import fetch_planner, freshness_registry
+from src.services.fetch_planner import OVERLAP_BARS, FetchPlan, count_missing_bars, plan_fetches
+from src.services.freshness_registry import FreshnessEntry, FreshnessRegistry
+from src.services.trading_calendar import TradingCalendar
+
+# 2025-07-04 (周五) ~ 2025-07-11 (周五) 工作日交易，周末休市
+CALENDAR = TradingCalendar(
+    ["2025-07-04", "2025-07-07", "2025-07-08", "2025-07-09", "2025-07-10", "2025-07-11"],
+    ["2025-07-05", "2025-07-06", "2025-07-12", "2025-07-13"],
+)
+
+DAY = KlineTimeframe.DAY
+MINS_30 = KlineTimeframe.MINS_30
+STOCK = SymbolType.STOCK
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(freshness_registry, "get_trading_calendar", lambda: CALENDAR)
+    monkeypatch.setattr(fetch_planner, "get_trading_calendar", lambda: CALENDAR)
+    registry = FreshnessRegistry(session_factory=lambda: None)
+    registry._loaded = True
+    return registry
+
+
+def _entry(last_bar, fetched_local):
+    return FreshnessEntry(last_bar, fetched_local.astimezone(timezone.utc), "sina")
+
+
+def test_count_missing_daily_bars_skips_weekends():
+    assert count_missing_bars(DAY, "2025-07-08", "2025-07-08", CALENDAR) == 0
+    assert count_missing_bars(DAY, "2025-07-04", "2025-07-08", CALENDAR) == 2
+    assert count_missing_bars(DAY, "2025-07-04", "2025-07-11", CALENDAR, limit=3) == 3
+
+
+def test_count_missing_intraday_bars_across_days():
+    assert count_missing_bars(MINS_30, "2025-07-08 10:00:00", "2025-07-08 11:30:00", CALENDAR) == 3
+    # 07-04 14:30 之后: 15:00 + 07-07 全天 8 根 + 07-08 10:00、10:30
+    assert count_missing_bars(MINS_30, "2025-07-04 14:30:00", "2025-07-08 10:30:00", CALENDAR) == 11
+
+
+def test_plan_skips_current_symbols_and_sizes_windows(registry):
+    now = datetime(2025, 7, 8, 16, 0)
+    registry.apply({
+        # 收盘后已获取过当天K线
+        (STOCK, "600519", DAY): _entry("2025-07-08", datetime(2025, 7, 8, 15, 40)),
+        # 上周五之后没有更新
+        (STOCK, "000001", DAY): _entry("2025-07-04", datetime(2025, 7, 4, 16, 0)),
+        # 盘中保存的当天K线尚未走完
+        (STOCK, "000002", DAY): _entry("2025-07-08", datetime(2025, 7, 8, 11, 0)),
+    })
+
+    plans = plan_fetches(
+        STOCK, DAY, ["600519", "000001", "000002", "300750"],
+        default_window=120, now=now, registry=registry,
+    )
+    assert plans == [
+        FetchPlan("000001", "2025-07-04", 2 + OVERLAP_BARS),
+        FetchPlan("000002", "2025-07-08", OVERLAP_BARS),
+        FetchPlan("300750", None, 120),
+    ]
+    assert plans[0].start_date == "20250704"
+    assert plans[0].keep("2025-07-04") and not plans[0].keep("2025-07-03")
+    assert plans[2].keep("2020-01-01")
+
+
+def test_plan_caps_window_and_keeps_fixed_window_sources(registry):
+    now = datetime(2025, 7, 11, 10, 35)
+    registry.apply({
+        (STOCK, "600519", MINS_30): _entry("2025-07-04 15:00:00", datetime(2025, 7, 4, 15, 10)),
+    })
+
+    assert plan_fetches(STOCK, MINS_30, ["600519"], default_window=20, now=now, registry=registry) == [
+        FetchPlan("600519", "2025-07-04 15:00:00", 20)
+    ]
+    # 同花顺 last.js 窗口固定：只给出裁剪起点
+    assert plan_fetches(STOCK, MINS_30, ["600519"], now=now, registry=registry) == [
+        FetchPlan("600519", "2025-07-04 15:00:00", None)
+    ]
@@ -0,0 +1,164 @@
+"""
+Tests for the per-symbol freshness registry
+
+Freshness rows are written in the same transaction as the klines and the
+in-memory map is updated after commit; staleness is a dict lookup against the
+expected latest bar.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models import DataFreshness, KlineTimeframe, SymbolType
+from src.repositories.kline_repository import KlineRepository
+from src.services import freshness_registry
+from src.services.freshness_registry import (
+    FreshnessEntry,
+    FreshnessRegistry,
+    backfill_from_latest,
+    record_freshness,
+)
+from src.services.kline_service import KlineService
+from src.services.trading_calendar import TradingCalendar
+
+# 2025-07-04 (周五) ~ 2025-07-11 (周五) 工作日交易，周末休市
+CALENDAR = TradingCalendar(
+    ["2025-07-04", "2025-07-07", "2025-07-08", "2025-07-09", "2025-07-10", "2025-07-11"],
+    ["2025-07-05", "2025-07-06", "2025-07-12", "2025-07-13"],
+)
+
+DAY = KlineTimeframe.DAY
+MINS_30 = KlineTimeframe.MINS_30
+STOCK = SymbolType.STOCK
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def registry(monkeypatch, session_factory):
+    monkeypatch.setattr(freshness_registry, "get_trading_calendar", lambda: CALENDAR)
+    registry = FreshnessRegistry(session_factory=session_factory)
+    monkeypatch.setattr(freshness_registry, "_registry", registry)
+    return registry
+
+
+def _entry(last_bar, fetched_local):
+    return FreshnessEntry(last_bar, fetched_local.astimezone(timezone.utc), "sina")
+
+
+def _kline(day, close=10.0):
+    return {"datetime": day, "open": close, "high": close, "low": close, "close": close, "volume": 100}
+
+
+def test_expected_latest_daily_bar(registry):
+    # 交易日收盘前：上一交易日
+    assert registry.expected_latest_bar(DAY, datetime(2025, 7, 8, 14, 0))[0] == "2025-07-07"
+    # 交易日 15:30 后：当天
+    assert registry.expected_latest_bar(DAY, datetime(2025, 7, 8, 15, 31))[0] == "2025-07-08"
+    # 周一盘前：上周五
+    assert registry.expected_latest_bar(DAY, datetime(2025, 7, 7, 9, 0))[0] == "2025-07-04"
+    # 周末：周五
+    assert registry.expected_latest_bar(DAY, datetime(2025, 7, 13, 12, 0))[0] == "2025-07-11"
+
+
+def test_expected_latest_intraday_bar(registry):
+    assert registry.expected_latest_bar(MINS_30, datetime(2025, 7, 8, 10, 4))[0] == "2025-07-07 15:00:00"
+    assert registry.expected_latest_bar(MINS_30, datetime(2025, 7, 8, 10, 5))[0] == "2025-07-08 10:00:00"
+    # 午休期间应有 11:30 的K线
+    assert registry.expected_latest_bar(MINS_30, datetime(2025, 7, 8, 12, 30))[0] == "2025-07-08 11:30:00"
+    assert registry.expected_latest_bar(MINS_30, datetime(2025, 7, 12, 10, 0))[0] == "2025-07-11 15:00:00"
+
+
+def test_is_stale(registry):
+    now = datetime(2025, 7, 8, 16, 0)
+    registry.apply({
+        (STOCK, "600519", DAY): _entry("2025-07-08", now - timedelta(minutes=20)),
+        (STOCK, "000001", DAY): _entry("2025-07-07", now - timedelta(hours=2)),
+        # 15:30 后已获取过但上游仍没有当天数据（如停牌）
+        (STOCK, "000002", DAY): _entry("2025-07-07", now - timedelta(minutes=5)),
+        (STOCK, "000003", DAY): _entry("2025-07-07", now - timedelta(minutes=25)),
+    })
+
+    assert registry.is_stale(STOCK, "600519", DAY, now) is False
+    assert registry.is_stale(STOCK, "000001", DAY, now) is True
+    assert registry.is_stale(STOCK, "000002", DAY, now) is False
+    assert registry.is_stale(STOCK, "000003", DAY, now) is True
+    assert registry.is_stale(STOCK, "300750", DAY, now) is True
+    assert registry.stale_symbols(STOCK, DAY, now) == ["000001", "000003"]
+
+
+def test_save_klines_records_freshness_on_commit(registry, session_factory):
+    session = session_factory()
+    service = KlineService(KlineRepository(session), None)
+    service.save_klines(
+        STOCK, "600519", None, DAY, [_kline("2025-07-07"), _kline("2025-07-08")],
+        calculate_indicators=False, source="tushare",
+    )
+    # 提交前不可见
+    assert registry.get(STOCK, "600519", DAY) is None
+    session.commit()
+
+    entry = registry.get(STOCK, "600519", DAY)
+    assert entry.last_bar_time == "2025-07-08"
+    assert entry.source == "tushare"
+    row = session.execute(select(DataFreshness)).scalar_one()
+    assert (row.symbol_code, row.last_bar_time, row.source) == ("600519", "2025-07-08", "tushare")
+
+    # 重复保存（无行变化）也刷新获取时间；较早的K线不会回退最新K线时间
+    first_fetch = row.last_fetched_at
+    service.save_klines(
+        STOCK, "600519", None, DAY, [_kline("2025-07-07")],
+        calculate_indicators=False, source="sina",
+    )
+    session.commit()
+    session.expire_all()
+    row = session.execute(select(DataFreshness)).scalar_one()
+    assert row.last_bar_time == "2025-07-08"
+    assert row.source == "sina"
+    assert row.last_fetched_at >= first_fetch
+    assert registry.get(STOCK, "600519", DAY).last_bar_time == "2025-07-08"
+    session.close()
+
+
+def test_rollback_discards_pending_freshness(registry, session_factory):
+    session = session_factory()
+    KlineService(KlineRepository(session), None).save_klines(
+        STOCK, "000001", None, DAY, [_kline("2025-07-08")], calculate_indicators=False
+    )
+    record_freshness(session, STOCK, MINS_30, {"000001": "2025-07-08 15:00:00"}, "sina")
+    session.rollback()
+    session.commit()
+
+    assert registry.get(STOCK, "000001", DAY) is None
+    assert registry.get(STOCK, "000001", MINS_30) is None
+    assert session.execute(select(DataFreshness)).first() is None
+    session.close()
+
+
+def test_registry_loads_from_table_and_backfills_from_latest(registry, session_factory):
+    session = session_factory()
+    repo = KlineRepository(session)
+    KlineService(repo, None).save_klines(
+        STOCK, "600519", None, DAY, [_kline("2025-07-08")], calculate_indicators=False
+    )
+    session.commit()
+    session.execute(DataFreshness.__table__.delete())
+    session.commit()
+
+    assert backfill_from_latest(session) == 1
+    session.commit()
+    session.close()
+
+    loaded = FreshnessRegistry(session_factory=session_factory)
+    entry = loaded.get(STOCK, "600519", DAY)
+    assert entry.last_bar_time == "2025-07-08"
+    assert entry.source is None
@@ -0,0 +1,97 @@
+"""
+Tests for the shared HTTP client manager
+
+A local keep-alive HTTP server verifies connection reuse; MockTransport covers limits.
+"""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from src.services.http_client import HttpClientManager
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused_and_reported(server_url):
+    manager = HttpClientManager()
+
+    async def run():
+        for _ in range(3):
+            resp = await manager.get(f"{server_url}/quote")
+            assert resp.text == "ok"
+        await manager.close()
+
+    asyncio.run(run())
+
+    stats = manager.stats()[server_url.removeprefix("http://")]
+    assert stats["requests"] == 3
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 2
+    assert stats["avg_latency_ms"] is not None
+
+
+def test_per_host_limit():
+    in_flight = {"now": 0, "max": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return httpx.Response(200, text="ok")
+
+    manager = HttpClientManager(per_host_limit=2, transport=httpx.MockTransport(handler))
+
+    async def run():
+        await asyncio.gather(*(manager.get("http://hq.example/q") for _ in range(6)))
+        await asyncio.gather(*(manager.get("http://other.example/q") for _ in range(2)))
+        await manager.close()
+
+    asyncio.run(run())
+
+    assert in_flight["max"] == 2
+    assert manager.stats()["hq.example"]["requests"] == 6
+    assert manager.stats()["other.example"]["requests"] == 2
+
+
+def test_errors_are_counted_and_new_loop_gets_new_client():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    manager = HttpClientManager(transport=httpx.MockTransport(handler))
+
+    async def run():
+        with pytest.raises(httpx.ConnectError):
+            await manager.get("http://down.example/")
+        return manager.is_started()
+
+    assert asyncio.run(run()) is True
+    # 新的事件循环上重新创建客户端
+    assert asyncio.run(run()) is True
+    assert manager.stats()["down.example"]["errors"] == 2
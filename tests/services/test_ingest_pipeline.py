@@ -0,0 +1,142 @@
+"""
+Tests for the streaming fetch -> parse -> write ingestion pipeline
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+from src.services.ingest_pipeline import FETCH, PARSE, WRITE, IngestPipeline, get_pipeline_stats
+
+
+def _session():
+    session = MagicMock()
+    session.committed = []
+    return session
+
+
+def test_slow_writer_applies_backpressure_and_groups_commits():
+    session = _session()
+    written, writer_threads = [], set()
+    pending_commit = []
+
+    async def fetch(key):
+        await asyncio.sleep(0)
+        return key * 10
+
+    def write(_session, item):
+        writer_threads.add(threading.get_ident())
+        time.sleep(0.01)
+        pending_commit.append(item)
+        return 2
+
+    def commit():
+        session.committed.append(list(pending_commit))
+        written.extend(pending_commit)
+        pending_commit.clear()
+
+    session.commit.side_effect = commit
+    pipeline = IngestPipeline(
+        "test_backpressure", fetch, lambda key, raw: raw + 1, write, lambda: session,
+        fetch_concurrency=4, queue_size=2, max_group=5,
+    )
+    result = asyncio.run(pipeline.run(range(30)))
+
+    assert sorted(written) == [k * 10 + 1 for k in range(30)]
+    assert result.written == 60
+    # 写入慢于获取：队列积压时合并为较大的事务，上游阶段因队列满而等待
+    assert result.groups < 30
+    assert max(len(group) for group in session.committed) > 1
+    assert result.stages[FETCH].blocked + result.stages[PARSE].blocked > 0
+    assert result.stages[WRITE].queue_peak == 2
+    # 写入始终在同一个专用线程中执行
+    assert len(writer_threads) == 1 and threading.get_ident() not in writer_threads
+
+    stats = get_pipeline_stats()["test_backpressure"]
+    assert stats["stages"]["fetch"]["items"] == 30
+    assert stats["stages"]["write"]["items"] == 30
+    assert stats["stages"]["write"]["per_sec"] > 0
+
+
+def test_failed_group_is_retried_item_by_item():
+    session = _session()
+    saved = []
+
+    async def fetch(key):
+        if key == 3:
+            raise RuntimeError("upstream timeout")
+        return key
+
+    def parse(key, raw):
+        if key == 4:
+            raise ValueError("bad payload")
+        return None if key == 5 else raw
+
+    def write(_session, item):
+        if item == 7:
+            raise RuntimeError("constraint failed")
+        saved.append(item)
+        return 1
+
+    pipeline = IngestPipeline(
+        "test_errors", fetch, parse, write, lambda: session, fetch_concurrency=1, max_group=50,
+    )
+    result = asyncio.run(pipeline.run(range(10)))
+
+    assert result.stages[FETCH].errors == 1
+    assert result.stages[PARSE].errors == 1
+    assert result.stages[WRITE].errors == 1
+    assert result.written == 6  # 0,1,2,6,8,9
+    assert session.rollback.called
+
+
+def test_deadline_skips_remaining_fetches():
+    session = _session()
+
+    async def fetch(key):
+        await asyncio.sleep(0.2 if key else 0)
+        return key
+
+    pipeline = IngestPipeline(
+        "test_deadline", fetch, lambda key, raw: raw, lambda _session, item: 1, lambda: session,
+        fetch_concurrency=2, deadline=0.05,
+    )
+    result = asyncio.run(pipeline.run(range(6)))
+
+    assert result.written == 1
+    assert result.skipped == 5
+
+
+def test_concurrent_pipelines_use_own_sessions_and_one_writer():
+    sessions, writer_threads = {}, set()
+
+    def factory(name):
+        def create():
+            sessions[name] = _session()
+            return sessions[name]
+        return create
+
+    def write(session, item):
+        writer_threads.add(threading.get_ident())
+        if item == "bad":
+            raise RuntimeError("constraint failed")
+        return 1
+
+    async def fetch(key):
+        await asyncio.sleep(0)
+        return key
+
+    async def run_both():
+        return await asyncio.gather(
+            IngestPipeline("test_a", fetch, lambda key, raw: raw, write, factory("a")).run(["x", "bad"]),
+            IngestPipeline("test_b", fetch, lambda key, raw: raw, write, factory("b")).run(["y", "z"]),
+        )
+
+    result_a, result_b = asyncio.run(run_both())
+
+    assert (result_a.written, result_b.written) == (1, 2)
+    # 回滚只发生在出错管道自己的会话中；运行结束后会话关闭
+    assert sessions["a"].rollback.called and not sessions["b"].rollback.called
+    assert sessions["a"].close.called and sessions["b"].close.called
+    assert len(writer_threads) == 1
@@ -0,0 +1,215 @@
+"""
+Tests for the memory-mapped kline cache
+
+Uses a file-backed SQLite database and a cache rooted in tmp_path.
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, KlineTimeframe, SymbolType
+from src.repositories.kline_columns import KlineColumns
+from src.repositories.kline_repository import KlineRepository
+from src.services import kline_array_cache
+from src.services.kline_array_cache import KlineArrayCache, decode_times, encode_times
+from src.services.kline_service import KlineService
+
+
+STOCK, DAY, MINS_30 = SymbolType.STOCK, KlineTimeframe.DAY, KlineTimeframe.MINS_30
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'market.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def cache(tmp_path, engine, monkeypatch):
+    cache = KlineArrayCache(tmp_path / "kline_cache", engine)
+    monkeypatch.setattr(kline_array_cache, "_cache", cache)
+    monkeypatch.setattr(kline_array_cache, "_cache_configured", True)
+    return cache
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _klines(days, close=10.0):
+    return [
+        {
+            "datetime": day,
+            "open": close + i,
+            "high": close + i + 1,
+            "low": close + i - 1,
+            "close": close + i,
+            "volume": 1000.0,
+            "amount": 10000.0,
+        }
+        for i, day in enumerate(days)
+    ]
+
+
+def _save(session, code, days, close=10.0, timeframe=DAY):
+    service = KlineService(KlineRepository(session))
+    service.save_klines(STOCK, code, None, timeframe, _klines(days, close))
+    session.commit()
+
+
+DAYS = [f"2024-01-{d:02d}" for d in range(2, 12)]
+
+
+class TestKlineArrayCache:
+    """KlineArrayCache read/store behaviour"""
+
+    def test_time_encoding_round_trip(self):
+        day = np.array(["2024-01-02", "2024-12-31"], dtype=object)
+        intraday = np.array(["2024-01-02 10:30:00", "2024-01-02 15:00:00"], dtype=object)
+
+        assert decode_times(encode_times(day, DAY), DAY).tolist() == day.tolist()
+        assert decode_times(encode_times(intraday, MINS_30), MINS_30).tolist() == intraday.tolist()
+        # Non-canonical strings are not cached
+        assert encode_times(np.array(["2024-01-02 10:30"], dtype=object), MINS_30) is None
+        assert encode_times(np.array(["20240102"], dtype=object), DAY) is None
+
+    def test_read_miss_loads_history_and_matches_sqlite(self, cache, session):
+        _save(session, "600000", DAYS)
+        service = KlineService(KlineRepository(session))
+
+        assert cache.read(STOCK, DAY, "600000") is None
+        columns = service.get_kline_columns(STOCK, "600000", DAY, limit=3)
+
+        assert columns.trade_time.tolist() == DAYS[-3:]
+        assert columns.close.tolist() == [17.0, 18.0, 19.0]
+        assert cache.cached_codes(STOCK, DAY) == {"600000"}
+
+        window = service.get_kline_columns(
+            STOCK, "600000", DAY, start_date="2024-01-04", end_date="2024-01-06"
+        )
+        expected = KlineRepository(session).find_columns_by_symbol(
+            "600000", STOCK, DAY, start_time="2024-01-04", end_time="2024-01-06"
+        )
+        assert window.trade_time.tolist() == expected.trade_time.tolist()
+        assert np.array_equal(window.close, expected.close)
+
+    def test_commit_appends_in_place(self, cache, session):
+        _save(session, "600000", DAYS[:5])
+        KlineService(KlineRepository(session)).get_kline_columns(STOCK, "600000", DAY)
+        offset_before = cache._partition(STOCK, DAY).entries["600000"][0]
+
+        _save(session, "600000", DAYS[5:], close=15.0)
+
+        columns = cache.read(STOCK, DAY, "600000")
+        assert columns.trade_time.tolist() == DAYS
+        assert columns.close[-1] == 19.0
+        partition = cache._partition(STOCK, DAY)
+        partition.load_index()
+        assert partition.entries["600000"][0] == offset_before
+
+    def test_commit_rewriting_history_copies_segment(self, cache, session):
+        _save(session, "600000", DAYS)
+        KlineService(KlineRepository(session)).get_kline_columns(STOCK, "600000", DAY)
+
+        # Rewrite the last three bars with different prices
+        _save(session, "600000", DAYS[-3:], close=100.0)
+
+        columns = cache.read(STOCK, DAY, "600000")
+        assert len(columns) == len(DAYS)
+        assert columns.close[-3:].tolist() == [100.0, 101.0, 102.0]
+        assert columns.close[:-3].tolist() == [10.0 + i for i in range(7)]
+
+    def test_rollback_leaves_cache_untouched(self, cache, session):
+        _save(session, "600000", DAYS[:5])
+        KlineService(KlineRepository(session)).get_kline_columns(STOCK, "600000", DAY)
+
+        service = KlineService(KlineRepository(session))
+        service.save_klines(STOCK, "600000", None, DAY, _klines(DAYS[5:]))
+        session.rollback()
+        _save(session, "600001", DAYS[:2])
+
+        assert len(cache.read(STOCK, DAY, "600000")) == 5
+        # Uncached symbols are loaded lazily, not on commit
+        assert cache.cached_codes(STOCK, DAY) == {"600000"}
+
+    def test_intraday_partition(self, cache, session):
+        times = [f"2024-01-02 {h}:00:00" for h in ("10", "11", "14", "15")]
+        _save(session, "600000", times, timeframe=MINS_30)
+        service = KlineService(KlineRepository(session))
+
+        columns = service.get_kline_columns(
+            STOCK, "600000", MINS_30, start_date="2024-01-02", end_date="2024-01-03"
+        )
+        assert columns.trade_time.tolist() == times
+        assert cache.cached_codes(STOCK, MINS_30) == {"600000"}
+        assert cache.cached_codes(STOCK, DAY) == set()
+
+    def test_other_database_is_not_cached(self, cache):
+        other = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(other)
+        with sessionmaker(bind=other)() as session:
+            _save(session, "600000", DAYS)
+            columns = KlineService(KlineRepository(session)).get_kline_columns(
+                STOCK, "600000", DAY
+            )
+        assert len(columns) == len(DAYS)
+        assert cache.cached_codes(STOCK, DAY) == set()
+
+    def test_compaction_preserves_data(self, cache):
+        def columns(code, n, start=0.0):
+            days = (np.datetime64("2020-01-01") + np.arange(n)).astype(str).astype(object)
+            values = np.arange(n, dtype=np.float64) + start
+            return KlineColumns.from_columns(code, days, [values] * 6)
+
+        cache.store(STOCK, DAY, {"A": columns("A", 100), "B": columns("B", 50)})
+        generation = cache._partition(STOCK, DAY).generation
+
+        # Full replacements leave dead segments behind until compaction
+        for i in range(5):
+            cache.store(STOCK, DAY, {"A": columns("A", 100, start=i)})
+
+        partition = cache._partition(STOCK, DAY)
+        partition.load_index()
+        assert partition.generation > generation
+        assert cache.read(STOCK, DAY, "A").close[0] == 4.0
+        assert cache.read(STOCK, DAY, "B", limit=2).close.tolist() == [48.0, 49.0]
+        assert len(list(partition.directory.glob("bars.*.dat"))) == 1
+
+    def test_rebuild_removes_superseded_generation(self, cache, session):
+        _save(session, "600000", DAYS)
+        KlineService(KlineRepository(session)).get_kline_columns(STOCK, "600000", DAY)
+        reader = KlineArrayCache(cache.root, cache.engine)
+        assert reader.cached_codes(STOCK, DAY) == {"600000"}
+
+        assert cache.rebuild(STOCK, DAY) == 1
+        partition = cache._partition(STOCK, DAY)
+        assert [p.name for p in partition.directory.glob("bars.*.dat")] == [
+            f"bars.{partition.generation}.dat"
+        ]
+        # A reader still holding the old index reloads it instead of failing
+        stale = reader._partition(STOCK, DAY)
+        stale._index_mtime = partition.index_path.stat().st_mtime_ns
+        assert stale.generation < partition.generation
+        assert len(reader.read(STOCK, DAY, "600000")) == len(DAYS)
+
+    def test_cleanup_drops_cached_history(self, cache, session):
+        _save(session, "600000", DAYS)
+        service = KlineService(KlineRepository(session))
+        assert len(service.get_kline_columns(STOCK, "600000", DAY)) == len(DAYS)
+
+        assert service.delete_klines_before(DAY, "2024-01-05") == 3
+        session.commit()
+
+        assert cache.cached_codes(STOCK, DAY) == set()
+        columns = service.get_kline_columns(STOCK, "600000", DAY)
+        assert columns.trade_time[0] == "2024-01-05"
+        repo = KlineRepository(session)
+        assert repo.find_indicator_state("600000", STOCK, DAY) is None
+        assert repo.find_latest_bar("600000", STOCK, DAY).trade_time == "2024-01-11"
@@ -0,0 +1,207 @@
+"""
+Tests for the add-to-watchlist kline bootstrap jobs
+"""
+
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.api import routes_watchlist
+from src.api.dependencies import get_db
+from src.database import Base
+from src.models import Kline, SymbolMetadata, Watchlist
+from src.services import kline_bootstrap, refresh_queue, sina_kline_provider
+from src.services.refresh_queue import DONE, FAILED, RefreshQueue
+
+
+def test_enqueue_tracks_job_status_and_coalesces_by_key():
+    release = threading.Event()
+
+    def job(_session):
+        release.wait(2)
+        return {"daily": 3}
+
+    queue = RefreshQueue(max_workers=1, session_factory=MagicMock)
+    first = queue.enqueue(("bootstrap", "600519"), job)
+    again = queue.enqueue(("bootstrap", "600519"), job)
+    assert again is first
+    assert queue.get_job(first.job_id).status in ("queued", "running")
+
+    release.set()
+    assert first.future.result(2) == {"daily": 3}
+    record = queue.get_job(first.job_id).to_dict()
+    assert record["status"] == DONE
+    assert record["result"] == {"daily": 3}
+    assert record["key"] == ["bootstrap", "600519"]
+
+    def boom(_session):
+        raise RuntimeError("upstream down")
+
+    failed = queue.enqueue(("bootstrap", "600519"), boom)
+    assert failed.job_id != first.job_id
+    with pytest.raises(RuntimeError):
+        failed.future.result(2)
+    assert queue.get_job(failed.job_id).status == FAILED
+    assert queue.get_job(failed.job_id).error == "upstream down"
+    queue.shutdown(wait=True)
+
+
+def test_history_evicts_oldest_finished_jobs():
+    queue = RefreshQueue(max_workers=1, session_factory=MagicMock, max_history=2)
+    jobs = [queue.enqueue(i, lambda _s: 1) for i in range(3)]
+    for job in jobs:
+        job.future.result(2)
+    queue.enqueue(3, lambda _s: 1).future.result(2)
+    queue.shutdown(wait=True)
+
+    assert queue.get_job(jobs[0].job_id) is None
+    assert queue.get_job(jobs[2].job_id) is not None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        session.add_all([
+            SymbolMetadata(ticker="600519", name="贵州茅台"),
+            SymbolMetadata(ticker="000001", name="平安银行"),
+        ])
+        session.commit()
+
+    release = threading.Event()
+    fetched = []
+
+    def fake_fetch(db, ticker, timeframe, limit=None):
+        release.wait(2)
+        fetched.append((ticker, timeframe))
+        if timeframe == "30m":
+            raise RuntimeError("sina timeout")
+        return 5
+
+    monkeypatch.setattr(kline_bootstrap, "fetch_stock_klines", fake_fetch)
+    queue = RefreshQueue(max_workers=2, session_factory=factory)
+    monkeypatch.setattr(refresh_queue, "_bootstrap_queue", queue)
+
+    def override_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(routes_watchlist.router, prefix="/watchlist")
+    app.dependency_overrides[get_db] = override_db
+    with TestClient(app) as test_client:
+        yield test_client, release, fetched, factory
+    queue.shutdown(wait=True)
+
+
+def test_add_returns_job_immediately_and_job_can_be_awaited(client):
+    test_client, release, fetched, factory = client
+
+    response = test_client.post("/watchlist", json={"ticker": "600519"})
+    assert response.status_code == 201
+    body = response.json()
+    assert body["job_status"] in ("queued", "running")
+    assert fetched == []  # 接口返回时上游尚未获取
+
+    release.set()
+    job = test_client.get(f"/watchlist/jobs/{body['job_id']}", params={"wait": 2}).json()
+    assert job["status"] == "done"
+    assert job["result"] == {"daily": 5, "mins30": 0, "errors": {"30m": "sina timeout"}}
+    with factory() as session:
+        assert session.query(Watchlist).count() == 1
+
+    assert test_client.get("/watchlist/jobs/unknown").status_code == 404
+
+
+def test_batch_add_skips_unknown_and_existing(client):
+    test_client, release, _fetched, _factory = client
+    release.set()
+    test_client.post("/watchlist", json={"ticker": "000001"})
+
+    response = test_client.post(
+        "/watchlist/batch", json={"tickers": ["600519", "000001", "999999", "600519"]}
+    )
+    assert response.status_code == 201
+    body = response.json()
+    assert [item["ticker"] for item in body["added"]] == ["600519"]
+    assert all(item["job_id"] for item in body["added"])
+    assert {item["ticker"] for item in body["skipped"]} == {"000001", "999999"}
+
+
+class FakeAsyncSina(sina_kline_provider.AsyncSinaKlineProvider):
+    """只替换网络请求，保留 fetch_kline_blocking 的调度逻辑"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def fetch_kline(self, ticker, period="30m", limit=500):
+        self.calls.append((ticker, period, limit, threading.get_ident()))
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(["2024-01-02 10:00", "2024-01-02 10:30"]),
+            "open": [10.0, 10.1],
+            "high": [10.2, 10.3],
+            "low": [9.9, 10.0],
+            "close": [10.1, 10.2],
+            "volume": [1000.0, 1200.0],
+        })
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def test_30m_fetch_uses_shared_async_sina_provider(monkeypatch, session_factory):
+    fake = FakeAsyncSina()
+    monkeypatch.setattr(sina_kline_provider, "_async_provider", fake)
+
+    with session_factory() as session:
+        assert kline_bootstrap.fetch_stock_klines(session, "600519", "30m", limit=80) == 2
+        assert session.query(Kline).count() == 2
+    assert [call[:3] for call in fake.calls] == [("600519", "30m", 80)]
+
+
+def test_30m_fetch_runs_on_bound_loop_from_worker_thread(monkeypatch, session_factory):
+    fake = FakeAsyncSina()
+    monkeypatch.setattr(sina_kline_provider, "_async_provider", fake)
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+    fake.bind_loop(loop)
+
+    try:
+        with session_factory() as session:
+            assert kline_bootstrap.fetch_stock_klines(session, "600519", "30m") == 2
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join(2)
+        loop.close()
+    assert fake.calls[0][3] == loop_thread.ident
+
+
+def test_fetch_kline_blocking_rejects_running_loop():
+    async def call():
+        FakeAsyncSina().fetch_kline_blocking("600519")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(call())
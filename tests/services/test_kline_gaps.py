@@ -0,0 +1,143 @@
+"""
+Tests for kline gap scanning and backfill planning
+"""
+
+import asyncio
+from unittest.mock import Mock
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database import Base
+from src.models import Kline, KlineTimeframe, SymbolType, TradeCalendar
+from src.services import fetch_planner, freshness_registry, kline_gaps
+from src.services.freshness_registry import FreshnessRegistry
+from src.services.kline_gaps import KlineGap, plan_backfill, scan_gaps
+from src.services.kline_updater import KlineUpdater
+from src.services.trading_calendar import TradingCalendar
+from src.services.tushare_client import AsyncTokenBucket, AsyncTushareClient, TushareClient
+
+DAYS = ["2025-07-04", "2025-07-07", "2025-07-08", "2025-07-09", "2025-07-10", "2025-07-11"]
+CALENDAR = TradingCalendar(DAYS, ["2025-07-05", "2025-07-06", "2025-07-12", "2025-07-13"])
+
+DAY = KlineTimeframe.DAY
+MINS_30 = KlineTimeframe.MINS_30
+STOCK = SymbolType.STOCK
+
+
+@pytest.fixture
+def session(monkeypatch):
+    for module in (kline_gaps, fetch_planner, freshness_registry):
+        monkeypatch.setattr(module, "get_trading_calendar", lambda: CALENDAR)
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(freshness_registry, "_registry", FreshnessRegistry(session_factory=factory))
+    kline_gaps.clear_unfillable()
+
+    session = factory()
+    session.add_all([TradeCalendar(date=d, is_trading_day=True) for d in DAYS])
+    session.add_all([
+        TradeCalendar(date=d, is_trading_day=False) for d in ("2025-07-05", "2025-07-06")
+    ])
+    session.commit()
+    yield session
+    session.close()
+    kline_gaps.clear_unfillable()
+
+
+def _add_bars(session, code, timeframe, times, symbol_type=STOCK):
+    session.add_all([
+        Kline(
+            symbol_type=symbol_type, symbol_code=code, timeframe=timeframe, trade_time=t,
+            open=10.0, high=10.0, low=10.0, close=10.0, volume=100, amount=0,
+        )
+        for t in times
+    ])
+    session.commit()
+
+
+def test_scan_finds_interior_daily_gaps_as_ranges(session):
+    _add_bars(session, "600519", DAY, ["2025-07-04", "2025-07-09", "2025-07-11"])
+    _add_bars(session, "000001", DAY, ["2025-07-08", "2025-07-09"])  # 首根之前不算缺口
+
+    gaps = scan_gaps(session, DAY, since="2025-07-01")
+    assert gaps == [
+        KlineGap(STOCK, "600519", DAY, "2025-07-07", "2025-07-08", 2),
+        KlineGap(STOCK, "600519", DAY, "2025-07-10", "2025-07-10", 1),
+    ]
+    # 扫描起点之后的缺口才报告
+    assert scan_gaps(session, DAY, since="2025-07-09") == [gaps[1]]
+
+
+def test_scan_uses_half_hour_grid_across_days(session):
+    _add_bars(session, "600519", MINS_30, [
+        "2025-07-04 14:30:00",
+        "2025-07-07 10:00:00", "2025-07-07 10:30:00", "2025-07-07 11:30:00",
+        "2025-07-07 13:30:00", "2025-07-07 14:00:00", "2025-07-07 14:30:00", "2025-07-07 15:00:00",
+        "2025-07-08 10:30:00",
+    ])
+
+    assert scan_gaps(session, MINS_30, since="2025-07-01") == [
+        KlineGap(STOCK, "600519", MINS_30, "2025-07-04 15:00:00", "2025-07-04 15:00:00", 1),
+        KlineGap(STOCK, "600519", MINS_30, "2025-07-07 11:00:00", "2025-07-07 11:00:00", 1),
+        KlineGap(STOCK, "600519", MINS_30, "2025-07-08 10:00:00", "2025-07-08 10:00:00", 1),
+    ]
+
+
+def test_plan_uses_cross_sections_for_widely_missing_days(monkeypatch):
+    monkeypatch.setattr(kline_gaps, "get_trading_calendar", lambda: CALENDAR)
+    gaps = [KlineGap(STOCK, f"{600000 + i}", DAY, "2025-07-08", "2025-07-08", 1) for i in range(3)]
+    gaps.append(KlineGap(STOCK, "000001", DAY, "2025-07-07", "2025-07-08", 2))
+    gaps.append(KlineGap(SymbolType.CONCEPT, "885556", MINS_30, "2025-07-08 10:00:00", "2025-07-08 11:00:00", 3))
+
+    tasks = plan_backfill(gaps, cross_section_min=3)
+    assert [(t.symbol_type, t.code, t.start, t.end, t.missing) for t in tasks] == [
+        (STOCK, None, "2025-07-08", "2025-07-08", 4),
+        (SymbolType.CONCEPT, "885556", "2025-07-08 10:00:00", "2025-07-08 11:00:00", 3),
+        # 07-07 不在截面内，仍按股票区间获取
+        (STOCK, "000001", "2025-07-07", "2025-07-08", 2),
+    ]
+    assert tasks[1].window is None and tasks[2].window is None
+
+
+def test_backfill_fills_gaps_within_budget_and_marks_unfillable(session, monkeypatch):
+    _add_bars(session, "600519", DAY, ["2025-07-04", "2025-07-09"])
+    _add_bars(session, "000001", DAY, ["2025-07-04", "2025-07-10"])
+
+    def fetch_daily(ts_code=None, start_date=None, end_date=None, **_):
+        # 000001 在 07-07 ~ 07-09 停牌，上游没有数据
+        if ts_code.startswith("000001"):
+            return pd.DataFrame()
+        return pd.DataFrame({
+            "ts_code": [ts_code] * 2, "trade_date": ["20250708", "20250707"],
+            "open": [10.0] * 2, "high": [11.0] * 2, "low": [9.0] * 2,
+            "close": [10.5] * 2, "vol": [100.0] * 2, "amount": [1000.0] * 2,
+        })
+
+    client = Mock(spec=TushareClient)
+    client.normalize_ts_code.side_effect = lambda code: f"{code}.SH"
+    client.fetch_daily.side_effect = fetch_daily
+    updater = KlineUpdater.create_with_session(session)
+    updater._async_tushare_client = AsyncTushareClient(client, rate_limiter=AsyncTokenBucket(rate=1000))
+    # 回溯到测试数据所在的日期
+    monkeypatch.setattr(kline_gaps, "LOOKBACK_DAYS", {DAY: 10_000, MINS_30: 10_000})
+
+    result = asyncio.run(updater.backfill_gaps(max_requests=1))
+    # 预算只够一个请求：缺失最多的 000001 先回补，但上游无数据
+    assert result["tasks"] == 2 and result["executed"] == 1 and result["deferred"] == 1
+    assert result["saved"] == 0 and result["unfillable"] == 1
+
+    result = asyncio.run(updater.backfill_gaps(max_requests=5))
+    assert result["tasks"] == 1  # 已登记为无法回补的缺口不再计划
+    assert result["saved"] == 2
+    assert client.fetch_daily.call_args.kwargs["start_date"] == "20250707"
+    assert client.fetch_daily.call_args.kwargs["end_date"] == "20250708"
+    assert scan_gaps(session, DAY, since="2025-07-01", include_unfillable=True) == [
+        KlineGap(STOCK, "000001", DAY, "2025-07-07", "2025-07-09", 3),
+    ]
@@ -5,16 +5,29 @@ Tests business logic layer using mocked repositories.
 """
 
 import pytest
-from unittest.mock import Mock, MagicMock
+from unittest.mock import Mock, MagicMock, patch
 from datetime import datetime
 
-from src.models import Kline, KlineTimeframe, SymbolType
+from src.models import Kline, KlineLatest, KlineTimeframe, SymbolType
+from src.repositories.kline_columns import KlineColumns
 from src.repositories.kline_repository import KlineRepository
 from src.repositories.symbol_repository import SymbolRepository
 from src.services.kline_service import KlineService
 from src.utils.indicators import calculate_macd
 
 
+def _columns(klines):
+    """Build the columnar result the repository returns (oldest first)"""
+    return KlineColumns.from_columns(
+        klines[0].symbol_code if klines else "",
+        [k.trade_time for k in klines],
+        [
+            [getattr(k, field) for k in klines]
+            for field in ("open", "high", "low", "close", "volume", "amount")
+        ],
+    )
+
+
 class TestCalculateMacd:
     """Test MACD calculation function"""
 
@@ -92,7 +105,7 @@ class TestKlineServiceGetKlines:
                 amount=6000000.0,
             ),
         ]
-        mock_repo.find_by_symbol.return_value = mock_klines
+        mock_repo.find_columns_by_symbol.return_value = _columns(mock_klines)
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -103,15 +116,17 @@ class TestKlineServiceGetKlines:
             limit=10,
         )
 
-        # Verify repository was called
-        mock_repo.find_by_symbol.assert_called_once()
+        # Verify repository was called with the latest-N query
+        mock_repo.find_columns_by_symbol.assert_called_once()
+        assert mock_repo.find_columns_by_symbol.call_args.kwargs["limit"] == 10
 
         # Verify result format
         assert len(result) == 2
-        assert result[0]["datetime"] == "2024-01-02"  # Reversed order (oldest first)
-        assert result[0]["close"] == 3100.0
-        assert result[1]["datetime"] == "2024-01-01"
-        assert result[1]["close"] == 3050.0
+        assert result[0]["datetime"] == "2024-01-01"
+        assert result[0]["close"] == 3050.0
+        assert result[1]["datetime"] == "2024-01-02"
+        assert result[1]["close"] == 3100.0
+        assert isinstance(result[0]["close"], float)
 
     def test_get_klines_with_date_range(self):
         """Test K-line retrieval with date range"""
@@ -130,7 +145,7 @@ class TestKlineServiceGetKlines:
                 amount=5000000.0,
             ),
         ]
-        mock_repo.find_by_symbol_and_date_range.return_value = mock_klines
+        mock_repo.find_columns_by_symbol.return_value = _columns(mock_klines)
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -143,9 +158,11 @@ class TestKlineServiceGetKlines:
             end_date="2024-01-05",
         )
 
-        # Should call date range method
-        mock_repo.find_by_symbol_and_date_range.assert_called_once()
-        mock_repo.find_by_symbol.assert_not_called()
+        # Should query by date range without a limit
+        kwargs = mock_repo.find_columns_by_symbol.call_args.kwargs
+        assert kwargs["start_time"] == "2024-01-01"
+        assert kwargs["end_time"] == "2024-01-05"
+        assert "limit" not in kwargs
 
         assert len(result) == 1
         assert result[0]["datetime"] == "2024-01-01"
@@ -176,7 +193,7 @@ class TestKlineServiceWithIndicators:
                 )
             )
 
-        mock_repo.find_by_symbol.return_value = mock_klines
+        mock_repo.find_columns_by_symbol.return_value = _columns(mock_klines)
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -216,7 +233,7 @@ class TestKlineServiceWithIndicators:
                 amount=5000000.0,
             ),
         ]
-        mock_repo.find_by_symbol.return_value = mock_klines
+        mock_repo.find_columns_by_symbol.return_value = _columns(mock_klines)
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -257,7 +274,14 @@ class TestKlineServiceMetadata:
                 amount=5000000.0,
             ),
         ]
-        mock_kline_repo.find_by_symbol.return_value = mock_klines
+        mock_kline_repo.find_columns_by_symbol.return_value = _columns(mock_klines)
+        mock_kline_repo.find_latest_bar.return_value = KlineLatest(
+            symbol_code="000001.SH",
+            symbol_name="上证指数",
+            symbol_type=SymbolType.INDEX,
+            timeframe=KlineTimeframe.DAY,
+            trade_time="2024-01-01",
+        )
 
         service = KlineService(
             kline_repo=mock_kline_repo,
@@ -279,6 +303,31 @@ class TestKlineServiceMetadata:
         assert result["timeframe"] == "day"
         assert result["count"] == 1
         assert len(result["klines"]) == 1
+        mock_kline_repo.find_by_symbol.assert_not_called()
+
+    def test_stock_name_falls_back_to_symbol_metadata(self):
+        """Stock names missing from kline_latest come from symbol_metadata"""
+        mock_kline_repo = Mock(spec=KlineRepository)
+        mock_symbol_repo = Mock(spec=SymbolRepository)
+        mock_kline_repo.find_columns_by_symbol.return_value = _columns([
+            Kline(
+                symbol_code="600000",
+                symbol_type=SymbolType.STOCK,
+                timeframe=KlineTimeframe.DAY,
+                trade_time="2024-01-01",
+                open=10.0, high=10.0, low=10.0, close=10.0, volume=1.0, amount=10.0,
+            )
+        ])
+        mock_kline_repo.find_latest_bar.return_value = None
+        mock_symbol_repo.find_by_ticker.return_value = Mock(name="metadata")
+        mock_symbol_repo.find_by_ticker.return_value.name = "浦发银行"
+
+        service = KlineService(kline_repo=mock_kline_repo, symbol_repo=mock_symbol_repo)
+        result = service.get_klines_with_meta(
+            SymbolType.STOCK, "600000", KlineTimeframe.DAY, limit=10, include_indicators=False
+        )
+
+        assert result["symbol_name"] == "浦发银行"
 
 
 class TestKlineServiceLatest:
@@ -287,7 +336,7 @@ class TestKlineServiceLatest:
     def test_get_latest_kline(self):
         """Test getting latest K-line"""
         mock_repo = Mock(spec=KlineRepository)
-        mock_kline = Kline(
+        mock_kline = KlineLatest(
             symbol_code="000001.SH",
             symbol_type=SymbolType.INDEX,
             timeframe=KlineTimeframe.DAY,
@@ -299,7 +348,7 @@ class TestKlineServiceLatest:
             volume=1500000.0,
             amount=7500000.0,
         )
-        mock_repo.find_latest_by_symbol.return_value = mock_kline
+        mock_repo.find_latest_bar.return_value = mock_kline
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -316,7 +365,7 @@ class TestKlineServiceLatest:
     def test_get_latest_kline_none(self):
         """Test getting latest when no data exists"""
         mock_repo = Mock(spec=KlineRepository)
-        mock_repo.find_latest_by_symbol.return_value = None
+        mock_repo.find_latest_bar.return_value = None
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -335,7 +384,7 @@ class TestKlineServiceTradeTime:
     def test_get_latest_trade_time(self):
         """Test getting latest trade time"""
         mock_repo = Mock(spec=KlineRepository)
-        mock_kline = Kline(
+        mock_kline = KlineLatest(
             symbol_code="000001.SH",
             symbol_type=SymbolType.INDEX,
             timeframe=KlineTimeframe.DAY,
@@ -347,7 +396,7 @@ class TestKlineServiceTradeTime:
             volume=1500000.0,
             amount=7500000.0,
         )
-        mock_repo.find_latest_by_symbol.return_value = mock_kline
+        mock_repo.find_latest_bar.return_value = mock_kline
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -362,7 +411,7 @@ class TestKlineServiceTradeTime:
     def test_get_latest_trade_time_none(self):
         """Test getting latest trade time when no data"""
         mock_repo = Mock(spec=KlineRepository)
-        mock_repo.find_latest_by_symbol.return_value = None
+        mock_repo.find_latest_bar.return_value = None
 
         service = KlineService(kline_repo=mock_repo)
 
@@ -417,3 +466,183 @@ class TestKlineServiceSymbolList:
         assert len(symbols) == 3
         assert "000001.SH" in symbols
         mock_repo.find_symbols_with_data.assert_called_once()
+
+
+@pytest.fixture
+def db_session():
+    """Create a fresh in-memory database for each test"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from src.database import Base
+
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    yield session
+
+    session.close()
+
+
+def _bars(closes, start_day=0):
+    """Build daily bar dicts with consecutive dates"""
+    from datetime import date, timedelta
+
+    base = date(2024, 1, 1)
+    return [
+        {
+            "datetime": (base + timedelta(days=start_day + i)).isoformat(),
+            "open": c, "high": c, "low": c, "close": c,
+            "volume": 100, "amount": 1000,
+        }
+        for i, c in enumerate(closes)
+    ]
+
+
+class TestKlineServiceIncrementalMacd:
+    """Test stateful incremental MACD in save_klines"""
+
+    CLOSES = [10 + ((i * 7) % 11) * 0.3 + i * 0.05 for i in range(60)]
+
+    def _save(self, service, bars):
+        service.save_klines(
+            SymbolType.INDEX, "000001.SH", "上证指数", KlineTimeframe.DAY, bars
+        )
+        service.kline_repo.commit()
+
+    def _assert_matches_full_history(self, service, closes):
+        stored = service.kline_repo.find_by_symbol(
+            "000001.SH", SymbolType.INDEX, KlineTimeframe.DAY
+        )
+        stored = list(reversed(stored))
+        expected = calculate_macd(closes)
+        assert [k.close for k in stored] == pytest.approx(closes)
+        assert [k.dif for k in stored] == expected["dif"]
+        assert [k.dea for k in stored] == expected["dea"]
+        assert [k.macd for k in stored] == expected["macd"]
+
+    def test_append_continues_from_state(self, db_session):
+        """New bars continue from stored EMA state"""
+        service = KlineService.create_with_session(db_session)
+
+        self._save(service, _bars(self.CLOSES[:40]))
+        self._save(service, _bars(self.CLOSES[40:], start_day=40))
+
+        self._assert_matches_full_history(service, self.CLOSES)
+
+    def test_overlapping_window_with_new_bars(self, db_session):
+        """Re-fetched unchanged bars keep their values"""
+        service = KlineService.create_with_session(db_session)
+
+        self._save(service, _bars(self.CLOSES[:45]))
+        self._save(service, _bars(self.CLOSES[30:], start_day=30))
+
+        self._assert_matches_full_history(service, self.CLOSES)
+
+    def test_short_history_fills_in_once_enough_bars(self, db_session):
+        """Indicators appear for all bars once history reaches the slow period"""
+        service = KlineService.create_with_session(db_session)
+
+        self._save(service, _bars(self.CLOSES[:20]))
+        self._assert_matches_full_history(service, self.CLOSES[:20])
+
+        self._save(service, _bars(self.CLOSES[20:30], start_day=20))
+        self._assert_matches_full_history(service, self.CLOSES[:30])
+
+    def test_rewrite_last_bar_uses_previous_state(self, db_session):
+        """Intraday rewrite of the latest bar continues from the prior state"""
+        service = KlineService.create_with_session(db_session)
+        closes = list(self.CLOSES[:40])
+
+        self._save(service, _bars(closes))
+        closes[-1] += 1.0
+        self._save(service, _bars(closes[-1:], start_day=39))
+
+        self._assert_matches_full_history(service, closes)
+
+    def test_bars_without_close_are_skipped(self, db_session):
+        """Bars with a missing close are not stored as zero-price bars"""
+        service = KlineService.create_with_session(db_session)
+        bars = _bars(self.CLOSES[:30])
+        bars[-1]["close"] = None
+
+        assert service.save_klines(
+            SymbolType.INDEX, "000001.SH", "上证指数", KlineTimeframe.DAY, bars
+        ) == 29
+        service.kline_repo.commit()
+
+        self._assert_matches_full_history(service, self.CLOSES[:29])
+
+    def test_rewrite_older_history_recomputes(self, db_session):
+        """Changing an older bar triggers a full recompute"""
+        service = KlineService.create_with_session(db_session)
+        closes = list(self.CLOSES[:50])
+
+        self._save(service, _bars(closes))
+        closes[10] += 2.0
+        self._save(service, _bars(closes[10:12], start_day=10))
+
+        self._assert_matches_full_history(service, closes)
+
+
+class TestKlineServiceCrossSectionMacd:
+    """Test incremental MACD when daily cross-sections are re-ingested via save_bar_records"""
+
+    CODES = ["600000", "600001", "600002"]
+    CLOSES = TestKlineServiceIncrementalMacd.CLOSES[:40]
+
+    @staticmethod
+    def _section(day, closes):
+        from datetime import date, timedelta
+
+        trade_time = (date(2024, 1, 1) + timedelta(days=day)).isoformat()
+        return [
+            {
+                "symbol_type": SymbolType.STOCK, "symbol_code": code, "symbol_name": None,
+                "timeframe": KlineTimeframe.DAY, "trade_time": trade_time,
+                "open": c, "high": c, "low": c, "close": c, "volume": 100.0, "amount": 1000.0,
+                "dif": None, "dea": None, "macd": None, "updated_at": datetime.now(),
+            }
+            for code, c in closes.items()
+        ]
+
+    def _ingest(self, service, day, closes):
+        service.save_bar_records(SymbolType.STOCK, KlineTimeframe.DAY, self._section(day, closes))
+        service.kline_repo.commit()
+
+    def _assert_matches_full_history(self, service, code, closes):
+        stored = list(reversed(service.kline_repo.find_by_symbol(
+            code, SymbolType.STOCK, KlineTimeframe.DAY
+        )))
+        expected = calculate_macd(closes)
+        assert [k.close for k in stored] == pytest.approx(closes)
+        assert [k.dif for k in stored] == expected["dif"]
+        assert [k.macd for k in stored] == expected["macd"]
+
+    def test_reingesting_same_day_does_not_recompute(self, db_session):
+        service = KlineService.create_with_session(db_session)
+        history = {code: list(self.CLOSES) for code in self.CODES}
+        for day, close in enumerate(self.CLOSES):
+            self._ingest(service, day, {code: close for code in self.CODES})
+
+        recomputed = []
+        with patch.object(service, "recompute_indicators", side_effect=recomputed.append):
+            # 同一天重跑：600000 收盘价不变，600001 最新一根被修正
+            history["600001"][-1] += 0.5
+            self._ingest(service, 39, {code: history[code][-1] for code in self.CODES})
+
+        assert recomputed == []
+        for code in self.CODES:
+            self._assert_matches_full_history(service, code, history[code])
+
+    def test_changed_older_close_recomputes(self, db_session):
+        service = KlineService.create_with_session(db_session)
+        closes = list(self.CLOSES)
+        for day, close in enumerate(closes):
+            self._ingest(service, day, {"600000": close})
+
+        closes[30] += 1.0
+        self._ingest(service, 30, {"600000": closes[30]})
+
+        self._assert_matches_full_history(service, "600000", closes)
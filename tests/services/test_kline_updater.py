@@ -0,0 +1,189 @@
+"""
+Unit tests for KlineUpdater
+
+Tests ingestion logic using an in-memory SQLite database and a mocked Tushare client.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database import Base
+from src.models import Kline, KlineTimeframe, SymbolMetadata, SymbolType, TradeCalendar, Watchlist
+from src.services import fetch_planner, freshness_registry
+from src.services.freshness_registry import FreshnessEntry, FreshnessRegistry
+from src.services.kline_updater import KlineUpdater
+from src.services.trading_calendar import TradingCalendar, invalidate_trading_calendar
+from src.services.tushare_client import AsyncTokenBucket, AsyncTushareClient, TushareClient
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    """Create a fresh in-memory database for each test (shared with the pipeline writer thread)"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine)
+    session = SessionLocal()
+    invalidate_trading_calendar()
+
+    yield session
+
+    session.close()
+    invalidate_trading_calendar()
+
+
+def _cross_section(trade_date: str, ts_codes: list[str]) -> pd.DataFrame:
+    """Build a Tushare daily cross-section DataFrame"""
+    n = len(ts_codes)
+    return pd.DataFrame({
+        "ts_code": ts_codes,
+        "trade_date": [trade_date] * n,
+        "open": [10.0 + i for i in range(n)],
+        "high": [11.0 + i for i in range(n)],
+        "low": [9.0 + i for i in range(n)],
+        "close": [10.5 + i for i in range(n)],
+        "vol": [1000.0] * n,
+        "amount": [5000.0] * n,
+    })
+
+
+class TestUpdateAllStockDaily:
+    """Test market-wide daily ingestion by trade_date"""
+
+    def _setup(self, db_session, trading_days: list[str]):
+        db_session.add_all([
+            SymbolMetadata(ticker="000001", name="平安银行"),
+            SymbolMetadata(ticker="600000", name="浦发银行"),
+        ])
+        db_session.add_all([
+            TradeCalendar(date=d, is_trading_day=True) for d in trading_days
+        ])
+        db_session.commit()
+
+        updater = KlineUpdater.create_with_session(db_session)
+        client = Mock(spec=TushareClient)
+        client.fetch_daily.side_effect = lambda trade_date=None, **_: _cross_section(
+            trade_date, ["000001.SZ", "600000.SH", "999999.SZ"]
+        )
+        updater._async_tushare_client = AsyncTushareClient(
+            client, rate_limiter=AsyncTokenBucket(rate=1000)
+        )
+        return updater, client
+
+    def test_backfills_each_missing_trade_date_in_one_call(self, db_session):
+        """Test each missing trading day is fetched once as a cross-section"""
+        today = datetime.now()
+        days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in (3, 2, 1)]
+        updater, client = self._setup(db_session, days)
+
+        count = asyncio.run(updater.update_all_stock_daily())
+
+        assert client.fetch_daily.call_count == 3
+        called = [c.kwargs["trade_date"] for c in client.fetch_daily.call_args_list]
+        assert called == [d.replace("-", "") for d in days]
+
+        # 只保留 SymbolMetadata 中存在的股票
+        assert count == 6
+        codes = {k.symbol_code for k in db_session.query(Kline).all()}
+        assert codes == {"000001", "600000"}
+
+        kline = (
+            db_session.query(Kline)
+            .filter(Kline.symbol_code == "600000", Kline.trade_time == days[0])
+            .one()
+        )
+        assert kline.symbol_type == SymbolType.STOCK
+        assert kline.timeframe == KlineTimeframe.DAY
+        assert kline.close == 11.5
+
+    def test_skips_dates_already_stored(self, db_session):
+        """Test only dates after the latest stored bar are fetched"""
+        today = datetime.now()
+        days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in (3, 2, 1)]
+        updater, client = self._setup(db_session, days)
+
+        asyncio.run(updater.update_all_stock_daily())
+        client.fetch_daily.reset_mock()
+
+        count = asyncio.run(updater.update_all_stock_daily())
+
+        assert count == 0
+        client.fetch_daily.assert_not_called()
+
+    def test_watchlist_bars_do_not_mark_market_current(self, db_session):
+        """Test a date covered only by a few single-stock saves is still fetched"""
+        today = datetime.now()
+        days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in (3, 2, 1)]
+        updater, client = self._setup(db_session, days)
+        asyncio.run(updater.update_all_stock_daily())
+        client.fetch_daily.reset_mock()
+
+        # 自选股更新写入了新交易日的一只股票
+        new_day = today.strftime("%Y-%m-%d")
+        db_session.add(TradeCalendar(date=new_day, is_trading_day=True))
+        db_session.add(Kline(
+            symbol_type=SymbolType.STOCK, symbol_code="000001", timeframe=KlineTimeframe.DAY,
+            trade_time=new_day, open=1.0, high=1.0, low=1.0, close=1.0, volume=1.0, amount=1.0,
+        ))
+        db_session.commit()
+        invalidate_trading_calendar()
+
+        count = asyncio.run(updater.update_all_stock_daily())
+
+        assert [c.kwargs["trade_date"] for c in client.fetch_daily.call_args_list] == [
+            new_day.replace("-", "")
+        ]
+        assert count == 2
+
+
+class TestIncrementalStockDaily:
+    """Test watchlist daily updates only fetch what is missing"""
+
+    def test_fetches_stale_tickers_from_last_stored_bar(self, db_session, monkeypatch):
+        calendar = TradingCalendar([])  # 按工作日判断
+        monkeypatch.setattr(freshness_registry, "get_trading_calendar", lambda: calendar)
+        monkeypatch.setattr(fetch_planner, "get_trading_calendar", lambda: calendar)
+        registry = FreshnessRegistry(session_factory=sessionmaker(bind=db_session.get_bind()))
+        monkeypatch.setattr(freshness_registry, "_registry", registry)
+
+        expected, _ = registry.expected_latest_bar(KlineTimeframe.DAY)
+        previous = calendar.prev(expected)
+        now = datetime.now(timezone.utc)
+        registry.apply({
+            (SymbolType.STOCK, "600519", KlineTimeframe.DAY): FreshnessEntry(expected, now, "tushare"),
+            (SymbolType.STOCK, "000001", KlineTimeframe.DAY): FreshnessEntry(
+                previous, now - timedelta(days=10), "tushare"
+            ),
+        })
+        db_session.add_all([Watchlist(ticker="600519"), Watchlist(ticker="000001")])
+        db_session.commit()
+
+        updater = KlineUpdater.create_with_session(db_session)
+        client = Mock(spec=TushareClient)
+        client.normalize_ts_code.side_effect = lambda code: f"{code}.SZ"
+        client.fetch_daily.return_value = pd.DataFrame({
+            "trade_date": [expected.replace("-", ""), previous.replace("-", "")],
+            "open": [10.0, 9.0], "high": [11.0, 10.0], "low": [9.0, 8.0],
+            "close": [10.5, 9.5], "vol": [1000.0, 900.0], "amount": [5000.0, 4000.0],
+        })
+        updater._async_tushare_client = AsyncTushareClient(
+            client, rate_limiter=AsyncTokenBucket(rate=1000)
+        )
+
+        count = asyncio.run(updater.update_stock_daily())
+
+        # 已是最新的 600519 不请求；000001 从已保存的最新交易日开始获取
+        assert client.fetch_daily.call_count == 1
+        assert client.fetch_daily.call_args.kwargs == {
+            "ts_code": "000001.SZ", "start_date": previous.replace("-", "")
+        }
+        assert count == 2
+        assert registry.get(SymbolType.STOCK, "000001", KlineTimeframe.DAY).last_bar_time == expected
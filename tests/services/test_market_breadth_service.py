@@ -0,0 +1,273 @@
+"""
+Tests for MarketBreadthService
+
+Breadth and sector turnover rows are recomputed when stock cross-sections are
+committed through KlineService.save_bar_records.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models import (
+    DataUpdateLog,
+    KlineTimeframe,
+    MarketBreadthDaily,
+    SectorTurnoverDaily,
+    SymbolMetadata,
+    SymbolType,
+)
+from src.repositories.kline_repository import KlineRepository
+from src.services.kline_service import KlineService
+from src.services.market_breadth_service import (
+    MarketBreadthService,
+    compute_breadth,
+    compute_sector_turnover,
+)
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _record(code, day, close, volume=1000.0):
+    return {
+        "symbol_type": SymbolType.STOCK,
+        "symbol_code": code,
+        "symbol_name": None,
+        "timeframe": KlineTimeframe.DAY,
+        "trade_time": day,
+        "open": close,
+        "high": close,
+        "low": close,
+        "close": close,
+        "volume": volume,
+        "amount": close * volume,
+        "dif": None,
+        "dea": None,
+        "macd": None,
+        "updated_at": datetime.now(),
+    }
+
+
+def _save(session, records):
+    KlineService(KlineRepository(session)).save_bar_records(
+        SymbolType.STOCK, KlineTimeframe.DAY, records, calculate_indicators=False
+    )
+    session.commit()
+
+
+class TestComputeBreadth:
+    """compute_breadth on cross-section rows"""
+
+    def test_counts_and_board_limits(self):
+        rows = [
+            # (code, name, open, close, volume, amount, prev_close)
+            ("600000", "浦发银行", 10.0, 11.0, 100.0, 1100.0, 10.0),  # main limit up
+            ("300001", "特锐德", 10.0, 11.0, 100.0, 1100.0, 10.0),  # chinext +10%, not limit
+            ("300002", "神州泰岳", 10.0, 12.0, 100.0, 1200.0, 10.0),  # chinext limit up
+            ("688001", "华兴源创", 10.0, 8.0, 100.0, 800.0, 10.0),  # star limit down
+            ("600001", "*ST 某某", 10.0, 10.5, 100.0, 1050.0, 10.0),  # ST limit up at 5%
+            ("000001", "平安银行", 10.0, 10.0, 0.0, 0.0, 10.0),  # flat, suspended
+            ("001001", None, 20.0, 21.0, 100.0, 2100.0, None),  # new listing vs open
+        ]
+
+        stats = compute_breadth(rows)
+
+        assert (stats["up_count"], stats["down_count"], stats["flat_count"]) == (5, 1, 1)
+        assert stats["limit_up_count"] == 3
+        assert stats["limit_down_count"] == 1
+        assert stats["stock_count"] == 7
+        assert stats["traded_count"] == 6
+        assert stats["total_amount"] == pytest.approx(7350.0)
+        assert stats["board_breadth"]["chinext"] == {"count": 2, "up": 2, "down": 0}
+        assert stats["board_breadth"]["main"] == {"count": 4, "up": 3, "down": 0}
+        assert "bse" not in stats["board_breadth"]
+
+    def test_empty_cross_section(self):
+        assert compute_breadth([]) is None
+
+    def test_sector_turnover(self):
+        rows = [
+            ("600000", None, 10.0, 10.0, 100.0, 0.0, 9.0),
+            ("600001", None, 10.0, 20.0, 50.0, 0.0, 9.0),
+            ("600002", None, 10.0, 10.0, 0.0, 0.0, 9.0),  # suspended, still counted in sector
+            ("600003", None, 10.0, 10.0, 10.0, 0.0, 9.0),  # no sector
+        ]
+
+        result = compute_sector_turnover(rows, {"600000": "银行", "600001": "银行", "600002": "芯片"})
+
+        assert result["traded_count"] == 3
+        assert result["sectors"] == {
+            "银行": {"amount": pytest.approx(200000.0), "count": 2},
+            "芯片": {"amount": 0.0, "count": 1},
+        }
+
+
+class TestMarketBreadthMaterialization:
+    """Breadth rows maintained on ingest"""
+
+    def test_commit_materializes_daily_breadth(self, db_session):
+        db_session.add(SymbolMetadata(ticker="600002", name="ST 测试"))
+        _save(
+            db_session,
+            [
+                _record("600000", "2024-01-02", 10.0),
+                _record("600001", "2024-01-02", 10.0),
+                _record("600002", "2024-01-02", 10.0),
+            ],
+        )
+        _save(
+            db_session,
+            [
+                _record("600000", "2024-01-03", 11.0),
+                _record("600001", "2024-01-03", 9.5),
+                _record("600002", "2024-01-03", 10.5),
+            ],
+        )
+
+        breadth = db_session.get(MarketBreadthDaily, "2024-01-03")
+        assert (breadth.up_count, breadth.down_count, breadth.flat_count) == (2, 1, 0)
+        assert breadth.limit_up_count == 2  # 600000 at 10%, ST 600002 at 5%
+        assert breadth.total_amount == pytest.approx((11.0 + 9.5 + 10.5) * 1000)
+        assert db_session.get(MarketBreadthDaily, "2024-01-02").flat_count == 3
+
+        # Re-ingesting a corrected close updates the row
+        _save(db_session, [_record("600001", "2024-01-03", 10.2)])
+        db_session.expire_all()
+        breadth = db_session.get(MarketBreadthDaily, "2024-01-03")
+        assert (breadth.up_count, breadth.down_count) == (3, 0)
+
+    def test_rollback_discards_pending_breadth(self, db_session):
+        service = KlineService(KlineRepository(db_session))
+        service.save_bar_records(
+            SymbolType.STOCK, KlineTimeframe.DAY,
+            [_record("600000", "2024-01-02", 10.0)], calculate_indicators=False,
+        )
+        db_session.rollback()
+        db_session.commit()
+
+        assert db_session.query(MarketBreadthDaily).count() == 0
+
+    def test_single_symbol_saves_do_not_touch_breadth(self, db_session):
+        _save(db_session, [_record(f"{600000 + i}", "2024-01-02", 10.0) for i in range(3)])
+        service = KlineService(KlineRepository(db_session))
+        service.save_klines(
+            SymbolType.STOCK, "600000", None, KlineTimeframe.DAY,
+            [{"datetime": "2024-01-02", "open": 12.0, "high": 12.0, "low": 12.0,
+              "close": 12.0, "volume": 10.0, "amount": 120.0},
+             {"datetime": "2024-01-03", "open": 12.0, "high": 12.0, "low": 12.0,
+              "close": 12.0, "volume": 10.0, "amount": 120.0}],
+            calculate_indicators=False,
+        )
+        service.save_klines(
+            SymbolType.STOCK, "600000", None, KlineTimeframe.MINS_30,
+            [{"datetime": "2024-01-03 10:00:00", "open": 10.0, "high": 10.3,
+              "low": 9.9, "close": 10.2, "volume": 10.0, "amount": 102.0}],
+            calculate_indicators=False,
+        )
+        db_session.commit()
+
+        # 历史统计不被单股写入改写，也不产生单股的统计行
+        assert db_session.get(MarketBreadthDaily, "2024-01-02").flat_count == 3
+        assert db_session.get(MarketBreadthDaily, "2024-01-03") is None
+
+    def test_low_coverage_cross_section_is_not_stored_or_served(self, db_session):
+        db_session.add_all(SymbolMetadata(ticker=f"{600000 + i}", name="测试") for i in range(5))
+        _save(db_session, [_record(f"{600000 + i}", "2024-01-02", 10.0) for i in range(4)])
+        _save(db_session, [_record(f"{600000 + i}", "2024-01-03", 11.0) for i in range(2)])
+        # 旧版本写入的残缺统计行
+        db_session.add(MarketBreadthDaily(trade_date="2024-01-04", stock_count=1, up_count=1))
+        db_session.commit()
+        service = MarketBreadthService(db_session)
+
+        assert service.required_stock_count() == 4
+        assert db_session.get(MarketBreadthDaily, "2024-01-02").stock_count == 4
+        assert db_session.get(MarketBreadthDaily, "2024-01-03") is None
+        assert service.get_daily("2024-01-03") is None
+        assert service.get_daily("2024-01-04") is None
+        assert [b.trade_date for b in service.get_previous_daily("2024-01-05")] == [
+            "2024-01-02"
+        ]
+        # 赛道成交额不要求覆盖率：残缺截面照常写入，按有成交股票数筛选
+        assert [t.trade_date for t in service.get_sector_turnover(limit=2)] == [
+            "2024-01-03", "2024-01-02"
+        ]
+        assert [t.trade_date for t in service.get_sector_turnover(limit=2, min_traded=2)] == [
+            "2024-01-02"
+        ]
+
+    def test_reads(self, db_session):
+        _save(db_session, [_record(f"{600000 + i}", "2024-01-02", 10.0) for i in range(3)])
+        _save(
+            db_session,
+            [_record(f"{600000 + i}", "2024-01-03", 10.0, volume=0.0) for i in range(3)],
+        )
+        service = MarketBreadthService(db_session)
+
+        assert [t.trade_date for t in service.get_sector_turnover(limit=2, min_traded=0)] == [
+            "2024-01-02"
+        ]
+        assert [b.trade_date for b in service.get_previous_daily("2024-01-03")] == [
+            "2024-01-02"
+        ]
+
+        # Missing rows are computed on demand without being stored
+        db_session.query(MarketBreadthDaily).delete()
+        breadth = service.get_daily("2024-01-02")
+        assert breadth.flat_count == 3
+        assert db_session.query(MarketBreadthDaily).count() == 0
+        assert service.get_daily("2024-01-04") is None
+
+        assert service.backfill_daily() == 2
+        assert db_session.query(SectorTurnoverDaily).count() == 2
+
+    def test_sector_turnover_materialized_and_refreshed_on_reassignment(self, db_session):
+        db_session.execute(text("CREATE TABLE stock_sectors (ticker TEXT PRIMARY KEY, sector TEXT)"))
+        db_session.execute(
+            text("INSERT INTO stock_sectors VALUES ('600000', '银行'), ('600001', '银行')")
+        )
+        _save(
+            db_session,
+            [_record("600000", "2024-01-02", 10.0), _record("600001", "2024-01-02", 20.0)],
+        )
+
+        turnover = db_session.get(SectorTurnoverDaily, "2024-01-02")
+        assert turnover.traded_count == 2
+        assert turnover.sectors == {"银行": {"amount": 3000000.0, "count": 2}}
+
+        db_session.execute(text("UPDATE stock_sectors SET sector = '券商' WHERE ticker = '600001'"))
+        service = MarketBreadthService(db_session)
+        assert service.refresh_sector_turnover(["2024-01-02", "2024-01-09"]) == 1
+        db_session.commit()
+
+        db_session.expire_all()
+        assert db_session.get(SectorTurnoverDaily, "2024-01-02").sectors == {
+            "银行": {"amount": 1000000.0, "count": 1},
+            "券商": {"amount": 2000000.0, "count": 1},
+        }
+
+    def test_backfill_is_attempted_once(self, db_session, monkeypatch):
+        db_session.add_all(SymbolMetadata(ticker=f"{600000 + i}", name="测试") for i in range(5))
+        KlineRepository(db_session).upsert_records([_record("600000", "2024-01-02", 10.0)])
+        db_session.commit()
+        service = MarketBreadthService(db_session)
+
+        # 覆盖不足：没有写入涨跌统计，但记录已尝试过回填
+        assert service.backfill_daily_once() == 0
+        db_session.commit()
+        assert db_session.query(MarketBreadthDaily).count() == 0
+        assert db_session.query(DataUpdateLog).one().update_type == "market_breadth_backfill"
+
+        scans = []
+        monkeypatch.setattr(service, "backfill_daily", lambda limit=60: scans.append(limit))
+        assert service.backfill_daily_once() is None
+        assert scans == []
@@ -0,0 +1,126 @@
+"""
+Tests for the shared realtime quote cache
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from src.services import quote_cache
+from src.services.quote_cache import QuoteCache, TZ_SHANGHAI, in_trading_session
+from src.services.trading_calendar import TradingCalendar
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(clock, trading=True):
+    return QuoteCache(trading_ttl=3.0, idle_ttl=60.0, clock=clock, session_check=lambda: trading)
+
+
+def test_get_many_loads_only_missing_keys_and_expires():
+    clock = FakeClock()
+    cache = _cache(clock)
+    calls = []
+
+    async def loader(keys):
+        calls.append(list(keys))
+        return {k: f"q-{k}" for k in keys if k != "bad"}
+
+    async def run():
+        first = await cache.get_many("sina_hq", ["a", "b", "bad"], loader)
+        second = await cache.get_many("sina_hq", ["b", "c", "a"], loader)
+        clock.now = 3.5
+        third = await cache.get_many("sina_hq", ["a"], loader)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+
+    assert first == {"a": "q-a", "b": "q-b", "bad": None}
+    assert list(second) == ["b", "c", "a"]
+    assert calls == [["a", "b", "bad"], ["c"], ["a"]]
+    stats = cache.stats()["namespaces"]["sina_hq"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 5
+    assert stats["upstream_calls"] == 3
+
+
+def test_idle_ttl_outside_trading_session():
+    clock = FakeClock()
+    cache = _cache(clock, trading=False)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return 1
+
+    async def run():
+        await cache.get("ths_concept", "886047", loader)
+        clock.now = 30.0
+        await cache.get("ths_concept", "886047", loader)
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = _cache(FakeClock())
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"price": 10.0}
+
+    async def run():
+        return await asyncio.gather(*(cache.get("sina_index", "000001.SH", loader) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(r == {"price": 10.0} for r in results)
+    stats = cache.stats()["namespaces"]["sina_index"]
+    assert stats["coalesced"] == 9
+    assert cache.stats()["inflight"] == 0
+
+
+def test_errors_reach_waiters_and_are_not_cached():
+    cache = _cache(FakeClock())
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("456")
+
+    async def run():
+        results = await asyncio.gather(
+            *(cache.get("sina_hq", "sh600519", failing) for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        return await cache.get("sina_hq", "sh600519", lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(run()) == "ok"
+    assert len(calls) == 1
+    assert cache.stats()["namespaces"]["sina_hq"]["upstream_errors"] == 1
+
+
+@pytest.mark.parametrize(
+    "moment, expected",
+    [
+        (datetime(2026, 10, 16, 10, 0), True),
+        (datetime(2026, 10, 16, 12, 0), False),
+        (datetime(2026, 10, 16, 14, 59), True),
+        (datetime(2026, 10, 17, 10, 0), False),  # Saturday
+    ],
+)
+def test_in_trading_session(monkeypatch, moment, expected):
+    monkeypatch.setattr(quote_cache, "get_trading_calendar", lambda: TradingCalendar([]))
+    assert in_trading_session(moment.replace(tzinfo=TZ_SHANGHAI)) is expected
@@ -0,0 +1,120 @@
+"""
+Tests for the realtime quote push broadcaster
+"""
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import routes_realtime
+from src.services import quote_stream
+from src.services.quote_stream import QuoteBroadcaster
+from src.services.sina_quote_service import parse_hq_response
+
+
+def _line(symbol: str, price: float) -> str:
+    fields = ["名称", "10", "10", str(price), "11", "9", "0", "0", "100", "1000"] + ["0"] * 20
+    fields += ["2025-07-10", "10:00:00", "00"]
+    return f'var hq_str_{symbol}="{",".join(fields)}";\n'
+
+
+class FakeUpstream:
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    async def __call__(self, symbols):
+        self.calls.append(list(symbols))
+        return parse_hq_response("".join(_line(s, self.prices[s]) for s in symbols if s in self.prices))
+
+
+def _broadcaster(upstream, interval=60.0):
+    return QuoteBroadcaster(
+        fetcher=upstream, trading_interval=interval, idle_interval=interval, session_check=lambda: True
+    )
+
+
+def test_union_is_fetched_once_and_only_changes_are_pushed():
+    upstream = FakeUpstream({"sh600519": 1800.0, "sz000001": 12.5})
+    broadcaster = _broadcaster(upstream)
+
+    async def run():
+        a = broadcaster.subscribe(["600519"])
+        b = broadcaster.subscribe(["600519", "000001"])
+        await asyncio.sleep(0)  # poller starts and fetches
+
+        first_a = await a.next(timeout=1)
+        first_b = await b.next(timeout=1)
+
+        upstream.prices["sz000001"] = 12.6
+        changed = await broadcaster.poll_once(broadcaster.symbols())
+        delta_a = await a.next(timeout=0.05)
+        delta_b = await b.next(timeout=0.05)
+
+        a.close()
+        b.close()
+        await asyncio.sleep(0)
+        return first_a, first_b, changed, delta_a, delta_b
+
+    first_a, first_b, changed, delta_a, delta_b = asyncio.run(run())
+
+    assert upstream.calls[0] == ["sh600519", "sz000001"]
+    assert [q["ticker"] for q in first_a] == ["600519"]
+    assert sorted(q["ticker"] for q in first_b) == ["000001", "600519"]
+    assert changed == 1
+    assert delta_a == []
+    assert [(q["ticker"], q["price"]) for q in delta_b] == [("000001", 12.6)]
+    assert broadcaster.stats()["running"] is False
+
+
+def test_slow_subscriber_gets_latest_value_only():
+    upstream = FakeUpstream({"sh600519": 1800.0})
+    broadcaster = _broadcaster(upstream)
+
+    async def run():
+        sub = broadcaster.subscribe(["600519"])
+        for price in (1801.0, 1802.0, 1803.0):
+            upstream.prices["sh600519"] = price
+            await broadcaster.poll_once(["sh600519"])
+        quotes = await sub.next(timeout=1)
+        await broadcaster.stop()
+        return quotes
+
+    quotes = asyncio.run(run())
+    assert [q["price"] for q in quotes] == [1803.0]
+
+
+def test_late_subscriber_receives_cached_quote_without_new_fetch():
+    upstream = FakeUpstream({"sh600519": 1800.0})
+    broadcaster = _broadcaster(upstream)
+
+    async def run():
+        first = broadcaster.subscribe(["600519"])
+        await first.next(timeout=1)
+        calls = len(upstream.calls)
+        late = broadcaster.subscribe(["600519"])
+        quotes = await late.next(timeout=0.05)
+        await broadcaster.stop()
+        return calls, quotes
+
+    calls, quotes = asyncio.run(run())
+    assert [q["price"] for q in quotes] == [1800.0]
+    assert len(upstream.calls) == calls
+
+
+def test_websocket_subscribe_receives_quotes(monkeypatch):
+    upstream = FakeUpstream({"sh600519": 1800.0, "sz000001": 12.5})
+    monkeypatch.setattr(quote_stream, "_broadcaster", _broadcaster(upstream, interval=0.01))
+    app = FastAPI()
+    app.include_router(routes_realtime.router, prefix="/realtime")
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/realtime/ws?tickers=600519") as ws:
+            message = ws.receive_json()
+            assert message["type"] == "quotes"
+            assert [q["ticker"] for q in message["data"]] == ["600519"]
+
+            ws.send_json({"action": "subscribe", "tickers": ["000001"]})
+            message = ws.receive_json()
+            assert [q["ticker"] for q in message["data"]] == ["000001"]
@@ -0,0 +1,57 @@
+"""
+Tests for the deduplicating background refresh queue
+"""
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.services.refresh_queue import RefreshQueue
+
+
+def test_concurrent_submits_for_same_key_run_once():
+    sessions = []
+    release = threading.Event()
+    calls = []
+
+    def factory():
+        session = MagicMock()
+        sessions.append(session)
+        return session
+
+    def job(session):
+        calls.append(session)
+        release.wait(2)
+        return 42
+
+    queue = RefreshQueue(max_workers=2, session_factory=factory)
+    futures = [queue.submit(("stock", "000001", "day"), job) for _ in range(5)]
+    other = queue.submit(("stock", "600519", "day"), job)
+    assert queue.is_pending(("stock", "000001", "day"))
+
+    release.set()
+    assert {f.result(2) for f in futures} == {42}
+    assert other.result(2) == 42
+    queue.shutdown(wait=True)
+
+    assert len(calls) == 2
+    assert all(s.close.called for s in sessions)
+    stats = queue.stats()
+    assert stats == {"pending": 0, "submitted": 2, "coalesced": 4, "failed": 0}
+
+
+def test_failed_job_rolls_back_and_can_be_resubmitted():
+    session = MagicMock()
+    queue = RefreshQueue(max_workers=1, session_factory=lambda: session)
+
+    def boom(_session):
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        queue.submit("k", boom).result(2)
+    assert session.rollback.called
+
+    assert queue.submit("k", lambda _s: 1).result(2) == 1
+    queue.shutdown(wait=True)
+    assert queue.stats()["failed"] == 1
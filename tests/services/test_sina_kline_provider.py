@@ -0,0 +1,119 @@
+"""
+Tests for the async Sina kline provider with AIMD concurrency control
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from src.perception.config import CircuitBreakerConfig
+from src.perception.sources.sina_source import CircuitBreaker
+from src.services.http_client import HttpClientManager
+from src.services.sina_kline_provider import AimdLimiter, AsyncSinaKlineProvider
+
+BARS = [
+    {"day": "2025-07-10 10:00:00", "open": "10.0", "high": "10.5", "low": "9.9", "close": "10.2", "volume": "1000"},
+    {"day": "2025-07-10 10:30:00", "open": "10.2", "high": "10.6", "low": "10.1", "close": "10.4", "volume": "800"},
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_aimd_grows_additively_and_backs_off_once_per_cooldown():
+    clock = FakeClock()
+    limiter = AimdLimiter(initial=2, maximum=8, cooldown=1.0, clock=clock)
+
+    for _ in range(2):
+        limiter.on_success()
+    assert 2.8 < limiter.limit < 3.0  # 约每轮 +1
+
+    assert limiter.on_throttle() is True
+    assert limiter.on_throttle() is False  # 同一轮的其他失败不再回退
+    assert 1.4 < limiter.limit < 1.5
+
+    clock.now = 2.0
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 1  # 不低于下限
+
+    for _ in range(200):
+        limiter.on_success()
+    assert limiter.limit == 8  # 不超过上限
+
+
+def _provider(handler, **kwargs):
+    manager = HttpClientManager(transport=httpx.MockTransport(handler), per_host_limit=16)
+    return AsyncSinaKlineProvider(http=manager, **kwargs), manager
+
+
+def test_fetch_many_runs_requests_concurrently_within_limit():
+    state = {"in_flight": 0, "max": 0}
+
+    async def handler(request):
+        state["in_flight"] += 1
+        state["max"] = max(state["max"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        return httpx.Response(200, text=json.dumps(BARS))
+
+    limiter = AimdLimiter(initial=4, maximum=4)
+    provider, manager = _provider(handler, limiter=limiter)
+    tickers = [f"{600000 + i}" for i in range(12)]
+
+    async def run():
+        results = await provider.fetch_many(tickers, period="30m", limit=2)
+        await manager.close()
+        return results
+
+    results = asyncio.run(run())
+    assert list(results) == tickers
+    assert all(len(df) == 2 for df in results.values())
+    assert results["600000"]["close"].tolist() == [10.2, 10.4]
+    assert 1 < state["max"] <= 4
+    stats = provider.stats()
+    assert stats["requests"] == 12
+    assert stats["requests_per_sec"] > 0
+
+
+def test_throttling_backs_off_retries_and_trips_breaker(monkeypatch):
+    calls = {"n": 0}
+
+    async def handler(request):
+        calls["n"] += 1
+        if request.url.params["symbol"] == "sz000001" and calls["n"] <= 2:
+            return httpx.Response(456, text="")
+        if request.url.params["symbol"] == "sh600519":
+            return httpx.Response(503, text="")
+        return httpx.Response(200, text=json.dumps(BARS))
+
+    async def no_sleep(_delay):
+        return None
+
+    monkeypatch.setattr("src.services.sina_kline_provider.asyncio.sleep", no_sleep)
+    limiter = AimdLimiter(initial=4, maximum=4, cooldown=0)
+    breaker = CircuitBreaker(CircuitBreakerConfig(failure_threshold=3, recovery_timeout_seconds=60))
+    provider, manager = _provider(handler, limiter=limiter, breaker=breaker, max_retries=2)
+
+    async def run():
+        first = await provider.fetch_kline("000001")
+        failed = await provider.fetch_kline("600519")
+        rejected = await provider.fetch_kline("000002")
+        await manager.close()
+        return first, failed, rejected
+
+    first, failed, rejected = asyncio.run(run())
+    assert len(first) == 2  # 两次 456 后重试成功
+    assert failed is None
+    assert rejected is None  # 熔断后直接拒绝
+    stats = provider.stats()
+    assert stats["breaker"] == "open"
+    assert stats["rejected"] == 1
+    assert stats["throttled"] == 5
+    assert stats["concurrency_limit"] < 4
@@ -0,0 +1,115 @@
+"""
+Tests for the batched Sina quote service
+
+Parsing is checked against hand-written hq payloads; fetching uses MockTransport.
+"""
+
+import asyncio
+import time
+from urllib.parse import unquote
+
+import httpx
+import numpy as np
+import pytest
+
+from src.services import http_client
+from src.services.http_client import HttpClientManager
+from src.services.sina_quote_service import (
+    SinaQuoteService,
+    parse_hq_index_response,
+    parse_hq_response,
+    to_sina_symbol,
+)
+
+
+def _quote_line(symbol: str, price: str = "12.55", prev_close: str = "12.40") -> str:
+    fields = ["名称", "12.45", prev_close, price, "12.60", "12.30", "12.54", "12.55",
+              "98765432", "1234567890.00"] + ["0"] * 20 + ["2025-07-10", "15:00:03", "00"]
+    return f'var hq_str_{symbol}="{",".join(fields)}";\n'
+
+
+def test_parse_hq_response_columns():
+    text = _quote_line("sh600519", "1815.50", "1800.00") + _quote_line("sz000001")
+    snap = parse_hq_response(text)
+
+    assert list(snap.symbols) == ["sh600519", "sz000001"]
+    assert list(snap.tickers) == ["600519", "000001"]
+    assert snap.price.dtype == np.float64
+    np.testing.assert_allclose(snap.price, [1815.50, 12.55])
+    np.testing.assert_allclose(snap.change_pct[0], (1815.50 - 1800.00) / 1800.00 * 100)
+    assert snap.date[1] == "2025-07-10"
+    assert snap.quote("000001").price == 12.55
+    assert snap.quote("sh600519").name == "名称"
+    assert snap.quote("688001") is None
+
+
+def test_parse_skips_incomplete_and_handles_blank_fields():
+    text = (
+        'var hq_str_sh600000="浦发银行,1800.00";\n'
+        'var hq_str_sz000002=;\n'
+        + _quote_line("sz000004", price="", prev_close="")
+    )
+    snap = parse_hq_response(text)
+
+    assert list(snap.tickers) == ["000004"]
+    assert snap.price[0] == 0.0
+    assert np.isnan(snap.change_pct[0])
+    assert len(snap.trading()) == 0
+    assert snap.to_records()[0]["change_pct"] is None
+
+
+def test_parse_index_response():
+    text = (
+        'var hq_str_s_sh000001="上证指数,3259.22,46.14,1.44,2660394,28862016";\n'
+        'var hq_str_s_sz399001="深证成指";\n'
+    )
+    snap = parse_hq_index_response(text)
+
+    assert list(snap.symbols) == ["sh000001"]
+    assert list(snap.tickers) == ["000001"]
+    assert snap.change_pct[0] == 1.44
+
+
+def test_to_sina_symbol():
+    assert to_sina_symbol("600519") == "sh600519"
+    assert to_sina_symbol(" 300750") == "sz300750"
+    assert to_sina_symbol("sh000001") == "sh000001"
+
+
+@pytest.fixture
+def hq_requests(monkeypatch):
+    seen = []
+
+    def handler(request):
+        symbols = unquote(str(request.url)).split("list=", 1)[1].split(",")
+        seen.append(symbols)
+        return httpx.Response(200, text="".join(_quote_line(s) for s in symbols))
+
+    monkeypatch.setattr(
+        http_client, "_manager", HttpClientManager(transport=httpx.MockTransport(handler))
+    )
+    return seen
+
+
+def test_fetch_quotes_chunks_requests(hq_requests):
+    tickers = [f"{600000 + i}" for i in range(25)] + ["600000"]
+    service = SinaQuoteService(chunk_size=10)
+
+    snap = asyncio.run(service.fetch_quotes(tickers))
+
+    assert [len(chunk) for chunk in hq_requests] == [10, 10, 5]
+    assert len(snap) == 25
+    assert snap.symbols[0] == "sh600000"
+    assert snap.tickers[-1] == "600024"
+
+
+def test_full_market_parse_is_fast():
+    symbols = [f"sz{i:06d}" for i in range(5400)]
+    text = "".join(_quote_line(s) for s in symbols)
+
+    start = time.perf_counter()
+    snap = parse_hq_response(text)
+    elapsed = time.perf_counter() - start
+
+    assert len(snap) == 5400
+    assert elapsed < 0.5
@@ -0,0 +1,96 @@
+"""
+Tests for the in-memory trading calendar
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models import TradeCalendar
+from src.services.trading_calendar import (
+    AFTER_CLOSE,
+    AFTERNOON,
+    CALL_AUCTION,
+    CLOSED,
+    LUNCH_BREAK,
+    MORNING,
+    PRE_OPEN,
+    TradingCalendar,
+    upsert_trade_calendar,
+)
+
+# 2025-09-29 (周一) ~ 2025-10-10 (周五)，国庆 10-01 ~ 10-08 休市
+CALENDAR = TradingCalendar(
+    ["2025-09-29", "2025-09-30", "2025-10-09", "2025-10-10"],
+    ["2025-10-01", "2025-10-02", "2025-10-03", "2025-10-04", "2025-10-05",
+     "2025-10-06", "2025-10-07", "2025-10-08", "2025-10-11", "2025-10-12"],
+)
+
+
+def test_is_trading_day_uses_calendar_then_weekdays():
+    assert CALENDAR.is_trading_day("2025-09-30")
+    assert not CALENDAR.is_trading_day("2025-10-06")  # 周一，节假日
+    assert CALENDAR.is_trading_day("20251009")
+    assert CALENDAR.is_trading_day(datetime(2025, 10, 13, 10, 0))  # 日历外的周一
+    assert not CALENDAR.is_trading_day("2025-10-18")  # 日历外的周六
+
+
+def test_prev_and_next_skip_holidays():
+    assert CALENDAR.prev("2025-10-09") == "2025-09-30"
+    assert CALENDAR.prev("2025-10-09", 2) == "2025-09-29"
+    assert CALENDAR.prev("2025-09-29") is None
+    assert CALENDAR.next("2025-09-30") == "2025-10-09"
+    # 日历之外按工作日推断
+    assert CALENDAR.next("2025-10-10") == "2025-10-13"
+    assert CALENDAR.prev("2025-10-14") == "2025-10-13"
+
+
+def test_latest_and_n_days_back():
+    assert CALENDAR.latest_on_or_before("2025-10-05") == "2025-09-30"
+    assert CALENDAR.latest_on_or_before("2025-10-12") == "2025-10-10"
+    assert CALENDAR.n_days_back("2025-10-10", 0) == "2025-10-10"
+    assert CALENDAR.n_days_back("2025-10-10", 2) == "2025-09-30"
+    assert CALENDAR.n_days_back("2025-10-14", 3) == "2025-10-09"
+    assert CALENDAR.n_days_back("2025-10-10", 10) is None
+    assert CALENDAR.between("2025-09-30", "2025-10-09") == ["2025-09-30", "2025-10-09"]
+
+
+@pytest.mark.parametrize(
+    "moment, phase",
+    [
+        (datetime(2025, 10, 9, 9, 0), PRE_OPEN),
+        (datetime(2025, 10, 9, 9, 20), CALL_AUCTION),
+        (datetime(2025, 10, 9, 10, 0), MORNING),
+        (datetime(2025, 10, 9, 12, 0), LUNCH_BREAK),
+        (datetime(2025, 10, 9, 15, 0), AFTERNOON),
+        (datetime(2025, 10, 9, 15, 1), AFTER_CLOSE),
+        (datetime(2025, 10, 8, 10, 0), CLOSED),
+    ],
+)
+def test_session_phase(moment, phase):
+    assert CALENDAR.session_phase(moment) == phase
+
+
+def test_quote_session_starts_after_auction_match():
+    assert not CALENDAR.in_quote_session(datetime(2025, 10, 9, 9, 20))
+    assert CALENDAR.in_quote_session(datetime(2025, 10, 9, 9, 25))
+    assert not CALENDAR.is_trading_time(datetime(2025, 10, 9, 9, 25))
+
+
+def test_bulk_upsert_and_load():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    assert upsert_trade_calendar(session, {"20251009": True, "20251011": True}) == 2
+    assert upsert_trade_calendar(session, {"20251011": False, "20251010": True}) == 2
+    session.commit()
+
+    assert session.query(TradeCalendar).count() == 3
+    calendar = TradingCalendar.load(session)
+    assert calendar.between("2025-10-01", "2025-10-31") == ["2025-10-09", "2025-10-10"]
+    assert not calendar.is_trading_day("2025-10-11")
+    session.close()
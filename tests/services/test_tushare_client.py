@@ -0,0 +1,172 @@
+"""
+Unit tests for the async Tushare client
+
+The synchronous client is mocked; only rate limiting, offloading and retries are tested.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+import pandas as pd
+import pytest
+
+from src.services.tushare_client import (
+    AsyncTokenBucket,
+    AsyncTushareClient,
+    Priority,
+    RateLimiter,
+    TushareClient,
+)
+
+
+class TestRateLimiter:
+    """Shared sliding-window budget"""
+
+    def test_thread_safe_counting(self):
+        limiter = RateLimiter(max_calls=1000, time_window=60)
+
+        def worker():
+            for _ in range(50):
+                limiter.wait_if_needed()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(limiter._window.calls) == 400
+
+    def test_interactive_requests_jump_ahead(self):
+        limiter = RateLimiter(max_calls=1, time_window=0.3)
+        limiter.wait_if_needed()
+        order = []
+
+        def call(name, priority):
+            limiter.wait_if_needed(priority)
+            order.append(name)
+
+        batch = threading.Thread(target=call, args=("batch", Priority.BATCH))
+        batch.start()
+        time.sleep(0.05)
+        interactive = threading.Thread(
+            target=call, args=("interactive", Priority.INTERACTIVE)
+        )
+        interactive.start()
+        batch.join(timeout=5)
+        interactive.join(timeout=5)
+
+        assert order == ["interactive", "batch"]
+
+    def test_file_backed_budget_is_shared(self, tmp_path):
+        path = str(tmp_path / "budget.db")
+        first = RateLimiter(max_calls=2, time_window=60, state_path=path)
+        second = RateLimiter(max_calls=2, time_window=60, state_path=path)
+
+        first.wait_if_needed()
+        second.wait_if_needed()
+
+        assert first._window.try_acquire() > 0
+        assert second._window.try_acquire() > 0
+
+
+class TestAsyncTokenBucket:
+    """Token bucket waits without blocking the loop"""
+
+    def test_burst_then_paced(self):
+        bucket = AsyncTokenBucket(rate=20, capacity=2)
+
+        async def run():
+            return [await bucket.acquire() for _ in range(4)]
+
+        waits = asyncio.run(run())
+
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2] == pytest.approx(0.05, abs=0.02)
+
+    def test_waiting_does_not_block_other_tasks(self):
+        bucket = AsyncTokenBucket(rate=10, capacity=1)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await bucket.acquire()
+            await asyncio.gather(bucket.acquire(), ticker())
+
+        asyncio.run(run())
+
+        assert len(ticks) == 5
+
+
+class TestAsyncTushareClient:
+    """Offloaded calls with awaitable retries"""
+
+    def _client(self, sync_client, **kwargs):
+        return AsyncTushareClient(
+            sync_client, rate_limiter=AsyncTokenBucket(rate=1000), **kwargs
+        )
+
+    def test_calls_run_in_executor_concurrently(self):
+        sync_client = Mock(spec=TushareClient)
+        threads = set()
+        barrier = threading.Barrier(2, timeout=2)
+
+        def fetch_daily(**kwargs):
+            threads.add(threading.get_ident())
+            barrier.wait()  # 两个请求同时在途才会通过
+            return pd.DataFrame({"trade_date": [kwargs["trade_date"]]})
+
+        sync_client.fetch_daily.side_effect = fetch_daily
+        client = self._client(sync_client, max_workers=2)
+
+        async def run():
+            return await asyncio.gather(
+                client.fetch_daily(trade_date="20240102"),
+                client.fetch_daily(trade_date="20240103"),
+            )
+
+        frames = asyncio.run(run())
+
+        assert [df["trade_date"][0] for df in frames] == ["20240102", "20240103"]
+        assert threading.get_ident() not in threads
+        assert len(threads) == 2
+
+    def test_retries_with_backoff(self):
+        sync_client = Mock(spec=TushareClient)
+        sync_client.fetch_daily.side_effect = [
+            Exception("timeout"),
+            pd.DataFrame({"close": [1.0]}),
+        ]
+        client = self._client(sync_client, retry_delay=0.01)
+
+        df = asyncio.run(client.fetch_daily(ts_code="000001.SZ"))
+
+        assert sync_client.fetch_daily.call_count == 2
+        assert df["close"][0] == 1.0
+
+    def test_shared_budget_is_taken_in_worker_thread(self):
+        sync_client = Mock(spec=TushareClient)
+        sync_client.fetch_daily.return_value = pd.DataFrame()
+        sync_client.rate_limiter = RateLimiter(max_calls=5, time_window=60)
+        client = AsyncTushareClient(sync_client)
+
+        asyncio.run(client.fetch_daily(trade_date="20240102", priority=Priority.BATCH))
+
+        assert client.rate_limiter is None
+        assert len(sync_client.rate_limiter._window.calls) == 1
+        sync_client.fetch_daily.assert_called_once_with(trade_date="20240102")
+
+    def test_raises_after_max_retries(self):
+        sync_client = Mock(spec=TushareClient)
+        sync_client.fetch_daily.side_effect = Exception("boom")
+        client = self._client(sync_client, max_retries=2, retry_delay=0.01)
+
+        with pytest.raises(Exception, match="boom"):
+            asyncio.run(client.fetch_daily(ts_code="000001.SZ"))
+        assert sync_client.fetch_daily.call_count == 2
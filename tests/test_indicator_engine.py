@@ -0,0 +1,175 @@
+"""
+Unit tests for the vectorized indicator engine
+
+Compares every indicator against a straightforward per-element reference loop,
+for single series and (symbols x time) panels.
+"""
+
+import numpy as np
+import pytest
+
+from src.utils import indicator_engine as engine
+from src.utils.indicators import calculate_ma, calculate_macd, calculate_macd_series
+
+
+def _ref_ema(values, alpha, init=None):
+    out = []
+    prev = values[0] if init is None else init
+    for v in values:
+        prev = prev + alpha * (v - prev)
+        out.append(prev)
+    return np.array(out)
+
+
+def _ref_ma(values, period):
+    return np.array([
+        np.mean(values[max(0, i - period + 1) : i + 1]) for i in range(len(values))
+    ])
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(42)
+    close = 10 + np.cumsum(rng.normal(0, 0.2, size=(20, 300)), axis=1)
+    high = close + rng.uniform(0, 0.3, size=close.shape)
+    low = close - rng.uniform(0, 0.3, size=close.shape)
+    return high, low, close
+
+
+class TestBasicFilters:
+    """EMA / MA against reference loops"""
+
+    @pytest.mark.parametrize("period", [3, 9, 12, 26, 60])
+    def test_ema_matches_loop(self, panel, period):
+        _, _, close = panel
+        result = engine.ema(close, period)
+        for row in range(close.shape[0]):
+            expected = _ref_ema(close[row], 2 / (period + 1))
+            np.testing.assert_allclose(result[row], expected, rtol=1e-10)
+
+    def test_ema_continues_from_init(self, panel):
+        _, _, close = panel
+        series = close[0]
+        full = engine.ema(series, 12)
+        resumed = engine.ema(series[100:], 12, init=full[99])
+        np.testing.assert_allclose(resumed, full[100:], rtol=1e-10)
+
+    @pytest.mark.parametrize("period", [1, 5, 20, 400])
+    def test_sma_matches_loop(self, panel, period):
+        _, _, close = panel
+        result = engine.sma(close, period)
+        for row in range(close.shape[0]):
+            np.testing.assert_allclose(result[row], _ref_ma(close[row], period), rtol=1e-10)
+
+    def test_leading_nan_rows_start_at_first_valid_value(self, panel):
+        _, _, close = panel
+        data = close[:2].copy()
+        data[1, :50] = np.nan
+
+        ema_result = engine.ema(data, 12)
+        sma_result = engine.sma(data, 5)
+
+        assert np.isnan(ema_result[1, :50]).all()
+        np.testing.assert_allclose(ema_result[1, 50:], engine.ema(close[1, 50:], 12), rtol=1e-10)
+        np.testing.assert_allclose(sma_result[1, 50:], _ref_ma(close[1, 50:], 5), rtol=1e-10)
+        np.testing.assert_allclose(ema_result[0], engine.ema(close[0], 12), rtol=1e-10)
+
+
+class TestCompositeIndicators:
+    """MACD / RSI / BOLL / KDJ / ATR against reference loops"""
+
+    def test_macd_panel_matches_single_series(self, panel):
+        _, _, close = panel
+        result = engine.macd(close)
+        for row in (0, 7, 19):
+            fast = _ref_ema(close[row], 2 / 13)
+            slow = _ref_ema(close[row], 2 / 27)
+            dif = fast - slow
+            dea = _ref_ema(dif, 2 / 10)
+            np.testing.assert_allclose(result["dif"][row], dif, atol=1e-10)
+            np.testing.assert_allclose(result["dea"][row], dea, atol=1e-10)
+            np.testing.assert_allclose(result["macd"][row], (dif - dea) * 2, atol=1e-10)
+
+    def test_rsi_matches_loop(self, panel):
+        _, _, close = panel
+        series = close[3]
+        change = np.diff(series)
+        gain = _ref_ema(np.maximum(change, 0), 1 / 14)
+        total = _ref_ema(np.abs(change), 1 / 14)
+
+        result = engine.rsi(close, 14)[3]
+
+        assert np.isnan(result[0])
+        np.testing.assert_allclose(result[1:], gain / total * 100, rtol=1e-9)
+
+    def test_boll_matches_loop(self, panel):
+        _, _, close = panel
+        series = close[5]
+        result = engine.boll(close, 20, 2.0)
+
+        assert np.isnan(result["mid"][5, :19]).all()
+        for i in range(19, len(series)):
+            window = series[i - 19 : i + 1]
+            assert result["mid"][5, i] == pytest.approx(window.mean(), rel=1e-10)
+            assert result["upper"][5, i] == pytest.approx(window.mean() + 2 * window.std(), rel=1e-9)
+
+    def test_kdj_matches_loop(self, panel):
+        high, low, close = panel
+        row = 11
+        k_prev = d_prev = 50.0
+        expected_k, expected_d = [], []
+        for i in range(close.shape[1]):
+            hh = high[row, max(0, i - 8) : i + 1].max()
+            ll = low[row, max(0, i - 8) : i + 1].min()
+            rsv = (close[row, i] - ll) / (hh - ll) * 100
+            k_prev = k_prev + (rsv - k_prev) / 3
+            d_prev = d_prev + (k_prev - d_prev) / 3
+            expected_k.append(k_prev)
+            expected_d.append(d_prev)
+
+        result = engine.kdj(high, low, close)
+
+        np.testing.assert_allclose(result["k"][row], expected_k, rtol=1e-9)
+        np.testing.assert_allclose(result["d"][row], expected_d, rtol=1e-9)
+        np.testing.assert_allclose(
+            result["j"][row], 3 * np.array(expected_k) - 2 * np.array(expected_d), rtol=1e-8
+        )
+
+    def test_atr_matches_loop(self, panel):
+        high, low, close = panel
+        row = 2
+        prev_close = np.concatenate([[close[row, 0]], close[row, :-1]])
+        tr = np.maximum.reduce([
+            high[row] - low[row],
+            np.abs(high[row] - prev_close),
+            np.abs(low[row] - prev_close),
+        ])
+
+        result = engine.atr(high, low, close, 14)
+
+        np.testing.assert_allclose(result[row], _ref_ma(tr, 14), rtol=1e-10)
+
+
+class TestListInterfaces:
+    """indicators.py list interfaces keep their contracts"""
+
+    def test_calculate_ma_docstring_example(self):
+        assert calculate_ma([10, 11, 12, 13, 14], 3) == [10.0, 10.5, 11.0, 12.0, 13.0]
+
+    def test_calculate_macd_rounds_to_four_decimals(self, panel):
+        _, _, close = panel
+        result = calculate_macd(close[0].tolist())
+        assert len(result["dif"]) == close.shape[1]
+        assert all(round(v, 4) == v for v in result["dif"])
+
+    def test_calculate_macd_series_resumes_from_state(self, panel):
+        _, _, close = panel
+        series = close[0].tolist()
+        full = calculate_macd_series(series)
+        resumed = calculate_macd_series(
+            series[200:],
+            ema_fast=full["ema_fast"][199],
+            ema_slow=full["ema_slow"][199],
+            dea=full["dea"][199],
+        )
+        np.testing.assert_allclose(resumed["dea"], full["dea"][200:], atol=1e-10)